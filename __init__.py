@@ -1,7 +1,7 @@
 import logging  # Для логирования
 from logging.handlers import RotatingFileHandler  # Для ротации лог-файлов
 import os
-from flask import Flask, jsonify
+from flask import Flask, jsonify, g
 from flask_restx import Api  # Импорт Api из flask_restx
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -12,11 +12,27 @@ from marshmallow import ValidationError  # Для ошибок валидаци
 from config import config
 from flask_cors import CORS  # Импортируем CORS
 
+
+
+class BatchJWTManager(JWTManager):
+    """
+    JWTManager, который не проверяет заново токен, уже проверенный
+    пакетным запросом: BatchService.run сохраняет его в g.batch_jwt
+    (токен, данные), и вложенные запросы пакета получают данные готовыми.
+    """
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        verified = g.get('batch_jwt')
+        if verified is not None and verified[0] == encoded_token:
+            return verified[1]
+        return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+
 # Определение глобальных объектов
 db = SQLAlchemy()
 migrate = Migrate()
 ma = Marshmallow()
-jwt = JWTManager()
+jwt = BatchJWTManager()
 
 # Создаем объект Api для Swagger UI
 authorizations = {  # Настройка для кнопки Authorize в Swagger UI
@@ -106,7 +122,8 @@ def create_app(config_name='default'):
     # Если вы не знаете порт заранее или для простой разработки:
     # origins = "*"
     CORS(app, resources={r"/api/*": {"origins": origins}},
-         supports_credentials=True)
+         supports_credentials=True,
+         expose_headers=['ETag', 'Last-Modified'])
     # resources={r"/api/*"} - применяем CORS только к путям API
     # supports_credentials=True - важно для отправки куки или заголовка Authorization
 
@@ -166,6 +183,24 @@ def create_app(config_name='default'):
 
     from .views.support_restx import ns as support_ns
     api.add_namespace(support_ns, path='/api/v1/support')
+
+    from .views.batch_restx import ns as batch_ns
+    api.add_namespace(batch_ns, path='/api/v1/batch')
+
+    from .views.dashboard_restx import ns as dashboard_ns
+    api.add_namespace(dashboard_ns, path='/api/v1/dashboard')
+
+    from .views.recurring_restx import ns as recurring_ns
+    api.add_namespace(recurring_ns, path='/api/v1/recurring')
+
+    from .views.sync_restx import ns as sync_ns
+    api.add_namespace(sync_ns, path='/api/v1/sync')
+
+    from .views.events_restx import ns as events_ns
+    api.add_namespace(events_ns, path='/api/v1/events')
+
+    from .views.jobs_restx import ns as jobs_ns
+    api.add_namespace(jobs_ns, path='/api/v1/jobs')
     # -----------------------------
 
     # --- Эндпоинты вне API ---
@@ -92,8 +92,9 @@ def create_app(config_name='default'):
          supports_credentials=True,
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
          allow_headers=["Content-Type", "Authorization",
-                        "X-Requested-With", "Cache-Control", "Pragma", "Expires"],
-         expose_headers=['Content-Type', 'Authorization'])
+                        "X-Requested-With", "Cache-Control", "Pragma", "Expires",
+                        "If-None-Match", "If-Modified-Since"],
+         expose_headers=['Content-Type', 'Authorization', 'ETag', 'Last-Modified'])
 
     # Дополнительная конфигурация
     app.config['PROPAGATE_EXCEPTIONS'] = True
@@ -116,6 +117,12 @@ def create_app(config_name='default'):
     from views.reports_restx import ns as reports_ns
     from views.calculator_restx import ns as calculator_ns
     from views.support_restx import ns as support_ns
+    from views.batch_restx import ns as batch_ns
+    from views.dashboard_restx import ns as dashboard_ns
+    from views.recurring_restx import ns as recurring_ns
+    from views.sync_restx import ns as sync_ns
+    from views.events_restx import ns as events_ns
+    from views.jobs_restx import ns as jobs_ns
 
     api.add_namespace(auth_ns, path='/api/v1/auth')
     api.add_namespace(categories_ns, path='/api/v1/categories')
@@ -124,6 +131,12 @@ def create_app(config_name='default'):
     api.add_namespace(reports_ns, path='/api/v1/reports')
     api.add_namespace(calculator_ns, path='/api/v1/calculator')
     api.add_namespace(support_ns, path='/api/v1/support')
+    api.add_namespace(batch_ns, path='/api/v1/batch')
+    api.add_namespace(dashboard_ns, path='/api/v1/dashboard')
+    api.add_namespace(recurring_ns, path='/api/v1/recurring')
+    api.add_namespace(sync_ns, path='/api/v1/sync')
+    api.add_namespace(events_ns, path='/api/v1/events')
+    api.add_namespace(jobs_ns, path='/api/v1/jobs')
 
     # API статус
     @app.route('/api/status')
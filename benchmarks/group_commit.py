@@ -0,0 +1,100 @@
+"""
+Замер скорости создания транзакций (вставок в секунду) без группового
+коммита и с ним в обоих режимах надежности.
+
+Запуск из корня проекта:
+    python benchmarks/group_commit.py --threads 16 --inserts 200
+"""
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Приложение собирается фабрикой пакета, как в tests/conftest.py: корень
+# проекта импортируется как пакет, а config, models и services.* - абсолютно
+sys.path[:0] = [os.path.dirname(ROOT), ROOT]
+package = importlib.import_module(os.path.basename(ROOT))
+sys.modules.setdefault('models', importlib.import_module(f'{package.__name__}.models'))
+
+from config import config, TestingConfig  # noqa: E402
+from models import db, User, Category, CategoryType  # noqa: E402
+from services.transaction_service import TransactionService  # noqa: E402
+
+create_app = package.create_app
+
+
+def _prepare(app):
+    """Создает таблицы, пользователя и категорию; возвращает их id."""
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('benchmark')
+        db.session.add(user)
+        db.session.flush()
+        category = Category(name='Продукты', type=CategoryType.EXPENSE, user_id=user.id)
+        db.session.add(category)
+        db.session.commit()
+        return user.id, category.id
+
+
+def run(mode: str, threads: int, inserts: int) -> float:
+    """Вставки в секунду для режима off/commit/flush на новой файловой БД."""
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    # Файловая БД задается до создания приложения: движок создается при инициализации
+    config['benchmark'] = type('BenchmarkConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'GROUP_COMMIT_ENABLED': mode != 'off',
+        'GROUP_COMMIT_DURABILITY': mode if mode != 'off' else 'commit',
+        'EVENTS_POLL_INTERVAL': 0
+    })
+    app = create_app('benchmark')
+    user_id, category_id = _prepare(app)
+    errors = []
+
+    def worker(number):
+        with app.app_context():
+            for index in range(inserts):
+                result, status = TransactionService.create_transaction(user_id, {
+                    'description': f'Покупка {number}-{index}',
+                    'amount': '100.00',
+                    'date': date.today().isoformat(),
+                    'category_id': category_id
+                })
+                if status != 201:
+                    errors.append(result)
+            db.session.remove()
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    os.close(db_fd)
+    os.unlink(db_path)
+    if errors:
+        print(f'  {mode}: ошибок {len(errors)}, первая: {errors[0]}')
+    return threads * inserts / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16, help='Параллельных клиентов')
+    parser.add_argument('--inserts', type=int, default=100, help='Вставок на клиента')
+    args = parser.parse_args()
+
+    print(f'Клиентов: {args.threads}, вставок на клиента: {args.inserts}')
+    for mode in ('off', 'commit', 'flush'):
+        rate = run(mode, args.threads, args.inserts)
+        print(f'{mode:>7}: {rate:10.1f} вставок/с')
+
+
+if __name__ == '__main__':
+    main()
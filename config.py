@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 
 # Загрузка переменных окружения из .env файла
@@ -21,6 +22,54 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', SECRET_KEY)
     JWT_ACCESS_TOKEN_EXPIRES = 24 * 3600  # 24 часа в секундах
 
+    # Максимальное число вложенных запросов в /api/v1/batch
+    BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+
+    # Максимальное число элементов в массовых операциях (/bulk)
+    BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 1000))
+
+    # Число процессов для больших Монте-Карло расчетов (0 - без пула)
+    SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', 0))
+
+    # Интервал чтения событий изменений других процессов для SSE, секунд
+    # (0 - только события своего процесса)
+    EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 1.0))
+    # Интервал keepalive в SSE-потоке /api/v1/events/stream, секунд
+    EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+    # Предел SSE-подключений на процесс: каждое занимает поток воркера
+    # gthread до отключения клиента, поэтому предел должен быть меньше
+    # числа потоков (GUNICORN_THREADS), иначе потоки закончатся у API
+    # (0 - без предела)
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 0))
+
+    # Групповой коммит создания транзакций: вставки из параллельных
+    # запросов в окне GROUP_COMMIT_WINDOW_MS записываются одним коммитом.
+    # GROUP_COMMIT_DURABILITY: commit - ответ после коммита группы,
+    # flush - ответ до коммита (быстрее, но при сбое группа теряется)
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', '0') == '1'
+    GROUP_COMMIT_WINDOW_MS = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 5))
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 200))
+    GROUP_COMMIT_DURABILITY = os.environ.get('GROUP_COMMIT_DURABILITY', 'commit')
+
+    # Фоновые задачи (/api/v1/jobs): потоки выполнения, процессы для
+    # тяжелых вычислений (0 - без пула), лимит незавершенных задач
+    # пользователя, время хранения результатов и каталог файлов выгрузок
+    JOBS_THREAD_WORKERS = int(os.environ.get('JOBS_THREAD_WORKERS', 2))
+    JOBS_PROCESS_WORKERS = int(os.environ.get('JOBS_PROCESS_WORKERS', 0))
+    JOBS_MAX_ACTIVE_PER_USER = int(os.environ.get('JOBS_MAX_ACTIVE_PER_USER', 5))
+    JOBS_STALE_SECONDS = int(os.environ.get('JOBS_STALE_SECONDS', 600))
+    JOBS_RESULT_TTL = timedelta(hours=int(os.environ.get('JOBS_RESULT_TTL_HOURS', 24)))
+    JOBS_RESULT_DIR = os.environ.get('JOBS_RESULT_DIR', os.path.join(os.getcwd(), 'data', 'jobs'))
+
+    # Аналитика по столбцам NumPy (/reports/trend, /reports/categories):
+    # бюджет памяти кэша столбцов пользователей и каталог для хранения
+    # столбцов в файлах, отображаемых в память (пусто - только в памяти)
+    ANALYTICS_MEMORY_BUDGET_MB = int(os.environ.get('ANALYTICS_MEMORY_BUDGET_MB', 64))
+    ANALYTICS_MMAP_DIR = os.environ.get('ANALYTICS_MMAP_DIR', '')
+
+    # Каталог файлов архивов транзакций по годам
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(os.getcwd(), 'data', 'archive'))
+
     # CORS настройки
     CORS_ORIGINS = [
         "http://localhost:5173",
@@ -4,15 +4,35 @@
 """
 Скрипт для инициализации базы данных и создания начальных тестовых данных.
 Использует Flask-SQLAlchemy и Flask-Migrate для работы с БД.
+
+Уже инициализированная база определяется одним запросом к таблице
+schema_info. Для SQLite при первом запуске вместо создания схемы
+копируется готовый шаблон, собранный на этапе сборки образа:
+
+    python init_db.py --build-template /app/template/budgetnik.db
 """
 
 import os
 import sys
+import shutil
 import logging
+import argparse
+import importlib
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from flask import Flask
 from flask_migrate import Migrate
+from sqlalchemy import inspect, insert, select, update, func, text
+from sqlalchemy.exc import SQLAlchemyError
+
+if not __package__:
+    # models.py берет db из пакета приложения (from . import db), поэтому
+    # при запуске скриптом (python init_db.py) корень проекта импортируется
+    # как пакет, как в benchmarks/group_commit.py, а models - его модуль
+    ROOT = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.dirname(ROOT), ROOT]
+    _package = importlib.import_module(os.path.basename(ROOT))
+    sys.modules.setdefault('models', importlib.import_module(f'{_package.__name__}.models'))
 
 # Настройка логирования
 logging.basicConfig(
@@ -21,16 +41,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger('init_db')
 
+# Шаблон БД, который копируется при первом запуске контейнера
+DEFAULT_TEMPLATE_PATH = os.environ.get(
+    'DATABASE_TEMPLATE', '/app/template/budgetnik.db')
+
+# Версия схемы, с которой валюта входит в отпечаток транзакции
+FINGERPRINT_CURRENCY_VERSION = 13
+
 
-def create_app():
+def create_app(database_url=None):
     """Создает экземпляр Flask-приложения для инициализации БД"""
     app = Flask(__name__)
 
     # Конфигурация базы данных
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url or os.environ.get(
         'DATABASE_URL', 'sqlite:///budgetnik.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
+    app.config['ARCHIVE_DIR'] = os.environ.get(
+        'ARCHIVE_DIR', os.path.join(os.getcwd(), 'data', 'archive'))
 
     # Инициализация БД и миграций
     from models import db
@@ -42,194 +71,343 @@ def create_app():
     return app
 
 
-def init_database(app):
-    """Инициализирует базу данных и создает начальные тестовые данные"""
-    from models import User, Category, Budget, Transaction, CategoryType, BudgetPeriod
+def get_schema_version(db):
+    """
+    Возвращает версию схемы из отметки schema_info или None,
+    если база еще не инициализирована. Выполняет ровно один запрос.
+    """
+    try:
+        return db.session.execute(
+            text('SELECT version FROM schema_info ORDER BY id DESC LIMIT 1')
+        ).scalar()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+
+def copy_template_if_missing(db, template_path=DEFAULT_TEMPLATE_PATH):
+    """
+    Копирует шаблон SQLite-базы на место рабочей, если рабочей еще нет.
+    Возвращает True, если шаблон был скопирован.
+    """
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return False
+
+    if os.path.exists(url.database) or not os.path.exists(template_path):
+        return False
+
+    os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+    # Соединения пула могли открыть пустой файл до копирования
+    db.engine.dispose()
+    shutil.copyfile(template_path, url.database)
+    logger.info(f"База данных создана из шаблона {template_path}")
+    return True
+
+
+def upgrade_schema(db, from_version=None):
+    """
+    Создает недостающие таблицы, колонки и индексы.
+    Существующие данные не изменяются, кроме производных
+    (отпечатков транзакций) при смене способа их расчета.
+    """
+    logger.info("Создание таблиц базы данных...")
+    db.create_all()
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing_columns = {column['name']
+                                for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    # Строковые значения по умолчанию (коды валют) - в кавычках
+                    if isinstance(default, str) and not default.isdigit():
+                        default = f"'{default}'"
+                    ddl += f' DEFAULT {default}'
+                connection.execute(text(ddl))
+                logger.info(f"Добавлена колонка {table.name}.{column.name}")
+
+            existing_indexes = {index['name']
+                                for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    logger.info(f"Создан индекс {index.name}")
+
+        # Полнотекстовый индекс описаний транзакций (SQLite FTS5)
+        from services.search_service import SearchService
+        if SearchService.ensure_index(connection):
+            logger.info("Полнотекстовый индекс транзакций готов")
+
+        # Отпечатки для поиска дубликатов при импорте; с версии
+        # FINGERPRINT_CURRENCY_VERSION в отпечаток входит валюта
+        from models import Transaction
+        from services.dedup_service import DedupService
+        if from_version is not None and from_version < FINGERPRINT_CURRENCY_VERSION:
+            connection.execute(update(Transaction.__table__).values(fingerprint=None))
+        filled = DedupService.backfill_fingerprints(connection)
+        if filled:
+            logger.info(f"Заполнены отпечатки {filled} транзакций")
+
+        # Счетчики использования категорий
+        from services.category_stats_service import CategoryStatsService
+        CategoryStatsService.recalculate(connection=connection)
+
+
+def stamp_schema(db, seeded_on=None):
+    """Записывает текущую версию схемы в schema_info."""
+    from models import SchemaInfo, SCHEMA_VERSION
+
+    info = SchemaInfo.query.order_by(SchemaInfo.id.desc()).first()
+    if info is None:
+        info = SchemaInfo(version=SCHEMA_VERSION, seeded_on=seeded_on)
+        db.session.add(info)
+    else:
+        info.version = SCHEMA_VERSION
+        if seeded_on:
+            info.seeded_on = seeded_on
+    db.session.commit()
+
+
+def rebase_seed_dates(db):
+    """
+    Сдвигает даты тестовых данных шаблона на текущую дату.
+    Шаблон собирается заранее, поэтому без сдвига демо-транзакции
+    и бюджет "на текущий месяц" оказались бы в прошлом.
+    """
+    from models import SchemaInfo, Transaction, Budget, BudgetPeriod
+
+    info = SchemaInfo.query.order_by(SchemaInfo.id.desc()).first()
+    if info is None or info.seeded_on is None:
+        return
+
+    shift_days = (date.today() - info.seeded_on).days
+    if shift_days <= 0:
+        return
+
+    # Шаблон всегда SQLite, поэтому используем date(..., '+N days').
+    # Дата входит в отпечаток, поэтому отпечатки пересчитываются
+    from services.dedup_service import DedupService
+    db.session.execute(update(Transaction).values(
+        date=func.date(Transaction.date, f'+{shift_days} days'), fingerprint=None))
+    DedupService.backfill_fingerprints(db.session.connection())
+    from services.category_stats_service import CategoryStatsService
+    CategoryStatsService.recalculate(fields=('last_used_on',))
+    start_date, end_date = _current_month_range()
+    db.session.execute(update(Budget).where(Budget.period == BudgetPeriod.MONTHLY).values(
+        start_date=start_date, end_date=end_date))
+    info.seeded_on = date.today()
+    db.session.commit()
+    logger.info(f"Даты тестовых данных сдвинуты на {shift_days} дн.")
+
+
+def _current_month_range():
+    """Первый и последний день текущего месяца."""
+    today = date.today()
+    start_date = date(today.year, today.month, 1)
+    if today.month == 12:
+        end_date = date(today.year + 1, 1, 1) - timedelta(days=1)
+    else:
+        end_date = date(today.year, today.month + 1, 1) - timedelta(days=1)
+    return start_date, end_date
+
+
+def seed_demo_data(db):
+    """
+    Создает тестовых пользователей, категории, бюджет и транзакции.
+    Каждая таблица заполняется одним пакетным INSERT.
+    """
+    from models import (User, Category, Budget, Transaction, CategoryType, BudgetPeriod,
+                        BASE_CURRENCY)
+    from services.dedup_service import transaction_fingerprint
+    from services.category_stats_service import CategoryStatsService
     from werkzeug.security import generate_password_hash
 
+    logger.info("Создание тестовых пользователей...")
+
+    # Хеш считаем напрямую: демо-пароли короче правила User.set_password
+    db.session.execute(insert(User), [
+        {'username': 'demo', 'email': 'demo@example.com',
+         'password_hash': generate_password_hash('demo123')},
+        {'username': 'test', 'email': 'test@example.com',
+         'password_hash': generate_password_hash('test123')},
+    ])
+    demo_user_id = db.session.execute(
+        select(User.id).where(User.username == 'demo')).scalar_one()
+    logger.info("Создано 2 тестовых пользователя: demo, test")
+
+    # Создаем категории для demo пользователя
+    logger.info("Создание категорий для тестового пользователя...")
+    income_names = ["Зарплата", "Фриланс", "Инвестиции", "Подарки"]
+    expense_names = ["Продукты", "Транспорт", "Жилье",
+                     "Развлечения", "Здоровье", "Одежда"]
+    db.session.execute(insert(Category), [
+        {'name': name, 'type': CategoryType.INCOME, 'user_id': demo_user_id}
+        for name in income_names
+    ] + [
+        {'name': name, 'type': CategoryType.EXPENSE, 'user_id': demo_user_id}
+        for name in expense_names
+    ])
+    category_ids = dict(db.session.execute(
+        select(Category.name, Category.id).where(Category.user_id == demo_user_id)).all())
+    logger.info(
+        f"Создано {len(income_names)} категорий доходов и {len(expense_names)} категорий расходов")
+
+    # Создаем бюджет на текущий месяц
+    logger.info("Создание тестового бюджета...")
+    start_date, end_date = _current_month_range()
+    db.session.execute(insert(Budget), [{
+        'name': "Бюджет на текущий месяц",
+        'period': BudgetPeriod.MONTHLY,
+        'start_date': start_date,
+        'end_date': end_date,
+        'target_amount': Decimal('50000.00'),  # Цель на расходы
+        'user_id': demo_user_id
+    }])
+    logger.info(f"Создан бюджет: Бюджет на текущий месяц ({start_date} - {end_date})")
+
+    # Создаем тестовые транзакции: (описание, сумма, дней назад, тип, категория)
+    logger.info("Создание тестовых транзакций...")
+    today = date.today()
+    transactions = [
+        ("Зарплата за месяц", '70000.00', 15, CategoryType.INCOME, "Зарплата"),
+        ("Оплата за разработку сайта", '15000.00',
+         5, CategoryType.INCOME, "Фриланс"),
+        ("Продукты в супермаркете", '3500.00',
+         10, CategoryType.EXPENSE, "Продукты"),
+        ("Покупка продуктов", '2800.00', 3, CategoryType.EXPENSE, "Продукты"),
+        ("Аренда квартиры", '25000.00', 12, CategoryType.EXPENSE, "Жилье"),
+        ("Поход в кино", '1200.00', 2, CategoryType.EXPENSE, "Развлечения"),
+        ("Проездной на месяц", '2000.00', 20, CategoryType.EXPENSE, "Транспорт"),
+    ]
+    db.session.execute(insert(Transaction), [
+        {
+            'description': description,
+            'amount': Decimal(amount),
+            'date': today - timedelta(days=days_ago),
+            'type': transaction_type,
+            'category_id': category_ids[category_name],
+            'user_id': demo_user_id,
+            'fingerprint': transaction_fingerprint(
+                demo_user_id, today - timedelta(days=days_ago), amount, BASE_CURRENCY,
+                description)
+        } for description, amount, days_ago, transaction_type, category_name in transactions
+    ])
+    CategoryStatsService.recalculate(category_ids.values())
+    db.session.commit()
+    logger.info(f"Создано {len(transactions)} тестовых транзакций")
+
+
+def init_database(app, template_path=DEFAULT_TEMPLATE_PATH):
+    """Инициализирует базу данных и создает начальные тестовые данные"""
+    from models import User, SCHEMA_VERSION
+
     with app.app_context():
-        # Создание таблиц (если используем SQLite)
-        db = app.extensions['sqlalchemy'].db
-        logger.info("Создание таблиц базы данных...")
-        db.create_all()
+        db = app.extensions['sqlalchemy']
 
-        # Проверка, есть ли уже пользователи
-        if User.query.count() > 0:
+        copied = copy_template_if_missing(db, template_path)
+
+        # Единственная проверка на "горячем" пути старта контейнера
+        version = get_schema_version(db)
+        if version == SCHEMA_VERSION:
+            if copied:
+                rebase_seed_dates(db)
             logger.info(
-                "В базе данных уже есть пользователи, пропускаем создание тестовых данных")
+                f"Схема БД актуальна (версия {version}), инициализация не требуется")
             return
 
-        logger.info("Создание тестовых пользователей...")
-
-        # Создаем тестовых пользователей
-        demo_user = User(
-            username='demo',
-            email='demo@example.com'
-        )
-        demo_user.set_password('demo123')
-
-        test_user = User(
-            username='test',
-            email='test@example.com'
-        )
-        test_user.set_password('test123')
-
-        db.session.add(demo_user)
-        db.session.add(test_user)
-        db.session.commit()
-
-        logger.info(
-            f"Создано 2 тестовых пользователя: {demo_user.username}, {test_user.username}")
-
-        # Создаем категории для demo пользователя
-        logger.info("Создание категорий для тестового пользователя...")
-
-        # Категории доходов
-        income_categories = [
-            Category(name="Зарплата", type=CategoryType.INCOME,
-                     user_id=demo_user.id),
-            Category(name="Фриланс", type=CategoryType.INCOME,
-                     user_id=demo_user.id),
-            Category(name="Инвестиции", type=CategoryType.INCOME,
-                     user_id=demo_user.id),
-            Category(name="Подарки", type=CategoryType.INCOME,
-                     user_id=demo_user.id)
-        ]
-
-        # Категории расходов
-        expense_categories = [
-            Category(name="Продукты", type=CategoryType.EXPENSE,
-                     user_id=demo_user.id),
-            Category(name="Транспорт", type=CategoryType.EXPENSE,
-                     user_id=demo_user.id),
-            Category(name="Жилье", type=CategoryType.EXPENSE,
-                     user_id=demo_user.id),
-            Category(name="Развлечения", type=CategoryType.EXPENSE,
-                     user_id=demo_user.id),
-            Category(name="Здоровье", type=CategoryType.EXPENSE,
-                     user_id=demo_user.id),
-            Category(name="Одежда", type=CategoryType.EXPENSE,
-                     user_id=demo_user.id)
-        ]
-
-        for category in income_categories + expense_categories:
-            db.session.add(category)
-
-        db.session.commit()
-        logger.info(
-            f"Создано {len(income_categories)} категорий доходов и {len(expense_categories)} категорий расходов")
-
-        # Создаем бюджет на текущий месяц
-        logger.info("Создание тестового бюджета...")
-
-        today = date.today()
-        # Первый день текущего месяца
-        start_date = date(today.year, today.month, 1)
-
-        # Последний день текущего месяца
-        if today.month == 12:
-            end_date = date(today.year + 1, 1, 1) - timedelta(days=1)
+        if version is None:
+            logger.info("База данных не инициализирована")
         else:
-            end_date = date(today.year, today.month + 1, 1) - timedelta(days=1)
-
-        monthly_budget = Budget(
-            name="Бюджет на текущий месяц",
-            period=BudgetPeriod.MONTHLY,
-            start_date=start_date,
-            end_date=end_date,
-            target_amount=Decimal('50000.00'),  # Цель на расходы
-            user_id=demo_user.id
-        )
-
-        db.session.add(monthly_budget)
-        db.session.commit()
-        logger.info(
-            f"Создан бюджет: {monthly_budget.name} ({start_date} - {end_date})")
-
-        # Создаем тестовые транзакции
-        logger.info("Создание тестовых транзакций...")
-
-        # Доходы
-        salary = Transaction(
-            description="Зарплата за месяц",
-            amount=Decimal('70000.00'),
-            date=date.today() - timedelta(days=15),
-            type=CategoryType.INCOME,
-            category_id=income_categories[0].id,  # Зарплата
-            user_id=demo_user.id
-        )
-
-        freelance = Transaction(
-            description="Оплата за разработку сайта",
-            amount=Decimal('15000.00'),
-            date=date.today() - timedelta(days=5),
-            type=CategoryType.INCOME,
-            category_id=income_categories[1].id,  # Фриланс
-            user_id=demo_user.id
-        )
-
-        # Расходы
-        groceries1 = Transaction(
-            description="Продукты в супермаркете",
-            amount=Decimal('3500.00'),
-            date=date.today() - timedelta(days=10),
-            type=CategoryType.EXPENSE,
-            category_id=expense_categories[0].id,  # Продукты
-            user_id=demo_user.id
-        )
-
-        groceries2 = Transaction(
-            description="Покупка продуктов",
-            amount=Decimal('2800.00'),
-            date=date.today() - timedelta(days=3),
-            type=CategoryType.EXPENSE,
-            category_id=expense_categories[0].id,  # Продукты
-            user_id=demo_user.id
-        )
-
-        rent = Transaction(
-            description="Аренда квартиры",
-            amount=Decimal('25000.00'),
-            date=date.today() - timedelta(days=12),
-            type=CategoryType.EXPENSE,
-            category_id=expense_categories[2].id,  # Жилье
-            user_id=demo_user.id
-        )
-
-        entertainment = Transaction(
-            description="Поход в кино",
-            amount=Decimal('1200.00'),
-            date=date.today() - timedelta(days=2),
-            type=CategoryType.EXPENSE,
-            category_id=expense_categories[3].id,  # Развлечения
-            user_id=demo_user.id
-        )
-
-        transport = Transaction(
-            description="Проездной на месяц",
-            amount=Decimal('2000.00'),
-            date=date.today() - timedelta(days=20),
-            type=CategoryType.EXPENSE,
-            category_id=expense_categories[1].id,  # Транспорт
-            user_id=demo_user.id
-        )
-
-        transactions = [salary, freelance, groceries1,
-                        groceries2, rent, entertainment, transport]
-        for transaction in transactions:
-            db.session.add(transaction)
-
-        db.session.commit()
-        logger.info(f"Создано {len(transactions)} тестовых транзакций")
+            logger.info(
+                f"Обновление схемы БД с версии {version} до {SCHEMA_VERSION}")
+        upgrade_schema(db, from_version=version)
 
+        seeded_on = None
+        # Проверка, есть ли уже пользователи
+        if db.session.query(User.id).first() is not None:
+            logger.info(
+                "В базе данных уже есть пользователи, пропускаем создание тестовых данных")
+        else:
+            seed_demo_data(db)
+            seeded_on = date.today()
+
+        stamp_schema(db, seeded_on=seeded_on)
         logger.info("Инициализация базы данных завершена успешно!")
 
 
+def build_template(template_path):
+    """Собирает шаблон SQLite-базы для копирования при первом запуске."""
+    template_path = os.path.abspath(template_path)
+    os.makedirs(os.path.dirname(template_path), exist_ok=True)
+    if os.path.exists(template_path):
+        os.remove(template_path)
+
+    app = create_app(f'sqlite:///{template_path}')
+    # Шаблон не копируем сам в себя
+    init_database(app, template_path='')
+    with app.app_context():
+        db = app.extensions['sqlalchemy']
+        db.session.remove()
+        # VACUUM нельзя выполнить внутри транзакции
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text('VACUUM'))
+        db.engine.dispose()
+    logger.info(f"Шаблон базы данных создан: {template_path}")
+
+
+def load_rates(app, path):
+    """Загружает курсы валют из локального файла."""
+    from services.rate_import_service import RateImportService
+
+    with app.app_context():
+        result, status = RateImportService.load_file(path)
+        if status != 200:
+            raise ValueError(result.get('error'))
+        logger.info(f"Загружено курсов валют: {result['loaded']}")
+
+
+def archive_transactions(app, before_year):
+    """Архивирует транзакции всех завершенных лет раньше before_year."""
+    from services.archive_service import ArchiveService
+
+    with app.app_context():
+        for year in ArchiveService.archivable_years(before_year):
+            result, status = ArchiveService.archive_year(year)
+            if status != 200:
+                raise RuntimeError(result.get('error'))
+            logger.info(f"Транзакции {year} года перенесены в архив {result['path']}: "
+                        f"{result['row_count']} строк, {result['size_bytes']} байт")
+
+
 def main():
     """Основная функция для запуска скрипта"""
+    parser = argparse.ArgumentParser(
+        description='Инициализация базы данных Budgetnik')
+    parser.add_argument('--build-template', metavar='PATH',
+                        help='собрать шаблон SQLite-базы по указанному пути и выйти')
+    parser.add_argument('--load-rates', metavar='PATH',
+                        help='загрузить курсы валют из CSV (date,currency,rate) или JSON')
+    parser.add_argument('--archive-before', metavar='YEAR', type=int,
+                        help='перенести транзакции лет раньше YEAR в архивные файлы')
+    args = parser.parse_args()
+
     try:
+        if args.build_template:
+            build_template(args.build_template)
+            return
         app = create_app()
         init_database(app)
+        if args.load_rates:
+            load_rates(app, args.load_rates)
+        if args.archive_before:
+            archive_transactions(app, args.archive_before)
     except Exception as e:
         logger.error(f"Ошибка при инициализации базы данных: {str(e)}")
         sys.exit(1)
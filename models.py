@@ -3,7 +3,7 @@ from datetime import datetime, date
 from typing import Optional, Any, List, Union
 from werkzeug.security import generate_password_hash, check_password_hash
 # Для пользовательской валидации
-from sqlalchemy.orm import validates, relationship, backref
+from sqlalchemy.orm import validates, relationship, backref, column_property
 from . import db  # Импорт объекта db из __init__.py
 from decimal import Decimal  # Для валидации денежных сумм
 
@@ -24,9 +24,32 @@ class BudgetPeriod(enum.Enum):
     SEMIANNUAL = 'semiannual'  # Полугодовой
     ANNUAL = 'annual'
 
+
+# Версия схемы БД. Увеличивается при каждом изменении моделей, чтобы
+# init_db.py мог одним запросом понять, нужно ли обновлять базу.
+SCHEMA_VERSION = 13
+
+# Базовая валюта: в ней хранятся итоги и счетчики, к ней приводятся
+# курсы в exchange_rates (сколько единиц базовой валюты стоит единица)
+BASE_CURRENCY = 'RUB'
+
 # --- Модели ---
 
 
+class SchemaInfo(db.Model):
+    """Служебная отметка версии схемы и даты инициализации БД."""
+    __tablename__ = 'schema_info'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    # Дата заполнения тестовыми данными (нужна для сдвига дат в шаблоне)
+    seeded_on = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f'<SchemaInfo v{self.version}>'
+
+
 class User(db.Model):
     """Модель пользователя."""
     __tablename__ = 'users'
@@ -36,6 +59,11 @@ class User(db.Model):
     email = db.Column(db.String(120), index=True, unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Версия данных пользователя: растет при любом изменении его
+    # транзакций, категорий, бюджетов и правил (используется для ETag)
+    data_version = db.Column(db.Integer, nullable=False,
+                             default=0, server_default='0')
+    data_updated_at = db.Column(db.DateTime, nullable=True)
 
     # Связи: один пользователь может иметь много бюджетов, категорий, транзакций
     budgets = relationship(
@@ -44,6 +72,8 @@ class User(db.Model):
         'Category', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
     transactions = relationship(
         'Transaction', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
+    recurring_rules = relationship(
+        'RecurringRule', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
 
     @validates('username')
     def validate_username(self, key: str, username: str) -> str:
@@ -81,14 +111,26 @@ class Category(db.Model):
     type = db.Column(db.Enum(CategoryType), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey(
         'users.id'), nullable=False, index=True)
+    # Счетчики использования (обновляются при записи транзакций)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0, server_default='0')
+    last_used_on = db.Column(db.Date, nullable=True)
+    # Дельта-синхронизация: время и версия данных владельца при последнем изменении
+    updated_at = db.Column(db.DateTime, nullable=True)
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Связь: категория может иметь много транзакций
     transactions = relationship(
         'Transaction', backref='category', lazy='dynamic')
+    # Лимиты категории в бюджетах удаляются вместе с категорией
+    budget_lines = relationship(
+        'BudgetLine', backref='category', lazy='dynamic', cascade="all, delete-orphan")
 
     # Ограничение: Имя категории должно быть уникально для пользователя и типа
-    __table_args__ = (db.UniqueConstraint(
-        'user_id', 'name', 'type', name='_user_category_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', 'type', name='_user_category_uc'),
+        db.Index('ix_categories_user_change_seq', 'user_id', 'change_seq'),
+    )
 
     @validates('name')
     def validate_name(self, key: str, name: str) -> str:
@@ -112,9 +154,21 @@ class Budget(db.Model):
     end_date = db.Column(db.Date, nullable=False, index=True)
     # Целевая сумма (необязательно)
     target_amount = db.Column(db.Numeric(10, 2), nullable=True)
+    # Валюта бюджета: в ней считаются его доходы и расходы
+    currency = db.Column(db.String(3), nullable=False, default=BASE_CURRENCY,
+                         server_default=BASE_CURRENCY)
     user_id = db.Column(db.Integer, db.ForeignKey(
         'users.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Дельта-синхронизация: время и версия данных владельца при последнем изменении
+    updated_at = db.Column(db.DateTime, nullable=True)
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Лимиты расходов по категориям (строки бюджета)
+    lines = relationship('BudgetLine', backref='budget', order_by='BudgetLine.id',
+                         cascade="all, delete-orphan")
+
+    __table_args__ = (db.Index('ix_budgets_user_change_seq', 'user_id', 'change_seq'),)
 
     @validates('name')
     def validate_name(self, key: str, name: str) -> str:
@@ -139,6 +193,14 @@ class Budget(db.Model):
                     f"Invalid date format for {key}. Use YYYY-MM-DD.")
         return value
 
+    @validates('currency')
+    def validate_currency(self, key: str, value: Any) -> str:
+        """Код валюты ISO 4217 в верхнем регистре."""
+        code = str(value or '').strip().upper()
+        if len(code) != 3 or not code.isalpha():
+            raise ValueError("Currency must be a 3-letter ISO 4217 code.")
+        return code
+
     @validates('target_amount')
     def validate_target_amount(self, key: str, value: Any) -> Optional[Decimal]:
         """Валидация целевой суммы."""
@@ -163,23 +225,79 @@ class Budget(db.Model):
         return f'<Budget {self.name} ({self.period.value}) {self.start_date}-{self.end_date}>'
 
 
+class BudgetLine(db.Model):
+    """Строка бюджета: лимит расходов по одной категории в валюте бюджета."""
+    __tablename__ = 'budget_lines'
+    id = db.Column(db.Integer, primary_key=True)
+    budget_id = db.Column(db.Integer, db.ForeignKey(
+        'budgets.id', ondelete='CASCADE'), nullable=False, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey(
+        'categories.id', ondelete='CASCADE'), nullable=False, index=True)
+    limit_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    # Владелец (как у бюджета): изменение строк меняет версию данных
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'users.id'), nullable=False, index=True)
+
+    __table_args__ = (db.UniqueConstraint('budget_id', 'category_id', name='_budget_category_uc'),)
+
+    @validates('limit_amount')
+    def validate_limit_amount(self, key: str, value: Any) -> Decimal:
+        """Лимит - положительная сумма."""
+        try:
+            if not isinstance(value, Decimal):
+                value = Decimal(str(value))
+        except (ValueError, TypeError, ArithmeticError):
+            raise ValueError("Invalid amount format.")
+        if not value.is_finite() or value <= 0:
+            raise ValueError("Limit amount must be positive.")
+        return value
+
+    def __repr__(self) -> str:
+        return f'<BudgetLine budget={self.budget_id} category={self.category_id} {self.limit_amount}>'
+
+
 class Transaction(db.Model):
     """Модель финансовой транзакции (доход или расход)."""
     __tablename__ = 'transactions'
     id = db.Column(db.Integer, primary_key=True)
-    description = db.Column(db.String(255), nullable=True)
+    # active_history: прежние описание, сумма и категория нужны для
+    # обновления счетчиков категорий и модели автокатегоризации
+    description = column_property(db.Column(db.String(255), nullable=True),
+                                  active_history=True)
     # Используем Numeric для точности денежных сумм
-    amount = db.Column(db.Numeric(10, 2), nullable=False)
-    date = db.Column(db.Date, nullable=False, index=True, default=date.today)
+    amount = column_property(db.Column(db.Numeric(10, 2), nullable=False),
+                             active_history=True)
+    # active_history: старая дата нужна, чтобы сбросить итоги прежнего месяца
+    date = column_property(db.Column(db.Date, nullable=False, index=True,
+                                     default=date.today), active_history=True)
+    # Валюта суммы (код ISO 4217); отчеты приводят ее к базовой валюте
+    # по курсу на дату транзакции
+    currency = db.Column(db.String(3), nullable=False, default=BASE_CURRENCY,
+                         server_default=BASE_CURRENCY)
     # Тип транзакции должен совпадать с типом категории
     type = db.Column(db.Enum(CategoryType), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Отпечаток (пользователь, дата, сумма, описание) для поиска дубликатов
+    fingerprint = db.Column(db.String(40), nullable=True, index=True)
 
     # Внешние ключи
-    category_id = db.Column(db.Integer, db.ForeignKey(
-        'categories.id'), nullable=False)
+    category_id = column_property(db.Column(db.Integer, db.ForeignKey(
+        'categories.id'), nullable=False, index=True), active_history=True)
     user_id = db.Column(db.Integer, db.ForeignKey(
         'users.id'), nullable=False, index=True)
+    # Дельта-синхронизация: время и версия данных владельца при последнем изменении
+    updated_at = db.Column(db.DateTime, nullable=True)
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (db.Index('ix_transactions_user_change_seq', 'user_id', 'change_seq'),)
+
+    @validates('currency')
+    def validate_currency(self, key: str, value: Any) -> str:
+        """Код валюты ISO 4217 в верхнем регистре."""
+        code = str(value or '').strip().upper()
+        if len(code) != 3 or not code.isalpha():
+            raise ValueError("Currency must be a 3-letter ISO 4217 code.")
+        return code
 
     # Валидация суммы (должна быть > 0)
     @validates('amount')
@@ -233,3 +351,230 @@ class Transaction(db.Model):
     def __repr__(self) -> str:
         sign = '+' if self.type == CategoryType.INCOME else '-'
         return f'<Transaction {self.id} ({sign}{self.amount} on {self.date}) Category: {self.category_id}>'
+
+
+class ExchangeRate(db.Model):
+    """
+    Курс валюты к базовой на дату: rate единиц BASE_CURRENCY за единицу
+    currency. Для даты без курса используется последний более ранний.
+    """
+    __tablename__ = 'exchange_rates'
+    id = db.Column(db.Integer, primary_key=True)
+    currency = db.Column(db.String(3), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    rate = db.Column(db.Numeric(18, 8), nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('currency', 'date', name='_currency_date_uc'),)
+
+    def __repr__(self) -> str:
+        return f'<ExchangeRate {self.currency} {self.date} {self.rate}>'
+
+
+class TransactionArchive(db.Model):
+    """
+    Архив транзакций одного года: отдельный файл SQLite только для
+    чтения. Строки года перенесены из таблицы transactions; отчеты
+    подключают файл, если период пересекается с годом архива.
+    """
+    __tablename__ = 'transaction_archives'
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False, unique=True)
+    path = db.Column(db.String(512), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f'<TransactionArchive {self.year} ({self.row_count} rows)>'
+
+
+class DeletedRecord(db.Model):
+    """
+    Отметка об удаленной строке (tombstone) для дельта-синхронизации:
+    клиент узнает об удалении по версии данных, в которой оно произошло.
+    """
+    __tablename__ = 'deleted_records'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'users.id'), nullable=False)
+    # Таблица и id удаленной строки
+    table_name = db.Column(db.String(50), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_deleted_records_user_change_seq', 'user_id', 'change_seq'),)
+
+    def __repr__(self) -> str:
+        return f'<DeletedRecord {self.table_name}#{self.record_id} v{self.change_seq}>'
+
+
+class ChangeEvent(db.Model):
+    """
+    Уведомление об изменении данных пользователя. Через эту таблицу
+    события доходят до SSE-подписчиков, подключенных к другим процессам.
+    Хранится недолго и периодически очищается.
+    """
+    __tablename__ = 'change_events'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    table_name = db.Column(db.String(50), nullable=False)
+    # JSON-список id измененных строк (NULL - слишком много строк)
+    record_ids = db.Column(db.Text, nullable=True)
+    version = db.Column(db.Integer, nullable=False)
+    # Процесс, записавший событие (свои события он доставляет сразу)
+    origin = db.Column(db.String(128), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f'<ChangeEvent {self.table_name} v{self.version} for User {self.user_id}>'
+
+
+class JobStatus(enum.Enum):
+    QUEUED = 'queued'        # Ожидает свободного потока
+    RUNNING = 'running'      # Выполняется
+    SUCCEEDED = 'succeeded'  # Результат готов
+    FAILED = 'failed'        # Ошибка или прерывание процесса
+    CANCELLED = 'cancelled'  # Отменена пользователем
+
+
+class Job(db.Model):
+    """
+    Фоновая задача (выгрузка, тяжелый отчет). Хранит параметры,
+    состояние, прогресс и результат, чтобы клиент мог опрашивать
+    задачу из любого процесса.
+    """
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'users.id'), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    # Параметры задачи (JSON)
+    params = db.Column(db.Text, nullable=True)
+    status = db.Column(db.Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    # Доля выполненной работы от 0 до 1 и описание текущего шага
+    progress = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    message = db.Column(db.String(255), nullable=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False,
+                                 server_default='0')
+    # Результат: JSON или путь файла выгрузки с его MIME-типом
+    result = db.Column(db.Text, nullable=True)
+    result_path = db.Column(db.String(500), nullable=True)
+    result_type = db.Column(db.String(50), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Время последней отметки выполняющегося процесса
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_jobs_user_created', 'user_id', 'created_at'),)
+
+    def __repr__(self) -> str:
+        return f'<Job {self.id} {self.kind} {self.status.value if self.status else None}>'
+
+
+class MonthlySummary(db.Model):
+    """
+    Материализованные итоги пользователя за календарный месяц.
+    Строка удаляется при любом изменении транзакций месяца и
+    пересчитывается при следующем запросе отчета.
+    """
+    __tablename__ = 'monthly_summaries'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'users.id'), nullable=False)
+    # Первое число месяца
+    month = db.Column(db.Date, nullable=False)
+    total_income = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    total_expense = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint(
+        'user_id', 'month', name='_user_month_uc'),)
+
+    def __repr__(self) -> str:
+        return f'<MonthlySummary {self.month:%Y-%m} for User {self.user_id}>'
+
+
+class MonthlyCategorySummary(db.Model):
+    """Материализованные расходы пользователя по категории за месяц."""
+    __tablename__ = 'monthly_category_summaries'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'users.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey(
+        'categories.id'), nullable=False)
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint(
+        'user_id', 'month', 'category_id', name='_user_month_category_uc'),)
+
+    def __repr__(self) -> str:
+        return f'<MonthlyCategorySummary {self.month:%Y-%m} Category: {self.category_id}>'
+
+
+class RecurringRule(db.Model):
+    """
+    Правило повторяющейся транзакции (аренда, зарплата, подписки).
+    Расписание задается периодом BudgetPeriod от даты начала или
+    cron-подобным выражением "день_месяца месяц день_недели".
+    Вхождения вычисляются на лету и сохраняются как транзакции
+    только после подтверждения.
+    """
+    __tablename__ = 'recurring_rules'
+    id = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(255), nullable=True)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    type = db.Column(db.Enum(CategoryType), nullable=False)
+    period = db.Column(db.Enum(BudgetPeriod), nullable=True)
+    cron = db.Column(db.String(64), nullable=True)
+    start_date = db.Column(db.Date, nullable=False)
+    # Дата окончания (необязательно): правило действует бессрочно
+    end_date = db.Column(db.Date, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    category_id = db.Column(db.Integer, db.ForeignKey(
+        'categories.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'users.id'), nullable=False, index=True)
+
+    category = relationship('Category')
+    confirmations = relationship(
+        'RecurringConfirmation', backref='rule', lazy='dynamic', cascade="all, delete-orphan")
+
+    @validates('amount')
+    def validate_amount(self, key: str, amount: Any) -> Decimal:
+        """Валидация суммы правила."""
+        try:
+            if not isinstance(amount, Decimal):
+                amount = Decimal(str(amount))
+        except (ValueError, TypeError):
+            raise ValueError("Invalid amount format.")
+
+        if amount <= 0:
+            raise ValueError("Amount must be positive.")
+        return amount
+
+    def __repr__(self) -> str:
+        schedule = self.period.value if self.period else self.cron
+        return f'<RecurringRule {self.id} {self.amount} ({schedule}) Category: {self.category_id}>'
+
+
+class RecurringConfirmation(db.Model):
+    """Подтвержденное вхождение правила и созданная для него транзакция."""
+    __tablename__ = 'recurring_confirmations'
+    id = db.Column(db.Integer, primary_key=True)
+    rule_id = db.Column(db.Integer, db.ForeignKey(
+        'recurring_rules.id'), nullable=False)
+    occurrence_date = db.Column(db.Date, nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey(
+        'transactions.id', ondelete='SET NULL'), nullable=True)
+    confirmed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint(
+        'rule_id', 'occurrence_date', name='_rule_occurrence_uc'),)
+
+    def __repr__(self) -> str:
+        return f'<RecurringConfirmation Rule: {self.rule_id} on {self.occurrence_date}>'
@@ -80,6 +80,8 @@ class BudgetSchema(Schema):
     start_date = fields.Date(required=True)
     end_date = fields.Date(required=True)
     target_amount = DecimalField(places=2, as_string=True, allow_none=True)
+    currency = fields.String(validate=validate.Regexp(
+        r'^[A-Za-z]{3}$', error="Currency must be a 3-letter ISO 4217 code."))
     user_id = fields.Integer(dump_only=True)
     created_at = fields.DateTime(dump_only=True)
 
@@ -103,6 +105,8 @@ class TransactionSchema(Schema):
     description = fields.String(
         allow_none=True, validate=validate.Length(max=255))
     amount = DecimalField(places=2, as_string=True, required=True)
+    currency = fields.String(validate=validate.Regexp(
+        r'^[A-Za-z]{3}$', error="Currency must be a 3-letter ISO 4217 code."))
     date = fields.Date(required=True)
     type = fields.String(required=True, validate=validate.OneOf(
         ['income', 'expense'], error="Type must be 'income' or 'expense'"))
@@ -119,6 +123,55 @@ class TransactionSchema(Schema):
         if value > date.today():
             raise ValidationError("Transaction date cannot be in the future.")
 
+class TransactionImportRowSchema(Schema):
+    """Строка импорта: категория необязательна и может быть подобрана по описанию."""
+    description = fields.String(
+        allow_none=True, validate=validate.Length(max=255))
+    amount = DecimalField(places=2, required=True)
+    currency = fields.String(load_default=None, allow_none=True, validate=validate.Regexp(
+        r'^[A-Za-z]{3}$', error="Currency must be a 3-letter ISO 4217 code."))
+    date = fields.Date(required=True)
+    type = fields.String(load_default=None, validate=validate.OneOf(['income', 'expense']))
+    category_id = fields.Integer(load_default=None, allow_none=True)
+
+    @validates('date')
+    def validate_date(self, value):
+        if value > date.today():
+            raise ValidationError("Transaction date cannot be in the future.")
+
+
+class TransactionImportSchema(Schema):
+    """Схема пакетного импорта транзакций."""
+    transactions = fields.List(fields.Nested(TransactionImportRowSchema), required=True,
+                               validate=validate.Length(min=1, max=1000))
+    auto_categorize = fields.Boolean(load_default=True)
+    min_confidence = fields.Float(load_default=0.0, validate=validate.Range(min=0, max=1))
+    skip_duplicates = fields.Boolean(load_default=True)
+
+
+class RecurringRuleSchema(Schema):
+    """Схема валидации повторяющегося правила."""
+    id = fields.Integer(dump_only=True)
+    description = fields.String(
+        allow_none=True, validate=validate.Length(max=255))
+    amount = DecimalField(places=2, required=True)
+    category_id = fields.Integer(required=True)
+    period = fields.String(
+        allow_none=True,
+        validate=validate.OneOf(
+            ['weekly', 'monthly', 'quarterly', 'semiannual', 'annual'])
+    )
+    cron = fields.String(allow_none=True, validate=validate.Length(max=64))
+    start_date = fields.Date(required=True)
+    end_date = fields.Date(allow_none=True)
+    user_id = fields.Integer(dump_only=True)
+
+
+class RecurringConfirmSchema(Schema):
+    """Схема подтверждения вхождения повторяющегося правила."""
+    date = fields.Date(required=True)
+    amount = DecimalField(places=2, allow_none=True)
+
 # ---- Схемы для использования в API ----
 
 # Схема для регистрации пользователя
@@ -154,6 +207,48 @@ class SavingsCalculatorSchema(Schema):
         if value <= date.today():
             raise ValidationError("Target date must be in the future.")
 
+# Схема для вероятностного калькулятора сбережений
+
+
+class SavingsProbabilitySchema(SavingsCalculatorSchema):
+    simulations = fields.Integer(load_default=5000,
+                                 validate=validate.Range(min=100, max=100000))
+    seed = fields.Integer(load_default=None, validate=validate.Range(min=0))
+
+# Схема для пакетного калькулятора сбережений
+
+
+class SavingsGridSchema(Schema):
+    target_amounts = fields.List(DecimalField(places=2), required=True,
+                                 validate=validate.Length(min=1))
+    target_dates = fields.List(fields.Date(), required=True,
+                               validate=validate.Length(min=1))
+    current_savings = fields.List(DecimalField(positive=False, places=2),
+                                  load_default=list)
+    mode = fields.String(load_default='grid',
+                         validate=validate.OneOf(['grid', 'zip']))
+
+# Схемы для графиков кредита и накоплений
+
+
+class AmortizationSchema(Schema):
+    principal = DecimalField(places=2, required=True)
+    annual_rate = DecimalField(positive=False, places=4, required=True,
+                               validate=validate.Range(min=0, max=100))
+    months = fields.Integer(required=True, validate=validate.Range(min=1, max=600))
+    start_date = fields.Date(load_default=None)
+    include_schedule = fields.Boolean(load_default=True)
+
+
+class CompoundGrowthSchema(Schema):
+    initial_amount = DecimalField(positive=False, places=2, load_default=Decimal('0.00'))
+    monthly_contribution = DecimalField(positive=False, places=2, load_default=Decimal('0.00'))
+    annual_rate = DecimalField(positive=False, places=4, required=True,
+                               validate=validate.Range(min=0, max=100))
+    months = fields.Integer(required=True, validate=validate.Range(min=1, max=1200))
+    start_date = fields.Date(load_default=None)
+    include_schedule = fields.Boolean(load_default=True)
+
 # Схемы для отчетов
 
 
@@ -3,16 +3,65 @@
 Использует современные практики доступа к данным через абстракцию ORM.
 """
 
+import importlib
+import pkgutil
+import sys
+
+# Приложение импортирует сервисы относительно (как подмодули своего пакета),
+# а сами сервисы друг друга - абсолютно (services.*). Чтобы каждый модуль
+# загружался один раз и его обработчики событий SQLAlchemy регистрировались
+# один раз, подмодули пакета приложения - те же модули services.*
+if __name__ != 'services':
+    for _module in pkgutil.iter_modules(__path__):
+        sys.modules[f'{__name__}.{_module.name}'] = importlib.import_module(
+            f'services.{_module.name}')
+
 from services.auth_service import AuthService
 from services.base_service import BaseService
 from services.category_service import CategoryService
 from services.transaction_service import TransactionService
 from services.budget_service import BudgetService
+from services.summary_service import SummaryService
+from services.data_version_service import DataVersionService
+from services.dashboard_service import DashboardService
+from services.recurring_service import RecurringService
+from services.forecast_service import ForecastService
+from services.simulation_service import SimulationService
+from services.search_service import SearchService
+from services.categorizer_service import CategorizerService
+from services.dedup_service import DedupService
+from services.category_stats_service import CategoryStatsService
+from services.sync_service import SyncService
+from services.event_service import EventService
+from services.job_service import JobService
+from services.currency_service import ExchangeRateService
+from services.rate_import_service import RateImportService
+from services.archive_service import ArchiveService
+from services.analytics_service import AnalyticsService
+from services.budget_line_service import BudgetLineService
 
 __all__ = [
     'AuthService',
     'BaseService',
     'CategoryService',
     'TransactionService',
-    'BudgetService'
+    'BudgetService',
+    'SummaryService',
+    'DataVersionService',
+    'DashboardService',
+    'RecurringService',
+    'ForecastService',
+    'SimulationService',
+    'SearchService',
+    'CategorizerService',
+    'DedupService',
+    'CategoryStatsService',
+    'SyncService',
+    'EventService',
+    'JobService',
+    'ExchangeRateService',
+    'RateImportService',
+    'ArchiveService',
+    'AnalyticsService',
+    'BudgetLineService'
 ]
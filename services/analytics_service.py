@@ -0,0 +1,263 @@
+import glob
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, func, case, cast, Integer
+
+from models import Category, CategoryType, db
+from services.archive_service import transaction_source
+from services.currency_service import converted_amount, join_rates
+from services.data_version_service import DataVersionService
+
+# Бюджет памяти кэша столбцов по умолчанию, МБ
+DEFAULT_MEMORY_BUDGET_MB = 64
+# Сдвиг юлианского дня SQLite относительно date.toordinal()
+JULIAN_ORDINAL_OFFSET = 1721424.5
+# Порядковый номер 1970-01-01: начало отсчета datetime64
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+COLUMNS = ('days', 'cents', 'categories', 'income')
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def money(cents: int) -> str:
+    """Сумма в копейках строкой с двумя знаками."""
+    return str(Decimal(int(cents)).scaleb(-2))
+
+
+class UserColumns:
+    """
+    Транзакции пользователя столбцами NumPy, отсортированными по дате:
+    days - date.toordinal(), cents - сумма в копейках базовой валюты,
+    categories - id категорий, income - 1 для доходов. Диапазон дат
+    находится двоичным поиском, группировки - через bincount.
+    """
+
+    def __init__(self, version: int, days: np.ndarray, cents: np.ndarray,
+                 categories: np.ndarray, income: np.ndarray):
+        self.version = version
+        self.days = days
+        self.cents = cents
+        self.categories = categories
+        self.income = income
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in COLUMNS)
+
+    def _range(self, start_date: Optional[date], end_date: Optional[date]) -> slice:
+        start = 0 if start_date is None else \
+            int(np.searchsorted(self.days, start_date.toordinal(), side='left'))
+        end = len(self.days) if end_date is None else \
+            int(np.searchsorted(self.days, end_date.toordinal(), side='right'))
+        return slice(start, end)
+
+    def totals(self, start_date: Optional[date] = None,
+               end_date: Optional[date] = None) -> Tuple[int, int, int]:
+        """Доходы, расходы (копейки) и число транзакций за период."""
+        rows = self._range(start_date, end_date)
+        cents, income = self.cents[rows], self.income[rows]
+        income_total = int(cents[income == 1].sum())
+        return income_total, int(cents.sum()) - income_total, len(cents)
+
+    def by_category(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                    income: bool = False) -> List[Tuple[int, int, int]]:
+        """(категория, сумма в копейках, число) по убыванию суммы."""
+        rows = self._range(start_date, end_date)
+        selected = self.income[rows] == (1 if income else 0)
+        categories = self.categories[rows][selected]
+        if not len(categories):
+            return []
+        ids, positions = np.unique(categories, return_inverse=True)
+        sums = np.bincount(positions, weights=self.cents[rows][selected]).astype(np.int64)
+        counts = np.bincount(positions)
+        order = np.lexsort((ids, -sums))
+        return [(int(ids[i]), int(sums[i]), int(counts[i])) for i in order]
+
+    def trend(self, start_date: date, end_date: date,
+              granularity: str = 'month') -> List[Tuple[date, int, int]]:
+        """(начало интервала, доходы, расходы) для каждого дня, недели или месяца периода."""
+        rows = self._range(start_date, end_date)
+        days, cents, income = self.days[rows], self.cents[rows], self.income[rows]
+        if granularity == 'month':
+            origin = np.datetime64(start_date, 'M')
+            buckets = (days - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]') - origin
+            size = int(np.datetime64(end_date, 'M') - origin) + 1
+            starts = [(origin + i).astype(date) for i in range(size)]
+        else:
+            step = 7 if granularity == 'week' else 1
+            first = start_date - timedelta(days=start_date.weekday() if step == 7 else 0)
+            buckets = (days - first.toordinal()) // step
+            size = (end_date - first).days // step + 1
+            starts = [first + timedelta(days=i * step) for i in range(size)]
+        buckets = buckets.astype(np.int64)
+        income_sums = np.bincount(buckets, weights=cents * income, minlength=size).astype(np.int64)
+        totals = np.bincount(buckets, weights=cents, minlength=size).astype(np.int64)
+        return [(starts[i], int(income_sums[i]), int(totals[i] - income_sums[i]))
+                for i in range(size)]
+
+
+class AnalyticsService:
+    """
+    Аналитика по столбцам транзакций в памяти. Столбцы пользователя
+    загружаются одним запросом при первом обращении и хранятся в
+    app.extensions с вытеснением по LRU в пределах бюджета памяти.
+    Актуальность проверяется по версии данных пользователя, которая
+    растет при любой записи, поэтому после изменений столбцы
+    перечитываются. С ANALYTICS_MMAP_DIR столбцы сохраняются в файлы
+    .npy и читаются через отображение в память.
+    """
+
+    @staticmethod
+    def _store() -> Dict[str, Any]:
+        store = current_app.extensions.get('analytics_columns')
+        if store is None:
+            store = current_app.extensions.setdefault('analytics_columns', {
+                'lock': threading.Lock(), 'entries': OrderedDict(), 'bytes': 0})
+        return store
+
+    @staticmethod
+    def get_columns(user_id: int) -> UserColumns:
+        """Столбцы пользователя для текущей версии его данных."""
+        version, _ = DataVersionService.get_version(user_id)
+        store = AnalyticsService._store()
+        with store['lock']:
+            columns = store['entries'].get(user_id)
+            if columns is not None and columns.version == version:
+                store['entries'].move_to_end(user_id)
+                return columns
+
+        columns = AnalyticsService._load_mapped(user_id, version)
+        if columns is None:
+            columns = AnalyticsService._load(user_id, version)
+            AnalyticsService._save_mapped(user_id, columns)
+
+        budget = current_app.config.get('ANALYTICS_MEMORY_BUDGET_MB',
+                                        DEFAULT_MEMORY_BUDGET_MB) * 1024 * 1024
+        with store['lock']:
+            previous = store['entries'].pop(user_id, None)
+            if previous is not None:
+                store['bytes'] -= previous.nbytes
+            store['entries'][user_id] = columns
+            store['bytes'] += columns.nbytes
+            # Последние загруженные столбцы остаются, даже если больше бюджета
+            while store['bytes'] > budget and len(store['entries']) > 1:
+                _, evicted = store['entries'].popitem(last=False)
+                store['bytes'] -= evicted.nbytes
+        return columns
+
+    @staticmethod
+    def invalidate(user_ids=None) -> None:
+        """Сбрасывает столбцы пользователей (всех, если user_ids не задан)."""
+        store = AnalyticsService._store()
+        with store['lock']:
+            for user_id in list(store['entries']) if user_ids is None else set(user_ids):
+                columns = store['entries'].pop(user_id, None)
+                if columns is not None:
+                    store['bytes'] -= columns.nbytes
+
+    @staticmethod
+    def _load(user_id: int, version: int) -> UserColumns:
+        """
+        Столбцы из БД одним запросом: даты, суммы в копейках и тип
+        вычисляются в SQL, чтобы строки приходили готовыми целыми числами.
+        """
+        source = transaction_source()
+        base_amount, rates = converted_amount(table=source)
+        query = join_rates(select(
+            cast(func.julianday(source.date) - JULIAN_ORDINAL_OFFSET, Integer),
+            cast(func.round(base_amount * 100), Integer),
+            source.category_id,
+            case((source.type == CategoryType.INCOME, 1), else_=0)
+        ).select_from(source), rates).where(
+            source.user_id == user_id,
+            base_amount.isnot(None)
+        ).order_by(source.date)
+        rows = np.array(db.session.execute(query).all(), dtype=np.int64).reshape(-1, 4)
+        return UserColumns(version, rows[:, 0].astype(np.int32), rows[:, 1].copy(),
+                           rows[:, 2].astype(np.int32), rows[:, 3].astype(np.int8))
+
+    @staticmethod
+    def _mapped_path(user_id: int, version: int, name: str) -> str:
+        return os.path.join(current_app.config['ANALYTICS_MMAP_DIR'],
+                            f'user_{user_id}_v{version}_{name}.npy')
+
+    @staticmethod
+    def _load_mapped(user_id: int, version: int) -> Optional[UserColumns]:
+        """Столбцы из файлов текущей версии, отображенных в память."""
+        if not current_app.config.get('ANALYTICS_MMAP_DIR'):
+            return None
+        paths = [AnalyticsService._mapped_path(user_id, version, name) for name in COLUMNS]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        return UserColumns(version, *[np.load(path, mmap_mode='r') for path in paths])
+
+    @staticmethod
+    def _save_mapped(user_id: int, columns: UserColumns) -> None:
+        """Сохраняет столбцы в файлы .npy и удаляет файлы прежних версий."""
+        directory = current_app.config.get('ANALYTICS_MMAP_DIR')
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        current = set()
+        for name in COLUMNS:
+            path = AnalyticsService._mapped_path(user_id, columns.version, name)
+            # Запись во временный файл: другой процесс не прочитает файл наполовину
+            temporary = f'{path}.{os.getpid()}.tmp'
+            with open(temporary, 'wb') as target:
+                np.save(target, getattr(columns, name))
+            os.replace(temporary, path)
+            current.add(path)
+        for path in glob.glob(os.path.join(directory, f'user_{user_id}_v*.npy')):
+            if path not in current:
+                os.remove(path)
+
+    @staticmethod
+    def get_trend(user_id: int, start_date: date, end_date: date,
+                  granularity: str = 'month') -> Tuple[Dict, int]:
+        """Доходы и расходы по дням, неделям или месяцам периода."""
+        if granularity not in GRANULARITIES:
+            return {"error": f"Интервал: {', '.join(GRANULARITIES)}"}, 400
+        if end_date < start_date:
+            return {"error": "Конечная дата не может быть раньше начальной"}, 400
+        columns = AnalyticsService.get_columns(user_id)
+        return {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'granularity': granularity,
+            'items': [
+                {'period_start': period_start.isoformat(), 'income': money(income),
+                 'expense': money(expense), 'net': money(income - expense)}
+                for period_start, income, expense in columns.trend(start_date, end_date, granularity)
+            ]
+        }, 200
+
+    @staticmethod
+    def get_category_totals(user_id: int, start_date: Optional[date] = None,
+                            end_date: Optional[date] = None,
+                            transaction_type: str = CategoryType.EXPENSE.value) -> Tuple[Dict, int]:
+        """Суммы и число транзакций по категориям одного типа за период."""
+        try:
+            income = CategoryType(transaction_type) == CategoryType.INCOME
+        except ValueError:
+            return {"error": f"Неверный тип. Допустимые значения: {[t.value for t in CategoryType]}"}, 400
+        columns = AnalyticsService.get_columns(user_id)
+        income_total, expense_total, count = columns.totals(start_date, end_date)
+        names = dict(db.session.query(Category.id, Category.name).filter(
+            Category.user_id == user_id).all())
+        return {
+            'start_date': start_date.isoformat() if start_date else None,
+            'end_date': end_date.isoformat() if end_date else None,
+            'total_income': money(income_total),
+            'total_expense': money(expense_total),
+            'transaction_count': count,
+            'categories': [
+                {'category_id': category_id, 'category_name': names.get(category_id),
+                 'total_amount': money(total), 'transaction_count': number}
+                for category_id, total, number in columns.by_category(start_date, end_date, income)
+            ]
+        }, 200
@@ -0,0 +1,197 @@
+import os
+import stat
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from flask import current_app
+from sqlalchemy import MetaData, Table, Column, Index, select, insert, delete, update, func, union, union_all
+from sqlalchemy.orm import aliased
+
+from models import Transaction, TransactionArchive, RecurringConfirmation, db
+from services.data_version_service import DataVersionService
+
+# Имя схемы, под которой файл архива подключается к соединению (ATTACH)
+ARCHIVE_SCHEMA = 'archive_{year}'
+ARCHIVE_FILE = 'transactions_{year}.db'
+# SQLite подключает к соединению не больше 10 баз (SQLITE_MAX_ATTACHED),
+# а запросы по всей истории подключают все архивы сразу
+MAX_ARCHIVES = 10
+
+_archive_tables: Dict[int, Table] = {}
+
+
+def archive_table(year: int) -> Table:
+    """Таблица transactions в подключенном файле архива года."""
+    table = _archive_tables.get(year)
+    if table is None:
+        table = Table('transactions', MetaData(), *[
+            Column(column.name, column.type, primary_key=column.primary_key)
+            for column in Transaction.__table__.columns
+        ], Index('ix_transactions_user_date', 'user_id', 'date'),
+            Index('ix_transactions_user_change_seq', 'user_id', 'change_seq'),
+            schema=ARCHIVE_SCHEMA.format(year=year))
+        _archive_tables[year] = table
+    return table
+
+
+def transaction_source(start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """
+    Источник транзакций для запроса за период. Если период не
+    пересекается с архивными годами - сама модель Transaction, иначе ее
+    псевдоним над UNION ALL основной таблицы и архивов этих лет; условия
+    запроса по дате SQLite переносит внутрь каждой части объединения.
+    """
+    archives = ArchiveService.archives_for(start_date, end_date)
+    if not archives:
+        return Transaction
+    ArchiveService.attach(db.session.connection(), archives)
+    return aliased(Transaction, _routed_union(archives))
+
+
+def transaction_table(connection=None):
+    """
+    Таблица transactions для запросов Core (например, пересчета счетчиков
+    категорий): сама таблица или UNION ALL с архивами всех лет,
+    подключенными к connection (по умолчанию - к соединению сессии).
+    """
+    connection = connection if connection is not None else db.session.connection()
+    archives = ArchiveService.archives_for(connection=connection)
+    if not archives:
+        return Transaction.__table__
+    ArchiveService.attach(connection, archives)
+    return _routed_union(archives)
+
+
+def _routed_union(archives: List[Tuple[int, str]]):
+    """Подзапрос UNION ALL основной таблицы и таблиц архивов."""
+    main = Transaction.__table__
+    parts = [select(*main.columns)]
+    for year, _ in archives:
+        table = archive_table(year)
+        parts.append(select(*[table.c[column.name] for column in main.columns]))
+    return union_all(*parts).subquery('routed_transactions')
+
+
+class ArchiveService:
+    """
+    Архивирование транзакций по годам. Строки завершенного года
+    переносятся в отдельный файл SQLite, который затем доступен только
+    для чтения: основная таблица и ее индексы не растут бесконечно, а
+    отчеты, списки, поиск и синхронизация через transaction_source
+    читают архивы только тех лет, которые пересекаются с запрошенным
+    периодом. Архивные транзакции нельзя изменить или удалить.
+    """
+
+    @staticmethod
+    def archives_for(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                     connection=None) -> List[Tuple[int, str]]:
+        """Архивы (год, путь), пересекающиеся с периодом."""
+        executor = connection if connection is not None else db.session
+        query = select(TransactionArchive.year, TransactionArchive.path)
+        if start_date is not None:
+            query = query.where(TransactionArchive.year >= start_date.year)
+        if end_date is not None:
+            query = query.where(TransactionArchive.year <= end_date.year)
+        return [tuple(row) for row in executor.execute(query.order_by(TransactionArchive.year))]
+
+    @staticmethod
+    def archived_categories(category_ids: Iterable[int]) -> Set[int]:
+        """
+        Категории из списка, на которые ссылаются архивные транзакции.
+        Файлы архивов только для чтения, поэтому такие категории нельзя
+        удалить или слить с другой: архивные строки потеряли бы категорию.
+        """
+        category_ids = sorted(set(category_ids))
+        archives = ArchiveService.archives_for()
+        if not category_ids or not archives:
+            return set()
+        ArchiveService.attach(db.session.connection(), archives)
+        return set(db.session.execute(union(*[
+            select(archive_table(year).c.category_id).where(
+                archive_table(year).c.category_id.in_(category_ids))
+            for year, _ in archives
+        ])).scalars())
+
+    @staticmethod
+    def attach(connection, archives: List[Tuple[int, str]]) -> None:
+        """Подключает к соединению файлы архивов, которые еще не подключены."""
+        attached = {row[1] for row in connection.exec_driver_sql('PRAGMA database_list')}
+        for year, path in archives:
+            schema = ARCHIVE_SCHEMA.format(year=year)
+            if schema in attached:
+                continue
+            # ATTACH несуществующего файла молча создал бы пустую базу
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Файл архива транзакций {year} года не найден: {path}")
+            connection.exec_driver_sql(f'ATTACH DATABASE ? AS {schema}', (path,))
+
+    @staticmethod
+    def archivable_years(before: int) -> List[int]:
+        """Годы раньше before, транзакции которых еще в основной таблице."""
+        year = func.strftime('%Y', Transaction.date)
+        return [int(value) for value, in db.session.execute(
+            select(year).where(Transaction.date < date(before, 1, 1)).distinct().order_by(year))]
+
+    @staticmethod
+    def archive_year(year: int, directory: Optional[str] = None) -> Tuple[Dict, int]:
+        """
+        Переносит транзакции года в файл архива. Запись выполняется на
+        отдельном соединении: архив подключается до начала транзакции,
+        а после коммита сжимается (VACUUM), отключается и становится
+        доступен только для чтения.
+        """
+        if year >= date.today().year:
+            return {"error": "Архивировать можно только завершенные годы"}, 400
+        if TransactionArchive.query.filter_by(year=year).first() is not None:
+            return {"error": f"Транзакции {year} года уже в архиве"}, 409
+        if TransactionArchive.query.count() >= MAX_ARCHIVES:
+            return {"error": f"Достигнут предел числа архивов ({MAX_ARCHIVES}): "
+                             "SQLite не подключит к запросу больше файлов"}, 409
+
+        directory = directory or current_app.config['ARCHIVE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.abspath(os.path.join(directory, ARCHIVE_FILE.format(year=year)))
+        if os.path.exists(path):
+            return {"error": f"Файл архива уже существует: {path}"}, 409
+
+        schema = ARCHIVE_SCHEMA.format(year=year)
+        main = Transaction.__table__
+        in_year = main.c.date.between(date(year, 1, 1), date(year, 12, 31))
+        # Соединение сессии не должно держать транзакцию SQLite
+        db.session.commit()
+        try:
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql(f'ATTACH DATABASE ? AS {schema}', (path,))
+                try:
+                    table = archive_table(year)
+                    table.create(connection)
+                    user_ids = connection.execute(
+                        select(main.c.user_id).where(in_year).distinct()).scalars().all()
+                    row_count = connection.execute(insert(table).from_select(
+                        [column.name for column in main.columns],
+                        select(*main.columns).where(in_year))).rowcount
+                    connection.execute(update(RecurringConfirmation.__table__).where(
+                        RecurringConfirmation.__table__.c.transaction_id.in_(
+                            select(main.c.id).where(in_year))).values(transaction_id=None))
+                    connection.execute(delete(main).where(in_year))
+                    connection.execute(insert(TransactionArchive.__table__).values(
+                        year=year, path=path, row_count=row_count, size_bytes=0))
+                    # Списки транзакций изменились: кэшированные ответы устарели
+                    DataVersionService.bump(user_ids, connection=connection)
+                    connection.commit()
+
+                    connection.exec_driver_sql(f'VACUUM {schema}')
+                finally:
+                    connection.rollback()
+                    connection.exec_driver_sql(f'DETACH DATABASE {schema}')
+        except Exception as e:
+            current_app.logger.error(f"Ошибка при архивировании транзакций {year} года: {str(e)}")
+            if TransactionArchive.query.filter_by(year=year).first() is None and os.path.exists(path):
+                os.remove(path)
+            return {"error": "Ошибка при архивировании транзакций"}, 500
+
+        os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        size_bytes = os.path.getsize(path)
+        db.session.execute(update(TransactionArchive).where(
+            TransactionArchive.year == year).values(size_bytes=size_bytes))
+        db.session.commit()
+        return {'year': year, 'path': path, 'row_count': row_count, 'size_bytes': size_bytes}, 200
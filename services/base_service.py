@@ -1,10 +1,58 @@
 from flask import current_app
+from sqlalchemy import select, insert, update, delete, bindparam
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, TypeVar, Union
 from models import db
+from services.data_version_service import DataVersionService
+from services.event_service import EventService
 
 T = TypeVar('T')
 
+# Размер пачки для executemany и списков IN (...) в массовых операциях
+BULK_CHUNK_SIZE = 500
+# Максимальное число элементов в одном массовом запросе
+DEFAULT_BULK_MAX_ITEMS = 1000
+
+# prepare(item[, row]) -> (значения колонок, 200) или ({"error": ...}, статус)
+Prepared = Tuple[Dict[str, Any], int]
+# after_write(user_id, прежние строки, новые строки) внутри транзакции БД
+AfterWrite = Callable[[int, List[Dict[str, Any]], List[Dict[str, Any]]], None]
+
+
+def chunked(items: List, size: int = BULK_CHUNK_SIZE) -> Iterable[List]:
+    """Делит список на пачки не длиннее size."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def parse_amount(value: Any) -> Tuple[Optional[Decimal], Optional[str]]:
+    """
+    Положительная сумма из строки или числа: (сумма, None) или (None, ошибка).
+    Сумма округляется до копейки до проверки, поэтому '0.004' отклоняется.
+    """
+    try:
+        amount = Decimal(str(value))
+        if not amount.is_finite():
+            return None, "Сумма должна быть положительной"
+        amount = amount.quantize(Decimal('0.01'))
+    except (ValueError, TypeError, InvalidOperation):
+        return None, "Неверный формат суммы"
+    if amount <= 0:
+        return None, "Сумма должна быть положительной"
+    return amount, None
+
+
+def parse_date(value: Any) -> Tuple[Optional[date], Optional[str]]:
+    """Дата из строки YYYY-MM-DD: (дата, None) или (None, ошибка)."""
+    if isinstance(value, date):
+        return value, None
+    try:
+        return date.fromisoformat(str(value)), None
+    except ValueError:
+        return None, "Неверный формат даты. Используйте формат YYYY-MM-DD"
+
 
 class BaseService:
     """
@@ -92,3 +140,259 @@ class BaseService:
             current_app.logger.error(
                 f"Неожиданная ошибка при удалении {type(entity).__name__}: {str(e)}")
             return {"error": f"Внутренняя ошибка сервера при удалении {type(entity).__name__}"}, 500
+
+    @staticmethod
+    def check_bulk_size(items: Any) -> Optional[str]:
+        """Проверяет список элементов массовой операции, возвращает текст ошибки или None."""
+        if not isinstance(items, list) or not items:
+            return "Передайте непустой список элементов"
+        max_items = current_app.config.get('BULK_MAX_ITEMS', DEFAULT_BULK_MAX_ITEMS)
+        if len(items) > max_items:
+            return f"Слишком много элементов (максимум {max_items})"
+        return None
+
+    @staticmethod
+    def create_many(model: Type[T], user_id: int, items: List[Dict[str, Any]],
+                    prepare: Callable[[Dict[str, Any]], Prepared],
+                    after_write: Optional[AfterWrite] = None,
+                    atomic: bool = False) -> Tuple[Dict, int]:
+        """
+        Массовое создание сущностей пользователя.
+        Каждый элемент проверяется prepare, корректные вставляются
+        пачками executemany в одной транзакции БД. Возвращает результат
+        по каждому элементу; в атомарном режиме ошибка в любом элементе
+        отменяет всю операцию.
+        """
+        error = BaseService.check_bulk_size(items)
+        if error:
+            return {"error": error}, 400
+
+        results: List[Dict] = [None] * len(items)
+        rows = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {'index': index, 'status': 400, 'error': "Элемент должен быть объектом"}
+                continue
+            values, status = prepare(item)
+            if status >= 400:
+                results[index] = {'index': index, 'status': status, 'error': values.get('error')}
+                continue
+            values['user_id'] = user_id
+            rows.append((index, values))
+
+        return BaseService._write_many(
+            model, user_id, results, atomic, 'создании', 201,
+            lambda table, version: BaseService._insert_rows(table, rows, version),
+            lambda: ([], [values for _, values in rows]),
+            after_write)
+
+    @staticmethod
+    def update_many(model: Type[T], user_id: int, items: List[Dict[str, Any]],
+                    prepare: Callable[[Dict[str, Any], Dict[str, Any]], Prepared],
+                    after_write: Optional[AfterWrite] = None,
+                    atomic: bool = False) -> Tuple[Dict, int]:
+        """
+        Массовое обновление сущностей пользователя.
+        Элементы содержат id и изменяемые поля. Владелец проверяется одним
+        запросом на пачку id; prepare получает элемент и текущую строку
+        и возвращает изменившиеся колонки. Изменения записываются
+        executemany-запросами UPDATE ... WHERE id = ?.
+        """
+        error = BaseService.check_bulk_size(items)
+        if error:
+            return {"error": error}, 400
+
+        results: List[Dict] = [None] * len(items)
+        existing = BaseService._load_owned(
+            model, user_id, [item.get('id') for item in items if isinstance(item, dict)])
+        changes = []
+        seen = set()
+        for index, item in enumerate(items):
+            entity_id = item.get('id') if isinstance(item, dict) else None
+            failure = BaseService._check_item(entity_id, existing, seen, 'редактирование')
+            if failure is None:
+                values, status = prepare(item, existing[entity_id])
+                if status >= 400:
+                    failure = {'status': status, 'error': values.get('error')}
+            if failure is not None:
+                results[index] = dict(index=index, id=entity_id, **failure)
+                continue
+            changes.append((index, entity_id, values))
+
+        return BaseService._write_many(
+            model, user_id, results, atomic, 'обновлении', 200,
+            lambda table, version: BaseService._update_rows(table, changes, version),
+            lambda: ([existing[entity_id] for _, entity_id, _ in changes],
+                     [dict(existing[entity_id], **values) for _, entity_id, values in changes]),
+            after_write)
+
+    @staticmethod
+    def delete_many(model: Type[T], user_id: int, ids: List[int],
+                    check: Optional[Callable[[Dict[str, Any]], Prepared]] = None,
+                    after_write: Optional[AfterWrite] = None,
+                    atomic: bool = False) -> Tuple[Dict, int]:
+        """
+        Массовое удаление сущностей пользователя.
+        Владелец проверяется одним запросом на пачку id, check может
+        запретить удаление отдельной строки. Удаление выполняется
+        запросами DELETE ... WHERE id IN (...).
+        """
+        error = BaseService.check_bulk_size(ids)
+        if error:
+            return {"error": error}, 400
+
+        results: List[Dict] = [None] * len(ids)
+        existing = BaseService._load_owned(model, user_id, ids)
+        removed = []
+        seen = set()
+        for index, entity_id in enumerate(ids):
+            failure = BaseService._check_item(entity_id, existing, seen, 'удаление')
+            if failure is None and check is not None:
+                message, status = check(existing[entity_id])
+                if status >= 400:
+                    failure = {'status': status, 'error': message.get('error')}
+            if failure is not None:
+                results[index] = dict(index=index, id=entity_id, **failure)
+                continue
+            removed.append((index, entity_id))
+
+        return BaseService._write_many(
+            model, user_id, results, atomic, 'удалении', 200,
+            lambda table, version: BaseService._delete_rows(table, removed, user_id, version),
+            lambda: ([existing[entity_id] for _, entity_id in removed], []),
+            after_write)
+
+    @staticmethod
+    def _load_owned(model: Type[T], user_id: int,
+                    ids: List[Any]) -> Dict[int, Optional[Dict[str, Any]]]:
+        """
+        Текущие строки по id одним запросом на пачку id.
+        Для чужих строк вместо значений возвращается None.
+        """
+        table = model.__table__
+        wanted = sorted({entity_id for entity_id in ids if isinstance(entity_id, int)})
+        existing = {}
+        for chunk in chunked(wanted):
+            for row in db.session.execute(select(table).where(table.c.id.in_(chunk))):
+                existing[row.id] = dict(row._mapping) if row.user_id == user_id else None
+        return existing
+
+    @staticmethod
+    def _check_item(entity_id: Any, existing: Dict[int, Optional[Dict]], seen: set,
+                    action: str) -> Optional[Dict]:
+        """Ошибка для id элемента (не найден, чужой, повтор) или None."""
+        if not isinstance(entity_id, int):
+            return {'status': 400, 'error': "Не указан id"}
+        if entity_id in seen:
+            return {'status': 400, 'error': "Элемент повторяется в запросе"}
+        seen.add(entity_id)
+        if entity_id not in existing:
+            return {'status': 404, 'error': "Не найдено"}
+        if existing[entity_id] is None:
+            return {'status': 403, 'error': f"У вас нет прав на {action}"}
+        return None
+
+    @staticmethod
+    def _insert_rows(table, rows: List[Tuple[int, Dict[str, Any]]],
+                     version: int) -> Dict[int, int]:
+        """Вставляет строки пачками, возвращает {индекс элемента: id}."""
+        created = {}
+        stamp = DataVersionService.sync_values(table, version)
+        for _, values in rows:
+            values.update(stamp)
+        # executemany выполняется для строк с одинаковым набором колонок
+        groups: Dict[Tuple[str, ...], List] = {}
+        for index, values in rows:
+            groups.setdefault(tuple(sorted(values)), []).append((index, values))
+        for group in groups.values():
+            for chunk in chunked(group):
+                ids = db.session.execute(
+                    insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                    [values for _, values in chunk]).scalars().all()
+                for (index, values), entity_id in zip(chunk, ids):
+                    values['id'] = entity_id
+                    created[index] = entity_id
+        return created
+
+    @staticmethod
+    def _update_rows(table, changes: List[Tuple[int, int, Dict[str, Any]]],
+                     version: int) -> Dict[int, int]:
+        """Обновляет строки executemany-запросами, сгруппированными по набору колонок."""
+        stamp = DataVersionService.sync_values(table, version)
+        groups: Dict[Tuple[str, ...], List] = {}
+        for index, entity_id, values in changes:
+            if values:
+                values = dict(values, **stamp)
+                groups.setdefault(tuple(sorted(values)), []).append((entity_id, values))
+        for columns, group in groups.items():
+            # Имена параметров не должны совпадать с именами колонок
+            statement = update(table).where(table.c.id == bindparam('row_id')).values(
+                {column: bindparam('new_' + column) for column in columns})
+            for chunk in chunked(group):
+                db.session.execute(statement, [
+                    dict({'new_' + column: value for column, value in values.items()},
+                         row_id=entity_id) for entity_id, values in chunk])
+        return {index: entity_id for index, entity_id, _ in changes}
+
+    @staticmethod
+    def _delete_rows(table, removed: List[Tuple[int, int]], user_id: int,
+                     version: int) -> Dict[int, int]:
+        """
+        Удаляет строки запросами DELETE ... WHERE id IN (...) и
+        записывает отметки об удалении для синхронизации.
+        """
+        for chunk in chunked(removed):
+            ids = [entity_id for _, entity_id in chunk]
+            db.session.execute(delete(table).where(table.c.id.in_(ids)))
+            DataVersionService.record_deletions(table, user_id, ids, version)
+        return {index: entity_id for index, entity_id in removed}
+
+    @staticmethod
+    def _write_many(model: Type[T], user_id: int, results: List[Dict], atomic: bool,
+                    action: str, success_status: int,
+                    write: Callable, written_rows: Callable,
+                    after_write: Optional[AfterWrite]) -> Tuple[Dict, int]:
+        """
+        Общая часть массовых операций: запись, обновление производных
+        данных и версии данных пользователя, фиксация и сбор результатов.
+        """
+        failed = sum(1 for result in results if result is not None)
+        if atomic and failed:
+            return {
+                "error": "Операция не выполнена: ошибки в элементах",
+                "succeeded": 0,
+                "failed": failed,
+                "results": [result for result in results if result is not None]
+            }, 400
+
+        try:
+            done = {}
+            if failed < len(results):
+                # Версия нужна до записи: ею отмечаются измененные строки
+                version = DataVersionService.bump([user_id])[user_id]
+                done = write(model.__table__, version)
+                EventService.record(user_id, model.__tablename__, done.values(), version)
+                if after_write is not None:
+                    old_rows, new_rows = written_rows()
+                    after_write(user_id, old_rows, new_rows)
+            db.session.commit()
+            # Объекты сессии могли устареть после записи в обход ORM
+            db.session.expire_all()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Ошибка SQLAlchemy при массовом {action} {model.__name__}: {str(e)}")
+            return {"error": f"Ошибка базы данных при массовом {action} {model.__name__}"}, 500
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Неожиданная ошибка при массовом {action} {model.__name__}: {str(e)}")
+            return {"error": f"Внутренняя ошибка сервера при массовом {action} {model.__name__}"}, 500
+
+        for index, entity_id in done.items():
+            results[index] = {'index': index, 'id': entity_id, 'status': success_status}
+        return {
+            "succeeded": len(done),
+            "failed": failed,
+            "results": results
+        }, 200
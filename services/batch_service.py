@@ -0,0 +1,164 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from flask import current_app, g
+from flask_jwt_extended import get_jwt
+
+from models import db
+
+# Допустимые методы и префикс путей для вложенных запросов
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+BATCH_PATH_PREFIX = '/api/v1/'
+BATCH_PATH = '/api/v1/batch'
+# Потоковые ответы без конца (SSE) нельзя прочитать целиком внутри пакета
+BATCH_STREAMING_PATHS = ('/api/v1/events/stream',)
+DEFAULT_MAX_REQUESTS = 20
+
+
+class BatchService:
+    """
+    Сервис пакетного выполнения запросов к API.
+    Вложенные запросы выполняются по порядку в контексте приложения
+    пакетного запроса: у них общая сессия БД, поэтому пользователь
+    из JWT загружается из БД один раз на весь пакет, а сам токен
+    проверяется один раз - при входе в пакетный запрос.
+    """
+
+    @staticmethod
+    def validate(requests: Any) -> Optional[str]:
+        """Проверяет список вложенных запросов, возвращает текст ошибки или None."""
+        if not isinstance(requests, list) or not requests:
+            return "Передайте непустой список запросов"
+
+        max_requests = current_app.config.get(
+            'BATCH_MAX_REQUESTS', DEFAULT_MAX_REQUESTS)
+        if len(requests) > max_requests:
+            return f"Слишком много запросов в пакете (максимум {max_requests})"
+
+        for index, item in enumerate(requests):
+            if not isinstance(item, dict):
+                return f"Запрос #{index} должен быть объектом"
+            method = str(item.get('method', 'GET')).upper()
+            path = item.get('path')
+            if method not in BATCH_METHODS:
+                return f"Запрос #{index}: метод {method} не поддерживается"
+            if not isinstance(path, str) or not path.startswith(BATCH_PATH_PREFIX):
+                return f"Запрос #{index}: путь должен начинаться с {BATCH_PATH_PREFIX}"
+            if path.split('?', 1)[0].rstrip('/') == BATCH_PATH:
+                return f"Запрос #{index}: вложенные пакеты не поддерживаются"
+            if path.split('?', 1)[0].rstrip('/') in BATCH_STREAMING_PATHS:
+                return f"Запрос #{index}: потоковые эндпоинты не поддерживаются"
+        return None
+
+    @staticmethod
+    def run(requests: List[Dict], headers: Dict[str, str], atomic: bool = False) -> Tuple[Dict, int]:
+        """
+        Выполняет вложенные запросы и возвращает их результаты по порядку.
+
+        В атомарном режиме все запросы выполняются в одной транзакции:
+        commit() внутри сервисов только сбрасывает изменения в БД, а
+        фиксация происходит после успешного выполнения всего пакета.
+        Первый запрос с ошибкой откатывает транзакцию, остальные
+        не выполняются.
+        """
+        error = BatchService.validate(requests)
+        if error:
+            return {"error": error}, 400
+
+        # Токен пакета уже проверен jwt_required эндпоинта; вложенные
+        # запросы (g общий для контекста приложения) его не декодируют
+        g.batch_jwt = (headers.get('Authorization', '').split(' ')[-1], get_jwt())
+
+        if atomic:
+            db.session.remove()
+            session = _make_atomic_session()
+            db.session.registry.set(session)
+
+        results = []
+        committed = True
+        started = time.perf_counter()
+        try:
+            for index, item in enumerate(requests):
+                result = _dispatch(item, headers)
+                results.append(result)
+                if atomic and result['status'] >= 400:
+                    committed = False
+                    results.extend(
+                        {"status": None, "skipped": True}
+                        for _ in requests[index + 1:])
+                    break
+
+            if atomic:
+                if committed:
+                    session.commit_batch()
+                else:
+                    session.rollback()
+        except Exception:
+            if atomic:
+                session.rollback()
+            raise
+        finally:
+            g.pop('batch_jwt', None)
+            if atomic:
+                db.session.remove()
+
+        total_ms = round((time.perf_counter() - started) * 1000, 2)
+        current_app.logger.info(
+            f"Пакет из {len(requests)} запросов выполнен за {total_ms} мс: " +
+            ', '.join(f"{item.get('method', 'GET').upper()} {item['path']} "
+                      f"{result['status']} {result.get('duration_ms', 0)} мс"
+                      for item, result in zip(requests, results)))
+
+        return {
+            "atomic": atomic,
+            "committed": committed,
+            "duration_ms": total_ms,
+            "results": results
+        }, 200
+
+
+def _make_atomic_session():
+    """
+    Сессия из фабрики db.session (с ее обработчиками событий), у которой
+    commit() только сбрасывает изменения, а фиксирует их commit_batch().
+    """
+    session = db.session.session_factory()
+    # Вставки пакета не уходят в групповой коммит мимо его транзакции
+    session.info['atomic_batch'] = True
+    session.commit_batch = session.commit
+    session.commit = session.flush
+    return session
+
+
+def _dispatch(item: Dict, headers: Dict[str, str]) -> Dict:
+    """Выполняет один вложенный запрос и замеряет время его выполнения."""
+    app = current_app._get_current_object()
+    method = str(item.get('method', 'GET')).upper()
+    body = item.get('body')
+
+    started = time.perf_counter()
+    # Контекст приложения уже активен, поэтому вложенный контекст запроса
+    # переиспользует его вместе с сессией БД и загруженным пользователем
+    with app.test_request_context(item['path'], method=method, headers=headers,
+                                  json=body if body is not None and method != 'GET' else None):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            app.logger.error(
+                f"Ошибка вложенного запроса {method} {item['path']}: {str(e)}", exc_info=True)
+            db.session.rollback()
+            response = app.response_class(status=500)
+
+    duration_ms = round((time.perf_counter() - started) * 1000, 2)
+    if response.is_json:
+        payload = response.get_json(silent=True)
+    else:
+        payload = response.get_data(as_text=True) or None
+
+    result = {
+        "status": response.status_code,
+        "duration_ms": duration_ms,
+        "body": payload
+    }
+    if 'ETag' in response.headers:
+        result['etag'] = response.headers['ETag']
+    return result
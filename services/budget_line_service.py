@@ -0,0 +1,162 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import func, and_, select, delete
+
+from models import Budget, BudgetLine, Category, CategoryType, db
+from services.base_service import parse_amount
+from services.archive_service import transaction_source
+from services.currency_service import converted_amount, join_rates
+
+
+class BudgetLineService:
+    """
+    Строки бюджета: лимиты расходов по категориям. Строки всех бюджетов
+    страницы оцениваются одним сгруппированным запросом: каждая строка
+    соединяется с расходами своей категории в диапазоне дат своего
+    бюджета, суммы пересчитываются в валюту бюджета в агрегате.
+    """
+
+    @staticmethod
+    def prepare_lines(user_id: int, items: Any) -> Tuple[Any, int]:
+        """
+        Проверяет строки из запроса: [{category_id, limit_amount}].
+        Возвращает список (category_id, лимит) или ошибку. Категории
+        проверяются одним запросом: своя категория расходов, без повторов.
+        """
+        if not isinstance(items, list):
+            return {"error": "Строки бюджета должны быть списком"}, 400
+        lines = []
+        for item in items:
+            if not isinstance(item, dict) or 'category_id' not in item or 'limit_amount' not in item:
+                return {"error": "Строка бюджета должна содержать category_id и limit_amount"}, 400
+            limit_amount, error = parse_amount(item['limit_amount'])
+            if error:
+                return {"error": f"Лимит строки бюджета: {error.lower()}"}, 400
+            lines.append((item['category_id'], limit_amount))
+
+        category_ids = [category_id for category_id, _ in lines]
+        if len(set(category_ids)) != len(category_ids):
+            return {"error": "Категория может встречаться в бюджете только один раз"}, 400
+        expense_ids = set(db.session.execute(select(Category.id).where(
+            Category.id.in_([i for i in category_ids if isinstance(i, int)]),
+            Category.user_id == user_id,
+            Category.type == CategoryType.EXPENSE)).scalars())
+        for category_id in category_ids:
+            if category_id not in expense_ids:
+                return {"error": f"Категория расходов {category_id} не найдена"}, 400
+        return lines, 200
+
+    @staticmethod
+    def replace_lines(budget: Budget, lines: List[Tuple[int, Decimal]]) -> None:
+        """Заменяет строки бюджета; существующие строки категорий обновляются."""
+        existing = {line.category_id: line for line in budget.lines}
+        # У нового бюджета, созданного через owner, user_id еще не заполнен
+        user_id = budget.user_id if budget.user_id is not None else budget.owner.id
+        updated = []
+        for category_id, limit_amount in lines:
+            line = existing.get(category_id)
+            if line is None:
+                line = BudgetLine(category_id=category_id, user_id=user_id)
+            line.limit_amount = limit_amount
+            updated.append(line)
+        budget.lines = updated
+
+    @staticmethod
+    def evaluate(user_id: int, budgets: Iterable[Budget],
+                 today: Optional[date] = None) -> Dict[int, List[Dict]]:
+        """
+        Итоги строк бюджетов: потрачено, остаток и прогноз на конец
+        периода для каждой строки. Один запрос на все бюджеты списка;
+        прогноз - по темпу расходов категории с начала бюджета.
+        Возвращает {budget_id: [строки]}, бюджеты без строк - пустой список.
+        """
+        today = today or date.today()
+        budgets = {budget.id: budget for budget in budgets}
+        result: Dict[int, List[Dict]] = {budget_id: [] for budget_id in budgets}
+        if not budgets:
+            return result
+
+        source = transaction_source(min(b.start_date for b in budgets.values()),
+                                    max(b.end_date for b in budgets.values()))
+        amount, rates = converted_amount(Budget.currency, table=source)
+        rows = join_rates(db.session.query(
+            BudgetLine.id, BudgetLine.budget_id, BudgetLine.category_id, Category.name,
+            BudgetLine.limit_amount, func.sum(amount)
+        ).select_from(BudgetLine).join(
+            Budget, BudgetLine.budget_id == Budget.id
+        ).outerjoin(
+            Category, BudgetLine.category_id == Category.id
+        ).outerjoin(source, and_(
+            source.user_id == user_id,
+            source.category_id == BudgetLine.category_id,
+            source.type == CategoryType.EXPENSE,
+            source.date >= Budget.start_date,
+            source.date <= Budget.end_date
+        )), rates).filter(
+            BudgetLine.budget_id.in_(list(budgets)),
+            BudgetLine.user_id == user_id
+        ).group_by(
+            BudgetLine.id, BudgetLine.budget_id, BudgetLine.category_id, Category.name,
+            BudgetLine.limit_amount
+        ).order_by(BudgetLine.id).all()
+
+        for line_id, budget_id, category_id, name, limit_amount, spent in rows:
+            budget = budgets[budget_id]
+            spent = float(round(spent or 0, 2))
+            limit_amount = float(limit_amount)
+            line = {
+                'id': line_id,
+                'category_id': category_id,
+                'category_name': name,
+                'limit_amount': limit_amount,
+                'spent': spent,
+                'remaining': round(limit_amount - spent, 2),
+                'percentage': round(spent / limit_amount * 100, 2)
+            }
+            if budget.start_date <= today <= budget.end_date:
+                elapsed_days = (today - budget.start_date).days + 1
+                total_days = (budget.end_date - budget.start_date).days + 1
+                projected = spent / elapsed_days * total_days
+                line['projection'] = {
+                    'method': 'run_rate',
+                    'daily_expense': round(spent / elapsed_days, 2),
+                    'projected_total': round(projected, 2),
+                    'projected_remaining': round(limit_amount - projected, 2),
+                    'projected_percentage': round(projected / limit_amount * 100, 2)
+                }
+            result[budget_id].append(line)
+        return result
+
+    @staticmethod
+    def delete_for(budget_ids: Iterable[int] = (), category_ids: Iterable[int] = ()) -> None:
+        """
+        Удаляет строки бюджетов или категорий, удаленных в обход ORM
+        (массовые операции): SQLite не применяет ON DELETE CASCADE.
+        """
+        budget_ids, category_ids = list(budget_ids), list(category_ids)
+        if budget_ids:
+            db.session.execute(delete(BudgetLine).where(BudgetLine.budget_id.in_(budget_ids)),
+                               execution_options={'synchronize_session': False})
+        if category_ids:
+            db.session.execute(delete(BudgetLine).where(BudgetLine.category_id.in_(category_ids)),
+                               execution_options={'synchronize_session': False})
+
+    @staticmethod
+    def merge_category(source_id: int, target_id: int) -> None:
+        """
+        Переносит строки категории source на target при слиянии категорий.
+        Если в бюджете уже есть строка target, лимиты складываются.
+        """
+        lines = BudgetLine.query.filter(BudgetLine.category_id.in_([source_id, target_id])).all()
+        targets = {line.budget_id: line for line in lines if line.category_id == target_id}
+        for line in lines:
+            if line.category_id != source_id:
+                continue
+            target = targets.get(line.budget_id)
+            if target is None:
+                line.category_id = target_id
+            else:
+                target.limit_amount += line.limit_amount
+                db.session.delete(line)
+        db.session.flush()
@@ -5,8 +5,12 @@ from flask import current_app
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import func, and_
 
-from models import Budget, Transaction, db, BudgetPeriod, CategoryType
-from services.base_service import BaseService
+from models import Budget, Transaction, db, BudgetPeriod, CategoryType, BASE_CURRENCY
+from services.base_service import BaseService, parse_amount, parse_date
+from services.archive_service import transaction_source
+from services.currency_service import normalize_currency, converted_amount, join_rates
+from services.forecast_service import ForecastService
+from services.budget_line_service import BudgetLineService
 
 
 class BudgetService(BaseService):
@@ -53,6 +57,11 @@ class BudgetService(BaseService):
             budgets = query.order_by(Budget.start_date.desc()).limit(
                 limit).offset(offset).all()
 
+            # Прогнозы для всех активных бюджетов страницы одним проходом
+            projections = ForecastService.forecast_budgets(user_id, budgets)
+            # Строки всех бюджетов страницы - одним запросом
+            lines = BudgetLineService.evaluate(user_id, budgets)
+
             # Формируем ответ с данными бюджетов
             result = []
             for budget in budgets:
@@ -64,13 +73,14 @@ class BudgetService(BaseService):
                     'start_date': budget.start_date.isoformat(),
                     'end_date': budget.end_date.isoformat(),
                     'target_amount': float(budget.target_amount) if budget.target_amount else None,
+                    'currency': budget.currency,
                     'user_id': budget.user_id,
                     'created_at': budget.created_at.isoformat() if budget.created_at else None
                 }
 
                 # Добавляем статистику по бюджету
                 income, expense, balance = BudgetService._calculate_budget_stats(
-                    user_id, budget.start_date, budget.end_date
+                    user_id, budget.start_date, budget.end_date, budget.currency
                 )
 
                 budget_data['statistics'] = {
@@ -89,6 +99,10 @@ class BudgetService(BaseService):
                         'remaining': remaining
                     }
 
+                if budget.id in projections:
+                    budget_data['projection'] = projections[budget.id]
+                budget_data['lines'] = lines[budget.id]
+
                 result.append(budget_data)
 
             return {
@@ -154,6 +168,20 @@ class BudgetService(BaseService):
                 except (ValueError, TypeError, decimal.InvalidOperation):
                     return {"error": "Неверный формат целевой суммы"}, 400
 
+            # Валюта бюджета: итоги считаются в ней
+            currency = BASE_CURRENCY
+            if data.get('currency') is not None:
+                currency, error = normalize_currency(data['currency'])
+                if error:
+                    return {"error": error}, 400
+
+            # Строки бюджета: лимиты по категориям расходов
+            lines = []
+            if data.get('lines') is not None:
+                lines, status = BudgetLineService.prepare_lines(user_id, data['lines'])
+                if status != 200:
+                    return lines, status
+
             # Создаем новый бюджет
             budget = Budget(
                 name=data['name'],
@@ -161,9 +189,11 @@ class BudgetService(BaseService):
                 start_date=start_date,
                 end_date=end_date,
                 target_amount=target_amount,
+                currency=currency,
                 user_id=user_id
             )
 
+            BudgetLineService.replace_lines(budget, lines)
             db.session.add(budget)
             db.session.commit()
 
@@ -175,8 +205,10 @@ class BudgetService(BaseService):
                 'start_date': budget.start_date.isoformat(),
                 'end_date': budget.end_date.isoformat(),
                 'target_amount': float(budget.target_amount) if budget.target_amount else None,
+                'currency': budget.currency,
                 'user_id': budget.user_id,
-                'created_at': budget.created_at.isoformat() if budget.created_at else None
+                'created_at': budget.created_at.isoformat() if budget.created_at else None,
+                'lines': BudgetLineService.evaluate(user_id, [budget])[budget.id]
             }
 
             return result, 201
@@ -258,11 +290,24 @@ class BudgetService(BaseService):
                     except (ValueError, TypeError, decimal.InvalidOperation):
                         return {"error": "Неверный формат целевой суммы"}, 400
 
+            if 'currency' in data:
+                currency, error = normalize_currency(data['currency'])
+                if error:
+                    return {"error": error}, 400
+                budget.currency = currency
+
+            # Переданные строки заменяют текущие
+            if data.get('lines') is not None:
+                lines, status = BudgetLineService.prepare_lines(user_id, data['lines'])
+                if status != 200:
+                    return lines, status
+                BudgetLineService.replace_lines(budget, lines)
+
             db.session.commit()
 
             # Рассчитываем статистику
             income, expense, balance = BudgetService._calculate_budget_stats(
-                user_id, budget.start_date, budget.end_date
+                user_id, budget.start_date, budget.end_date, budget.currency
             )
 
             # Формируем ответ
@@ -273,13 +318,15 @@ class BudgetService(BaseService):
                 'start_date': budget.start_date.isoformat(),
                 'end_date': budget.end_date.isoformat(),
                 'target_amount': float(budget.target_amount) if budget.target_amount else None,
+                'currency': budget.currency,
                 'user_id': budget.user_id,
                 'created_at': budget.created_at.isoformat() if budget.created_at else None,
                 'statistics': {
                     'income': float(income),
                     'expense': float(expense),
                     'balance': float(balance)
-                }
+                },
+                'lines': BudgetLineService.evaluate(user_id, [budget])[budget.id]
             }
 
             # Добавляем прогресс, если есть целевая сумма
@@ -335,6 +382,71 @@ class BudgetService(BaseService):
                 f"Неожиданная ошибка при удалении бюджета: {str(e)}")
             return {"error": "Внутренняя ошибка сервера"}, 500
 
+    @staticmethod
+    def _prepare_budget(item: Dict[str, Any], row: Optional[Dict[str, Any]] = None) -> Tuple[Dict, int]:
+        """
+        Проверяет поля бюджета для массовых операций и возвращает значения
+        колонок. row - текущая строка при обновлении (None при создании).
+        """
+        if row is None:
+            for field in ('name', 'period', 'start_date', 'end_date'):
+                if field not in item:
+                    return {"error": f"Отсутствует обязательное поле: {field}"}, 400
+
+        values = {}
+        if 'name' in item:
+            name = item['name'].strip() if isinstance(item['name'], str) else ''
+            if not name:
+                return {"error": "Название бюджета не может быть пустым"}, 400
+            values['name'] = name
+        if 'period' in item:
+            try:
+                values['period'] = BudgetPeriod(item['period'])
+            except ValueError:
+                return {"error": f"Неверный тип периода. Допустимые значения: {[p.value for p in BudgetPeriod]}"}, 400
+        for field in ('start_date', 'end_date'):
+            if field in item:
+                values[field], error = parse_date(item[field])
+                if error:
+                    return {"error": error}, 400
+        if 'target_amount' in item:
+            values['target_amount'] = None
+            if item['target_amount'] is not None:
+                values['target_amount'], error = parse_amount(item['target_amount'])
+                if error:
+                    return {"error": f"Целевая сумма: {error.lower()}"}, 400
+        if 'currency' in item:
+            values['currency'], error = normalize_currency(item['currency'])
+            if error:
+                return {"error": error}, 400
+
+        merged = dict(row or {}, **values)
+        if merged['end_date'] < merged['start_date']:
+            return {"error": "Конечная дата не может быть раньше начальной"}, 400
+        return values, 200
+
+    @staticmethod
+    def bulk_create(user_id: int, items: List[Dict[str, Any]],
+                    atomic: bool = False) -> Tuple[Dict, int]:
+        """Массовое создание бюджетов."""
+        return BaseService.create_many(Budget, user_id, items,
+                                       BudgetService._prepare_budget, atomic=atomic)
+
+    @staticmethod
+    def bulk_update(user_id: int, items: List[Dict[str, Any]],
+                    atomic: bool = False) -> Tuple[Dict, int]:
+        """Массовое обновление бюджетов: элементы содержат id и изменяемые поля."""
+        return BaseService.update_many(Budget, user_id, items,
+                                       BudgetService._prepare_budget, atomic=atomic)
+
+    @staticmethod
+    def bulk_delete(user_id: int, ids: List[int], atomic: bool = False) -> Tuple[Dict, int]:
+        """Массовое удаление бюджетов (вместе с их строками)."""
+        return BaseService.delete_many(
+            Budget, user_id, ids, atomic=atomic,
+            after_write=lambda _, old_rows, __: BudgetLineService.delete_for(
+                budget_ids=[row['id'] for row in old_rows]))
+
     @staticmethod
     def get_budget_details(budget_id: int, user_id: int) -> Tuple[Dict, int]:
         """
@@ -351,7 +463,7 @@ class BudgetService(BaseService):
 
             # Рассчитываем статистику
             income, expense, balance = BudgetService._calculate_budget_stats(
-                user_id, budget.start_date, budget.end_date
+                user_id, budget.start_date, budget.end_date, budget.currency
             )
 
             # Формируем подробный ответ
@@ -362,13 +474,15 @@ class BudgetService(BaseService):
                 'start_date': budget.start_date.isoformat(),
                 'end_date': budget.end_date.isoformat(),
                 'target_amount': float(budget.target_amount) if budget.target_amount else None,
+                'currency': budget.currency,
                 'user_id': budget.user_id,
                 'created_at': budget.created_at.isoformat() if budget.created_at else None,
                 'statistics': {
                     'income': float(income),
                     'expense': float(expense),
                     'balance': float(balance)
-                }
+                },
+                'lines': BudgetLineService.evaluate(user_id, [budget])[budget.id]
             }
 
             # Добавляем прогресс выполнения, если есть целевая сумма
@@ -392,34 +506,12 @@ class BudgetService(BaseService):
 
             result['status'] = status
 
-            # Добавляем прогноз расходов на оставшийся период, если бюджет активный
+            # Прогноз расходов на оставшийся период, если бюджет активный
             if status == 'active':
-                total_days = (budget.end_date - budget.start_date).days + 1
-                elapsed_days = (current_date - budget.start_date).days + 1
-                remaining_days = (budget.end_date - current_date).days
-
-                if elapsed_days > 0:
-                    daily_expense = float(expense) / elapsed_days
-                    projected_expense = float(
-                        expense) + (daily_expense * remaining_days)
-
-                    result['projection'] = {
-                        'daily_expense': round(daily_expense, 2),
-                        'projected_total': round(projected_expense, 2),
-                        'elapsed_days': elapsed_days,
-                        'remaining_days': remaining_days,
-                        'total_days': total_days
-                    }
-
-                    # Если есть целевая сумма, добавляем проекцию выполнения
-                    if budget.target_amount:
-                        projected_remaining = float(
-                            budget.target_amount) - projected_expense
-                        projected_percentage = round(
-                            (projected_expense / float(budget.target_amount)) * 100, 2)
-                        result['projection']['target_remaining'] = round(
-                            projected_remaining, 2)
-                        result['projection']['target_percentage'] = projected_percentage
+                projection = ForecastService.forecast_budgets(
+                    user_id, [budget], current_date).get(budget.id)
+                if projection:
+                    result['projection'] = projection
 
             return result, 200
 
@@ -429,26 +521,26 @@ class BudgetService(BaseService):
             return {"error": "Ошибка при получении деталей бюджета"}, 500
 
     @staticmethod
-    def _calculate_budget_stats(user_id: int, start_date: date, end_date: date) -> Tuple[Decimal, Decimal, Decimal]:
+    def _calculate_budget_stats(user_id: int, start_date: date, end_date: date,
+                                currency: str = BASE_CURRENCY) -> Tuple[Decimal, Decimal, Decimal]:
         """
         Вспомогательный метод для расчета статистики бюджета.
-        Возвращает общий доход, расход и баланс за период.
+        Возвращает общий доход, расход и баланс за период в валюте бюджета:
+        суммы пересчитываются в агрегате через соединение с курсами.
         """
-        # Запрос для суммы доходов
-        income = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == CategoryType.INCOME,
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        ).scalar() or Decimal('0.00')
-
-        # Запрос для суммы расходов
-        expense = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == CategoryType.EXPENSE,
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        ).scalar() or Decimal('0.00')
+        source = transaction_source(start_date, end_date)
+        amount, rates = converted_amount(currency, table=source)
+        query = join_rates(db.session.query(
+            func.sum(amount).filter(source.type == CategoryType.INCOME),
+            func.sum(amount).filter(source.type == CategoryType.EXPENSE)
+        ).select_from(source), rates).filter(
+            source.user_id == user_id,
+            source.date >= start_date,
+            source.date <= end_date
+        )
+        income, expense = query.one()
+        income = Decimal(str(round(income or 0, 2)))
+        expense = Decimal(str(round(expense or 0, 2)))
 
         # Рассчитываем баланс
         balance = income - expense
@@ -1,7 +1,30 @@
 from datetime import date
-from decimal import Decimal, ROUND_UP, InvalidOperation
+from decimal import Decimal, ROUND_UP, ROUND_DOWN, ROUND_HALF_UP, InvalidOperation
+from functools import lru_cache
 from dateutil.relativedelta import relativedelta  # Для расчета разницы в месяцах
-from typing import Dict, Union, Optional, Any
+from typing import Dict, Union, Optional, Any, List, Sequence, Iterator
+import numpy as np
+
+# Максимальное количество сценариев в одном пакетном расчете
+MAX_SCENARIOS = 10000
+# Количество строк графика, вычисляемых за один векторный шаг
+SCHEDULE_CHUNK = 120
+
+
+@lru_cache(maxsize=4096)
+def months_until(target_date: date, today: date) -> int:
+    """
+    Количество месяцев для накопления до целевой даты.
+    Неполный месяц считается целым. Результат кэшируется по паре дат,
+    поэтому в пакетных расчетах relativedelta вычисляется один раз
+    на каждую уникальную дату.
+    """
+    delta = relativedelta(target_date, today)
+    months_remaining = delta.years * 12 + delta.months
+    if delta.days > 0 or (delta.years == 0 and delta.months == 0):
+        # Если есть остаток дней или цель в текущем месяце, добавляем месяц
+        months_remaining += 1
+    return months_remaining
 
 
 def calculate_required_savings(target_amount: Decimal, target_date: date,
@@ -79,13 +102,8 @@ def calculate_required_savings(target_amount: Decimal, target_date: date,
     # Расчеты
     amount_to_save = target_amount - current_savings
 
-    # Расчет количества полных месяцев до цели
-    delta = relativedelta(target_date, today)
-    # Учитываем дни: если до целевой даты меньше месяца, считаем как 1 месяц для расчета
-    months_remaining = delta.years * 12 + delta.months
-    if delta.days > 0 or (delta.years == 0 and delta.months == 0):
-        # Если есть остаток дней или цель в текущем месяце, добавляем месяц
-        months_remaining += 1
+    # Расчет количества месяцев до цели (неполный месяц считается целым)
+    months_remaining = months_until(target_date, today)
 
     if months_remaining <= 0:
         # Это не должно произойти из-за проверки target_date > today, но на всякий случай
@@ -106,6 +124,282 @@ def calculate_required_savings(target_amount: Decimal, target_date: date,
     }
 
 
+def _to_cents(value: Any, name: str, allow_zero: bool) -> int:
+    """Преобразует денежную сумму в целое число копеек с проверкой знака."""
+    try:
+        amount = value if isinstance(value, Decimal) else Decimal(str(value))
+        cents = int(amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) * 100)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f"Invalid {name} format.")
+    if cents < 0 or (cents == 0 and not allow_zero):
+        raise ValueError(f"{name.capitalize()} must be positive." if not allow_zero
+                         else f"{name.capitalize()} cannot be negative.")
+    return cents
+
+
+def _format_cents(cents: int) -> str:
+    """Строковое представление суммы в копейках, например 12345 -> '123.45'."""
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def calculate_savings_grid(target_amounts: Sequence[Any], target_dates: Sequence[Any],
+                           current_savings: Optional[Sequence[Any]] = None,
+                           mode: str = 'grid') -> Dict[str, Any]:
+    """
+    Пакетный расчет ежемесячных сбережений для набора сценариев.
+
+    В режиме 'grid' считаются все сочетания сумм, дат и накоплений
+    (результат - вложенные списки [сумма][дата][накопления]); в режиме
+    'zip' - сценарии из элементов с одинаковыми индексами (список
+    накоплений из одного элемента применяется ко всем сценариям).
+    Суммы переводятся в копейки, и все сценарии считаются одной
+    векторной операцией NumPy с округлением вверх до копейки, как в
+    calculate_required_savings.
+
+    Raises:
+        ValueError: Если входные данные не проходят валидацию.
+    """
+    today = date.today()
+    if mode not in ('grid', 'zip'):
+        raise ValueError("Mode must be 'grid' or 'zip'.")
+    if not target_amounts or not target_dates:
+        raise ValueError("Target amounts and target dates must not be empty.")
+    current_savings = list(current_savings) if current_savings else [Decimal('0.00')]
+
+    amounts = np.array([_to_cents(value, "target amount", allow_zero=False)
+                        for value in target_amounts], dtype=np.int64)
+    savings = np.array([_to_cents(value, "current savings", allow_zero=True)
+                        for value in current_savings], dtype=np.int64)
+
+    dates = []
+    for value in target_dates:
+        if isinstance(value, str):
+            try:
+                value = date.fromisoformat(value)
+            except ValueError:
+                raise ValueError("Invalid target date format. Use YYYY-MM-DD.")
+        if not isinstance(value, date):
+            raise ValueError("Invalid target date format. Use YYYY-MM-DD.")
+        if value <= today:
+            raise ValueError("Target date must be in the future.")
+        dates.append(value)
+    months = np.array([months_until(value, today) for value in dates], dtype=np.int64)
+
+    if mode == 'grid':
+        scenarios = amounts.size * months.size * savings.size
+        if scenarios > MAX_SCENARIOS:
+            raise ValueError(f"Too many scenarios (maximum {MAX_SCENARIOS}).")
+        to_save = np.maximum(amounts[:, None, None] - savings[None, None, :], 0)
+        month_counts = months[None, :, None]
+    else:
+        size = amounts.size
+        if months.size != size or savings.size not in (1, size):
+            raise ValueError("In 'zip' mode all lists must have the same length.")
+        if size > MAX_SCENARIOS:
+            raise ValueError(f"Too many scenarios (maximum {MAX_SCENARIOS}).")
+        to_save = np.maximum(amounts - savings, 0)
+        month_counts = months
+
+    # Деление с округлением вверх в целых копейках
+    required = -(-to_save // month_counts)
+
+    return {
+        "mode": mode,
+        "target_amounts": [_format_cents(int(value)) for value in amounts],
+        "target_dates": [value.isoformat() for value in dates],
+        "current_savings": [_format_cents(int(value)) for value in savings],
+        "months_remaining": months.tolist(),
+        "required_monthly_savings": np.vectorize(_format_cents, otypes=[object])(required).tolist()
+    }
+
+
+def _rate_per_month(annual_rate: Any) -> Decimal:
+    """Месячная ставка из годовой процентной ставки."""
+    try:
+        annual_rate = annual_rate if isinstance(annual_rate, Decimal) else Decimal(str(annual_rate))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError("Invalid annual rate format.")
+    if annual_rate < 0 or annual_rate > 100:
+        raise ValueError("Annual rate must be between 0 and 100.")
+    return annual_rate / Decimal(1200)
+
+
+def _check_months(months: Any, maximum: int) -> int:
+    if not isinstance(months, int) or isinstance(months, bool) or not 1 <= months <= maximum:
+        raise ValueError(f"Months must be an integer between 1 and {maximum}.")
+    return months
+
+
+def _schedule_date(start_date: Optional[date], number: int) -> Optional[str]:
+    return (start_date + relativedelta(months=number)).isoformat() if start_date else None
+
+
+def _loan_balances(principal: int, payment: int, rate: float, numbers: np.ndarray) -> np.ndarray:
+    """
+    Остаток долга в копейках после платежей с номерами numbers
+    (замкнутая формула аннуитета, округление до копейки).
+    """
+    if rate == 0:
+        balances = principal - payment * numbers
+    else:
+        growth = (1.0 + rate) ** numbers
+        balances = np.rint(principal * growth - payment * (growth - 1.0) / rate)
+    return np.maximum(balances, 0).astype(np.int64)
+
+
+def amortization_summary(principal: Any, annual_rate: Any, months: int) -> Dict[str, Any]:
+    """
+    Параметры аннуитетного кредита: ежемесячный платеж, последний
+    (корректирующий) платеж и итоговые суммы.
+
+    Платеж считается в Decimal и округляется до копейки; последний
+    платеж гасит остаток, накопившийся из-за округления.
+
+    Raises:
+        ValueError: Если входные данные не проходят валидацию.
+    """
+    principal_cents = _to_cents(principal, "principal", allow_zero=False)
+    rate = _rate_per_month(annual_rate)
+    months = _check_months(months, 600)
+
+    principal_decimal = Decimal(principal_cents) / 100
+    if rate == 0:
+        exact = principal_decimal / months
+    else:
+        exact = principal_decimal * rate / (1 - (1 + rate) ** -months)
+    payment = exact.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    # Округленный вверх платеж не должен гасить долг раньше срока:
+    # тогда платеж округляется вниз, остаток уходит в последний
+    if months > 1 and _loan_balances(principal_cents, int(payment * 100), float(rate),
+                                     np.array([months - 1]))[0] <= 0:
+        payment = exact.quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+    payment_cents = int(payment * 100)
+    # Проверяется до начала потоковой передачи графика
+    if payment_cents <= 0:
+        raise ValueError("Principal is too small for the given term: monthly payment rounds to zero.")
+
+    before_last = int(_loan_balances(principal_cents, payment_cents, float(rate),
+                                     np.array([months - 1]))[0])
+    last_payment = before_last + int((Decimal(before_last) * rate).quantize(
+        Decimal('1'), rounding=ROUND_HALF_UP))
+    total_paid = payment_cents * (months - 1) + last_payment
+
+    return {
+        "principal": _format_cents(principal_cents),
+        "annual_rate": str(annual_rate),
+        "months": months,
+        "monthly_payment": _format_cents(payment_cents),
+        "last_payment": _format_cents(last_payment),
+        "total_paid": _format_cents(total_paid),
+        "total_interest": _format_cents(total_paid - principal_cents)
+    }
+
+
+def iter_amortization_schedule(principal: Any, annual_rate: Any, months: int,
+                               start_date: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Генератор графика платежей по аннуитетному кредиту.
+
+    Строки вычисляются блоками по SCHEDULE_CHUNK месяцев векторными
+    операциями NumPy в целых копейках и отдаются по мере вычисления,
+    поэтому длинный график не собирается в один большой список.
+    Платеж постоянен; доля процентов равна платежу минус погашение
+    основного долга, последний платеж гасит остаток полностью.
+    """
+    summary = amortization_summary(principal, annual_rate, months)
+    principal_cents = _to_cents(principal, "principal", allow_zero=False)
+    payment_cents = _to_cents(summary["monthly_payment"], "payment", allow_zero=False)
+    last_payment = _to_cents(summary["last_payment"], "payment", allow_zero=True)
+    rate = float(_rate_per_month(annual_rate))
+
+    previous = principal_cents
+    for chunk_start in range(1, months + 1, SCHEDULE_CHUNK):
+        numbers = np.arange(chunk_start, min(chunk_start + SCHEDULE_CHUNK, months + 1))
+        balances = _loan_balances(principal_cents, payment_cents, rate, numbers)
+        previous_balances = np.concatenate(([previous], balances[:-1]))
+        if numbers[-1] == months:
+            balances[-1] = 0
+        principal_parts = previous_balances - balances
+        payments = np.full(numbers.size, payment_cents, dtype=np.int64)
+        if numbers[-1] == months:
+            payments[-1] = last_payment
+        interest_parts = payments - principal_parts
+
+        for number, payment, principal_part, interest, balance in zip(
+                numbers.tolist(), payments.tolist(), principal_parts.tolist(),
+                interest_parts.tolist(), balances.tolist()):
+            yield {
+                "number": number,
+                "date": _schedule_date(start_date, number),
+                "payment": _format_cents(payment),
+                "principal": _format_cents(principal_part),
+                "interest": _format_cents(interest),
+                "balance": _format_cents(balance)
+            }
+        previous = int(balances[-1])
+
+
+def _growth_balances(initial: int, contribution: int, rate: float, numbers: np.ndarray) -> np.ndarray:
+    """Баланс вклада в копейках после месяцев numbers (взнос в конце месяца)."""
+    if rate == 0:
+        return (initial + contribution * numbers).astype(np.int64)
+    growth = (1.0 + rate) ** numbers
+    return np.rint(initial * growth + contribution * (growth - 1.0) / rate).astype(np.int64)
+
+
+def compound_growth_summary(initial_amount: Any, monthly_contribution: Any,
+                            annual_rate: Any, months: int) -> Dict[str, Any]:
+    """
+    Итог накоплений со сложным процентом (ежемесячная капитализация,
+    взносы в конце каждого месяца).
+
+    Raises:
+        ValueError: Если входные данные не проходят валидацию.
+    """
+    initial = _to_cents(initial_amount, "initial amount", allow_zero=True)
+    contribution = _to_cents(monthly_contribution, "monthly contribution", allow_zero=True)
+    rate = _rate_per_month(annual_rate)
+    months = _check_months(months, 1200)
+    if initial == 0 and contribution == 0:
+        raise ValueError("Initial amount or monthly contribution must be positive.")
+
+    final_balance = int(_growth_balances(initial, contribution, float(rate), np.array([months]))[0])
+    contributed = initial + contribution * months
+    return {
+        "initial_amount": _format_cents(initial),
+        "monthly_contribution": _format_cents(contribution),
+        "annual_rate": str(annual_rate),
+        "months": months,
+        "total_contributions": _format_cents(contributed),
+        "total_interest": _format_cents(final_balance - contributed),
+        "final_balance": _format_cents(final_balance)
+    }
+
+
+def iter_compound_growth_schedule(initial_amount: Any, monthly_contribution: Any,
+                                  annual_rate: Any, months: int,
+                                  start_date: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+    """Генератор помесячного графика роста вклада (блоками по SCHEDULE_CHUNK)."""
+    compound_growth_summary(initial_amount, monthly_contribution, annual_rate, months)
+    initial = _to_cents(initial_amount, "initial amount", allow_zero=True)
+    contribution = _to_cents(monthly_contribution, "monthly contribution", allow_zero=True)
+    rate = float(_rate_per_month(annual_rate))
+
+    for chunk_start in range(1, months + 1, SCHEDULE_CHUNK):
+        numbers = np.arange(chunk_start, min(chunk_start + SCHEDULE_CHUNK, months + 1))
+        balances = _growth_balances(initial, contribution, rate, numbers)
+        contributed = initial + contribution * numbers
+
+        for number, total, balance in zip(numbers.tolist(), contributed.tolist(), balances.tolist()):
+            yield {
+                "month": number,
+                "date": _schedule_date(start_date, number),
+                "contributions": _format_cents(total),
+                "interest": _format_cents(balance - total),
+                "balance": _format_cents(balance)
+            }
+
+
 # Пример использования (для тестирования)
 if __name__ == '__main__':
     try:
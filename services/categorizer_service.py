@@ -0,0 +1,195 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, inspect
+
+from models import Transaction, db
+from services.search_service import search_tokens
+
+# Сколько пользователей держать в памяти (вытеснение по LRU)
+MAX_CACHED_USERS = 1000
+# Сколько последних транзакций пользователя используется для обучения
+TRAINING_LIMIT = 5000
+# Длина префикса слова: "starbucks#123" и "starbucks#456" дают общий признак
+PREFIX_LENGTH = 4
+# Вес совпадения всего описания относительно отдельного слова
+EXACT_WEIGHT = 3.0
+
+
+def description_features(description: Optional[str]) -> List[str]:
+    """
+    Признаки описания: слова, их префиксы и нормализованное описание
+    целиком. Признаки разных видов различаются префиксом.
+    """
+    tokens = search_tokens(description or '')
+    if not tokens:
+        return []
+    features = {'d:' + ' '.join(tokens)}
+    for token in tokens:
+        features.add('w:' + token)
+        if len(token) > PREFIX_LENGTH:
+            features.add('p:' + token[:PREFIX_LENGTH])
+    return sorted(features)
+
+
+class UserCategorizer:
+    """
+    Модель категоризации одного пользователя: для каждого признака
+    описания хранится, сколько раз он встречался в каждой категории.
+    Категория оценивается суммой долей P(категория | признак),
+    взвешенных редкостью признака (idf).
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[int, int]] = {}
+        self.totals: Dict[str, int] = {}
+        self.documents = 0
+
+    def add(self, description: Optional[str], category_id: int, delta: int = 1) -> None:
+        """Учитывает (delta=1) или забывает (delta=-1) пару описание-категория."""
+        features = description_features(description)
+        if not features or category_id is None:
+            return
+        self.documents = max(self.documents + delta, 0)
+        for feature in features:
+            by_category = self.counts.setdefault(feature, {})
+            count = by_category.get(category_id, 0) + delta
+            if count > 0:
+                by_category[category_id] = count
+            else:
+                by_category.pop(category_id, None)
+            total = self.totals.get(feature, 0) + delta
+            if total > 0 and by_category:
+                self.totals[feature] = total
+            else:
+                self.totals.pop(feature, None)
+                self.counts.pop(feature, None)
+
+    def suggest(self, description: Optional[str], limit: int = 3) -> List[Tuple[int, float]]:
+        """Категории по убыванию уверенности: [(category_id, доля 0..1)]."""
+        scores: Dict[int, float] = {}
+        for feature in description_features(description):
+            by_category = self.counts.get(feature)
+            if not by_category:
+                continue
+            total = self.totals[feature]
+            weight = math.log(1.0 + self.documents / total)
+            if feature.startswith('d:'):
+                weight *= EXACT_WEIGHT
+            for category_id, count in by_category.items():
+                scores[category_id] = scores.get(category_id, 0.0) + weight * count / total
+
+        norm = sum(scores.values())
+        if not norm:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(category_id, round(score / norm, 4)) for category_id, score in ranked]
+
+
+class CategorizerService:
+    """
+    Автоматическая категоризация транзакций по описанию.
+    Модели пользователей строятся по истории одним запросом при первом
+    обращении, хранятся в памяти процесса с вытеснением по LRU и
+    обновляются инкрементально после каждого коммита транзакций.
+    """
+
+    _models: "OrderedDict[int, UserCategorizer]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_model(user_id: int) -> UserCategorizer:
+        """Модель пользователя из кэша или построенная по истории."""
+        with CategorizerService._lock:
+            model = CategorizerService._models.get(user_id)
+            if model is not None:
+                CategorizerService._models.move_to_end(user_id)
+                return model
+
+        model = UserCategorizer()
+        rows = db.session.query(Transaction.description, Transaction.category_id).filter(
+            Transaction.user_id == user_id,
+            Transaction.description.isnot(None)
+        ).order_by(Transaction.id.desc()).limit(TRAINING_LIMIT).all()
+        for description, category_id in rows:
+            model.add(description, category_id)
+
+        with CategorizerService._lock:
+            # Параллельный запрос мог построить модель раньше
+            model = CategorizerService._models.setdefault(user_id, model)
+            CategorizerService._models.move_to_end(user_id)
+            while len(CategorizerService._models) > MAX_CACHED_USERS:
+                CategorizerService._models.popitem(last=False)
+        return model
+
+    @staticmethod
+    def suggest(user_id: int, description: Optional[str],
+                limit: int = 3) -> List[Tuple[int, float]]:
+        """Предлагаемые категории для описания."""
+        return CategorizerService.get_model(user_id).suggest(description, limit)
+
+    @staticmethod
+    def invalidate(user_ids: Iterable[int]) -> None:
+        """
+        Удаляет модели пользователей из кэша.
+        Нужно вызывать после массовых UPDATE/DELETE в обход ORM.
+        """
+        with CategorizerService._lock:
+            for user_id in set(user_ids):
+                CategorizerService._models.pop(user_id, None)
+
+    @staticmethod
+    def apply_changes(changes: Iterable[Tuple[int, Optional[str], int, int]]) -> None:
+        """Применяет изменения (user_id, описание, категория, +1/-1) к моделям в кэше."""
+        with CategorizerService._lock:
+            for user_id, description, category_id, delta in changes:
+                model = CategorizerService._models.get(user_id)
+                if model is not None:
+                    model.add(description, category_id, delta)
+
+
+def _old_value(obj, name):
+    """Значение атрибута до изменения в текущем flush."""
+    history = inspect(obj).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, name)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_categorizer_changes(session, flush_context):
+    """
+    Запоминает изменения пар описание-категория. Модели обновляются
+    только после коммита, чтобы откат не оставил их в неверном виде.
+    """
+    changes = session.info.setdefault('categorizer_changes', [])
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            changes.append((obj.user_id, obj.description, obj.category_id, 1))
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            changes.append((_old_value(obj, 'user_id'), _old_value(obj, 'description'),
+                            _old_value(obj, 'category_id'), -1))
+    for obj in session.dirty:
+        if not isinstance(obj, Transaction):
+            continue
+        state = inspect(obj)
+        if not (state.attrs.description.history.has_changes()
+                or state.attrs.category_id.history.has_changes()):
+            continue
+        changes.append((obj.user_id, _old_value(obj, 'description'),
+                        _old_value(obj, 'category_id'), -1))
+        changes.append((obj.user_id, obj.description, obj.category_id, 1))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_categorizer_changes(session):
+    changes = session.info.pop('categorizer_changes', None)
+    if changes:
+        CategorizerService.apply_changes(changes)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_categorizer_changes(session):
+    session.info.pop('categorizer_changes', None)
@@ -1,10 +1,18 @@
 from typing import Dict, List, Optional, Tuple, Union, Any
 from flask import current_app
+from sqlalchemy import select, update, delete
 from sqlalchemy.exc import SQLAlchemyError
 from flask_jwt_extended import current_user
 
-from models import Category, db, CategoryType
+from models import Category, Transaction, RecurringRule, db, CategoryType
 from services.base_service import BaseService
+from services.summary_service import SummaryService
+from services.data_version_service import DataVersionService
+from services.category_stats_service import CategoryStatsService
+from services.categorizer_service import CategorizerService
+from services.event_service import EventService
+from services.budget_line_service import BudgetLineService
+from services.archive_service import ArchiveService
 
 
 class CategoryService(BaseService):
@@ -15,9 +23,13 @@ class CategoryService(BaseService):
     """
 
     @staticmethod
-    def get_user_categories(user_id: int, type_filter: Optional[CategoryType] = None) -> Tuple[List[Dict], int]:
+    def get_user_categories(user_id: int, type_filter: Optional[CategoryType] = None,
+                            sort: Optional[str] = None) -> Tuple[List[Dict], int]:
         """
         Получение всех категорий пользователя с возможной фильтрацией по типу.
+        Счетчики использования хранятся в категориях, поэтому статистика
+        не требует дополнительных запросов.
+        sort: 'name', 'recent' (недавно использованные) или 'frequent' (частые).
         """
         try:
             query = Category.query.filter_by(user_id=user_id)
@@ -25,13 +37,24 @@ class CategoryService(BaseService):
             if type_filter:
                 query = query.filter_by(type=type_filter)
 
+            if sort == 'recent':
+                query = query.order_by(Category.last_used_on.is_(None),
+                                       Category.last_used_on.desc(), Category.name)
+            elif sort == 'frequent':
+                query = query.order_by(Category.transaction_count.desc(), Category.name)
+            elif sort == 'name':
+                query = query.order_by(Category.name)
+
             categories = query.all()
             result = [
                 {
                     'id': category.id,
                     'name': category.name,
                     'type': category.type.value,
-                    'user_id': category.user_id
+                    'user_id': category.user_id,
+                    'transaction_count': category.transaction_count or 0,
+                    'total_amount': float(category.total_amount or 0),
+                    'last_used_on': category.last_used_on.isoformat() if category.last_used_on else None
                 } for category in categories
             ]
 
@@ -170,7 +193,7 @@ class CategoryService(BaseService):
                 return {"error": "У вас нет прав на удаление этой категории"}, 403
 
             # Проверяем, есть ли транзакции, связанные с категорией
-            if category.transactions.count() > 0:
+            if category.transaction_count or ArchiveService.archived_categories([category_id]):
                 return {"error": "Категория не может быть удалена, так как с ней связаны транзакции"}, 400
 
             db.session.delete(category)
@@ -203,3 +226,252 @@ class CategoryService(BaseService):
             return {"error": "У вас нет прав на доступ к этой категории"}, 403
 
         return category, 200
+
+    @staticmethod
+    def _category_keys(user_id: int) -> Dict[Tuple[str, CategoryType], int]:
+        """Занятые пары (имя, тип) категорий пользователя: {(имя, тип): id}."""
+        return {(row.name, row.type): row.id for row in db.session.execute(
+            select(Category.id, Category.name, Category.type).where(Category.user_id == user_id))}
+
+    @staticmethod
+    def _prepare_category(item: Dict[str, Any], row: Optional[Dict[str, Any]],
+                          keys: Dict[Tuple[str, CategoryType], Any]) -> Tuple[Dict, int]:
+        """
+        Проверяет имя и тип категории для массовых операций. keys - занятые
+        пары (имя, тип), обновляется по мере обработки элементов пакета.
+        """
+        if row is None:
+            for field in ('name', 'type'):
+                if field not in item:
+                    return {"error": f"Отсутствует обязательное поле: {field}"}, 400
+
+        values = {}
+        if 'name' in item:
+            name = item['name'].strip() if isinstance(item['name'], str) else ''
+            if not name:
+                return {"error": "Имя категории не может быть пустым"}, 400
+            values['name'] = name
+        if 'type' in item:
+            try:
+                values['type'] = CategoryType(item['type'])
+            except ValueError:
+                return {"error": f"Неверный тип категории. Допустимые значения: {[t.value for t in CategoryType]}"}, 400
+            if row is not None and values['type'] != row['type'] and row['transaction_count']:
+                return {"error": "Нельзя изменить тип категории, с которой связаны транзакции"}, 400
+
+        merged = dict(row or {}, **values)
+        key = (merged['name'], merged['type'])
+        # У новой категории нет id: метка уникальна для каждого элемента
+        entity_id = row['id'] if row is not None else object()
+        if key in keys and keys[key] != entity_id:
+            return {"error": f"Категория с именем '{key[0]}' и типом '{key[1].value}' уже существует"}, 400
+        if row is not None:
+            keys.pop((row['name'], row['type']), None)
+        keys[key] = entity_id
+        return values, 200
+
+    @staticmethod
+    def bulk_create(user_id: int, items: List[Dict[str, Any]],
+                    atomic: bool = False) -> Tuple[Dict, int]:
+        """Массовое создание категорий; уникальность имен проверяется по одному запросу."""
+        keys = CategoryService._category_keys(user_id)
+        return BaseService.create_many(
+            Category, user_id, items,
+            lambda item: CategoryService._prepare_category(item, None, keys),
+            atomic=atomic)
+
+    @staticmethod
+    def bulk_update(user_id: int, items: List[Dict[str, Any]],
+                    atomic: bool = False) -> Tuple[Dict, int]:
+        """Массовое обновление категорий: элементы содержат id, name и/или type."""
+        keys = CategoryService._category_keys(user_id)
+        return BaseService.update_many(
+            Category, user_id, items,
+            lambda item, row: CategoryService._prepare_category(item, row, keys),
+            atomic=atomic)
+
+    @staticmethod
+    def bulk_delete(user_id: int, ids: List[int], atomic: bool = False) -> Tuple[Dict, int]:
+        """
+        Массовое удаление категорий. Категории с транзакциями (в том
+        числе архивными) или повторяющимися правилами не удаляются.
+        """
+        with_rules = set(db.session.execute(
+            select(RecurringRule.category_id).distinct().where(
+                RecurringRule.user_id == user_id)).scalars())
+        archived = ArchiveService.archived_categories(
+            [entity_id for entity_id in ids if isinstance(entity_id, int)] if isinstance(ids, list) else [])
+
+        def check(row):
+            if row['transaction_count'] or row['id'] in archived:
+                return {"error": "Категория не может быть удалена, так как с ней связаны транзакции"}, 400
+            if row['id'] in with_rules:
+                return {"error": "Категория не может быть удалена, так как с ней связаны повторяющиеся правила"}, 400
+            return {}, 200
+
+        # Строки бюджетов с удаленными категориями удаляются вместе с ними
+        return BaseService.delete_many(
+            Category, user_id, ids, check=check, atomic=atomic,
+            after_write=lambda _, old_rows, __: BudgetLineService.delete_for(
+                category_ids=[row['id'] for row in old_rows]))
+
+    @staticmethod
+    def _moved_months(user_id: int, source_ids: List[int],
+                      transaction_ids: Optional[List[int]] = None) -> set:
+        """(user_id, дата) перемещаемых транзакций для сброса помесячных итогов."""
+        query = select(Transaction.date).distinct().where(
+            Transaction.user_id == user_id, Transaction.category_id.in_(source_ids))
+        if transaction_ids is not None:
+            query = query.where(Transaction.id.in_(transaction_ids))
+        return {(user_id, day) for day in db.session.execute(query).scalars()}
+
+    @staticmethod
+    def _after_bulk_move(user_id: int, category_ids: List[int], months: set) -> None:
+        """
+        Обновляет производные данные после перемещения транзакций в обход
+        ORM: помесячные итоги и счетчики категорий.
+        """
+        SummaryService.invalidate(months)
+        CategoryStatsService.recalculate(category_ids)
+
+    @staticmethod
+    def merge_categories(source_id: int, target_id: int, user_id: int) -> Tuple[Dict, int]:
+        """
+        Слияние категорий: все транзакции и повторяющиеся правила source
+        переносятся в target одним UPDATE, строки бюджетов - на target
+        (с суммированием лимитов), затем source удаляется.
+        Типы категорий проверяются один раз; все изменения выполняются
+        в одной транзакции БД.
+        """
+        try:
+            if source_id == target_id:
+                return {"error": "Нельзя объединить категорию саму с собой"}, 400
+
+            categories = {category.id: category for category in Category.query.filter(
+                Category.id.in_([source_id, target_id])).all()}
+            for category_id in (source_id, target_id):
+                if category_id not in categories:
+                    return {"error": f"Категория {category_id} не найдена"}, 404
+                if categories[category_id].user_id != user_id:
+                    return {"error": "У вас нет прав на изменение этой категории"}, 403
+            source, target = categories[source_id], categories[target_id]
+            if source.type != target.type:
+                return {"error": "Можно объединять только категории одного типа"}, 400
+            # Архивы только для чтения: их строки нельзя перенести в target
+            if ArchiveService.archived_categories([source_id]):
+                return {"error": "Категория используется в архиве транзакций и не может быть объединена"}, 409
+
+            months = CategoryService._moved_months(user_id, [source_id])
+            # Новой версией данных отмечаются перенесенные транзакции
+            version = DataVersionService.bump([user_id])[user_id]
+            moved = db.session.execute(
+                update(Transaction).where(Transaction.category_id == source_id)
+                .values(category_id=target_id,
+                        **DataVersionService.sync_values(Transaction.__table__, version)),
+                execution_options={'synchronize_session': False}).rowcount
+            db.session.execute(
+                update(RecurringRule).where(RecurringRule.category_id == source_id)
+                .values(category_id=target_id),
+                execution_options={'synchronize_session': False})
+            BudgetLineService.merge_category(source_id, target_id)
+            db.session.execute(delete(Category).where(Category.id == source_id),
+                               execution_options={'synchronize_session': False})
+            DataVersionService.record_deletions(Category.__table__, user_id, [source_id], version)
+            EventService.record(user_id, Transaction.__tablename__, None, version)
+            EventService.record(user_id, Category.__tablename__, [source_id, target_id], version)
+            CategoryService._after_bulk_move(user_id, [target_id], months)
+            db.session.commit()
+
+            # Объекты сессии могли ссылаться на старую категорию
+            db.session.expire_all()
+            CategorizerService.invalidate([user_id])
+
+            return {
+                'message': "Категории объединены",
+                'source_id': source_id,
+                'target_id': target_id,
+                'moved_transactions': moved
+            }, 200
+
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Ошибка SQLAlchemy при объединении категорий: {str(e)}")
+            return {"error": "Ошибка базы данных при объединении категорий"}, 500
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Неожиданная ошибка при объединении категорий: {str(e)}")
+            return {"error": "Внутренняя ошибка сервера"}, 500
+
+    @staticmethod
+    def recategorize_transactions(target_id: int, user_id: int,
+                                  transaction_ids: Optional[List[int]] = None,
+                                  source_id: Optional[int] = None) -> Tuple[Dict, int]:
+        """
+        Перенос транзакций в категорию target одним UPDATE ... WHERE.
+        Переносятся указанные transaction_ids, все транзакции source_id
+        или их пересечение. Если хотя бы одна транзакция не найдена или
+        не подходит по типу, ничего не меняется.
+        """
+        try:
+            if transaction_ids is None and source_id is None:
+                return {"error": "Укажите transaction_ids или source_category_id"}, 400
+
+            target, status_code = CategoryService.get_category_with_check(target_id, user_id)
+            if status_code != 200:
+                return target, status_code
+
+            query = select(Transaction.id, Transaction.category_id, Transaction.type).where(
+                Transaction.user_id == user_id)
+            if transaction_ids is not None:
+                transaction_ids = sorted(set(transaction_ids))
+                query = query.where(Transaction.id.in_(transaction_ids))
+            if source_id is not None:
+                query = query.where(Transaction.category_id == source_id)
+            rows = db.session.execute(query).all()
+
+            if transaction_ids is not None:
+                missing = sorted(set(transaction_ids) - {row.id for row in rows})
+                if missing:
+                    return {"error": "Транзакции не найдены", "transaction_ids": missing}, 404
+            mismatched = [row.id for row in rows if row.type != target.type]
+            if mismatched:
+                return {"error": "Тип транзакций не совпадает с типом категории",
+                        "transaction_ids": mismatched}, 400
+
+            ids = [row.id for row in rows if row.category_id != target_id]
+            if not ids:
+                return {'message': "Нет транзакций для переноса", 'moved_transactions': 0}, 200
+            source_ids = sorted({row.category_id for row in rows if row.category_id != target_id})
+
+            months = CategoryService._moved_months(user_id, source_ids, ids)
+            version = DataVersionService.bump([user_id])[user_id]
+            db.session.execute(
+                update(Transaction).where(Transaction.id.in_(ids), Transaction.user_id == user_id)
+                .values(category_id=target_id,
+                        **DataVersionService.sync_values(Transaction.__table__, version)),
+                execution_options={'synchronize_session': False})
+            EventService.record(user_id, Transaction.__tablename__, ids, version)
+            CategoryService._after_bulk_move(user_id, source_ids + [target_id], months)
+            db.session.commit()
+
+            db.session.expire_all()
+            CategorizerService.invalidate([user_id])
+
+            return {
+                'message': "Транзакции перенесены",
+                'target_id': target_id,
+                'moved_transactions': len(ids)
+            }, 200
+
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Ошибка SQLAlchemy при переносе транзакций: {str(e)}")
+            return {"error": "Ошибка базы данных при переносе транзакций"}, 500
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Неожиданная ошибка при переносе транзакций: {str(e)}")
+            return {"error": "Внутренняя ошибка сервера"}, 500
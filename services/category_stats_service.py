@@ -0,0 +1,143 @@
+from typing import Dict, Iterable, Optional, Set, Tuple
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import event, inspect, select, func, case, or_
+
+from models import Category, Transaction, db, BASE_CURRENCY
+from services.currency_service import ExchangeRateService, converted_amount, join_rates
+from services.archive_service import transaction_table
+
+
+class CategoryStatsService:
+    """
+    Счетчики использования категорий: число транзакций, сумма за все
+    время в базовой валюте и дата последнего использования. Хранятся
+    в самих категориях и обновляются в той же транзакции БД, что и
+    изменения транзакций, поэтому список категорий со статистикой
+    читается одним запросом.
+    """
+
+    @staticmethod
+    def apply_deltas(deltas: Dict[int, Tuple[int, Decimal, Optional[date]]],
+                     connection=None) -> None:
+        """
+        Прибавляет к счетчикам категорий (число, сумма, последняя дата).
+        Дата последнего использования может только увеличиться.
+        """
+        executor = connection if connection is not None else db.session
+        categories = Category.__table__
+        for category_id, (count, amount, last_date) in deltas.items():
+            values = {
+                'transaction_count': func.coalesce(categories.c.transaction_count, 0) + count,
+                'total_amount': func.coalesce(categories.c.total_amount, 0) + amount
+            }
+            if last_date is not None:
+                values['last_used_on'] = case(
+                    (or_(categories.c.last_used_on.is_(None),
+                         categories.c.last_used_on < last_date), last_date),
+                    else_=categories.c.last_used_on)
+            executor.execute(categories.update().where(
+                categories.c.id == category_id).values(**values))
+
+    @staticmethod
+    def recalculate(category_ids: Optional[Iterable[int]] = None, fields=None,
+                    connection=None) -> None:
+        """
+        Пересчитывает счетчики по транзакциям одним UPDATE с
+        коррелированными подзапросами (все категории, если category_ids
+        не задан). Нужно вызывать после массовых изменений в обход ORM.
+        fields ограничивает набор пересчитываемых колонок. Архивные
+        транзакции учитываются: категория с ними не считается пустой.
+        """
+        executor = connection if connection is not None else db.session
+        categories = Category.__table__
+        transactions = transaction_table(connection)
+        related = transactions.c.category_id == categories.c.id
+        base_amount, rates = converted_amount(table=transactions)
+        values = {
+            'transaction_count': select(func.count(transactions.c.id))
+            .where(related).scalar_subquery(),
+            'total_amount': join_rates(
+                select(func.coalesce(func.sum(base_amount), 0)).select_from(transactions), rates)
+            .where(related).scalar_subquery(),
+            'last_used_on': select(func.max(transactions.c.date))
+            .where(related).scalar_subquery()
+        }
+        if fields:
+            values = {name: value for name, value in values.items() if name in fields}
+
+        statement = categories.update().values(**values)
+        if category_ids is not None:
+            category_ids = sorted(set(category_ids))
+            if not category_ids:
+                return
+            statement = statement.where(categories.c.id.in_(category_ids))
+        executor.execute(statement)
+
+
+def _old_value(obj, name):
+    """Значение атрибута до изменения в текущем flush."""
+    history = inspect(obj).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, name)
+
+
+def _collect_deltas(session) -> Tuple[Dict[int, list], Set[int]]:
+    """
+    Изменения счетчиков по категориям и категории, из которых
+    транзакции ушли (для них последняя дата пересчитывается).
+    Суммы в другой валюте переводятся в базовую по кэшу курсов.
+    """
+    deltas: Dict[int, list] = {}
+    removed: Set[int] = set()
+
+    def add(category_id, amount, transaction_date, sign, currency=BASE_CURRENCY):
+        if category_id is None:
+            return
+        delta = deltas.setdefault(category_id, [0, Decimal('0.00'), None])
+        delta[0] += sign
+        if amount is not None and currency not in (None, BASE_CURRENCY):
+            amount = ExchangeRateService.to_base(amount, currency, transaction_date,
+                                                 session.connection())
+        if amount is not None:
+            delta[1] += Decimal(str(amount)) * sign
+        if sign > 0 and transaction_date is not None:
+            delta[2] = max(delta[2] or transaction_date, transaction_date)
+        if sign < 0:
+            removed.add(category_id)
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            add(obj.category_id, obj.amount, obj.date, 1, obj.currency)
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            add(_old_value(obj, 'category_id'), _old_value(obj, 'amount'),
+                _old_value(obj, 'date'), -1, _old_value(obj, 'currency'))
+    for obj in session.dirty:
+        if not isinstance(obj, Transaction):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[name].history.has_changes()
+                   for name in ('category_id', 'amount', 'date', 'currency')):
+            continue
+        add(_old_value(obj, 'category_id'), _old_value(obj, 'amount'),
+            _old_value(obj, 'date'), -1, _old_value(obj, 'currency'))
+        add(obj.category_id, obj.amount, obj.date, 1, obj.currency)
+    return deltas, removed
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_category_stats(session, flush_context):
+    """Обновляет счетчики категорий транзакций, измененных при flush."""
+    deltas, removed = _collect_deltas(session)
+    if not deltas:
+        return
+    connection = session.connection()
+    CategoryStatsService.apply_deltas(
+        {category_id: tuple(delta) for category_id, delta in deltas.items()
+         if delta[0] or delta[1] or delta[2]},
+        connection=connection)
+    if removed:
+        CategoryStatsService.recalculate(removed, fields=('last_used_on',),
+                                         connection=connection)
@@ -0,0 +1,143 @@
+import bisect
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from flask import current_app
+from sqlalchemy import select, func, case, and_
+from sqlalchemy.orm import aliased
+
+from models import ExchangeRate, Transaction, BASE_CURRENCY, db
+
+# Сколько секунд курсы валюты живут в кэше процесса (курсы, загруженные
+# другим процессом, становятся видны не позже чем через это время)
+RATE_CACHE_TTL = 300.0
+
+RateJoin = Tuple[Any, Any]
+
+
+def normalize_currency(value: Any) -> Tuple[Optional[str], Optional[str]]:
+    """Код валюты ISO 4217 в верхнем регистре: (код, None) или (None, ошибка)."""
+    code = str(value or '').strip().upper()
+    if len(code) != 3 or not code.isalpha():
+        return None, "Код валюты должен состоять из трех букв (ISO 4217)"
+    return code, None
+
+
+def rate_join(currency, on_date, name: Optional[str] = None) -> RateJoin:
+    """
+    Условие LEFT JOIN курса валюты на дату: строка exchange_rates с
+    последней датой не позже on_date (поиск по индексу currency, date).
+    """
+    rate = aliased(ExchangeRate, name=name)
+    latest = select(func.max(ExchangeRate.date)).where(
+        ExchangeRate.currency == currency,
+        ExchangeRate.date <= on_date
+    ).correlate_except(ExchangeRate).scalar_subquery()
+    return rate, and_(rate.currency == currency, rate.date == latest)
+
+
+def converted_amount(currency: Any = BASE_CURRENCY, table=Transaction) -> Tuple[Any, List[RateJoin]]:
+    """
+    SQL-выражение суммы транзакции в валюте currency по курсам на дату
+    транзакции и список соединений с курсами для запроса (join_rates).
+    currency - код валюты или столбец (например, Budget.currency), если
+    валюта своя у каждой строки запроса.
+    table - модель Transaction или ее таблица для запросов Core.
+    Без курса на дату сумма - NULL и в агрегат не попадает.
+    """
+    columns = getattr(table, 'c', table)
+    rate, on_rate = rate_join(columns.currency, columns.date, 'transaction_rate')
+    amount = case((columns.currency == BASE_CURRENCY, columns.amount),
+                  else_=columns.amount * rate.rate)
+    joins = [(rate, on_rate)]
+    if not isinstance(currency, str):
+        target, on_target = rate_join(currency, columns.date, 'target_rate')
+        amount = case((columns.currency == currency, columns.amount),
+                      (currency == BASE_CURRENCY, amount),
+                      else_=amount / target.rate)
+        joins.append((target, on_target))
+    elif currency != BASE_CURRENCY:
+        target, on_target = rate_join(currency, columns.date, 'target_rate')
+        amount = case((columns.currency == currency, columns.amount),
+                      else_=amount / target.rate)
+        joins.append((target, on_target))
+    return amount, joins
+
+
+def join_rates(query, joins: List[RateJoin]):
+    """Добавляет к запросу соединения с курсами из converted_amount."""
+    for rate, on_rate in joins:
+        query = query.outerjoin(rate, on_rate)
+    return query
+
+
+class ExchangeRateService:
+    """
+    Курсы валют к базовой валюте по датам.
+    Отчеты и итоги пересчитывают суммы в SQL через соединение с
+    exchange_rates; для операций с одной транзакцией курсы читаются
+    из кэша процесса (весь ряд валюты одним запросом). Кэш хранится
+    в app.extensions, поэтому у каждого приложения он свой.
+    """
+
+    @staticmethod
+    def _cache() -> Dict[str, Any]:
+        cache = current_app.extensions.get('exchange_rates')
+        if cache is None:
+            cache = current_app.extensions.setdefault(
+                'exchange_rates', {'lock': threading.Lock(), 'series': {}})
+        return cache
+
+    @staticmethod
+    def _series(currency: str, connection=None) -> Tuple[List[date], List[Decimal]]:
+        cache = ExchangeRateService._cache()
+        now = time.monotonic()
+        cached = cache['series'].get(currency)
+        if cached is not None and now - cached[0] < RATE_CACHE_TTL:
+            return cached[1], cached[2]
+        executor = connection if connection is not None else db.session
+        rows = executor.execute(
+            select(ExchangeRate.date, ExchangeRate.rate)
+            .where(ExchangeRate.currency == currency)
+            .order_by(ExchangeRate.date)).all()
+        dates, rates = [row.date for row in rows], [row.rate for row in rows]
+        with cache['lock']:
+            cache['series'][currency] = (now, dates, rates)
+        return dates, rates
+
+    @staticmethod
+    def get_rate(currency: str, on_date: date, connection=None) -> Optional[Decimal]:
+        """Курс валюты к базовой на дату (последний известный) или None."""
+        if currency == BASE_CURRENCY:
+            return Decimal('1')
+        dates, rates = ExchangeRateService._series(currency, connection)
+        index = bisect.bisect_right(dates, on_date)
+        return rates[index - 1] if index else None
+
+    @staticmethod
+    def to_base(amount: Decimal, currency: str, on_date: date,
+                connection=None) -> Optional[Decimal]:
+        """Сумма в базовой валюте по курсу на дату или None без курса."""
+        rate = ExchangeRateService.get_rate(currency, on_date, connection)
+        if rate is None:
+            return None
+        return (Decimal(amount) * rate).quantize(Decimal('0.01'))
+
+    @staticmethod
+    def check_currency(value: Any, on_date: date) -> Tuple[Optional[str], Optional[str]]:
+        """Код валюты, для которой известен курс на дату: (код, None) или (None, ошибка)."""
+        currency, error = normalize_currency(value)
+        if error:
+            return None, error
+        if ExchangeRateService.get_rate(currency, on_date) is None:
+            return None, f"Нет курса {currency} на {on_date.isoformat()}"
+        return currency, None
+
+    @staticmethod
+    def invalidate() -> None:
+        """Сбрасывает кэш курсов приложения."""
+        cache = ExchangeRateService._cache()
+        with cache['lock']:
+            cache['series'].clear()
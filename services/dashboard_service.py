@@ -0,0 +1,189 @@
+from typing import Dict, List, Tuple
+from datetime import date, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import func
+
+from models import Budget, Category, Transaction, db, CategoryType, BASE_CURRENCY
+from services.summary_service import month_start, next_month
+from services.currency_service import ExchangeRateService, converted_amount, join_rates
+from services.archive_service import transaction_source
+from services.recurring_service import RecurringService, RecurringForecast
+
+
+class DashboardService:
+    """
+    Сервис главной страницы.
+    Собирает сводку за текущий месяц, активные бюджеты, последние
+    транзакции и категории за несколько общих запросов вместо
+    отдельных вызовов API.
+    """
+
+    @staticmethod
+    def get_dashboard(user_id: int, transactions_limit: int = 10) -> Tuple[Dict, int]:
+        """
+        Данные главной страницы пользователя.
+
+        Одна сгруппированная выборка по (дата, тип, категория) за окно,
+        покрывающее текущий месяц и все активные бюджеты, служит и для
+        сводки, и для прогресса бюджетов. Категории загружаются один раз
+        и используются для подписей транзакций и разбивки расходов.
+        """
+        try:
+            today = date.today()
+            month_first = month_start(today)
+            month_last = next_month(today) - timedelta(days=1)
+
+            # 1. Категории пользователя
+            categories = Category.query.filter_by(user_id=user_id).order_by(
+                Category.type, Category.name).all()
+            category_names = {category.id: category.name for category in categories}
+
+            # 2. Активные бюджеты
+            budgets = Budget.query.filter(
+                Budget.user_id == user_id,
+                Budget.start_date <= today,
+                Budget.end_date >= today
+            ).order_by(Budget.start_date.desc()).all()
+
+            # 3. Общая агрегатная выборка за окно месяца и бюджетов
+            window_start = min([month_first] + [b.start_date for b in budgets])
+            window_end = max([month_last] + [b.end_date for b in budgets])
+            # Суммы в базовой валюте: пересчет в агрегате через курсы
+            source = transaction_source(window_start, window_end)
+            base_amount, rates = converted_amount(table=source)
+            rows = join_rates(db.session.query(
+                source.date, source.type, source.category_id,
+                func.sum(base_amount)
+            ).select_from(source), rates).filter(
+                source.user_id == user_id,
+                source.date >= window_start,
+                source.date <= window_end
+            ).group_by(source.date, source.type, source.category_id).all()
+
+            # Ожидаемые повторяющиеся транзакции до конца бюджетов
+            forecast = RecurringService.forecast(user_id, today, window_end)
+
+            # 4. Последние транзакции без подгрузки категорий
+            recent = Transaction.query.filter_by(user_id=user_id).order_by(
+                Transaction.date.desc(), Transaction.id.desc()
+            ).limit(transactions_limit).all()
+
+            return {
+                'summary': DashboardService._build_summary(
+                    rows, month_first, month_last, category_names),
+                'budgets': [DashboardService._build_budget(budget, rows, forecast, today)
+                            for budget in budgets],
+                'recent_transactions': [
+                    {
+                        'id': transaction.id,
+                        'description': transaction.description,
+                        'amount': float(transaction.amount),
+                        'date': transaction.date.isoformat(),
+                        'type': transaction.type.value,
+                        'category_id': transaction.category_id,
+                        'category_name': category_names.get(transaction.category_id)
+                    } for transaction in recent
+                ],
+                'categories': [
+                    {
+                        'id': category.id,
+                        'name': category.name,
+                        'type': category.type.value,
+                        'user_id': category.user_id
+                    } for category in categories
+                ]
+            }, 200
+
+        except Exception as e:
+            current_app.logger.error(
+                f"Ошибка при получении данных главной страницы: {str(e)}")
+            return {"error": "Ошибка при получении данных главной страницы"}, 500
+
+    @staticmethod
+    def _build_summary(rows: List, start_date: date, end_date: date,
+                       category_names: Dict[int, str]) -> Dict:
+        """Сводка за период из сгруппированных по дням сумм."""
+        income = Decimal('0.00')
+        expense = Decimal('0.00')
+        by_category: Dict[int, Decimal] = {}
+        for day, transaction_type, category_id, amount in rows:
+            if not start_date <= day <= end_date:
+                continue
+            amount = amount or Decimal('0.00')
+            if transaction_type == CategoryType.INCOME:
+                income += amount
+            else:
+                expense += amount
+                by_category[category_id] = by_category.get(
+                    category_id, Decimal('0.00')) + amount
+
+        return {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'total_income': float(income),
+            'total_expense': float(expense),
+            'net_total': float(income - expense),
+            'expenses_by_category': [
+                {
+                    'category_id': category_id,
+                    'category_name': category_names.get(category_id),
+                    'total_amount': float(amount)
+                } for category_id, amount in sorted(
+                    by_category.items(), key=lambda item: item[1], reverse=True)
+            ]
+        }
+
+    @staticmethod
+    def _build_budget(budget: Budget, rows: List, forecast: RecurringForecast,
+                      today: date) -> Dict:
+        """
+        Бюджет со статистикой и прогрессом в формате BudgetService
+        и прогнозом с учетом ожидаемых повторяющихся расходов.
+        Дневные суммы в базовой валюте переводятся в валюту бюджета
+        по курсу дня из кэша курсов.
+        """
+        def in_budget_currency(amount, day: date) -> Decimal:
+            amount = Decimal(str(amount or 0))
+            if budget.currency == BASE_CURRENCY:
+                return amount
+            rate = ExchangeRateService.get_rate(budget.currency, day)
+            return (amount / rate).quantize(Decimal('0.01')) if rate else Decimal('0.00')
+
+        income = Decimal('0.00')
+        expense = Decimal('0.00')
+        for day, transaction_type, _, amount in rows:
+            if budget.start_date <= day <= budget.end_date:
+                if transaction_type == CategoryType.INCOME:
+                    income += in_budget_currency(amount, day)
+                else:
+                    expense += in_budget_currency(amount, day)
+
+        budget_data = {
+            'id': budget.id,
+            'name': budget.name,
+            'period': budget.period.value,
+            'start_date': budget.start_date.isoformat(),
+            'end_date': budget.end_date.isoformat(),
+            'target_amount': float(budget.target_amount) if budget.target_amount else None,
+            'currency': budget.currency,
+            'statistics': {
+                'income': float(income),
+                'expense': float(expense),
+                'balance': float(income - expense)
+            }
+        }
+        expected = in_budget_currency(
+            forecast.totals(max(today, budget.start_date), budget.end_date)['expense'], today)
+        budget_data['projection'] = {
+            'expected_expense': float(expected),
+            'projected_expense': float(expense + expected)
+        }
+        if budget.target_amount:
+            budget_data['progress'] = {
+                'percentage': round(float(expense) / float(budget.target_amount) * 100, 2),
+                'remaining': float(budget.target_amount) - float(expense)
+            }
+            budget_data['projection']['percentage'] = round(
+                float(expense + expected) / float(budget.target_amount) * 100, 2)
+        return budget_data
@@ -0,0 +1,118 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime
+from sqlalchemy import event, insert, select
+
+from models import User, Transaction, Category, Budget, BudgetLine, RecurringRule, DeletedRecord, db
+
+# Модели, изменение которых меняет версию данных владельца
+TRACKED_MODELS = (Transaction, Category, Budget, BudgetLine, RecurringRule)
+# Модели, строки которых отдаются клиентам через /sync: изменения
+# отмечаются версией данных (change_seq), удаления - в deleted_records
+SYNC_MODELS = (Transaction, Category, Budget)
+
+
+class DataVersionService:
+    """
+    Сервис версии данных пользователя.
+    Версия увеличивается при каждом flush, затронувшем транзакции,
+    категории, бюджеты (и их строки) или повторяющиеся правила пользователя,
+    и служит основой для ETag. Измененные строки синхронизируемых
+    таблиц получают эту версию в change_seq.
+    """
+
+    @staticmethod
+    def bump(user_ids: Iterable[int], connection=None) -> Dict[int, int]:
+        """
+        Увеличивает версию данных пользователей и возвращает новые версии.
+        Нужно вызывать после массовых UPDATE/DELETE в обход ORM.
+        """
+        user_ids = sorted(set(user_ids))
+        if not user_ids:
+            return {}
+        executor = connection if connection is not None else db.session
+        users = User.__table__
+        statement = users.update().where(users.c.id.in_(user_ids)).values(
+            data_version=users.c.data_version + 1,
+            data_updated_at=datetime.utcnow()
+        )
+        dialect = (connection if connection is not None else db.session.connection()).dialect
+        if dialect.update_returning:
+            rows = executor.execute(statement.returning(users.c.id, users.c.data_version))
+        else:
+            # Без UPDATE ... RETURNING (MySQL) новые версии читаются в той же
+            # транзакции: UPDATE заблокировал строки до ее завершения
+            executor.execute(statement)
+            rows = executor.execute(select(users.c.id, users.c.data_version).where(
+                users.c.id.in_(user_ids)))
+        return {row.id: row.data_version for row in rows}
+
+    @staticmethod
+    def sync_values(table, version: int) -> Dict[str, Any]:
+        """
+        Значения колонок синхронизации для записи строк в обход ORM
+        (пустой словарь, если таблица не синхронизируется).
+        """
+        if 'change_seq' not in table.c:
+            return {}
+        return {'change_seq': version, 'updated_at': datetime.utcnow()}
+
+    @staticmethod
+    def record_deletions(table, user_id: int, ids: List[int], version: int,
+                         connection=None) -> None:
+        """Записывает отметки об удалении строк в обход ORM."""
+        if 'change_seq' not in table.c or not ids:
+            return
+        executor = connection if connection is not None else db.session
+        executor.execute(insert(DeletedRecord.__table__), [
+            {'user_id': user_id, 'table_name': table.name, 'record_id': record_id,
+             'change_seq': version, 'deleted_at': datetime.utcnow()}
+            for record_id in ids
+        ])
+
+    @staticmethod
+    def get_version(user_id: int) -> Tuple[int, Optional[datetime]]:
+        """Текущая версия данных пользователя и время ее изменения."""
+        row = db.session.query(User.data_version, User.data_updated_at).filter(
+            User.id == user_id).first()
+        if row is None:
+            return 0, None
+        return row.data_version or 0, row.data_updated_at
+
+
+def _changed_objects(session) -> Tuple[List, List]:
+    """Измененные (новые и обновленные) и удаляемые отслеживаемые объекты сессии."""
+    changed = [obj for obj in session.new
+               if isinstance(obj, TRACKED_MODELS) and obj.user_id is not None]
+    changed += [obj for obj in session.dirty
+                if isinstance(obj, TRACKED_MODELS) and obj.user_id is not None
+                and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted
+               if isinstance(obj, TRACKED_MODELS) and obj.user_id is not None]
+    return changed, deleted
+
+
+@event.listens_for(db.session, 'before_flush')
+def _bump_changed_owners(session, flush_context, instances):
+    """
+    Увеличивает версию данных владельцев объектов, изменяемых при flush,
+    отмечает ею измененные строки и записывает отметки об удалениях.
+    """
+    changed, deleted = _changed_objects(session)
+    user_ids: Set[int] = {obj.user_id for obj in changed + deleted}
+    if not user_ids:
+        return
+    versions = DataVersionService.bump(user_ids, connection=session.connection())
+
+    now = datetime.utcnow()
+    for obj in changed:
+        if isinstance(obj, SYNC_MODELS):
+            obj.change_seq = versions[obj.user_id]
+            obj.updated_at = now
+    # Данные удаляемых пользователей отметок не требуют
+    removed_users = {obj.id for obj in session.deleted if isinstance(obj, User)}
+    for obj in deleted:
+        if isinstance(obj, SYNC_MODELS) and obj.id is not None \
+                and obj.user_id not in removed_users:
+            session.add(DeletedRecord(user_id=obj.user_id, table_name=obj.__tablename__,
+                                      record_id=obj.id, change_seq=versions[obj.user_id],
+                                      deleted_at=now))
@@ -0,0 +1,110 @@
+import hashlib
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional, Set, Tuple
+from datetime import date
+from sqlalchemy import event, select, update, bindparam
+
+from models import Transaction, db, BASE_CURRENCY
+from services.search_service import TOKEN_PATTERN
+
+# Сколько строк пересчитывается за один пакетный UPDATE
+BACKFILL_BATCH = 1000
+
+
+def normalize_description(description: Optional[str]) -> str:
+    """Описание без регистра, пунктуации и лишних пробелов."""
+    return ' '.join(TOKEN_PATTERN.findall((description or '').lower()))
+
+
+def transaction_fingerprint(user_id: int, transaction_date: date, amount: Any,
+                            currency: Optional[str], description: Optional[str]) -> str:
+    """
+    Отпечаток содержимого транзакции: хеш пользователя, даты, суммы,
+    валюты и нормализованного описания. Одинаковые строки выписок дают
+    одинаковый отпечаток независимо от регистра и пунктуации, а 100 USD
+    и 100 RUB за один день - разные.
+    """
+    amount = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+    key = '|'.join((str(user_id), transaction_date.isoformat(),
+                    str(amount.quantize(Decimal('0.01'))),
+                    (currency or BASE_CURRENCY).upper(),
+                    normalize_description(description)))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class DedupService:
+    """
+    Поиск дубликатов при импорте по отпечаткам содержимого.
+    Отпечатки существующих транзакций за период импорта читаются
+    одним запросом по диапазону дат; дальше проверка идет в памяти.
+    """
+
+    @staticmethod
+    def find_duplicates(user_id: int,
+                        rows: List[Tuple[date, Any, str, Optional[str]]]) -> Set[int]:
+        """
+        Индексы строк (дата, сумма, валюта, описание), которые уже есть в базе.
+        Учитывается количество: если одинаковая строка сохранена один
+        раз, а в импорте встречается дважды, дубликатом считается одна.
+        """
+        if not rows:
+            return set()
+
+        dates = [row[0] for row in rows]
+        existing = Counter()
+        for fingerprint, transaction_date, amount, currency, description in db.session.execute(
+            select(Transaction.fingerprint, Transaction.date, Transaction.amount,
+                   Transaction.currency, Transaction.description).where(
+                Transaction.user_id == user_id,
+                Transaction.date >= min(dates),
+                Transaction.date <= max(dates)
+            )
+        ):
+            # Строки, добавленные в обход ORM, могут быть без отпечатка
+            existing[fingerprint or transaction_fingerprint(
+                user_id, transaction_date, amount, currency, description)] += 1
+
+        duplicates = set()
+        for index, (transaction_date, amount, currency, description) in enumerate(rows):
+            fingerprint = transaction_fingerprint(
+                user_id, transaction_date, amount, currency, description)
+            if existing[fingerprint] > 0:
+                existing[fingerprint] -= 1
+                duplicates.add(index)
+        return duplicates
+
+    @staticmethod
+    def backfill_fingerprints(connection) -> int:
+        """
+        Заполняет отсутствующие отпечатки пакетными UPDATE.
+        Нужно вызывать после вставок и изменений в обход ORM.
+        Возвращает число обновленных строк.
+        """
+        table = Transaction.__table__
+        statement = update(table).where(table.c.id == bindparam('row_id')).values(
+            fingerprint=bindparam('row_fingerprint'))
+        updated = 0
+        while True:
+            rows = connection.execute(
+                select(table.c.id, table.c.user_id, table.c.date, table.c.amount,
+                       table.c.currency, table.c.description)
+                .where(table.c.fingerprint.is_(None))
+                .limit(BACKFILL_BATCH)).all()
+            if not rows:
+                return updated
+            connection.execute(statement, [
+                {'row_id': row.id, 'row_fingerprint': transaction_fingerprint(
+                    row.user_id, row.date, row.amount, row.currency, row.description)}
+                for row in rows
+            ])
+            updated += len(rows)
+
+
+@event.listens_for(Transaction, 'before_insert')
+@event.listens_for(Transaction, 'before_update')
+def _set_fingerprint(mapper, connection, target):
+    """Отпечаток пересчитывается при каждой записи транзакции через ORM."""
+    if target.user_id is not None and target.date is not None and target.amount is not None:
+        target.fingerprint = transaction_fingerprint(
+            target.user_id, target.date, target.amount, target.currency, target.description)
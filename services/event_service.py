@@ -0,0 +1,263 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert, select, delete
+
+from models import User, ChangeEvent, db
+from services.data_version_service import TRACKED_MODELS
+
+# Больше строк одной таблицы в одном flush - событие без списка id
+MAX_EVENT_IDS = 100
+# Размер очереди подписчика: медленный клиент получает resync вместо потока
+SUBSCRIBER_QUEUE_SIZE = 1000
+DEFAULT_POLL_INTERVAL = 1.0
+# Интервал комментариев keepalive в SSE-потоке, секунд
+DEFAULT_HEARTBEAT = 15.0
+# Сколько SSE-подключений держит один процесс (0 - без предела)
+DEFAULT_MAX_STREAMS = 0
+# Сколько хранить события в таблице и как часто удалять старые
+EVENT_RETENTION = timedelta(minutes=10)
+PRUNE_INTERVAL = 60.0
+POLL_BATCH = 1000
+
+
+def process_origin() -> str:
+    """
+    Метка процесса: свои события он доставляет сразу после коммита,
+    из таблицы change_events читает только события других процессов.
+    Вычисляется при вызове, чтобы воркеры после fork различались.
+    """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class ChangeBroker:
+    """
+    Внутрипроцессная рассылка событий: у каждого SSE-подключения своя
+    очередь, события пользователя кладутся во все его очереди.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[queue.Queue]] = {}
+        self._lock = threading.Lock()
+        self.poller: Optional[threading.Thread] = None
+
+    def subscribe(self, user_id: int, limit: int = 0) -> Optional[queue.Queue]:
+        """Очередь нового подписчика или None, если подписчиков уже limit (0 - без предела)."""
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            if limit and sum(len(items) for items in self._subscribers.values()) >= limit:
+                return None
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id: int, subscriber: queue.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def has_subscribers(self, user_id: Optional[int] = None) -> bool:
+        with self._lock:
+            if user_id is None:
+                return bool(self._subscribers)
+            return user_id in self._subscribers
+
+    def publish(self, user_id: int, payload: Dict[str, Any]) -> None:
+        """Кладет событие в очереди подписчиков пользователя."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(payload)
+            except queue.Full:
+                # Клиент не успевает читать: пропущенное заменяет resync
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait({'type': 'resync', 'version': payload.get('version')})
+
+    def start_poller(self, app, interval: float) -> None:
+        """Запускает поток чтения событий других процессов, если он не запущен."""
+        with self._lock:
+            if self.poller is not None and self.poller.is_alive():
+                return
+            self.poller = threading.Thread(target=_poll_loop, args=(app, self, interval),
+                                           name='change-events-poller', daemon=True)
+            self.poller.start()
+
+    def keep_polling(self) -> bool:
+        """Поток чтения работает, пока есть подписчики; иначе завершается."""
+        with self._lock:
+            if self._subscribers:
+                return True
+            self.poller = None
+            return False
+
+
+def get_broker(app=None) -> ChangeBroker:
+    """Брокер приложения (один на процесс и приложение)."""
+    app = app or current_app._get_current_object()
+    return app.extensions.setdefault('change_broker', ChangeBroker())
+
+
+def _event_payload(user_id: int, table_name: str, record_ids: Optional[List[int]],
+                   version: int) -> Dict[str, Any]:
+    return {'type': 'change', 'user_id': user_id, 'table': table_name,
+            'ids': record_ids, 'version': version}
+
+
+class EventService:
+    """
+    Уведомления об изменениях данных пользователя для SSE.
+    События записываются в change_events в той же транзакции, что и
+    изменения; после коммита процесс сразу рассылает их своим
+    подписчикам, а другие процессы читают их из таблицы.
+    """
+
+    _last_prune = 0.0
+
+    @staticmethod
+    def record(user_id: int, table_name: str, record_ids: Optional[Iterable[int]],
+               version: int, connection=None, session=None) -> None:
+        """
+        Записывает событие об изменении строк таблицы. Нужно вызывать
+        после записи в обход ORM; record_ids=None - "много строк".
+        """
+        EventService.record_many([(user_id, table_name, record_ids, version)],
+                                 connection=connection, session=session)
+
+    @staticmethod
+    def record_many(events: List[Tuple[int, str, Optional[Iterable[int]], int]],
+                    connection=None, session=None) -> None:
+        session = session if session is not None else db.session
+        executor = connection if connection is not None else session
+        payloads = []
+        for user_id, table_name, record_ids, version in events:
+            record_ids = sorted(set(record_ids)) if record_ids is not None else None
+            if record_ids is not None and len(record_ids) > MAX_EVENT_IDS:
+                record_ids = None
+            payloads.append(_event_payload(user_id, table_name, record_ids, version))
+        if not payloads:
+            return
+
+        now = datetime.utcnow()
+        executor.execute(insert(ChangeEvent.__table__), [
+            {'user_id': payload['user_id'], 'table_name': payload['table'],
+             'record_ids': json.dumps(payload['ids']) if payload['ids'] is not None else None,
+             'version': payload['version'], 'origin': process_origin(), 'created_at': now}
+            for payload in payloads
+        ])
+        # Старые события удаляются не чаще раза в PRUNE_INTERVAL
+        if time.monotonic() - EventService._last_prune > PRUNE_INTERVAL:
+            EventService._last_prune = time.monotonic()
+            executor.execute(delete(ChangeEvent.__table__).where(
+                ChangeEvent.created_at < now - EVENT_RETENTION))
+        session.info.setdefault('change_events', []).extend(payloads)
+
+    @staticmethod
+    def last_event_id() -> int:
+        return db.session.execute(select(ChangeEvent.id).order_by(
+            ChangeEvent.id.desc()).limit(1)).scalar() or 0
+
+    @staticmethod
+    def poll(broker: ChangeBroker, last_id: int) -> int:
+        """
+        Рассылает подписчикам процесса события других процессов,
+        записанные после last_id. Возвращает id последнего события.
+        """
+        origin = process_origin()
+        rows = db.session.execute(
+            select(ChangeEvent).where(ChangeEvent.id > last_id)
+            .order_by(ChangeEvent.id).limit(POLL_BATCH)).scalars().all()
+        for row in rows:
+            if row.origin != origin and broker.has_subscribers(row.user_id):
+                broker.publish(row.user_id, _event_payload(
+                    row.user_id, row.table_name,
+                    json.loads(row.record_ids) if row.record_ids else None, row.version))
+        # Транзакция чтения не должна держать снимок БД между опросами
+        db.session.rollback()
+        return rows[-1].id if rows else last_id
+
+    @staticmethod
+    def subscribe(user_id: int) -> Optional[queue.Queue]:
+        """
+        Подписывает SSE-подключение на события пользователя и при
+        необходимости запускает чтение событий других процессов.
+        Каждый поток занимает поток воркера, поэтому подключений в процессе
+        не больше EVENTS_MAX_STREAMS; сверх предела возвращается None.
+        """
+        app = current_app._get_current_object()
+        broker = get_broker(app)
+        subscriber = broker.subscribe(
+            user_id, app.config.get('EVENTS_MAX_STREAMS', DEFAULT_MAX_STREAMS))
+        if subscriber is None:
+            return None
+        interval = app.config.get('EVENTS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        if interval:
+            broker.start_poller(app, interval)
+        return subscriber
+
+    @staticmethod
+    def unsubscribe(user_id: int, subscriber: queue.Queue, app=None) -> None:
+        get_broker(app).unsubscribe(user_id, subscriber)
+
+
+def _poll_loop(app, broker: ChangeBroker, interval: float) -> None:
+    """Поток чтения change_events; работает, пока в процессе есть подписчики."""
+    with app.app_context():
+        try:
+            last_id = EventService.last_event_id()
+            while broker.keep_polling():
+                time.sleep(interval)
+                try:
+                    last_id = EventService.poll(broker, last_id)
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Ошибка чтения событий изменений: {str(e)}")
+        finally:
+            db.session.remove()
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_changes(session, flush_context):
+    """Записывает события об изменениях отслеживаемых строк в том же flush."""
+    objects = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty
+        if isinstance(obj, TRACKED_MODELS) and session.is_modified(obj)]
+    changed: Dict[Tuple[int, str], Set[int]] = {}
+    for obj in objects:
+        if isinstance(obj, TRACKED_MODELS) and obj.user_id is not None and obj.id is not None:
+            changed.setdefault((obj.user_id, obj.__tablename__), set()).add(obj.id)
+    if not changed:
+        return
+
+    connection = session.connection()
+    user_ids = sorted({user_id for user_id, _ in changed})
+    versions = dict(connection.execute(
+        select(User.id, User.data_version).where(User.id.in_(user_ids))).all())
+    EventService.record_many(
+        [(user_id, table_name, ids, versions.get(user_id, 0))
+         for (user_id, table_name), ids in sorted(changed.items())],
+        connection=connection, session=session)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_changes(session):
+    payloads = session.info.pop('change_events', None)
+    if not payloads or not has_app_context():
+        return
+    broker = get_broker()
+    for payload in payloads:
+        broker.publish(payload['user_id'], payload)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('change_events', None)
@@ -0,0 +1,150 @@
+from typing import Dict, Iterable, Optional
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import func
+
+from models import Budget, db, CategoryType, BASE_CURRENCY
+from services.currency_service import ExchangeRateService, converted_amount, join_rates
+from services.archive_service import transaction_source
+
+# Сколько дней истории используется для оценки модели
+HISTORY_DAYS = 91
+# Коэффициент экспоненциального сглаживания на неделю истории
+SMOOTHING = 0.3
+# Уровень доверия и соответствующий квантиль нормального распределения
+CONFIDENCE = 0.9
+Z_SCORE = 1.6449
+
+
+class ForecastService:
+    """
+    Прогноз расходов для бюджетов.
+
+    Дневной ряд расходов пользователя загружается одним запросом.
+    По нему строится модель с учетом дня недели: для каждого дня
+    недели считается экспоненциально взвешенное среднее и дисперсия
+    (свежие недели весят больше). Прогноз и доверительный интервал
+    для всех бюджетов считаются одним векторным проходом NumPy.
+    """
+
+    @staticmethod
+    def forecast_budgets(user_id: int, budgets: Iterable[Budget],
+                         today: Optional[date] = None) -> Dict[int, Dict]:
+        """
+        Прогнозы расходов для активных бюджетов из списка.
+        Возвращает словарь {budget_id: прогноз}; для неактивных
+        бюджетов и бюджетов в валюте без курса прогноз не строится.
+        """
+        today = today or date.today()
+        budgets = [budget for budget in budgets
+                   if budget.start_date <= today <= budget.end_date]
+        if not budgets:
+            return {}
+
+        model_start = today - timedelta(days=HISTORY_DAYS - 1)
+        series_start = min([model_start] + [b.start_date for b in budgets])
+        days = (today - series_start).days + 1
+
+        # Ряд расходов в базовой валюте (пересчет по курсам в агрегате)
+        source = transaction_source(series_start, today)
+        base_amount, rates = converted_amount(table=source)
+        rows = join_rates(db.session.query(
+            source.date, func.sum(base_amount)
+        ).select_from(source), rates).filter(
+            source.user_id == user_id,
+            source.type == CategoryType.EXPENSE,
+            source.date >= series_start,
+            source.date <= today
+        ).group_by(source.date).all()
+
+        # Плотный дневной ряд: дни без расходов - нули
+        daily = np.zeros(days)
+        if rows:
+            offsets = np.array([(day - series_start).days for day, _ in rows])
+            daily[offsets] = np.array([float(amount or 0) for _, amount in rows])
+            first_day = series_start + timedelta(days=int(offsets.min()))
+        else:
+            first_day = today
+        cumulative = np.concatenate(([0.0], np.cumsum(daily)))
+
+        mean, variance = ForecastService._fit_weekday_model(
+            daily, series_start, max(model_start, first_day))
+
+        # Параметры бюджетов в виде векторов
+        start_index = np.array([(b.start_date - series_start).days for b in budgets])
+        spent = cumulative[days] - cumulative[start_index]
+        remaining_days = np.array([(b.end_date - today).days for b in budgets])
+        elapsed_days = np.array([(today - b.start_date).days + 1 for b in budgets])
+
+        # Число оставшихся дней каждого дня недели (бюджеты x 7)
+        first_weekday = (today + timedelta(days=1)).weekday()
+        shift = (np.arange(7) - first_weekday) % 7
+        counts = (remaining_days[:, None] // 7) + \
+            (shift[None, :] < (remaining_days[:, None] % 7))
+
+        expected_rest = counts @ mean
+        deviation = Z_SCORE * np.sqrt(counts @ variance)
+        projected = spent + expected_rest
+        lower = spent + np.maximum(expected_rest - deviation, 0.0)
+        upper = projected + deviation
+        daily_rate = np.divide(expected_rest, remaining_days,
+                               out=np.full(len(budgets), float(mean.mean())),
+                               where=remaining_days > 0)
+
+        # Бюджеты в другой валюте: прогноз переводится по курсу на сегодня
+        scale = np.ones(len(budgets))
+        for i, budget in enumerate(budgets):
+            if budget.currency != BASE_CURRENCY:
+                rate = ExchangeRateService.get_rate(budget.currency, today)
+                scale[i] = 1 / float(rate) if rate else np.nan
+        spent, projected, lower, upper, daily_rate = (
+            values * scale for values in (spent, projected, lower, upper, daily_rate))
+
+        result = {}
+        for i, budget in enumerate(budgets):
+            if np.isnan(scale[i]):
+                continue
+            projection = {
+                'method': 'weekday_ewma',
+                'daily_expense': round(float(daily_rate[i]), 2),
+                'spent_to_date': round(float(spent[i]), 2),
+                'projected_total': round(float(projected[i]), 2),
+                'lower_bound': round(float(lower[i]), 2),
+                'upper_bound': round(float(upper[i]), 2),
+                'confidence': CONFIDENCE,
+                'elapsed_days': int(elapsed_days[i]),
+                'remaining_days': int(remaining_days[i]),
+                'total_days': int(elapsed_days[i] + remaining_days[i])
+            }
+            if budget.target_amount:
+                target = float(budget.target_amount)
+                projection['target_remaining'] = round(target - float(projected[i]), 2)
+                projection['target_percentage'] = round(float(projected[i]) / target * 100, 2)
+            result[budget.id] = projection
+        return result
+
+    @staticmethod
+    def _fit_weekday_model(daily: np.ndarray, series_start: date, fit_start: date):
+        """
+        Экспоненциально взвешенные среднее и дисперсия расходов по дням недели.
+        Если для дня недели нет наблюдений, берется общая оценка.
+        """
+        offset = (fit_start - series_start).days
+        values = daily[offset:]
+        if values.size == 0:
+            return np.zeros(7), np.zeros(7)
+
+        weekdays = (fit_start.weekday() + np.arange(values.size)) % 7
+        age_weeks = (values.size - 1 - np.arange(values.size)) / 7.0
+        weights = (1.0 - SMOOTHING) ** age_weeks
+
+        weight_sum = np.bincount(weekdays, weights=weights, minlength=7)
+        overall_mean = np.average(values, weights=weights)
+        mean = np.divide(np.bincount(weekdays, weights=weights * values, minlength=7),
+                         weight_sum, out=np.full(7, overall_mean), where=weight_sum > 0)
+
+        squared = (values - mean[weekdays]) ** 2
+        overall_variance = np.average(squared, weights=weights)
+        variance = np.divide(np.bincount(weekdays, weights=weights * squared, minlength=7),
+                             weight_sum, out=np.full(7, overall_variance), where=weight_sum > 0)
+        return mean, variance
@@ -0,0 +1,176 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+from flask import current_app
+
+from models import Transaction, db
+
+# Режимы надежности группового коммита:
+# commit - вызов возвращается после коммита группы (данные на диске);
+# flush - после записи строки в открытую транзакцию группы (id известен),
+#         коммит выполняется следом; при сбое коммита группа теряется
+DURABILITY_MODES = ('commit', 'flush')
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 200
+# Сколько вызывающий поток ждет результата
+DEFAULT_WAIT_TIMEOUT = 30.0
+
+_lock = threading.Lock()
+
+
+class _PendingInsert:
+    """Строка, ожидающая записи в группе, и результат для вызывающего."""
+
+    __slots__ = ('values', 'future')
+
+    def __init__(self, values: Dict[str, Any]):
+        self.values = values
+        self.future: Future = Future()
+
+
+class GroupCommitter:
+    """
+    Групповой коммит вставок транзакций. Вызовы из разных потоков
+    ставят строки в очередь; поток-коммиттер собирает их в окне
+    window_ms (не больше max_batch строк) и записывает одной транзакцией
+    БД, то есть одним fsync вместо fsync на каждую строку. Если запись
+    группы не удалась, строки повторяются по одной, и каждый вызывающий
+    получает свою ошибку.
+    """
+
+    def __init__(self, app, window_ms: float = DEFAULT_WINDOW_MS,
+                 max_batch: int = DEFAULT_MAX_BATCH, durability: str = 'commit'):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Неизвестный режим надежности: {durability}")
+        self.app = app
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.durability = durability
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='group-committer', daemon=True)
+        self._thread.start()
+
+    def submit(self, values: Dict[str, Any]) -> Future:
+        """Ставит строку транзакции в очередь; результат - словарь с id и created_at."""
+        pending = _PendingInsert(values)
+        self._queue.put(pending)
+        return pending.future
+
+    def insert(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Записывает строку в составе группы и ждет результата не дольше
+        GROUP_COMMIT_WAIT_TIMEOUT секунд (иначе concurrent.futures.TimeoutError).
+        """
+        return self.submit(values).result(timeout=self.app.config.get(
+            'GROUP_COMMIT_WAIT_TIMEOUT', DEFAULT_WAIT_TIMEOUT))
+
+    def _collect(self) -> List[_PendingInsert]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        with self.app.app_context():
+            while True:
+                batch = self._collect()
+                try:
+                    self._write_group(batch)
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Ошибка группового коммита: {str(e)}")
+                    for pending in batch:
+                        if not pending.future.done():
+                            pending.future.set_exception(e)
+                finally:
+                    db.session.remove()
+
+    def _write_group(self, batch: List[_PendingInsert]) -> None:
+        try:
+            rows = [Transaction(**pending.values) for pending in batch]
+            db.session.add_all(rows)
+            db.session.flush()
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.warning(
+                f"Групповая запись не удалась, строки пишутся по одной: {str(e)}")
+            self._write_each(batch)
+            return
+
+        results = [_row_result(row) for row in rows]
+        if self.durability == 'flush':
+            for pending, result in zip(batch, results):
+                pending.future.set_result(result)
+        db.session.commit()
+        for pending, result in zip(batch, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    def _write_each(self, batch: List[_PendingInsert]) -> None:
+        for pending in batch:
+            try:
+                row = Transaction(**pending.values)
+                db.session.add(row)
+                db.session.commit()
+                pending.future.set_result(_row_result(row))
+            except Exception as e:
+                db.session.rollback()
+                pending.future.set_exception(e)
+
+
+def _row_result(row: Transaction) -> Dict[str, Any]:
+    return {'id': row.id, 'created_at': row.created_at}
+
+
+def get_committer(app=None) -> Optional[GroupCommitter]:
+    """
+    Коммиттер приложения (один на процесс и приложение) или None,
+    если групповой коммит выключен.
+    """
+    app = app or current_app._get_current_object()
+    if not app.config.get('GROUP_COMMIT_ENABLED'):
+        return None
+    committer = app.extensions.get('group_committer')
+    if committer is None:
+        with _lock:
+            committer = app.extensions.get('group_committer')
+            if committer is None:
+                committer = GroupCommitter(
+                    app,
+                    window_ms=app.config.get('GROUP_COMMIT_WINDOW_MS', DEFAULT_WINDOW_MS),
+                    max_batch=app.config.get('GROUP_COMMIT_MAX_BATCH', DEFAULT_MAX_BATCH),
+                    durability=app.config.get('GROUP_COMMIT_DURABILITY', 'commit'))
+                app.extensions['group_committer'] = committer
+    return committer
+
+
+def committer_for_session(app=None) -> Optional[GroupCommitter]:
+    """
+    Коммиттер для вставки из текущей сессии db.session или None, если вставка должна
+    идти через саму сессию: групповой коммит выключен, сессия принадлежит
+    атомарному пакету или держит незафиксированные изменения (коммиттер
+    записал бы строку отдельно от них). Читающая транзакция сессии без
+    изменений завершается, чтобы не держать блокировку SQLite, пока
+    коммиттер записывает группу.
+    """
+    committer = get_committer(app)
+    session = db.session()
+    if committer is None or session.info.get('atomic_batch'):
+        return None
+    if session.new or session.dirty or session.deleted:
+        return None
+    if session.in_transaction():
+        raw = session.connection().connection.dbapi_connection
+        if getattr(raw, 'in_transaction', True):
+            return None
+        session.rollback()
+    return committer
@@ -0,0 +1,504 @@
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timedelta, date
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from flask import current_app
+from marshmallow import ValidationError
+from sqlalchemy import select, update, delete, func
+
+from models import Job, JobStatus, Category, db
+from schemas import SavingsProbabilitySchema
+from services.archive_service import transaction_source
+from services.base_service import parse_date
+from services.simulation_service import SimulationService
+from services.transaction_service import TransactionService
+
+DEFAULT_THREAD_WORKERS = 2
+# Отметки прогресса пишутся в БД не чаще раза в PROGRESS_INTERVAL секунд
+PROGRESS_INTERVAL = 0.5
+# Выполняющаяся задача без отметок дольше этого считается прерванной
+DEFAULT_STALE_SECONDS = 600
+# Сколько хранить завершенные задачи и их результаты
+DEFAULT_RESULT_TTL = timedelta(hours=24)
+PRUNE_INTERVAL = 60.0
+DEFAULT_MAX_ACTIVE = 5
+# Размер пачки строк при выгрузке
+EXPORT_BATCH = 1000
+# Каталог файлов результатов выгрузок
+DEFAULT_RESULT_DIR = os.path.join(os.getcwd(), 'data', 'jobs')
+
+ACTIVE_STATUSES = (JobStatus.QUEUED, JobStatus.RUNNING)
+FINISHED_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем во время выполнения."""
+
+
+class JobFailed(Exception):
+    """Ожидаемая ошибка задачи: сообщение показывается пользователю."""
+
+
+class JobKind:
+    """
+    Вид задачи: validate(params) -> (нормализованные параметры, ошибка),
+    run(context, user_id, params) -> (результат, MIME-тип).
+    """
+
+    def __init__(self, name: str, run: Callable, validate: Callable):
+        self.name = name
+        self.run = run
+        self.validate = validate
+
+
+JOB_KINDS: Dict[str, JobKind] = {}
+
+
+class ResultFile:
+    """
+    Результат, записанный обработчиком в файл JOBS_RESULT_DIR: в строке
+    задачи сохраняется только путь, файл отдается клиенту потоком.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+
+def _remove_result_file(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def job_kind(name: str, validate: Callable):
+    """Регистрирует обработчик вида задачи."""
+    def register(run: Callable) -> Callable:
+        JOB_KINDS[name] = JobKind(name, run, validate)
+        return run
+    return register
+
+
+class JobRunner:
+    """
+    Пулы выполнения задач процесса: задачи выполняются в пуле потоков
+    (каждая в своем контексте приложения), а вычисления, которым нужен
+    отдельный процесс, обработчики передают в пул процессов.
+    """
+
+    def __init__(self, thread_workers: int, process_workers: int):
+        self.threads = ThreadPoolExecutor(max_workers=max(thread_workers, 1),
+                                          thread_name_prefix='job')
+        self.process_workers = process_workers
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def processes(self) -> Optional[ProcessPoolExecutor]:
+        """Пул процессов (создается при первом обращении) или None, если выключен."""
+        if self.process_workers < 2:
+            return None
+        with _lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+        return self._processes
+
+
+def get_runner(app=None) -> JobRunner:
+    """Пулы задач приложения (одни на процесс и приложение)."""
+    app = app or current_app._get_current_object()
+    runner = app.extensions.get('job_runner')
+    if runner is None:
+        with _lock:
+            runner = app.extensions.get('job_runner')
+            if runner is None:
+                runner = JobRunner(
+                    app.config.get('JOBS_THREAD_WORKERS', DEFAULT_THREAD_WORKERS),
+                    app.config.get('JOBS_PROCESS_WORKERS', 0))
+                app.extensions['job_runner'] = runner
+    return runner
+
+
+class JobContext:
+    """Связь обработчика с его задачей: прогресс, отмена и пул процессов."""
+
+    def __init__(self, job_id: int, runner: JobRunner):
+        self.job_id = job_id
+        self.process_pool = runner.processes
+        self._last_report = 0.0
+
+    def progress(self, fraction: float, message: Optional[str] = None,
+                 force: bool = False) -> None:
+        """
+        Сохраняет долю выполненной работы и проверяет отмену.
+        Запись в БД не чаще раза в PROGRESS_INTERVAL секунд.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        values = {'progress': min(max(fraction, 0.0), 1.0), 'heartbeat_at': datetime.utcnow()}
+        if message is not None:
+            values['message'] = message
+        db.session.execute(update(Job).where(Job.id == self.job_id).values(**values))
+        cancelled = db.session.execute(
+            select(Job.cancel_requested).where(Job.id == self.job_id)).scalar()
+        db.session.commit()
+        if cancelled:
+            raise JobCancelled()
+
+    def result_path(self, extension: str) -> str:
+        """Путь файла результата задачи (каталог создается при необходимости)."""
+        directory = current_app.config.get('JOBS_RESULT_DIR') or DEFAULT_RESULT_DIR
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(os.path.abspath(directory), f'job-{self.job_id}.{extension}')
+
+
+def _job_dict(job: Job) -> Dict[str, Any]:
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status.value,
+        'progress': round(job.progress or 0.0, 4),
+        'message': job.message,
+        'params': json.loads(job.params) if job.params else {},
+        'error': job.error,
+        'result_type': job.result_type,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+class JobService:
+    """
+    Фоновые задачи пользователя: выгрузки и тяжелые отчеты, которые не
+    укладываются в время запроса. Состояние хранится в таблице jobs,
+    поэтому задачу можно опрашивать и отменять из любого процесса;
+    выполняется она в пуле потоков процесса, принявшего запрос.
+    """
+
+    _last_prune = 0.0
+
+    @staticmethod
+    def submit(user_id: int, kind: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Dict, int]:
+        """Проверяет параметры, сохраняет задачу и ставит ее в очередь."""
+        job_kind_ = JOB_KINDS.get(kind)
+        if job_kind_ is None:
+            return {"error": f"Неизвестный вид задачи: {kind}"}, 400
+        params, error = job_kind_.validate(params or {})
+        if error:
+            return {"error": error}, 400
+
+        app = current_app._get_current_object()
+        try:
+            JobService._prune(app)
+            active = db.session.execute(select(func.count(Job.id)).where(
+                Job.user_id == user_id, Job.status.in_(ACTIVE_STATUSES))).scalar()
+            if active >= app.config.get('JOBS_MAX_ACTIVE_PER_USER', DEFAULT_MAX_ACTIVE):
+                return {"error": "Слишком много незавершенных задач, дождитесь их окончания"}, 429
+
+            job = Job(user_id=user_id, kind=kind, params=json.dumps(params, ensure_ascii=False))
+            db.session.add(job)
+            db.session.commit()
+            result = _job_dict(job)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Ошибка при создании задачи: {str(e)}")
+            return {"error": "Ошибка при создании задачи"}, 500
+
+        get_runner(app).threads.submit(_run_job, app, result['id'])
+        return result, 202
+
+    @staticmethod
+    def _get_owned(job_id: int, user_id: int) -> Tuple[Any, int]:
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return {"error": "Задача не найдена"}, 404
+        if job.user_id != user_id:
+            return {"error": "У вас нет доступа к этой задаче"}, 403
+        JobService._mark_stale([job])
+        return job, 200
+
+    @staticmethod
+    def get_job(job_id: int, user_id: int) -> Tuple[Dict, int]:
+        job, status = JobService._get_owned(job_id, user_id)
+        if status != 200:
+            return job, status
+        return _job_dict(job), 200
+
+    @staticmethod
+    def list_jobs(user_id: int, limit: int = 50) -> Tuple[List[Dict], int]:
+        """Последние задачи пользователя, новые первыми."""
+        jobs = db.session.execute(select(Job).where(Job.user_id == user_id).order_by(
+            Job.created_at.desc(), Job.id.desc()).limit(limit)).scalars().all()
+        JobService._mark_stale(jobs)
+        return [_job_dict(job) for job in jobs], 200
+
+    @staticmethod
+    def cancel_job(job_id: int, user_id: int) -> Tuple[Dict, int]:
+        """
+        Отменяет задачу: ожидающая отменяется сразу, выполняющаяся -
+        при следующей отметке прогресса.
+        """
+        job, status = JobService._get_owned(job_id, user_id)
+        if status != 200:
+            return job, status
+        if job.status in FINISHED_STATUSES:
+            return {"error": "Задача уже завершена"}, 409
+        job.cancel_requested = True
+        if job.status == JobStatus.QUEUED:
+            job.status = JobStatus.CANCELLED
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return _job_dict(job), 200
+
+    @staticmethod
+    def get_result(job_id: int, user_id: int) -> Tuple[Dict, int]:
+        """
+        Результат завершенной задачи: {'content': ..., 'result_type': ...}
+        или, для выгрузок в файл, {'path': ..., 'result_type': ...}.
+        """
+        job, status = JobService._get_owned(job_id, user_id)
+        if status != 200:
+            return job, status
+        if job.status != JobStatus.SUCCEEDED:
+            return {"error": "Результат еще не готов", "status": job.status.value}, 409
+        if job.result_path:
+            if not os.path.exists(job.result_path):
+                return {"error": "Файл результата удален"}, 404
+            return {'path': job.result_path, 'result_type': job.result_type}, 200
+        content = json.loads(job.result) if job.result_type == 'application/json' else job.result
+        return {'content': content, 'result_type': job.result_type}, 200
+
+    @staticmethod
+    def _mark_stale(jobs: List[Job]) -> None:
+        """Помечает прерванными задачи, процесс которых перестал отмечаться."""
+        stale_after = timedelta(seconds=current_app.config.get(
+            'JOBS_STALE_SECONDS', DEFAULT_STALE_SECONDS))
+        now = datetime.utcnow()
+        stale = [job for job in jobs if job.status == JobStatus.RUNNING
+                 and (job.heartbeat_at or job.started_at or now) < now - stale_after]
+        for job in stale:
+            job.status = JobStatus.FAILED
+            job.error = "Выполнение задачи прервано"
+            job.finished_at = now
+        if stale:
+            db.session.commit()
+
+    @staticmethod
+    def _prune(app) -> None:
+        """Удаляет старые завершенные задачи не чаще раза в PRUNE_INTERVAL."""
+        if time.monotonic() - JobService._last_prune < PRUNE_INTERVAL:
+            return
+        JobService._last_prune = time.monotonic()
+        ttl = app.config.get('JOBS_RESULT_TTL', DEFAULT_RESULT_TTL)
+        expired = (Job.status.in_(FINISHED_STATUSES),
+                   Job.finished_at < datetime.utcnow() - ttl)
+        paths = db.session.execute(select(Job.result_path).where(
+            *expired, Job.result_path.isnot(None))).scalars().all()
+        db.session.execute(delete(Job).where(*expired))
+        for path in paths:
+            _remove_result_file(path)
+
+
+def _finish(job_id: int, **values) -> None:
+    db.session.execute(update(Job).where(Job.id == job_id).values(
+        finished_at=datetime.utcnow(), **values))
+    db.session.commit()
+
+
+def _run_job(app, job_id: int) -> None:
+    """Выполняет задачу в потоке пула в собственном контексте приложения."""
+    with app.app_context():
+        try:
+            job = db.session.get(Job, job_id)
+            if job is None or job.status != JobStatus.QUEUED:
+                return
+            if job.cancel_requested:
+                _finish(job_id, status=JobStatus.CANCELLED)
+                return
+            now = datetime.utcnow()
+            job.status = JobStatus.RUNNING
+            job.started_at = job.heartbeat_at = now
+            user_id, kind, params = job.user_id, job.kind, json.loads(job.params or '{}')
+            db.session.commit()
+
+            context = JobContext(job_id, get_runner(app))
+            try:
+                result, result_type = JOB_KINDS[kind].run(context, user_id, params)
+            except JobCancelled:
+                db.session.rollback()
+                _finish(job_id, status=JobStatus.CANCELLED)
+                return
+            except JobFailed as e:
+                db.session.rollback()
+                _finish(job_id, status=JobStatus.FAILED, error=str(e))
+                return
+
+            if isinstance(result, ResultFile):
+                _finish(job_id, status=JobStatus.SUCCEEDED, progress=1.0, message=None,
+                        result_path=result.path, result_type=result_type)
+                return
+            if result_type == 'application/json':
+                result = json.dumps(result, ensure_ascii=False)
+            _finish(job_id, status=JobStatus.SUCCEEDED, progress=1.0, message=None,
+                    result=result, result_type=result_type)
+
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Ошибка при выполнении задачи {job_id}: {str(e)}")
+            try:
+                _finish(job_id, status=JobStatus.FAILED, error="Внутренняя ошибка при выполнении задачи")
+            except Exception:
+                db.session.rollback()
+        finally:
+            db.session.remove()
+
+
+def _service_result(result: Tuple[Dict, int]) -> Dict:
+    """Ответ сервиса (данные, статус) как результат задачи."""
+    payload, status = result
+    if status != 200:
+        raise JobFailed(payload.get('error', 'Ошибка выполнения задачи'))
+    return payload
+
+
+# --- Виды задач ---
+
+
+def _validate_period(params: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Необязательный период start_date - end_date."""
+    result = {}
+    for field in ('start_date', 'end_date'):
+        if params.get(field):
+            value, error = parse_date(params[field])
+            if error:
+                return {}, error
+            result[field] = value.isoformat()
+    if result.get('start_date') and result.get('end_date') \
+            and result['end_date'] < result['start_date']:
+        return {}, "Дата окончания раньше даты начала"
+    return result, None
+
+
+def _period(params: Dict[str, Any]) -> Tuple[Optional[date], Optional[date]]:
+    return tuple(date.fromisoformat(params[field]) if params.get(field) else None
+                 for field in ('start_date', 'end_date'))
+
+
+def _validate_export(params: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    result, error = _validate_period(params)
+    if error:
+        return {}, error
+    result['format'] = params.get('format', 'csv')
+    if result['format'] not in ('csv', 'json'):
+        return {}, "Формат выгрузки: csv или json"
+    return result, None
+
+
+@job_kind('transactions_export', validate=_validate_export)
+def _export_transactions(context: JobContext, user_id: int,
+                         params: Dict[str, Any]) -> Tuple[Any, str]:
+    """
+    Выгрузка транзакций за период (CSV или JSON) в файл результата:
+    строки читаются и записываются пачками по EXPORT_BATCH, так что
+    в памяти не бывает больше одной пачки.
+    """
+    start_date, end_date = _period(params)
+    source = transaction_source(start_date, end_date)
+    conditions = [source.user_id == user_id]
+    if start_date:
+        conditions.append(source.date >= start_date)
+    if end_date:
+        conditions.append(source.date <= end_date)
+    total = db.session.execute(select(func.count(source.id)).where(*conditions)).scalar()
+
+    result = db.session.execute(
+        select(source.id, source.date, source.type, source.amount,
+               source.currency, Category.name, source.description)
+        .join(Category, Category.id == source.category_id)
+        .where(*conditions).order_by(source.date, source.id)
+        .execution_options(yield_per=EXPORT_BATCH))
+    as_json = params['format'] == 'json'
+    path = context.result_path(params['format'])
+    try:
+        with open(path, 'w', encoding='utf-8', newline='') as output:
+            if as_json:
+                output.write('[')
+            else:
+                writer = csv.writer(output)
+                writer.writerow(['id', 'date', 'type', 'amount', 'currency',
+                                 'category', 'description'])
+            exported = 0
+            for batch in result.partitions():
+                if as_json:
+                    output.write(''.join(
+                        (',' if exported or index else '') + json.dumps({
+                            'id': row_id, 'date': day.isoformat(),
+                            'type': transaction_type.value, 'amount': str(amount),
+                            'currency': currency, 'category': category,
+                            'description': description}, ensure_ascii=False)
+                        for index, (row_id, day, transaction_type, amount, currency,
+                                    category, description) in enumerate(batch)))
+                else:
+                    writer.writerows(
+                        [row_id, day.isoformat(), transaction_type.value, amount,
+                         currency, category, description or '']
+                        for row_id, day, transaction_type, amount, currency,
+                        category, description in batch)
+                exported += len(batch)
+                context.progress(exported / total if total else 1.0,
+                                 f"Выгружено {exported} из {total}")
+            if as_json:
+                output.write(']')
+    except BaseException:
+        _remove_result_file(path)
+        raise
+    return ResultFile(path), 'application/json' if as_json else 'text/csv'
+
+
+@job_kind('transaction_statistics', validate=_validate_period)
+def _transaction_statistics(context: JobContext, user_id: int,
+                            params: Dict[str, Any]) -> Tuple[Any, str]:
+    """Статистика доходов и расходов по категориям за период или всю историю."""
+    context.progress(0.0, "Расчет статистики", force=True)
+    start_date, end_date = _period(params)
+    return _service_result(TransactionService.get_transaction_statistics(
+        user_id, start_date, end_date)), 'application/json'
+
+
+def _validate_savings_probability(params: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    schema = SavingsProbabilitySchema()
+    try:
+        data = schema.load(params)
+    except ValidationError as e:
+        return {}, "; ".join(f"{field}: {', '.join(map(str, messages))}"
+                             for field, messages in e.messages.items())
+    # В параметрах задачи остаются только переданные значения
+    return {field: value for field, value in schema.dump(data).items()
+            if field in data and value is not None}, None
+
+
+@job_kind('savings_goal_probability', validate=_validate_savings_probability)
+def _savings_goal_probability(context: JobContext, user_id: int,
+                              params: Dict[str, Any]) -> Tuple[Any, str]:
+    """Монте-Карло оценка цели накоплений; блоки симуляций - в пуле процессов."""
+    context.progress(0.0, "Моделирование", force=True)
+    data = SavingsProbabilitySchema().load(params)
+    return _service_result(SimulationService.savings_goal_probability(
+        user_id,
+        target_amount=data['target_amount'],
+        target_date=data['target_date'],
+        current_savings=data.get('current_savings') or Decimal('0.00'),
+        simulations=data['simulations'],
+        seed=data['seed'],
+        pool=context.process_pool
+    )), 'application/json'
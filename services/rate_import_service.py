@@ -0,0 +1,101 @@
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Tuple
+from flask import current_app
+from sqlalchemy import select, delete, insert, tuple_
+
+from models import ExchangeRate, Transaction, BASE_CURRENCY, db
+from services.base_service import chunked, parse_date
+from services.category_stats_service import CategoryStatsService
+from services.currency_service import ExchangeRateService, normalize_currency
+from services.data_version_service import DataVersionService
+from services.summary_service import SummaryService
+
+
+class RateImportService:
+    """
+    Загрузка курсов валют из локального файла. Итоги месяцев и суммы
+    категорий, посчитанные по прежним курсам, пересчитываются.
+    """
+
+    @staticmethod
+    def load_rows(rows: List[Dict[str, Any]]) -> Tuple[Dict, int]:
+        """
+        Загружает курсы (date, currency, rate), заменяя курсы на те же
+        даты, и сбрасывает итоги и счетчики, зависящие от них.
+        """
+        values: Dict[Tuple[str, date], Decimal] = {}
+        for number, row in enumerate(rows, start=1):
+            currency, error = normalize_currency(row.get('currency'))
+            if not error:
+                rate_date, error = parse_date(row.get('date'))
+            if not error:
+                try:
+                    rate = Decimal(str(row.get('rate')))
+                    if not rate.is_finite() or rate <= 0:
+                        error = "Курс должен быть положительным"
+                except (ValueError, TypeError, InvalidOperation):
+                    error = "Неверный формат курса"
+            if error:
+                return {"error": f"Строка {number}: {error}"}, 400
+            if currency == BASE_CURRENCY:
+                return {"error": f"Строка {number}: курс базовой валюты всегда 1"}, 400
+            values[(currency, rate_date)] = rate
+        if not values:
+            return {"loaded": 0}, 200
+
+        keys = sorted(values)
+        try:
+            for chunk in chunked(keys):
+                db.session.execute(delete(ExchangeRate).where(
+                    tuple_(ExchangeRate.currency, ExchangeRate.date).in_(chunk)))
+            for chunk in chunked(keys):
+                db.session.execute(insert(ExchangeRate), [
+                    {'currency': currency, 'date': rate_date, 'rate': values[(currency, rate_date)]}
+                    for currency, rate_date in chunk
+                ])
+            RateImportService._after_rates_changed(
+                {currency for currency, _ in keys}, min(rate_date for _, rate_date in keys))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Ошибка при загрузке курсов валют: {str(e)}")
+            return {"error": "Ошибка при загрузке курсов валют"}, 500
+        finally:
+            ExchangeRateService.invalidate()
+        return {"loaded": len(keys)}, 200
+
+    @staticmethod
+    def load_file(path: str) -> Tuple[Dict, int]:
+        """
+        Загружает курсы из локального файла: CSV с колонками
+        date,currency,rate или JSON-список объектов с теми же полями.
+        """
+        with open(path, encoding='utf-8') as source:
+            if path.lower().endswith('.json'):
+                rows = json.load(source)
+            else:
+                rows = list(csv.DictReader(source))
+        return RateImportService.load_rows(rows)
+
+    @staticmethod
+    def _after_rates_changed(currencies, since: date) -> None:
+        """
+        Пересчитывает данные, посчитанные по прежним курсам: итоги
+        месяцев и суммы категорий пользователей с транзакциями в этих
+        валютах начиная с since; версия их данных увеличивается.
+        """
+        affected = db.session.execute(
+            select(Transaction.user_id, Transaction.category_id).where(
+                Transaction.currency.in_(sorted(currencies)),
+                Transaction.date >= since).distinct()).all()
+        if not affected:
+            return
+        user_ids = {user_id for user_id, _ in affected}
+        for user_id in user_ids:
+            SummaryService.invalidate_user(user_id)
+        CategoryStatsService.recalculate({category_id for _, category_id in affected},
+                                         fields=['total_amount'])
+        DataVersionService.bump(user_ids)
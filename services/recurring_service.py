@@ -0,0 +1,456 @@
+import calendar
+from collections import namedtuple
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple, Union
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from models import (RecurringRule, RecurringConfirmation, Transaction, Category,
+                    db, BudgetPeriod, CategoryType)
+from services.summary_service import month_start, next_month
+
+# Шаг периодов, кратных месяцу
+PERIOD_MONTHS = {
+    BudgetPeriod.MONTHLY: 1,
+    BudgetPeriod.QUARTERLY: 3,
+    BudgetPeriod.SEMIANNUAL: 6,
+    BudgetPeriod.ANNUAL: 12,
+}
+
+# Разобранное cron-выражение: None означает "*" (любое значение)
+CronSchedule = namedtuple('CronSchedule', ['days', 'months', 'weekdays'])
+
+
+# --- Арифметика дат ---
+
+
+def add_months(anchor: date, months: int) -> date:
+    """Сдвигает дату на months месяцев, прижимая день к концу месяца."""
+    month_index = anchor.year * 12 + anchor.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return date(year, month, min(anchor.day, calendar.monthrange(year, month)[1]))
+
+
+def _months_between(first: date, second: date) -> int:
+    """Разница в календарных месяцах между датами (без учета дней)."""
+    return (second.year - first.year) * 12 + second.month - first.month
+
+
+def _period_index_range(anchor: date, period: BudgetPeriod,
+                        start_date: date, end_date: date) -> Tuple[int, int]:
+    """
+    Номера первого и последнего вхождения периода в диапазоне.
+    Вычисляются делением, без перебора дней.
+    """
+    if period == BudgetPeriod.WEEKLY:
+        first = max(0, -(-(start_date - anchor).days // 7))
+        last = (end_date - anchor).days // 7
+        return first, last
+
+    step = PERIOD_MONTHS[period]
+    first = max(0, -(-_months_between(anchor, start_date) // step))
+    if add_months(anchor, first * step) < start_date:
+        first += 1
+    last = _months_between(anchor, end_date) // step
+    if last >= 0 and add_months(anchor, last * step) > end_date:
+        last -= 1
+    return first, last
+
+
+def _period_date(anchor: date, period: BudgetPeriod, index: int) -> date:
+    """Дата вхождения периода с номером index."""
+    if period == BudgetPeriod.WEEKLY:
+        return anchor + timedelta(days=7 * index)
+    return add_months(anchor, index * PERIOD_MONTHS[period])
+
+
+def period_occurrences(anchor: date, period: BudgetPeriod,
+                       start_date: date, end_date: date) -> List[date]:
+    """Даты вхождений периода от anchor в диапазоне [start_date, end_date]."""
+    first, last = _period_index_range(anchor, period, start_date, end_date)
+    return [_period_date(anchor, period, index) for index in range(first, last + 1)]
+
+
+def count_period_occurrences(anchor: date, period: BudgetPeriod,
+                             start_date: date, end_date: date) -> int:
+    """Количество вхождений периода в диапазоне за O(1)."""
+    first, last = _period_index_range(anchor, period, start_date, end_date)
+    return max(0, last - first + 1)
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> Optional[FrozenSet[int]]:
+    """Разбирает поле cron: *, числа, списки, диапазоны и шаги."""
+    if field == '*':
+        return None
+    values = set()
+    for part in field.split(','):
+        part, _, step_text = part.partition('/')
+        step = int(step_text) if step_text else 1
+        if part == '*':
+            first, last = low, high
+        elif '-' in part:
+            first_text, last_text = part.split('-', 1)
+            first, last = int(first_text), int(last_text)
+        else:
+            first = int(part)
+            last = high if step_text else first
+        if step < 1 or not low <= first <= last <= high:
+            raise ValueError(f"Значение '{field}' вне диапазона {low}-{high}")
+        values.update(range(first, last + 1, step))
+    return frozenset(values)
+
+
+def parse_cron(expression: str) -> CronSchedule:
+    """
+    Разбирает cron-подобное выражение "день_месяца месяц день_недели".
+    Допускается и полная форма из пяти полей (минуты и часы игнорируются).
+    День недели: 0-6, где 0 (или 7) - воскресенье.
+    """
+    parts = (expression or '').split()
+    if len(parts) == 5:
+        parts = parts[2:]
+    if len(parts) != 3:
+        raise ValueError(
+            "Cron-выражение должно иметь вид 'день_месяца месяц день_недели'")
+    try:
+        days = _parse_cron_field(parts[0], 1, 31)
+        months = _parse_cron_field(parts[1], 1, 12)
+        weekdays = _parse_cron_field(parts[2], 0, 7)
+    except ValueError as e:
+        raise ValueError(f"Неверное cron-выражение: {str(e)}")
+    if weekdays is not None:
+        # cron: 0 и 7 - воскресенье; Python: понедельник = 0
+        weekdays = frozenset((value - 1) % 7 for value in weekdays)
+    return CronSchedule(days, months, weekdays)
+
+
+def cron_occurrences(schedule: CronSchedule, start_date: date, end_date: date) -> List[date]:
+    """
+    Даты, подходящие под cron-расписание, в диапазоне.
+    Перебираются месяцы, а внутри месяца даты вычисляются напрямую:
+    дни месяца - из множества, дни недели - шагом в 7 дней.
+    Как и в cron, если заданы и день месяца, и день недели,
+    подходит дата, удовлетворяющая любому из них.
+    """
+    result = []
+    month = month_start(start_date)
+    while month <= end_date:
+        if schedule.months is None or month.month in schedule.months:
+            days_in_month = calendar.monthrange(month.year, month.month)[1]
+            days: Set[int] = set()
+            if schedule.weekdays is None or schedule.days is not None:
+                days.update(day for day in (schedule.days or range(1, days_in_month + 1))
+                            if day <= days_in_month)
+            if schedule.weekdays is not None:
+                first_weekday = month.weekday()
+                for weekday in schedule.weekdays:
+                    days.update(range(1 + (weekday - first_weekday) % 7,
+                                      days_in_month + 1, 7))
+            result.extend(occurrence for occurrence in (month.replace(day=day) for day in sorted(days))
+                          if start_date <= occurrence <= end_date)
+        month = next_month(month)
+    return result
+
+
+def rule_occurrences(rule: RecurringRule, start_date: date, end_date: date) -> List[date]:
+    """Вхождения правила в диапазоне с учетом его дат начала и окончания."""
+    start_date = max(start_date, rule.start_date)
+    if rule.end_date:
+        end_date = min(end_date, rule.end_date)
+    if start_date > end_date:
+        return []
+    if rule.period:
+        return period_occurrences(rule.start_date, rule.period, start_date, end_date)
+    return cron_occurrences(parse_cron(rule.cron), start_date, end_date)
+
+
+def count_rule_occurrences(rule: RecurringRule, start_date: date, end_date: date) -> int:
+    """Количество вхождений правила в диапазоне (для периодов - за O(1))."""
+    start_date = max(start_date, rule.start_date)
+    if rule.end_date:
+        end_date = min(end_date, rule.end_date)
+    if start_date > end_date:
+        return 0
+    if rule.period:
+        return count_period_occurrences(rule.start_date, rule.period, start_date, end_date)
+    return len(cron_occurrences(parse_cron(rule.cron), start_date, end_date))
+
+
+class RecurringForecast:
+    """
+    Ожидаемые (неподтвержденные) вхождения правил пользователя.
+    Загружается одним набором запросов на окно дат и затем отвечает
+    на запросы итогов для любых поддиапазонов этого окна.
+    """
+
+    def __init__(self, rules: List[RecurringRule], confirmed: Dict[int, Set[date]]):
+        self.rules = rules
+        self.confirmed = confirmed
+
+    def totals(self, start_date: date, end_date: date) -> Dict[str, Any]:
+        """Ожидаемые доходы и расходы за период, с разбивкой по категориям."""
+        income = Decimal('0.00')
+        expense = Decimal('0.00')
+        by_category: Dict[int, Decimal] = {}
+        for rule in self.rules:
+            count = count_rule_occurrences(rule, start_date, end_date)
+            count -= sum(1 for confirmed_date in self.confirmed.get(rule.id, ())
+                         if start_date <= confirmed_date <= end_date)
+            if count <= 0:
+                continue
+            amount = rule.amount * count
+            if rule.type == CategoryType.INCOME:
+                income += amount
+            else:
+                expense += amount
+            by_category[rule.category_id] = by_category.get(
+                rule.category_id, Decimal('0.00')) + amount
+        return {
+            'income': income,
+            'expense': expense,
+            'by_category': by_category
+        }
+
+
+class RecurringService:
+    """
+    Сервис повторяющихся транзакций.
+    Правила хранятся отдельно от транзакций; вхождения вычисляются
+    для запрошенного периода, а в транзакции превращаются только
+    подтвержденные вхождения.
+    """
+
+    @staticmethod
+    def _serialize(rule: RecurringRule) -> Dict:
+        return {
+            'id': rule.id,
+            'description': rule.description,
+            'amount': float(rule.amount),
+            'type': rule.type.value,
+            'period': rule.period.value if rule.period else None,
+            'cron': rule.cron,
+            'start_date': rule.start_date.isoformat(),
+            'end_date': rule.end_date.isoformat() if rule.end_date else None,
+            'category_id': rule.category_id,
+            'user_id': rule.user_id
+        }
+
+    @staticmethod
+    def _apply(rule: RecurringRule, user_id: int, data: Dict[str, Any]) -> Optional[str]:
+        """Переносит данные запроса в правило. Возвращает текст ошибки или None."""
+        if 'category_id' in data:
+            category = Category.query.filter_by(
+                id=data['category_id'], user_id=user_id).first()
+            if not category:
+                return "Категория не найдена"
+            rule.category_id = category.id
+            rule.type = category.type
+
+        if 'period' in data or 'cron' in data:
+            period = data.get('period')
+            cron = (data.get('cron') or '').strip() or None
+            if bool(period) == bool(cron):
+                return "Укажите либо period, либо cron"
+            if period:
+                try:
+                    rule.period = BudgetPeriod(period)
+                except ValueError:
+                    return f"Неверный период. Допустимые значения: {[p.value for p in BudgetPeriod]}"
+                rule.cron = None
+            else:
+                parse_cron(cron)
+                rule.period = None
+                rule.cron = cron
+
+        for key in ('start_date', 'end_date', 'amount', 'description'):
+            if key in data:
+                setattr(rule, key, data[key])
+        if rule.end_date and rule.end_date < rule.start_date:
+            return "Дата окончания не может быть раньше даты начала"
+        return None
+
+    @staticmethod
+    def get_user_rules(user_id: int) -> Tuple[Union[List[Dict], Dict], int]:
+        """Список правил пользователя."""
+        try:
+            rules = RecurringRule.query.filter_by(user_id=user_id).order_by(
+                RecurringRule.start_date, RecurringRule.id).all()
+            return [RecurringService._serialize(rule) for rule in rules], 200
+        except Exception as e:
+            current_app.logger.error(
+                f"Ошибка при получении повторяющихся правил: {str(e)}")
+            return {"error": "Ошибка при получении повторяющихся правил"}, 500
+
+    @staticmethod
+    def get_rule(rule_id: int, user_id: int) -> Tuple[Dict, int]:
+        """Правило пользователя по ID."""
+        rule = RecurringRule.query.filter_by(id=rule_id, user_id=user_id).first()
+        if not rule:
+            return {"error": "Правило не найдено"}, 404
+        return RecurringService._serialize(rule), 200
+
+    @staticmethod
+    def create_rule(user_id: int, data: Dict[str, Any]) -> Tuple[Dict, int]:
+        """Создание правила (данные уже проверены RecurringRuleSchema)."""
+        rule = RecurringRule(user_id=user_id)
+        try:
+            error = RecurringService._apply(rule, user_id, {
+                'period': None, 'cron': None, **data})
+            if error:
+                return {"error": error}, 400
+            db.session.add(rule)
+            db.session.commit()
+            return RecurringService._serialize(rule), 201
+        except (ValueError, InvalidOperation) as e:
+            db.session.rollback()
+            return {"error": str(e)}, 400
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Ошибка при создании повторяющегося правила: {str(e)}")
+            return {"error": "Ошибка при создании повторяющегося правила"}, 500
+
+    @staticmethod
+    def update_rule(rule_id: int, user_id: int, data: Dict[str, Any]) -> Tuple[Dict, int]:
+        """Обновление правила. Подтвержденные транзакции не меняются."""
+        rule = RecurringRule.query.filter_by(id=rule_id, user_id=user_id).first()
+        if not rule:
+            return {"error": "Правило не найдено"}, 404
+        try:
+            error = RecurringService._apply(rule, user_id, data)
+            if error:
+                db.session.rollback()
+                return {"error": error}, 400
+            db.session.commit()
+            return RecurringService._serialize(rule), 200
+        except (ValueError, InvalidOperation) as e:
+            db.session.rollback()
+            return {"error": str(e)}, 400
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Ошибка при обновлении повторяющегося правила: {str(e)}")
+            return {"error": "Ошибка при обновлении повторяющегося правила"}, 500
+
+    @staticmethod
+    def delete_rule(rule_id: int, user_id: int) -> Tuple[Dict, int]:
+        """Удаление правила. Созданные по нему транзакции сохраняются."""
+        rule = RecurringRule.query.filter_by(id=rule_id, user_id=user_id).first()
+        if not rule:
+            return {"error": "Правило не найдено"}, 404
+        try:
+            db.session.delete(rule)
+            db.session.commit()
+            return {"message": "Правило успешно удалено"}, 200
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Ошибка при удалении повторяющегося правила: {str(e)}")
+            return {"error": "Ошибка при удалении повторяющегося правила"}, 500
+
+    @staticmethod
+    def _load(user_id: int, start_date: date, end_date: date) -> Tuple[List[RecurringRule], Dict[int, Dict[date, Optional[int]]]]:
+        """Правила, действующие в периоде, и их подтверждения в этом периоде."""
+        rules = RecurringRule.query.filter(
+            RecurringRule.user_id == user_id,
+            RecurringRule.start_date <= end_date,
+            or_(RecurringRule.end_date.is_(None),
+                RecurringRule.end_date >= start_date)
+        ).order_by(RecurringRule.id).all()
+
+        confirmed: Dict[int, Dict[date, Optional[int]]] = {}
+        if rules:
+            rows = db.session.query(
+                RecurringConfirmation.rule_id, RecurringConfirmation.occurrence_date,
+                RecurringConfirmation.transaction_id
+            ).filter(
+                RecurringConfirmation.rule_id.in_([rule.id for rule in rules]),
+                RecurringConfirmation.occurrence_date >= start_date,
+                RecurringConfirmation.occurrence_date <= end_date
+            ).all()
+            for rule_id, occurrence_date, transaction_id in rows:
+                confirmed.setdefault(rule_id, {})[occurrence_date] = transaction_id
+        return rules, confirmed
+
+    @staticmethod
+    def forecast(user_id: int, start_date: date, end_date: date) -> RecurringForecast:
+        """Прогноз неподтвержденных вхождений для окна дат (два запроса)."""
+        rules, confirmed = RecurringService._load(user_id, start_date, end_date)
+        return RecurringForecast(rules, {rule_id: set(dates) for rule_id, dates in confirmed.items()})
+
+    @staticmethod
+    def get_occurrences(user_id: int, start_date: date, end_date: date) -> Tuple[Union[List[Dict], Dict], int]:
+        """Вхождения всех правил пользователя в периоде, отсортированные по дате."""
+        try:
+            rules, confirmed = RecurringService._load(user_id, start_date, end_date)
+            result = []
+            for rule in rules:
+                rule_confirmed = confirmed.get(rule.id, {})
+                for occurrence in rule_occurrences(rule, start_date, end_date):
+                    result.append({
+                        'rule_id': rule.id,
+                        'date': occurrence.isoformat(),
+                        'amount': float(rule.amount),
+                        'type': rule.type.value,
+                        'category_id': rule.category_id,
+                        'description': rule.description,
+                        'confirmed': occurrence in rule_confirmed,
+                        'transaction_id': rule_confirmed.get(occurrence)
+                    })
+            result.sort(key=lambda item: (item['date'], item['rule_id']))
+            return result, 200
+        except Exception as e:
+            current_app.logger.error(
+                f"Ошибка при расчете повторяющихся транзакций: {str(e)}")
+            return {"error": "Ошибка при расчете повторяющихся транзакций"}, 500
+
+    @staticmethod
+    def confirm_occurrence(rule_id: int, user_id: int, occurrence_date: date,
+                           amount: Optional[Decimal] = None) -> Tuple[Dict, int]:
+        """
+        Подтверждает вхождение правила: создает транзакцию и отметку
+        о подтверждении. Сумму можно уточнить (например, счет за месяц).
+        """
+        rule = RecurringRule.query.filter_by(id=rule_id, user_id=user_id).first()
+        if not rule:
+            return {"error": "Правило не найдено"}, 404
+        if occurrence_date > date.today():
+            return {"error": "Нельзя подтвердить будущее вхождение"}, 400
+        if occurrence_date not in rule_occurrences(rule, occurrence_date, occurrence_date):
+            return {"error": "На эту дату нет вхождения правила"}, 400
+
+        try:
+            transaction = Transaction(
+                description=rule.description,
+                amount=amount if amount is not None else rule.amount,
+                date=occurrence_date,
+                category_id=rule.category_id,
+                user_id=user_id
+            )
+            db.session.add(transaction)
+            db.session.flush()
+            db.session.add(RecurringConfirmation(
+                rule_id=rule.id, occurrence_date=occurrence_date,
+                transaction_id=transaction.id))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return {"error": "Вхождение уже подтверждено"}, 400
+        except ValueError as e:
+            db.session.rollback()
+            return {"error": str(e)}, 400
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Ошибка при подтверждении вхождения правила {rule_id}: {str(e)}")
+            return {"error": "Ошибка при подтверждении вхождения"}, 500
+
+        return {
+            'rule_id': rule.id,
+            'date': occurrence_date.isoformat(),
+            'transaction_id': transaction.id,
+            'amount': float(transaction.amount)
+        }, 201
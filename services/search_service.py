@@ -0,0 +1,247 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from datetime import date
+from flask import current_app
+from sqlalchemy import event, func, literal_column, select, text, table, column, union_all
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import aliased
+
+from models import Transaction, Category, db, CategoryType
+from services.archive_service import ArchiveService, archive_table
+
+# Полнотекстовый индекс по описаниям транзакций (SQLite FTS5)
+FTS_TABLE = 'transactions_fts'
+
+# Источник индекса: описание и токен владельца транзакции
+FTS_SOURCE = 'transactions_fts_source'
+
+# Индекс с внешним содержимым: текст хранится только в transactions,
+# а триггеры синхронизируют индекс при любых изменениях, в том числе
+# при массовых UPDATE/DELETE в обход ORM. Колонка owner содержит токен
+# пользователя, и MATCH сразу отбирает только его транзакции
+FTS_DDL = [
+    f"CREATE VIEW IF NOT EXISTS {FTS_SOURCE} AS "
+    "SELECT id, description, 'u' || user_id AS owner FROM transactions",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"description, owner, content='{FTS_SOURCE}', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON transactions BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, description, owner) "
+    "VALUES (new.id, new.description, 'u' || new.user_id); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON transactions BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, owner) "
+    "VALUES ('delete', old.id, old.description, 'u' || old.user_id); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+    "AFTER UPDATE OF description, user_id ON transactions BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, owner) "
+    "VALUES ('delete', old.id, old.description, 'u' || old.user_id); "
+    f"INSERT INTO {FTS_TABLE}(rowid, description, owner) "
+    "VALUES (new.id, new.description, 'u' || new.user_id); END",
+]
+
+# Слова запроса: буквы и цифры в любом алфавите
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+# Не более стольких слов в одном запросе
+MAX_TOKENS = 10
+# Найденные транзакции считаются не дальше этого числа
+MAX_TOTAL = 1000
+
+
+def search_tokens(query: str) -> List[str]:
+    """Слова поискового запроса в нижнем регистре."""
+    return [token.lower() for token in TOKEN_PATTERN.findall(query or '')][:MAX_TOKENS]
+
+
+def fts_match_expression(tokens: List[str]) -> str:
+    """
+    Выражение MATCH для FTS5: каждое слово в кавычках (спецсимволы
+    запроса не интерпретируются) и с поиском по префиксу, все слова
+    должны присутствовать.
+    """
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def fts_user_match_expression(user_id: int, tokens: List[str]) -> str:
+    """
+    Выражение MATCH по транзакциям одного пользователя: токен владельца
+    в колонке owner, слова запроса - только в колонке description.
+    """
+    return 'owner : "u{}" AND description : ({})'.format(
+        int(user_id), fts_match_expression(tokens))
+
+
+def _like_part(table, tokens: List[str]):
+    """Строки таблицы транзакций, в описании которых есть все слова (LIKE)."""
+    part = select(*[table.c[column.name] for column in Transaction.__table__.columns],
+                  literal_column('0').label('rank'))
+    for token in tokens:
+        pattern = '%' + token.replace('_', '\\_') + '%'
+        part = part.where(table.c.description.ilike(pattern, escape='\\'))
+    return part
+
+
+class SearchService:
+    """
+    Поиск транзакций по описанию.
+    На SQLite с FTS5 используется полнотекстовый индекс с ранжированием
+    bm25; на других СУБД и без FTS5 - поиск подстрок через LIKE.
+    Архивы лет, пересекающихся с периодом, просматриваются через LIKE,
+    их строки идут после ранжированных.
+    """
+
+    @staticmethod
+    def fts_available(connection) -> bool:
+        """Есть ли в базе полнотекстовый индекс транзакций."""
+        if connection.dialect.name != 'sqlite':
+            return False
+        return connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+        ), {'name': FTS_TABLE}).first() is not None
+
+    @staticmethod
+    def ensure_index(connection, rebuild: bool = False) -> bool:
+        """
+        Создает индекс и триггеры, если их нет, и заполняет индекс
+        существующими транзакциями одной командой 'rebuild' (при
+        создании индекса или если rebuild=True).
+        Возвращает True, если индекс доступен.
+        """
+        if connection.dialect.name != 'sqlite':
+            return False
+        created = not SearchService.fts_available(connection)
+        if not created and 'owner' not in {
+                row[1] for row in connection.execute(text(f"PRAGMA table_info({FTS_TABLE})"))}:
+            # Индекс прежней версии без владельца пересоздается
+            for suffix in ('ai', 'ad', 'au'):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}"))
+            connection.execute(text(f"DROP TABLE {FTS_TABLE}"))
+            created = True
+        try:
+            for statement in FTS_DDL:
+                connection.execute(text(statement))
+        except OperationalError:
+            # SQLite собран без FTS5 - остается поиск через LIKE
+            return False
+        if created or rebuild:
+            connection.execute(text(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        return True
+
+    @staticmethod
+    def search_transactions(
+        user_id: int,
+        query: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        category_id: Optional[int] = None,
+        transaction_type: Optional[str] = None,
+        sort_by: str = 'rank',
+        limit: int = 50,
+        offset: int = 0
+    ) -> Tuple[Dict, int]:
+        """
+        Транзакции пользователя, в описании которых есть все слова
+        запроса (по префиксу), с обычными фильтрами и пагинацией.
+        total ограничен MAX_TOTAL (total_capped=True, если совпадений больше).
+        sort_by: 'rank' - по релевантности, 'date' - сначала новые.
+        """
+        tokens = search_tokens(query)
+        if not tokens:
+            return {"error": "Search query must contain at least one word."}, 400
+
+        try:
+            type_enum = None
+            if transaction_type:
+                try:
+                    type_enum = CategoryType(transaction_type)
+                except ValueError:
+                    return {"error": f"Неверный тип транзакции. Допустимые значения: {[t.value for t in CategoryType]}"}, 400
+
+            main = Transaction.__table__
+            if SearchService.fts_available(db.session.connection()):
+                fts = table(FTS_TABLE, column('rowid'))
+                # Вес колонки owner нулевой: она есть у всех строк пользователя
+                parts = [select(*main.columns, func.bm25(
+                    literal_column(FTS_TABLE), 1.0, 0.0).label('rank')).join(
+                    fts, fts.c.rowid == main.c.id
+                ).where(literal_column(FTS_TABLE).op('MATCH')(
+                    fts_user_match_expression(user_id, tokens)))]
+            else:
+                parts = [_like_part(main, tokens)]
+
+            # Архивы лет периода: строки пользователя за эти годы немногочисленны
+            # (индекс user_id, date), в них ищется подстрока без ранжирования
+            archives = ArchiveService.archives_for(start_date, end_date)
+            if archives:
+                ArchiveService.attach(db.session.connection(), archives)
+                parts.extend(_like_part(archive_table(year), tokens) for year, _ in archives)
+
+            for index, part in enumerate(parts):
+                columns = part.selected_columns
+                part = part.where(columns.user_id == user_id)
+                if start_date:
+                    part = part.where(columns.date >= start_date)
+                if end_date:
+                    part = part.where(columns.date <= end_date)
+                if category_id:
+                    part = part.where(columns.category_id == category_id)
+                if type_enum is not None:
+                    part = part.where(columns.type == type_enum)
+                parts[index] = part
+
+            found = (union_all(*parts) if len(parts) > 1 else parts[0]).subquery('found')
+            source = aliased(Transaction, found)
+            rank = found.c.rank
+            search = db.session.query(source, rank)
+
+            if sort_by == 'date':
+                search = search.order_by(source.date.desc(), source.id.desc())
+            else:
+                search = search.order_by(rank, source.date.desc(), source.id.desc())
+
+            # Точное число совпадений не нужно: считаются не более
+            # MAX_TOTAL + 1 строк, total_capped сообщает об усечении
+            total_count = db.session.query(func.count()).select_from(
+                search.order_by(None).with_entities(source.id)
+                .limit(MAX_TOTAL + 1).subquery()
+            ).scalar()
+            total_capped = total_count > MAX_TOTAL
+            total_count = min(total_count, MAX_TOTAL)
+            rows = search.limit(limit).offset(offset).all()
+
+            category_names = dict(db.session.query(Category.id, Category.name).filter(
+                Category.id.in_({transaction.category_id for transaction, _ in rows})))
+
+            return {
+                'query': ' '.join(tokens),
+                'items': [
+                    {
+                        'id': transaction.id,
+                        'description': transaction.description,
+                        'amount': float(transaction.amount),
+                        'date': transaction.date.isoformat(),
+                        'type': transaction.type.value,
+                        'category_id': transaction.category_id,
+                        'category_name': category_names.get(transaction.category_id),
+                        'rank': round(-float(score), 6) if score else None
+                    } for transaction, score in rows
+                ],
+                'total': total_count,
+                'total_capped': total_capped,
+                'page': offset // limit + 1 if limit > 0 else 1,
+                'pages': (total_count + limit - 1) // limit if limit > 0 else 1,
+                'per_page': limit
+            }, 200
+
+        except Exception as e:
+            current_app.logger.error(f"Ошибка поиска транзакций: {str(e)}")
+            return {"error": "Ошибка поиска транзакций"}, 500
+
+
+@event.listens_for(Transaction.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    """
+    Индекс создается вместе с таблицей транзакций (create_all).
+    Индекс, оставшийся от удаленной таблицы, перестраивается.
+    """
+    SearchService.ensure_index(connection, rebuild=True)
@@ -0,0 +1,168 @@
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+
+from models import db, CategoryType
+from services.calculator_service import months_until
+from services.currency_service import converted_amount, join_rates
+from services.archive_service import transaction_source
+from services.summary_service import month_start, next_month, iter_months
+
+# Сколько последних полных месяцев истории используется для выборки
+HISTORY_MONTHS = 24
+# Минимальная история, при которой моделирование имеет смысл
+MIN_HISTORY_MONTHS = 3
+# Число симуляций в одном блоке; у каждого блока свой поток случайных чисел
+CHUNK_SIZE = 2000
+# Ограничение объема расчета: симуляции x месяцы
+MAX_CELLS = 5_000_000
+# Seed по умолчанию, чтобы одинаковые запросы давали одинаковый результат
+DEFAULT_SEED = 20240601
+# Перцентили траекторий в ответе
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _simulate_chunk(history: np.ndarray, months: int, start: float, target: float,
+                    seed: np.random.SeedSequence, count: int) -> Tuple[int, np.ndarray]:
+    """
+    Блок бутстреп-симуляций: помесячные чистые накопления выбираются
+    из истории с возвращением. Возвращает число траекторий, достигших
+    цели, и сами траектории (count x months).
+    """
+    rng = np.random.default_rng(seed)
+    paths = start + np.cumsum(rng.choice(history, size=(count, months)), axis=1)
+    return int(np.count_nonzero((paths >= target).any(axis=1))), paths
+
+
+def run_simulations(history: np.ndarray, months: int, start: float, target: float,
+                    simulations: int, seed: int, workers: int = 0,
+                    pool: Optional[Executor] = None) -> Tuple[float, np.ndarray]:
+    """
+    Запускает simulations траекторий блоками по CHUNK_SIZE.
+
+    Потоки случайных чисел блоков порождаются из одного SeedSequence,
+    поэтому результат зависит только от seed и не меняется при расчете
+    в переданном пуле (pool), во временном пуле процессов (workers > 1)
+    или последовательно.
+    Возвращает вероятность достижения цели и перцентили траекторий
+    (len(PERCENTILES) x months).
+    """
+    counts = [CHUNK_SIZE] * (simulations // CHUNK_SIZE)
+    if simulations % CHUNK_SIZE:
+        counts.append(simulations % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    args = [(history, months, start, target, chunk_seed, count)
+            for chunk_seed, count in zip(seeds, counts)]
+
+    if pool is not None and len(args) > 1:
+        results = list(pool.map(_simulate_chunk, *zip(*args)))
+    elif workers > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+            results = list(pool.map(_simulate_chunk, *zip(*args)))
+    else:
+        results = [_simulate_chunk(*chunk_args) for chunk_args in args]
+
+    hits = sum(chunk_hits for chunk_hits, _ in results)
+    paths = np.concatenate([chunk_paths for _, chunk_paths in results])
+    return hits / simulations, np.percentile(paths, PERCENTILES, axis=0)
+
+
+class SimulationService:
+    """
+    Вероятностные расчеты по истории пользователя.
+    Помесячные чистые накопления (доходы минус расходы) загружаются
+    одним агрегатным запросом, а симуляции выполняются векторно NumPy.
+    """
+
+    @staticmethod
+    def monthly_net_history(user_id: int, today: date) -> List[Decimal]:
+        """
+        Чистые накопления за последние HISTORY_MONTHS полных месяцев,
+        начиная с месяца первой транзакции (месяцы до начала учета не
+        считаются нулевыми).
+        """
+        history_end = month_start(today)
+        history_start = history_end
+        for _ in range(HISTORY_MONTHS):
+            history_start = month_start(history_start - timedelta(days=1))
+
+        source = transaction_source(history_start, history_end - timedelta(days=1))
+        base_amount, rates = converted_amount(table=source)
+        rows = join_rates(db.session.query(
+            source.date, source.type, func.sum(base_amount)
+        ).select_from(source), rates).filter(
+            source.user_id == user_id,
+            source.date >= history_start,
+            source.date < history_end
+        ).group_by(source.date, source.type).all()
+        if not rows:
+            return []
+
+        first_month = month_start(min(day for day, _, _ in rows))
+        net = {month: Decimal('0.00') for month in
+               iter_months(first_month, history_end - timedelta(days=1))}
+        for day, transaction_type, amount in rows:
+            amount = amount or Decimal('0.00')
+            net[month_start(day)] += amount if transaction_type == CategoryType.INCOME else -amount
+        return [net[month] for month in sorted(net)]
+
+    @staticmethod
+    def savings_goal_probability(user_id: int, target_amount: Decimal, target_date: date,
+                                 current_savings: Decimal = Decimal('0.00'),
+                                 simulations: int = 5000, seed: Optional[int] = None,
+                                 today: Optional[date] = None,
+                                 pool: Optional[Executor] = None) -> Tuple[Dict, int]:
+        """
+        Вероятность накопить target_amount к target_date при помесячных
+        накоплениях, похожих на историю пользователя (бутстреп).
+        pool - пул процессов фоновых задач для блоков симуляций.
+        """
+        today = today or date.today()
+        if target_date <= today:
+            return {"error": "Target date must be in the future."}, 400
+
+        months = months_until(target_date, today)
+        if simulations * months > MAX_CELLS:
+            return {"error": f"Too many simulations for this horizon "
+                             f"(maximum {MAX_CELLS // months})."}, 400
+
+        try:
+            history = SimulationService.monthly_net_history(user_id, today)
+        except Exception as e:
+            current_app.logger.error(f"Ошибка при загрузке истории накоплений: {str(e)}")
+            return {"error": "Ошибка при загрузке истории накоплений"}, 500
+        if len(history) < MIN_HISTORY_MONTHS:
+            return {"error": f"At least {MIN_HISTORY_MONTHS} months of history are required."}, 400
+
+        seed = DEFAULT_SEED if seed is None else seed
+        probability, trajectories = run_simulations(
+            np.array([float(value) for value in history]), months,
+            float(current_savings), float(target_amount), simulations, seed,
+            current_app.config.get('SIMULATION_WORKERS', 0), pool)
+
+        month_labels = []
+        current = next_month(today)
+        for _ in range(months):
+            month_labels.append(current.strftime('%Y-%m'))
+            current = next_month(current)
+
+        return {
+            "target_amount": str(target_amount),
+            "target_date": target_date.isoformat(),
+            "current_savings": str(current_savings),
+            "months_remaining": months,
+            "simulations": simulations,
+            "seed": seed,
+            "history_months": len(history),
+            "average_monthly_net": round(float(sum(history)) / len(history), 2),
+            "probability": round(probability, 4),
+            "months": month_labels,
+            "trajectories": {
+                f"p{percentile}": [round(float(value), 2) for value in row]
+                for percentile, row in zip(PERCENTILES, trajectories)
+            }
+        }, 200
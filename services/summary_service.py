@@ -0,0 +1,372 @@
+from typing import Dict, Iterable, List, Set, Tuple
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import event, func, insert, inspect, select, tuple_, case, or_
+from sqlalchemy.exc import IntegrityError
+
+from models import (User, Transaction, Category, MonthlySummary, MonthlyCategorySummary,
+                    db, CategoryType)
+from services.currency_service import converted_amount, join_rates
+from services.archive_service import transaction_source
+from services.data_version_service import DataVersionService
+
+
+def month_start(value: date) -> date:
+    """Первое число месяца, в который попадает дата."""
+    return value.replace(day=1)
+
+
+def next_month(value: date) -> date:
+    """Первое число следующего месяца."""
+    return (value.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def iter_months(first: date, last: date) -> List[date]:
+    """Список первых чисел месяцев от first до last включительно."""
+    months = []
+    current = month_start(first)
+    while current <= last:
+        months.append(current)
+        current = next_month(current)
+    return months
+
+
+def split_range(start_date: date, end_date: date) -> Tuple[List[date], List[Tuple[date, date]]]:
+    """
+    Делит диапазон дат на целые месяцы и неполные "края".
+    Возвращает список месяцев и список диапазонов для сырых запросов.
+    """
+    first_full = start_date if start_date.day == 1 else next_month(start_date)
+    # Последний целый месяц заканчивается в end_date, если это конец месяца
+    last_full_end = end_date if next_month(end_date) - timedelta(days=1) == end_date \
+        else month_start(end_date) - timedelta(days=1)
+
+    if first_full > last_full_end:
+        return [], [(start_date, end_date)]
+
+    edges = []
+    if start_date < first_full:
+        edges.append((start_date, first_full - timedelta(days=1)))
+    if last_full_end < end_date:
+        edges.append((last_full_end + timedelta(days=1), end_date))
+    return iter_months(first_full, last_full_end), edges
+
+
+def shift_months(value: date, months: int) -> date:
+    """Дата на months месяцев позже (раньше при months < 0), день не дальше конца месяца."""
+    index = value.year * 12 + value.month - 1 + months
+    first = date(index // 12, index % 12 + 1, 1)
+    return min(first + timedelta(days=value.day - 1), next_month(first) - timedelta(days=1))
+
+
+def comparison_periods(start_date: date, end_date: date) -> Dict[str, Tuple[date, date]]:
+    """
+    Текущий период, предыдущий и тот же период годом раньше (включительно).
+    Если период состоит из целых месяцев, предыдущий - столько же месяцев
+    перед ним, иначе - столько же дней.
+    """
+    months, edges = split_range(start_date, end_date)
+    before_start = start_date - timedelta(days=1)
+    if months and not edges:
+        previous = (shift_months(start_date, -len(months)), before_start)
+        year_ago_end = next_month(shift_months(end_date, -12)) - timedelta(days=1)
+    else:
+        previous = (before_start - (end_date - start_date), before_start)
+        year_ago_end = shift_months(end_date, -12)
+    return {'current': (start_date, end_date), 'previous': previous,
+            'year_ago': (shift_months(start_date, -12), year_ago_end)}
+
+
+def change(current: Decimal, base: Decimal) -> Dict:
+    """Разница с базовым периодом и ее процент (None при нулевой базе)."""
+    delta = current - base
+    return {
+        "amount": delta,
+        "percent": (delta * 100 / abs(base)).quantize(Decimal('0.01')) if base else None
+    }
+
+
+class SummaryService:
+    """
+    Сервис сводных отчетов на основе помесячных итогов.
+    Целые месяцы читаются из monthly_summaries, неполные месяцы
+    на краях диапазона считаются небольшими запросами по транзакциям.
+    Все суммы - в базовой валюте (пересчет по курсу на дату в SQL).
+    """
+
+    @staticmethod
+    def get_summary(user_id: int, start_date: date, end_date: date) -> Dict:
+        """
+        Сводка доходов и расходов за период с разбивкой расходов по категориям.
+        """
+        months, edges = split_range(start_date, end_date)
+
+        total_income = Decimal('0.00')
+        total_expense = Decimal('0.00')
+        by_category: Dict[int, List] = {}
+
+        def add_category(category_id, name, amount):
+            entry = by_category.setdefault(category_id, [name, Decimal('0.00')])
+            entry[1] += amount or Decimal('0.00')
+
+        if months:
+            SummaryService.ensure_months(user_id, months)
+
+            income, expense = db.session.query(
+                func.sum(MonthlySummary.total_income),
+                func.sum(MonthlySummary.total_expense)
+            ).filter(
+                MonthlySummary.user_id == user_id,
+                MonthlySummary.month >= months[0],
+                MonthlySummary.month <= months[-1]
+            ).one()
+            total_income += income or Decimal('0.00')
+            total_expense += expense or Decimal('0.00')
+
+            stored_categories = db.session.query(
+                Category.id, Category.name,
+                func.sum(MonthlyCategorySummary.total_amount)
+            ).join(Category, MonthlyCategorySummary.category_id == Category.id
+                   ).filter(
+                MonthlyCategorySummary.user_id == user_id,
+                MonthlyCategorySummary.month >= months[0],
+                MonthlyCategorySummary.month <= months[-1]
+            ).group_by(Category.id, Category.name).all()
+            for category_id, name, amount in stored_categories:
+                add_category(category_id, name, amount)
+
+        # Неполные месяцы: один сгруппированный запрос на каждый край
+        for edge_start, edge_end in edges:
+            source = transaction_source(edge_start, edge_end)
+            base_amount, rates = converted_amount(table=source)
+            rows = join_rates(db.session.query(
+                source.type, Category.id, Category.name,
+                func.sum(base_amount)
+            ).join(Category, source.category_id == Category.id), rates
+            ).filter(
+                source.user_id == user_id,
+                source.date >= edge_start,
+                source.date <= edge_end
+            ).group_by(source.type, Category.id, Category.name).all()
+            for transaction_type, category_id, name, amount in rows:
+                amount = amount or Decimal('0.00')
+                if transaction_type == CategoryType.INCOME:
+                    total_income += amount
+                elif transaction_type == CategoryType.EXPENSE:
+                    total_expense += amount
+                    add_category(category_id, name, amount)
+
+        expenses_breakdown = [
+            {"category_id": category_id, "category_name": name,
+             "total_amount": amount}
+            for category_id, (name, amount) in sorted(
+                by_category.items(), key=lambda item: item[1][1], reverse=True)
+        ]
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "total_income": total_income,
+            "total_expense": total_expense,
+            "net_total": total_income - total_expense,
+            "expenses_by_category": expenses_breakdown
+        }
+
+    @staticmethod
+    def get_comparison(user_id: int, start_date: date, end_date: date) -> Dict:
+        """
+        Сравнение периода с предыдущим и с тем же периодом годом раньше
+        по категориям. Все три периода считаются одним запросом: строки
+        отбираются по объединению диапазонов, а суммы каждого периода -
+        условной агрегацией SUM(CASE WHEN дата в периоде ...).
+        """
+        periods = comparison_periods(start_date, end_date)
+        first = min(period_start for period_start, _ in periods.values())
+        source = transaction_source(first, end_date)
+        base_amount, rates = converted_amount(table=source)
+        sums = [
+            func.sum(case((source.date.between(period_start, period_end), base_amount)))
+            for period_start, period_end in periods.values()
+        ]
+        rows = join_rates(db.session.query(
+            source.type, source.category_id, Category.name, *sums
+        ).outerjoin(Category, source.category_id == Category.id), rates).filter(
+            source.user_id == user_id,
+            or_(*[source.date.between(period_start, period_end)
+                  for period_start, period_end in periods.values()])
+        ).group_by(source.type, source.category_id, Category.name).all()
+
+        zero = Decimal('0.00')
+        totals = {name: {CategoryType.INCOME: zero, CategoryType.EXPENSE: zero} for name in periods}
+        categories = []
+        for transaction_type, category_id, name, *amounts in rows:
+            amounts = dict(zip(periods, (amount or zero for amount in amounts)))
+            for period, amount in amounts.items():
+                totals[period][transaction_type] += amount
+            categories.append({
+                "category_id": category_id, "category_name": name,
+                "type": transaction_type.value, **amounts,
+                "change_previous": change(amounts['current'], amounts['previous']),
+                "change_year_ago": change(amounts['current'], amounts['year_ago'])
+            })
+        categories.sort(key=lambda item: (item['type'], -item['current'], -item['previous']))
+
+        result = {"periods": {}, "categories": categories}
+        for period, (period_start, period_end) in periods.items():
+            income, expense = totals[period][CategoryType.INCOME], totals[period][CategoryType.EXPENSE]
+            result["periods"][period] = {
+                "start_date": period_start, "end_date": period_end,
+                "total_income": income, "total_expense": expense, "net_total": income - expense
+            }
+        for period in ('previous', 'year_ago'):
+            result[f"change_{period}"] = {
+                key: change(result["periods"]['current'][key], result["periods"][period][key])
+                for key in ('total_income', 'total_expense', 'net_total')
+            }
+        return result
+
+    @staticmethod
+    def ensure_months(user_id: int, months: List[date]) -> None:
+        """
+        Материализует итоги месяцев, для которых их еще нет.
+        Отсутствующие месяцы считаются одним запросом по транзакциям.
+        Итоги не сохраняются, если версия данных пользователя изменилась
+        после чтения: параллельная запись могла не попасть в снимок.
+        """
+        existing = {
+            month for (month,) in db.session.query(MonthlySummary.month).filter(
+                MonthlySummary.user_id == user_id,
+                MonthlySummary.month >= months[0],
+                MonthlySummary.month <= months[-1]
+            )
+        }
+        missing = [month for month in months if month not in existing]
+        if not missing:
+            return
+
+        version = DataVersionService.get_version(user_id)[0]
+        source = transaction_source(missing[0], next_month(missing[-1]) - timedelta(days=1))
+        base_amount, rates = converted_amount(table=source)
+        rows = join_rates(db.session.query(
+            source.date, source.type, source.category_id,
+            func.sum(base_amount)
+        ), rates).filter(
+            source.user_id == user_id,
+            source.date >= missing[0],
+            source.date < next_month(missing[-1])
+        ).group_by(source.date, source.type, source.category_id).all()
+
+        missing_set = set(missing)
+        totals = {month: [Decimal('0.00'), Decimal('0.00')] for month in missing}
+        category_totals: Dict[Tuple[date, int], Decimal] = {}
+        for day, transaction_type, category_id, amount in rows:
+            month = month_start(day)
+            if month not in missing_set:
+                continue
+            amount = amount or Decimal('0.00')
+            if transaction_type == CategoryType.INCOME:
+                totals[month][0] += amount
+            else:
+                totals[month][1] += amount
+                key = (month, category_id)
+                category_totals[key] = category_totals.get(
+                    key, Decimal('0.00')) + amount
+
+        SummaryService._store_months(
+            user_id, version,
+            [{'user_id': user_id, 'month': month, 'total_income': income, 'total_expense': expense}
+             for month, (income, expense) in totals.items()],
+            [{'user_id': user_id, 'month': month, 'category_id': category_id, 'total_amount': amount}
+             for (month, category_id), amount in category_totals.items()])
+
+    @staticmethod
+    def _store_months(user_id: int, version: int,
+                      month_rows: List[Dict], category_rows: List[Dict]) -> None:
+        """
+        Записывает материализованные итоги, не фиксируя и не откатывая
+        сессию вызывающего кода (ensure_months вызывается из чтения).
+        Если у сессии есть незафиксированные изменения (например, атомарный
+        пакет запросов), итоги пишутся в SAVEPOINT ее транзакции и
+        фиксируются вместе с ней; иначе - на отдельном соединении.
+
+        Версия данных проверяется после вставки в той же транзакции: она
+        уже держит блокировку записи, поэтому изменение, зафиксированное
+        после чтения итогов, видно, а более позднее - удалит эти строки
+        своей инвалидацией. Если версия не равна version, итоги
+        отбрасываются и будут посчитаны при следующем чтении.
+        """
+        users = User.__table__
+
+        def insert_rows(executor) -> bool:
+            executor.execute(insert(MonthlySummary.__table__), month_rows)
+            if category_rows:
+                executor.execute(insert(MonthlyCategorySummary.__table__), category_rows)
+            return executor.execute(select(users.c.data_version).where(
+                users.c.id == user_id)).scalar() == version
+
+        # sqlite3 открывает транзакцию только перед первой записью
+        raw = db.session.connection().connection.dbapi_connection
+        if getattr(raw, 'in_transaction', True):
+            try:
+                with db.session.begin_nested() as savepoint:
+                    if not insert_rows(db.session):
+                        savepoint.rollback()
+            except IntegrityError:
+                # Параллельный запрос уже материализовал эти месяцы:
+                # откатывается только SAVEPOINT
+                pass
+            return
+
+        with db.engine.connect() as connection:
+            try:
+                if insert_rows(connection):
+                    connection.commit()
+                else:
+                    connection.rollback()
+            except IntegrityError:
+                connection.rollback()
+
+    @staticmethod
+    def invalidate(user_months: Iterable[Tuple[int, date]], connection=None) -> None:
+        """
+        Удаляет материализованные итоги указанных (user_id, месяц).
+        Нужно вызывать после массовых UPDATE/DELETE в обход ORM.
+        """
+        keys = {(user_id, month_start(month)) for user_id, month in user_months}
+        if not keys:
+            return
+        executor = connection if connection is not None else db.session
+        for model in (MonthlySummary, MonthlyCategorySummary):
+            executor.execute(model.__table__.delete().where(
+                tuple_(model.user_id, model.month).in_(list(keys))))
+
+    @staticmethod
+    def invalidate_user(user_id: int, connection=None) -> None:
+        """Удаляет все материализованные итоги пользователя."""
+        executor = connection if connection is not None else db.session
+        for model in (MonthlySummary, MonthlyCategorySummary):
+            executor.execute(model.__table__.delete().where(
+                model.user_id == user_id))
+
+
+def _changed_transaction_months(session) -> Set[Tuple[int, date]]:
+    """Собирает (user_id, месяц) для измененных в сессии транзакций."""
+    keys = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Transaction) or obj.user_id is None:
+            continue
+        dates = set(inspect(obj).attrs.date.history.deleted or ())
+        if obj.date is not None:
+            dates.add(obj.date)
+        for value in dates:
+            if isinstance(value, date):
+                keys.add((obj.user_id, month_start(value)))
+    return keys
+
+
+@event.listens_for(db.session, 'after_flush')
+def _invalidate_changed_months(session, flush_context):
+    """Сбрасывает итоги месяцев, транзакции которых изменились при flush."""
+    keys = _changed_transaction_months(session)
+    if keys:
+        SummaryService.invalidate(keys, connection=session.connection())
@@ -0,0 +1,166 @@
+from typing import Any, Dict, Optional, Tuple
+from flask import current_app
+from sqlalchemy import select, and_, or_
+
+from models import Transaction, Category, Budget, DeletedRecord, db
+from services.archive_service import transaction_source
+from services.data_version_service import DataVersionService
+
+# Источники изменений в порядке внутри одной версии данных: позиция
+# в этом списке входит в курсор, поэтому порядок менять нельзя
+SYNC_SOURCES = ('transactions', 'categories', 'budgets', 'deleted')
+DEFAULT_SYNC_LIMIT = 500
+
+Cursor = Tuple[int, int, int]
+
+
+def parse_token(token: Optional[str]) -> Optional[Cursor]:
+    """
+    Курсор из токена синхронизации "версия.источник.id".
+    Пустой токен - полная синхронизация, токен из одного числа -
+    все изменения после этой версии данных. None для неверного токена.
+    """
+    if not token:
+        return 0, len(SYNC_SOURCES), 0
+    try:
+        parts = [int(part) for part in token.split('.')]
+    except ValueError:
+        return None
+    if len(parts) == 1:
+        return parts[0], len(SYNC_SOURCES), 0
+    if len(parts) != 3 or min(parts) < 0 or parts[1] >= len(SYNC_SOURCES):
+        return None
+    return parts[0], parts[1], parts[2]
+
+
+def make_token(cursor: Cursor) -> str:
+    """Токен синхронизации для курсора."""
+    seq, source, row_id = cursor
+    if source == len(SYNC_SOURCES):
+        return str(seq)
+    return f'{seq}.{source}.{row_id}'
+
+
+def _after_cursor(seq_column, id_column, source: int, cursor: Cursor):
+    """Условие "строка идет после курсора" в порядке (версия, источник, id)."""
+    seq, cursor_source, cursor_id = cursor
+    if source > cursor_source:
+        return seq_column >= seq
+    if source < cursor_source:
+        return seq_column > seq
+    return or_(seq_column > seq, and_(seq_column == seq, id_column > cursor_id))
+
+
+def _transaction_dict(transaction: Transaction) -> Dict[str, Any]:
+    return {
+        'id': transaction.id,
+        'description': transaction.description,
+        'amount': float(transaction.amount),
+        'currency': transaction.currency,
+        'date': transaction.date.isoformat(),
+        'type': transaction.type.value,
+        'category_id': transaction.category_id,
+        'created_at': transaction.created_at.isoformat() if transaction.created_at else None,
+        'updated_at': transaction.updated_at.isoformat() if transaction.updated_at else None
+    }
+
+
+def _category_dict(category: Category) -> Dict[str, Any]:
+    return {
+        'id': category.id,
+        'name': category.name,
+        'type': category.type.value,
+        'updated_at': category.updated_at.isoformat() if category.updated_at else None
+    }
+
+
+def _budget_dict(budget: Budget) -> Dict[str, Any]:
+    return {
+        'id': budget.id,
+        'name': budget.name,
+        'period': budget.period.value,
+        'start_date': budget.start_date.isoformat(),
+        'end_date': budget.end_date.isoformat(),
+        'target_amount': float(budget.target_amount) if budget.target_amount else None,
+        'currency': budget.currency,
+        'created_at': budget.created_at.isoformat() if budget.created_at else None,
+        'updated_at': budget.updated_at.isoformat() if budget.updated_at else None
+    }
+
+
+def _deleted_dict(record: DeletedRecord) -> Dict[str, Any]:
+    return {'table': record.table_name, 'id': record.record_id}
+
+
+# Модель и сериализация для каждого источника
+_SOURCES = {
+    'transactions': (Transaction, _transaction_dict),
+    'categories': (Category, _category_dict),
+    'budgets': (Budget, _budget_dict),
+    'deleted': (DeletedRecord, _deleted_dict)
+}
+
+
+class SyncService:
+    """
+    Дельта-синхронизация клиентов.
+    Каждая измененная строка транзакций, категорий и бюджетов хранит
+    версию данных владельца (change_seq), удаления записываются в
+    deleted_records. Клиент передает токен последней синхронизации и
+    получает только строки, измененные или удаленные после него;
+    применять их нужно в порядке: сначала удаления, затем изменения.
+    """
+
+    @staticmethod
+    def get_changes(user_id: int, token: Optional[str] = None,
+                    limit: int = DEFAULT_SYNC_LIMIT) -> Tuple[Dict, int]:
+        """
+        Изменения после токена в порядке (версия, источник, id), не более
+        limit строк. Из каждого источника читается не больше limit + 1
+        строк по индексу (user_id, change_seq).
+        """
+        cursor = parse_token(token)
+        if cursor is None:
+            return {"error": "Неверный токен синхронизации"}, 400
+
+        try:
+            entries = []
+            for source, name in enumerate(SYNC_SOURCES):
+                model = _SOURCES[name][0]
+                if model is Transaction:
+                    # Архивные транзакции не удаляются, а переносятся со своей
+                    # версией: полная синхронизация получает и их
+                    model = transaction_source()
+                rows = db.session.execute(
+                    select(model).where(
+                        model.user_id == user_id,
+                        _after_cursor(model.change_seq, model.id, source, cursor)
+                    ).order_by(model.change_seq, model.id).limit(limit + 1)
+                ).scalars().all()
+                entries.extend(((row.change_seq, source, row.id), name, row) for row in rows)
+
+            entries.sort(key=lambda entry: entry[0])
+            page = entries[:limit]
+            result: Dict[str, Any] = {name: [] for name in SYNC_SOURCES}
+            for _, name, row in page:
+                result[name].append(_SOURCES[name][1](row))
+
+            if page:
+                next_cursor = page[-1][0]
+                # Последняя страница: токен сокращается до версии данных
+                if len(entries) <= limit:
+                    next_cursor = (max(next_cursor[0], cursor[0]), len(SYNC_SOURCES), 0)
+            else:
+                next_cursor = cursor
+
+            result.update({
+                'token': make_token(next_cursor),
+                'has_more': len(entries) > limit,
+                'version': DataVersionService.get_version(user_id)[0]
+            })
+            return result, 200
+
+        except Exception as e:
+            current_app.logger.error(
+                f"Ошибка при получении изменений для синхронизации: {str(e)}")
+            return {"error": "Ошибка при получении изменений"}, 500
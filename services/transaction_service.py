@@ -1,13 +1,21 @@
 from typing import Dict, List, Optional, Tuple, Union, Any
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import date
 from decimal import Decimal
 from flask import current_app
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func, desc, asc, and_
+from sqlalchemy import func, desc, asc, and_, update
 
-from models import Transaction, Category, db, CategoryType
-from services.base_service import BaseService
+from models import Transaction, Category, RecurringConfirmation, db, CategoryType, BASE_CURRENCY
+from services.archive_service import transaction_source
+from services.base_service import BaseService, chunked, parse_amount, parse_date
 from services.category_service import CategoryService
+from services.categorizer_service import CategorizerService
+from services.category_stats_service import CategoryStatsService
+from services.currency_service import ExchangeRateService, converted_amount, join_rates
+from services.dedup_service import DedupService, transaction_fingerprint
+from services.group_commit_service import committer_for_session
+from services.summary_service import SummaryService
 
 
 class TransactionService(BaseService):
@@ -33,22 +41,24 @@ class TransactionService(BaseService):
         Получение транзакций пользователя с фильтрацией и сортировкой.
         """
         try:
-            query = Transaction.query.filter_by(user_id=user_id)
+            # Транзакции архивных лет периода читаются из их архивов
+            source = transaction_source(start_date, end_date)
+            query = db.session.query(source).filter(source.user_id == user_id)
 
             # Применяем фильтры
             if start_date:
-                query = query.filter(Transaction.date >= start_date)
+                query = query.filter(source.date >= start_date)
 
             if end_date:
-                query = query.filter(Transaction.date <= end_date)
+                query = query.filter(source.date <= end_date)
 
             if category_id:
-                query = query.filter(Transaction.category_id == category_id)
+                query = query.filter(source.category_id == category_id)
 
             if transaction_type:
                 try:
                     type_enum = CategoryType(transaction_type)
-                    query = query.filter(Transaction.type == type_enum)
+                    query = query.filter(source.type == type_enum)
                 except ValueError:
                     return {"error": f"Неверный тип транзакции. Допустимые значения: {[t.value for t in CategoryType]}"}, 400
 
@@ -56,7 +66,7 @@ class TransactionService(BaseService):
             if sort_by not in ['date', 'amount', 'id']:
                 sort_by = 'date'  # По умолчанию сортируем по дате
 
-            sort_column = getattr(Transaction, sort_by)
+            sort_column = getattr(source, sort_by)
             if sort_direction.lower() == 'asc':
                 query = query.order_by(asc(sort_column))
             else:
@@ -73,6 +83,7 @@ class TransactionService(BaseService):
                     'description': transaction.description,
                     # Преобразуем Decimal в float для JSON
                     'amount': float(transaction.amount),
+                    'currency': transaction.currency,
                     'date': transaction.date.isoformat(),
                     'type': transaction.type.value,
                     'category_id': transaction.category_id,
@@ -135,32 +146,52 @@ class TransactionService(BaseService):
                 return category_result, status_code
 
             category = category_result
-
-            # Создаем транзакцию
-            transaction = Transaction(
-                description=data.get('description', ''),
-                amount=amount,
-                date=transaction_date,
-                type=category.type,  # Устанавливаем тип в соответствии с категорией
-                category_id=category_id,
-                user_id=user_id
-            )
-
-            db.session.add(transaction)
-            db.session.commit()
+            category_name = category.name
+
+            # Валюта транзакции: нужен курс к базовой валюте на дату
+            currency = BASE_CURRENCY
+            if data.get('currency') is not None:
+                currency, error = ExchangeRateService.check_currency(
+                    data['currency'], transaction_date)
+                if error:
+                    return {"error": error}, 400
+
+            values = {
+                'description': data.get('description', ''),
+                'amount': amount,
+                'currency': currency,
+                'date': transaction_date,
+                'type': category.type,  # Устанавливаем тип в соответствии с категорией
+                'category_id': category_id,
+                'user_id': user_id
+            }
+
+            committer = committer_for_session()
+            if committer is not None:
+                written = committer.insert(values)
+            else:
+                # Создаем транзакцию
+                transaction = Transaction(**values)
+                db.session.add(transaction)
+                db.session.commit()
+                written = {'id': transaction.id, 'created_at': transaction.created_at}
 
             return {
-                'id': transaction.id,
-                'description': transaction.description,
-                'amount': float(transaction.amount),
-                'date': transaction.date.isoformat(),
-                'type': transaction.type.value,
-                'category_id': transaction.category_id,
-                'category_name': category.name,
-                'user_id': transaction.user_id,
-                'created_at': transaction.created_at.isoformat() if transaction.created_at else None
+                'id': written['id'],
+                'description': values['description'],
+                'amount': float(values['amount']),
+                'currency': values['currency'],
+                'date': values['date'].isoformat(),
+                'type': values['type'].value,
+                'category_id': values['category_id'],
+                'category_name': category_name,
+                'user_id': user_id,
+                'created_at': written['created_at'].isoformat() if written['created_at'] else None
             }, 201
 
+        except FutureTimeoutError:
+            current_app.logger.error("Истекло ожидание группового коммита транзакции")
+            return {"error": "Сервер перегружен, повторите запрос позже"}, 503
         except SQLAlchemyError as e:
             db.session.rollback()
             current_app.logger.error(
@@ -209,6 +240,14 @@ class TransactionService(BaseService):
                 except ValueError:
                     return {"error": "Неверный формат даты. Используйте формат YYYY-MM-DD"}, 400
 
+            # Обновление валюты: курс должен быть известен на дату транзакции
+            if 'currency' in data or ('date' in data and transaction.currency != BASE_CURRENCY):
+                currency, error = ExchangeRateService.check_currency(
+                    data.get('currency', transaction.currency), transaction.date)
+                if error:
+                    return {"error": error}, 400
+                transaction.currency = currency
+
             # Обновление категории
             if 'category_id' in data:
                 category_id = data['category_id']
@@ -232,6 +271,7 @@ class TransactionService(BaseService):
                 'id': transaction.id,
                 'description': transaction.description,
                 'amount': float(transaction.amount),
+                'currency': transaction.currency,
                 'date': transaction.date.isoformat(),
                 'type': transaction.type.value,
                 'category_id': transaction.category_id,
@@ -292,34 +332,38 @@ class TransactionService(BaseService):
         Получение статистики по транзакциям пользователя.
         """
         try:
+            # Источник строк: основная таблица и архивы лет периода
+            source = transaction_source(start_date, end_date)
+
             # Формируем базовые запросы для доходов и расходов
-            income_query = Transaction.query.filter_by(
-                user_id=user_id,
-                type=CategoryType.INCOME
+            income_query = db.session.query(source).filter(
+                source.user_id == user_id,
+                source.type == CategoryType.INCOME
             )
-            expense_query = Transaction.query.filter_by(
-                user_id=user_id,
-                type=CategoryType.EXPENSE
+            expense_query = db.session.query(source).filter(
+                source.user_id == user_id,
+                source.type == CategoryType.EXPENSE
             )
 
             # Применяем фильтры по датам
             if start_date:
                 income_query = income_query.filter(
-                    Transaction.date >= start_date)
+                    source.date >= start_date)
                 expense_query = expense_query.filter(
-                    Transaction.date >= start_date)
+                    source.date >= start_date)
 
             if end_date:
                 income_query = income_query.filter(
-                    Transaction.date <= end_date)
+                    source.date <= end_date)
                 expense_query = expense_query.filter(
-                    Transaction.date <= end_date)
+                    source.date <= end_date)
 
-            # Рассчитываем общие суммы
-            total_income = db.session.query(func.sum(Transaction.amount)).select_from(
-                income_query.subquery()).scalar() or 0
-            total_expense = db.session.query(func.sum(Transaction.amount)).select_from(
-                expense_query.subquery()).scalar() or 0
+            # Рассчитываем общие суммы в базовой валюте
+            base_amount, rates = converted_amount(table=source)
+            total_income = join_rates(income_query.with_entities(
+                func.sum(base_amount)), rates).scalar() or 0
+            total_expense = join_rates(expense_query.with_entities(
+                func.sum(base_amount)), rates).scalar() or 0
 
             # Группировка данных
             income_data = []
@@ -327,38 +371,38 @@ class TransactionService(BaseService):
 
             if group_by == 'category':
                 # Группировка по категориям
-                income_by_category = db.session.query(
+                income_by_category = join_rates(db.session.query(
                     Category.name,
-                    func.sum(Transaction.amount).label('total')
-                ).join(Transaction).filter(
-                    Transaction.user_id == user_id,
-                    Transaction.type == CategoryType.INCOME
+                    func.sum(base_amount).label('total')
+                ).join(source, source.category_id == Category.id), rates).filter(
+                    source.user_id == user_id,
+                    source.type == CategoryType.INCOME
                 )
 
                 if start_date:
                     income_by_category = income_by_category.filter(
-                        Transaction.date >= start_date)
+                        source.date >= start_date)
                 if end_date:
                     income_by_category = income_by_category.filter(
-                        Transaction.date <= end_date)
+                        source.date <= end_date)
 
                 income_by_category = income_by_category.group_by(
                     Category.name).all()
 
-                expense_by_category = db.session.query(
+                expense_by_category = join_rates(db.session.query(
                     Category.name,
-                    func.sum(Transaction.amount).label('total')
-                ).join(Transaction).filter(
-                    Transaction.user_id == user_id,
-                    Transaction.type == CategoryType.EXPENSE
+                    func.sum(base_amount).label('total')
+                ).join(source, source.category_id == Category.id), rates).filter(
+                    source.user_id == user_id,
+                    source.type == CategoryType.EXPENSE
                 )
 
                 if start_date:
                     expense_by_category = expense_by_category.filter(
-                        Transaction.date >= start_date)
+                        source.date >= start_date)
                 if end_date:
                     expense_by_category = expense_by_category.filter(
-                        Transaction.date <= end_date)
+                        source.date <= end_date)
 
                 expense_by_category = expense_by_category.group_by(
                     Category.name).all()
@@ -397,3 +441,262 @@ class TransactionService(BaseService):
             current_app.logger.error(
                 f"Ошибка при получении статистики: {str(e)}")
             return {"error": "Ошибка при получении статистики по транзакциям"}, 500
+
+    @staticmethod
+    def suggest_categories(user_id: int, description: str,
+                           transaction_type: Optional[str] = None,
+                           limit: int = 3) -> Tuple[Union[Dict, List[Dict]], int]:
+        """
+        Предлагаемые категории для описания по истории пользователя.
+        Учитываются только существующие категории нужного типа.
+        """
+        try:
+            categories = {category.id: category for category in
+                          Category.query.filter_by(user_id=user_id).all()}
+            suggestions = CategorizerService.suggest(user_id, description, limit=len(categories))
+            result = []
+            for category_id, confidence in suggestions:
+                category = categories.get(category_id)
+                if category is None or (transaction_type and category.type.value != transaction_type):
+                    continue
+                result.append({
+                    'category_id': category_id,
+                    'category_name': category.name,
+                    'type': category.type.value,
+                    'confidence': confidence
+                })
+            return result[:limit], 200
+
+        except Exception as e:
+            current_app.logger.error(
+                f"Ошибка при подборе категории: {str(e)}")
+            return {"error": "Ошибка при подборе категории"}, 500
+
+    @staticmethod
+    def import_transactions(user_id: int, rows: List[Dict[str, Any]],
+                            auto_categorize: bool = True,
+                            min_confidence: float = 0.0,
+                            skip_duplicates: bool = True) -> Tuple[Dict, int]:
+        """
+        Импорт пакета транзакций.
+        Строкам без category_id категория подбирается по описанию.
+        Если хотя бы одна строка некорректна, ничего не сохраняется
+        и возвращается список ошибок по строкам. Строки, которые уже
+        есть в базе (та же дата, сумма и описание), пропускаются.
+        """
+        try:
+            categories = {category.id: category for category in
+                          Category.query.filter_by(user_id=user_id).all()}
+            model = CategorizerService.get_model(user_id) if auto_categorize else None
+
+            errors = []
+            prepared = []
+            for index, row in enumerate(rows):
+                category_id = row.get('category_id')
+                confidence = None
+                if category_id is None and model is not None:
+                    for suggested_id, score in model.suggest(row.get('description'), limit=len(categories)):
+                        category = categories.get(suggested_id)
+                        if category is None or score < min_confidence or \
+                                (row.get('type') and category.type.value != row['type']):
+                            continue
+                        category_id, confidence = suggested_id, score
+                        break
+
+                if category_id is None:
+                    errors.append({'index': index, 'error': "Не удалось определить категорию, укажите category_id"})
+                    continue
+                category = categories.get(category_id)
+                if category is None:
+                    errors.append({'index': index, 'error': f"Категория {category_id} не найдена"})
+                    continue
+                if row.get('type') and category.type.value != row['type']:
+                    errors.append({'index': index, 'error': "Тип транзакции не совпадает с типом категории"})
+                    continue
+                currency = BASE_CURRENCY
+                if row.get('currency') is not None:
+                    currency, error = ExchangeRateService.check_currency(row['currency'], row['date'])
+                    if error:
+                        errors.append({'index': index, 'error': error})
+                        continue
+                prepared.append((index, category, confidence, Transaction(
+                    description=row.get('description'),
+                    amount=row['amount'],
+                    currency=currency,
+                    date=row['date'],
+                    type=category.type,
+                    category_id=category.id,
+                    user_id=user_id
+                )))
+
+            if errors:
+                return {"error": "Импорт не выполнен: ошибки в строках", "errors": errors}, 400
+
+            duplicates = set()
+            if skip_duplicates:
+                duplicates = DedupService.find_duplicates(user_id, [
+                    (transaction.date, transaction.amount, transaction.currency,
+                     transaction.description)
+                    for _, _, _, transaction in prepared])
+                prepared = [item for position, item in enumerate(prepared)
+                            if position not in duplicates]
+                # Позиции в prepared совпадают с индексами строк: ошибок нет
+                duplicates = sorted(duplicates)
+
+            db.session.add_all([transaction for _, _, _, transaction in prepared])
+            db.session.commit()
+
+            return {
+                'created': len(prepared),
+                'duplicates': list(duplicates),
+                'items': [
+                    {
+                        'index': index,
+                        'id': transaction.id,
+                        'category_id': category.id,
+                        'category_name': category.name,
+                        'auto_categorized': confidence is not None,
+                        'confidence': confidence
+                    } for index, category, confidence, transaction in prepared
+                ]
+            }, 201
+
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Ошибка SQLAlchemy при импорте транзакций: {str(e)}")
+            return {"error": "Ошибка базы данных при импорте транзакций"}, 500
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Неожиданная ошибка при импорте транзакций: {str(e)}")
+            return {"error": "Внутренняя ошибка сервера"}, 500
+
+    @staticmethod
+    def _after_bulk_write(user_id: int, old_rows: List[Dict], new_rows: List[Dict]) -> None:
+        """
+        Обновляет производные данные после массовой записи в обход ORM:
+        итоги затронутых месяцев и счетчики затронутых категорий.
+        """
+        rows = old_rows + new_rows
+        SummaryService.invalidate({(user_id, row['date']) for row in rows})
+        CategoryStatsService.recalculate({row['category_id'] for row in rows})
+
+    @staticmethod
+    def _after_bulk_delete(user_id: int, old_rows: List[Dict], new_rows: List[Dict]) -> None:
+        """Как _after_bulk_write, плюс отвязка подтверждений повторяющихся правил."""
+        ids = [row['id'] for row in old_rows]
+        for chunk in chunked(ids):
+            db.session.execute(update(RecurringConfirmation).where(
+                RecurringConfirmation.transaction_id.in_(chunk)).values(transaction_id=None),
+                execution_options={'synchronize_session': False})
+        TransactionService._after_bulk_write(user_id, old_rows, new_rows)
+
+    @staticmethod
+    def _finish_bulk(user_id: int, result: Tuple[Dict, int]) -> Tuple[Dict, int]:
+        """Сбрасывает модель автокатегоризации после успешной массовой записи."""
+        payload, status = result
+        if status == 200 and payload.get('succeeded'):
+            CategorizerService.invalidate([user_id])
+        return result
+
+    @staticmethod
+    def bulk_create(user_id: int, items: List[Dict[str, Any]],
+                    atomic: bool = False) -> Tuple[Dict, int]:
+        """
+        Массовое создание транзакций. Категории пользователя читаются
+        одним запросом, строки вставляются пачками.
+        """
+        categories = {category.id: category for category in
+                      Category.query.filter_by(user_id=user_id).all()}
+
+        def prepare(item):
+            for field in ('amount', 'date', 'category_id'):
+                if field not in item:
+                    return {"error": f"Отсутствует обязательное поле: {field}"}, 400
+            amount, error = parse_amount(item['amount'])
+            if error:
+                return {"error": error}, 400
+            transaction_date, error = parse_date(item['date'])
+            if error:
+                return {"error": error}, 400
+            if transaction_date > date.today():
+                return {"error": "Дата транзакции не может быть в будущем"}, 400
+            category = categories.get(item['category_id'])
+            if category is None:
+                return {"error": "Категория не найдена"}, 404
+            currency = BASE_CURRENCY
+            if item.get('currency') is not None:
+                currency, error = ExchangeRateService.check_currency(item['currency'], transaction_date)
+                if error:
+                    return {"error": error}, 400
+            description = item.get('description', '')
+            return {
+                'description': description,
+                'amount': amount,
+                'currency': currency,
+                'date': transaction_date,
+                'type': category.type,
+                'category_id': category.id,
+                'fingerprint': transaction_fingerprint(
+                    user_id, transaction_date, amount, currency, description)
+            }, 200
+
+        return TransactionService._finish_bulk(user_id, BaseService.create_many(
+            Transaction, user_id, items, prepare,
+            after_write=TransactionService._after_bulk_write, atomic=atomic))
+
+    @staticmethod
+    def bulk_update(user_id: int, items: List[Dict[str, Any]],
+                    atomic: bool = False) -> Tuple[Dict, int]:
+        """
+        Массовое обновление транзакций: каждый элемент содержит id и
+        изменяемые поля (amount, currency, date, category_id, description).
+        """
+        categories = {category.id: category for category in
+                      Category.query.filter_by(user_id=user_id).all()}
+
+        def prepare(item, row):
+            values = {}
+            if 'amount' in item:
+                values['amount'], error = parse_amount(item['amount'])
+                if error:
+                    return {"error": error}, 400
+            if 'date' in item:
+                values['date'], error = parse_date(item['date'])
+                if error:
+                    return {"error": error}, 400
+                if values['date'] > date.today():
+                    return {"error": "Дата транзакции не может быть в будущем"}, 400
+            if 'category_id' in item:
+                category = categories.get(item['category_id'])
+                if category is None:
+                    return {"error": "Категория не найдена"}, 404
+                values['category_id'] = category.id
+                values['type'] = category.type
+            if 'description' in item:
+                values['description'] = item['description']
+            if 'currency' in item or 'date' in values:
+                merged = dict(row, **values)
+                currency, error = ExchangeRateService.check_currency(
+                    item.get('currency', merged['currency']), merged['date'])
+                if error:
+                    return {"error": error}, 400
+                values['currency'] = currency
+            if {'amount', 'date', 'currency', 'description'} & set(values):
+                merged = dict(row, **values)
+                values['fingerprint'] = transaction_fingerprint(
+                    user_id, merged['date'], merged['amount'], merged['currency'],
+                    merged['description'])
+            return values, 200
+
+        return TransactionService._finish_bulk(user_id, BaseService.update_many(
+            Transaction, user_id, items, prepare,
+            after_write=TransactionService._after_bulk_write, atomic=atomic))
+
+    @staticmethod
+    def bulk_delete(user_id: int, ids: List[int], atomic: bool = False) -> Tuple[Dict, int]:
+        """Массовое удаление транзакций запросами DELETE ... WHERE id IN (...)."""
+        return TransactionService._finish_bulk(user_id, BaseService.delete_many(
+            Transaction, user_id, ids,
+            after_write=TransactionService._after_bulk_delete, atomic=atomic))
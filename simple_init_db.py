@@ -46,8 +46,13 @@ def create_users_file():
             }
         ]
 
-        with open(USERS_FILE, 'w') as f:
-            json.dump(initial_users, f, ensure_ascii=False, indent=4)
+        # Пишем весь список одним вызовом во временный файл и атомарно
+        # подменяем: прерванный старт не оставит "полуинициализированный"
+        # файл, который проверка существования сочла бы готовым
+        tmp_file = f"{USERS_FILE}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(initial_users, f, ensure_ascii=False)
+        os.replace(tmp_file, USERS_FILE)
 
         logging.info(f"Создан файл с пользователями: {USERS_FILE}")
     else:
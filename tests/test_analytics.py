@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from ..models import User, Category
+from ..services.analytics_service import AnalyticsService
+from ..services.transaction_service import TransactionService
+
+
+def _user():
+    return User.query.filter_by(username='testuser').first()
+
+
+def test_columns_match_seed_data(app):
+    """Итоги, категории и динамика по столбцам совпадают с данными."""
+    user = _user()
+    AnalyticsService.invalidate()
+    columns = AnalyticsService.get_columns(user.id)
+    assert columns.days.dtype == np.int32 and columns.cents.dtype == np.int64
+    assert list(np.diff(columns.days) >= 0) == [True] * (len(columns.days) - 1)
+    assert columns.totals() == (6500000, 395050, 4)
+
+    result, status = AnalyticsService.get_category_totals(user.id)
+    assert status == 200
+    assert [(item['category_name'], item['total_amount']) for item in result['categories']] == \
+        [('Продукты', '3500.50'), ('Транспорт', '450.00')]
+    result, _ = AnalyticsService.get_category_totals(user.id, transaction_type='income')
+    assert [item['total_amount'] for item in result['categories']] == ['50000.00', '15000.00']
+
+    today = date.today()
+    result, status = AnalyticsService.get_trend(user.id, today - timedelta(days=20), today, 'day')
+    assert status == 200 and len(result['items']) == 21
+    by_day = {item['period_start']: item for item in result['items']}
+    assert by_day[(today - timedelta(days=5)).isoformat()]['expense'] == '3500.50'
+    assert by_day[(today - timedelta(days=15)).isoformat()]['net'] == '50000.00'
+
+    result, _ = AnalyticsService.get_trend(user.id, today - timedelta(days=400), today, 'month')
+    assert result['items'][-1]['period_start'] == today.replace(day=1).isoformat()
+    assert sum(float(item['expense']) for item in result['items']) == 3950.50
+    result, _ = AnalyticsService.get_trend(user.id, today - timedelta(days=20), today, 'week')
+    assert all(date.fromisoformat(item['period_start']).weekday() == 0 for item in result['items'])
+    assert sum(float(item['income']) for item in result['items']) == 65000
+
+
+def test_columns_are_cached_until_data_changes(app):
+    """Столбцы перечитываются только после записи (рост версии данных)."""
+    user = _user()
+    AnalyticsService.invalidate()
+    columns = AnalyticsService.get_columns(user.id)
+    assert AnalyticsService.get_columns(user.id) is columns
+
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    _, status = TransactionService.create_transaction(user.id, {
+        'amount': '100.25', 'date': date.today().isoformat(), 'category_id': groceries.id})
+    assert status == 201
+    reloaded = AnalyticsService.get_columns(user.id)
+    assert reloaded is not columns
+    assert reloaded.totals()[1] == 395050 + 10025
+
+
+def test_columns_are_evicted_over_memory_budget(app):
+    user = _user()
+    AnalyticsService.invalidate()
+    app.config['ANALYTICS_MEMORY_BUDGET_MB'] = 0
+    try:
+        AnalyticsService.get_columns(user.id)
+        AnalyticsService.get_columns(user.id + 1000)
+        store = app.extensions['analytics_columns']
+        assert list(store['entries']) == [user.id + 1000]
+        assert store['bytes'] == store['entries'][user.id + 1000].nbytes
+    finally:
+        app.config['ANALYTICS_MEMORY_BUDGET_MB'] = 64
+        AnalyticsService.invalidate()
+
+
+def test_columns_are_memory_mapped(app, tmp_path):
+    """С каталогом mmap столбцы читаются из файлов .npy."""
+    user = _user()
+    AnalyticsService.invalidate()
+    app.config['ANALYTICS_MMAP_DIR'] = str(tmp_path)
+    try:
+        AnalyticsService.get_columns(user.id)
+        assert len(list(tmp_path.glob(f'user_{user.id}_v*.npy'))) == 4
+        AnalyticsService.invalidate()
+        columns = AnalyticsService.get_columns(user.id)
+        assert isinstance(columns.cents, np.memmap)
+        assert columns.totals() == (6500000, 395050, 4)
+    finally:
+        app.config['ANALYTICS_MMAP_DIR'] = ''
+        AnalyticsService.invalidate()
+
+
+def test_analytics_api(client, auth_headers):
+    response = client.get('/api/v1/reports/categories?type=expense', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['total_expense'] == '3950.50'
+    response = client.get('/api/v1/reports/trend?granularity=week', headers=auth_headers)
+    assert response.status_code == 200 and response.json['granularity'] == 'week'
+    response = client.get('/api/v1/reports/trend?granularity=year', headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,182 @@
+import os
+import stat
+from datetime import date
+from decimal import Decimal
+
+from ..models import db, User, Category, Transaction, TransactionArchive, CategoryType
+from ..services import archive_service
+from ..services.archive_service import ArchiveService, transaction_source
+from ..services.budget_service import BudgetService
+from ..services.category_service import CategoryService
+from ..services.category_stats_service import CategoryStatsService
+from ..services.search_service import SearchService
+from ..services.summary_service import SummaryService
+from ..services.sync_service import SyncService
+from ..services.transaction_service import TransactionService
+
+
+def _add_last_year(user):
+    """Две транзакции прошлого года: доход в марте и расход в ноябре."""
+    year = date.today().year - 1
+    salary = Category.query.filter_by(user_id=user.id, name='Зарплата').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    db.session.add_all([
+        Transaction(description='Премия', amount=Decimal('20000.00'), date=date(year, 3, 10),
+                    type=CategoryType.INCOME, category_id=salary.id, user_id=user.id),
+        Transaction(description='Рынок', amount=Decimal('1200.00'), date=date(year, 11, 20),
+                    type=CategoryType.EXPENSE, category_id=groceries.id, user_id=user.id)
+    ])
+    db.session.commit()
+    return year
+
+
+def test_archived_year_is_still_reported(app, tmp_path):
+    """Строки года уходят в файл архива, отчеты за период их видят."""
+    user = User.query.filter_by(username='testuser').first()
+    year = _add_last_year(user)
+    assert ArchiveService.archivable_years(year + 1) == [year]
+    # Период без архивов читает основную таблицу напрямую
+    assert transaction_source(date(year, 1, 1), date(year, 12, 31)) is Transaction
+
+    result, status = ArchiveService.archive_year(year, str(tmp_path))
+    assert status == 200, result
+    assert result['row_count'] == 2 and result['size_bytes'] > 0
+    assert not os.stat(result['path']).st_mode & stat.S_IWUSR
+    assert Transaction.query.filter(Transaction.date < date(year + 1, 1, 1)).count() == 0
+    assert TransactionArchive.query.filter_by(year=year).one().path == result['path']
+    assert ArchiveService.archivable_years(year + 1) == []
+
+    # Целые месяцы (через итоги) и неполные края периода
+    summary = SummaryService.get_summary(user.id, date(year, 1, 1), date(year, 12, 31))
+    assert summary['total_income'] == Decimal('20000.00')
+    assert summary['total_expense'] == Decimal('1200.00')
+    summary = SummaryService.get_summary(user.id, date(year, 11, 15), date(year, 11, 25))
+    assert summary['total_expense'] == Decimal('1200.00')
+
+    assert BudgetService._calculate_budget_stats(
+        user.id, date(year, 1, 1), date(year, 12, 31))[:2] == (Decimal('20000.00'), Decimal('1200.00'))
+    statistics, status = TransactionService.get_transaction_statistics(
+        user.id, date(year, 1, 1), date.today())
+    assert status == 200
+    assert statistics['total_income'] == 20000 + 50000 + 15000
+    assert statistics['total_expense'] == 1200 + 3500.50 + 450
+    assert {item['name'] for item in statistics['expense_breakdown']} == {'Продукты', 'Транспорт'}
+
+
+def test_archive_rejects_current_and_repeated_years(app, tmp_path):
+    user = User.query.filter_by(username='testuser').first()
+    year = _add_last_year(user)
+    assert ArchiveService.archive_year(date.today().year, str(tmp_path))[1] == 400
+    assert ArchiveService.archive_year(year, str(tmp_path))[1] == 200
+    assert ArchiveService.archive_year(year, str(tmp_path))[1] == 409
+
+
+def test_category_counters_include_archives(app, tmp_path):
+    """Пересчет счетчиков учитывает архивные транзакции."""
+    user = User.query.filter_by(username='testuser').first()
+    year = _add_last_year(user)
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    assert ArchiveService.archive_year(year, str(tmp_path))[1] == 200
+
+    CategoryStatsService.recalculate()
+    db.session.refresh(groceries)
+    assert groceries.transaction_count == 2
+    assert groceries.total_amount == Decimal('4700.50')
+
+    # Удаление живой транзакции пересчитывает дату с учетом архива
+    db.session.delete(Transaction.query.filter_by(category_id=groceries.id).one())
+    db.session.commit()
+    db.session.refresh(groceries)
+    assert groceries.transaction_count == 1
+    assert groceries.last_used_on == date(year, 11, 20)
+
+
+def test_archived_category_cannot_be_merged(app, tmp_path):
+    """Категорию с архивными строками нельзя слить: архив только для чтения."""
+    user = User.query.filter_by(username='testuser').first()
+    year = _add_last_year(user)
+    assert ArchiveService.archive_year(year, str(tmp_path))[1] == 200
+    categories = {category.name: category.id for category in Category.query.filter_by(user_id=user.id)}
+
+    _, status = CategoryService.merge_categories(categories['Продукты'], categories['Транспорт'], user.id)
+    assert status == 409
+    summary = SummaryService.get_summary(user.id, date(year, 1, 1), date(year, 12, 31))
+    assert [item['category_name'] for item in summary['expenses_by_category']] == ['Продукты']
+
+
+def test_archived_category_cannot_be_deleted(app, tmp_path):
+    """Категорию, на которую ссылаются только архивные строки, нельзя удалить."""
+    user = User.query.filter_by(username='testuser').first()
+    year = date.today().year - 1
+    gifts = Category(name='Подарки', type=CategoryType.EXPENSE, user_id=user.id)
+    db.session.add(gifts)
+    db.session.commit()
+    db.session.add(Transaction(description='Подарок', amount=Decimal('500.00'), date=date(year, 12, 1),
+                               type=CategoryType.EXPENSE, category_id=gifts.id, user_id=user.id))
+    db.session.commit()
+    assert ArchiveService.archive_year(year, str(tmp_path))[1] == 200
+    # Счетчики могли устареть (или быть сброшены вручную)
+    db.session.execute(Category.__table__.update().where(
+        Category.__table__.c.id == gifts.id).values(transaction_count=0))
+    db.session.commit()
+
+    assert CategoryService.delete_category(gifts.id, user.id)[1] == 400
+    result, status = CategoryService.bulk_delete(user.id, [gifts.id])
+    assert status == 200 and result['failed'] == 1
+    assert Category.query.get(gifts.id) is not None
+
+
+def test_archived_transactions_are_listed_and_read_only(client, auth_headers, tmp_path):
+    """Списки, карточка, поиск и синхронизация видят архив; изменить его нельзя."""
+    user = User.query.filter_by(username='testuser').first()
+    year = _add_last_year(user)
+    market_id = Transaction.query.filter_by(description='Рынок').one().id
+    assert ArchiveService.archive_year(year, str(tmp_path))[1] == 200
+
+    response = client.get(f'/api/v1/transactions?start_date={year}-01-01&end_date={year}-12-31',
+                          headers=auth_headers)
+    assert response.status_code == 200
+    assert {item['description'] for item in response.json} == {'Премия', 'Рынок'}
+    response = client.get('/api/v1/transactions', headers=auth_headers)
+    assert {'Премия', 'Рынок'} <= {item['description'] for item in response.json}
+    result, status = TransactionService.get_user_transactions(
+        user.id, start_date=date(year, 11, 1), end_date=date(year, 11, 30))
+    assert status == 200 and [item['id'] for item in result['items']] == [market_id]
+
+    response = client.get(f'/api/v1/transactions/{market_id}', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['category']['name'] == 'Продукты'
+    response = client.put(f'/api/v1/transactions/{market_id}', json={'description': 'Нет'},
+                          headers=auth_headers)
+    assert response.status_code == 409
+    assert client.delete(f'/api/v1/transactions/{market_id}',
+                         headers=auth_headers).status_code == 409
+    assert client.get('/api/v1/transactions/999999', headers=auth_headers).status_code == 404
+
+    # В архиве - поиск подстроки (LIKE в SQLite без учета регистра только для латиницы)
+    result, status = SearchService.search_transactions(user.id, 'ынок')
+    assert status == 200 and [item['id'] for item in result['items']] == [market_id]
+    assert result['items'][0]['rank'] is None
+    result, _ = SearchService.search_transactions(user.id, 'ынок', end_date=date(year, 6, 30))
+    assert result['total'] == 0
+
+    changes, status = SyncService.get_changes(user.id)
+    assert status == 200
+    assert market_id in {item['id'] for item in changes['transactions']}
+    assert changes['deleted'] == []
+
+
+def test_number_of_archives_is_capped(app, tmp_path, monkeypatch):
+    """Архивов не больше, чем SQLite подключит к одному запросу."""
+    user = User.query.filter_by(username='testuser').first()
+    year = _add_last_year(user)
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    db.session.add(Transaction(description='Старое', amount=Decimal('10.00'), date=date(year - 1, 5, 1),
+                               type=CategoryType.EXPENSE, category_id=groceries.id, user_id=user.id))
+    db.session.commit()
+    monkeypatch.setattr(archive_service, 'MAX_ARCHIVES', 1)
+
+    assert ArchiveService.archive_year(year, str(tmp_path))[1] == 200
+    result, status = ArchiveService.archive_year(year - 1, str(tmp_path))
+    assert status == 409 and 'предел' in result['error']
+    assert Transaction.query.filter_by(description='Старое').count() == 1
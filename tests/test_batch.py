@@ -0,0 +1,108 @@
+from flask_jwt_extended import JWTManager
+
+from ..models import Category
+
+
+def test_batch_runs_requests_in_order(client, auth_headers):
+    """Результаты возвращаются в порядке запросов, с временем выполнения."""
+    response = client.post('/api/v1/batch', json={'requests': [
+        {'method': 'GET', 'path': '/api/v1/categories'},
+        {'method': 'GET', 'path': '/api/v1/budgets'},
+        {'method': 'GET', 'path': '/api/v1/reports/summary'},
+        {'method': 'GET', 'path': '/api/v1/categories/999999'}
+    ]}, headers=auth_headers)
+
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [result['status'] for result in results] == [200, 200, 200, 404]
+    assert len(results[0]['body']) == 4
+    assert 'total_income' in results[2]['body']
+    assert all(result['duration_ms'] >= 0 for result in results)
+    assert response.json['committed'] is True
+
+
+def test_batch_atomic_rolls_back_on_error(client, auth_headers):
+    """В атомарном режиме ошибка откатывает изменения предыдущих запросов."""
+    response = client.post('/api/v1/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': '/api/v1/categories',
+         'body': {'name': 'Кафе', 'type': 'expense'}},
+        {'method': 'POST', 'path': '/api/v1/categories',
+         'body': {'name': 'Кафе', 'type': 'expense'}},
+        {'method': 'GET', 'path': '/api/v1/categories'}
+    ]}, headers=auth_headers)
+
+    assert response.status_code == 200
+    results = response.json['results']
+    assert results[0]['status'] == 201
+    assert results[1]['status'] == 400
+    assert results[2]['skipped'] is True
+    assert response.json['committed'] is False
+    assert Category.query.filter_by(name='Кафе').count() == 0
+
+
+def test_batch_atomic_commits_on_success(client, auth_headers):
+    """Успешный атомарный пакет фиксирует все изменения."""
+    response = client.post('/api/v1/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': '/api/v1/categories',
+         'body': {'name': 'Кафе', 'type': 'expense'}},
+        {'method': 'POST', 'path': '/api/v1/categories',
+         'body': {'name': 'Премия', 'type': 'income'}}
+    ]}, headers=auth_headers)
+
+    assert response.json['committed'] is True
+    assert Category.query.filter(Category.name.in_(['Кафе', 'Премия'])).count() == 2
+
+
+def test_batch_atomic_keeps_writes_before_summary(client, auth_headers):
+    """Материализация итогов в отчете не сбрасывает записи пакета."""
+    response = client.post('/api/v1/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': '/api/v1/categories',
+         'body': {'name': 'Кафе', 'type': 'expense'}},
+        {'method': 'GET', 'path': '/api/v1/reports/summary?start_date=2020-01-01&end_date=2020-12-31'}
+    ]}, headers=auth_headers)
+
+    assert [result['status'] for result in response.json['results']] == [201, 200]
+    assert response.json['committed'] is True
+    assert Category.query.filter_by(name='Кафе').count() == 1
+
+
+def test_batch_validation(client, auth_headers, app):
+    """Пакет ограничен по размеру, вложенные пакеты запрещены."""
+    app.config['BATCH_MAX_REQUESTS'] = 2
+    too_many = client.post('/api/v1/batch', json={'requests': [
+        {'path': '/api/v1/categories'}] * 3}, headers=auth_headers)
+    assert too_many.status_code == 400
+
+    nested = client.post('/api/v1/batch', json={'requests': [
+        {'method': 'POST', 'path': '/api/v1/batch'}]}, headers=auth_headers)
+    assert nested.status_code == 400
+
+    # SSE-поток не заканчивается и не может быть прочитан целиком
+    stream = client.post('/api/v1/batch', json={'atomic': True, 'requests': [
+        {'path': '/api/v1/events/stream?x=1'}]}, headers=auth_headers)
+    assert stream.status_code == 400
+    assert 'потоковые' in stream.json['error']
+
+
+def test_batch_verifies_token_once(client, auth_headers, monkeypatch):
+    """Токен проверяется при входе в пакет, вложенные запросы его не декодируют."""
+    decoded = []
+    decode = JWTManager._decode_jwt_from_config
+
+    def counting_decode(self, *args, **kwargs):
+        decoded.append(args[0])
+        return decode(self, *args, **kwargs)
+    monkeypatch.setattr(JWTManager, '_decode_jwt_from_config', counting_decode)
+
+    # Вне пакета каждый запрос проверяет токен сам
+    client.get('/api/v1/categories', headers=auth_headers)
+    assert decoded
+    decoded.clear()
+
+    response = client.post('/api/v1/batch', json={'requests': [
+        {'method': 'GET', 'path': '/api/v1/categories'},
+        {'method': 'GET', 'path': '/api/v1/budgets'},
+        {'method': 'GET', 'path': '/api/v1/transactions'}
+    ]}, headers=auth_headers)
+    assert [result['status'] for result in response.json['results']] == [200, 200, 200]
+    assert len(decoded) == 1
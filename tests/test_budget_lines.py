@@ -0,0 +1,133 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from ..models import db, User, Category, Budget, BudgetLine, BudgetPeriod, CategoryType
+from ..services.budget_line_service import BudgetLineService
+from ..services.budget_service import BudgetService
+from ..services.category_service import CategoryService
+from ..services.rate_import_service import RateImportService
+
+
+def _user_and_categories():
+    user = User.query.filter_by(username='testuser').first()
+    categories = {category.name: category.id
+                  for category in Category.query.filter_by(user_id=user.id)}
+    return user, categories
+
+
+def _budget(user, categories, **kwargs):
+    """Бюджет за последние 11 дней и 19 вперед с лимитами на продукты и транспорт."""
+    today = date.today()
+    data = dict(name='Месяц', period='monthly',
+                start_date=(today - timedelta(days=10)).isoformat(),
+                end_date=(today + timedelta(days=19)).isoformat(),
+                lines=[{'category_id': categories['Продукты'], 'limit_amount': '5000.00'},
+                       {'category_id': categories['Транспорт'], 'limit_amount': '300'}])
+    data.update(kwargs)
+    result, status = BudgetService.create_budget(user.id, data)
+    assert status == 201, result
+    return result
+
+
+def test_lines_report_spent_remaining_and_projection(app):
+    user, categories = _user_and_categories()
+    result = _budget(user, categories)
+    groceries, transport = result['lines']
+    assert groceries['category_name'] == 'Продукты'
+    assert groceries['spent'] == 3500.50 and groceries['remaining'] == 1499.50
+    assert groceries['percentage'] == 70.01
+    # Темп расходов: 3500.50 за 11 дней из 30
+    assert groceries['projection']['projected_total'] == round(3500.50 / 11 * 30, 2)
+    assert transport['remaining'] == -150.0 and transport['percentage'] == 150.0
+
+    details, status = BudgetService.get_budget_details(result['id'], user.id)
+    assert status == 200 and details['lines'] == result['lines']
+
+    # Обновление заменяет строки
+    updated, status = BudgetService.update_budget(result['id'], user.id, {
+        'lines': [{'category_id': categories['Транспорт'], 'limit_amount': '1000'}]})
+    assert status == 200
+    assert [(line['category_name'], line['limit_amount']) for line in updated['lines']] == \
+        [('Транспорт', 1000.0)]
+    assert BudgetLine.query.filter_by(budget_id=result['id']).count() == 1
+
+
+def test_lines_of_all_budgets_in_one_query(app):
+    """Строки всех бюджетов страницы оцениваются одним запросом."""
+    user, categories = _user_and_categories()
+    for name in ('Первый', 'Второй', 'Третий'):
+        _budget(user, categories, name=name)
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if 'budget_lines' in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        budgets = Budget.query.filter_by(user_id=user.id).all()
+        lines = BudgetLineService.evaluate(user.id, budgets)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    assert len(statements) == 1
+    assert sum(len(items) for items in lines.values()) == 6
+    assert all(items[0]['spent'] == 3500.50 for items in lines.values() if items)
+
+
+def test_lines_in_budget_currency(app):
+    """Расходы строки пересчитываются в валюту бюджета."""
+    user, categories = _user_and_categories()
+    RateImportService.load_rows([{'date': (date.today() - timedelta(days=30)).isoformat(),
+                                  'currency': 'USD', 'rate': '50'}])
+    result = _budget(user, categories, currency='USD', lines=[
+        {'category_id': categories['Продукты'], 'limit_amount': '100'}])
+    assert result['lines'][0]['spent'] == 70.01
+
+
+def test_invalid_lines_are_rejected(app):
+    user, categories = _user_and_categories()
+    for lines in ([{'category_id': categories['Зарплата'], 'limit_amount': '100'}],
+                  [{'category_id': categories['Продукты'], 'limit_amount': '100'},
+                   {'category_id': categories['Продукты'], 'limit_amount': '200'}],
+                  [{'category_id': categories['Продукты'], 'limit_amount': '-1'}],
+                  [{'category_id': categories['Продукты'], 'limit_amount': '0.004'}],
+                  [{'category_id': 999999, 'limit_amount': '1'}],
+                  'Продукты'):
+        result, status = BudgetLineService.prepare_lines(user.id, lines)
+        assert status == 400, lines
+
+    # Лимит, округленный до нуля, - ошибка запроса, а не сервера
+    result, status = BudgetService.create_budget(user.id, dict(
+        name='Месяц', period='monthly', start_date='2024-05-01', end_date='2024-05-31',
+        lines=[{'category_id': categories['Продукты'], 'limit_amount': '0.001'}]))
+    assert status == 400, result
+
+
+def test_lines_follow_budget_and_category_changes(client, auth_headers):
+    user, categories = _user_and_categories()
+    today = date.today()
+    response = client.post('/api/v1/budgets', json={
+        'name': 'Новый', 'period': 'monthly', 'start_date': today.isoformat(),
+        'end_date': (today + timedelta(days=29)).isoformat(),
+        'lines': [{'category_id': categories['Продукты'], 'limit_amount': '2000'}]},
+        headers=auth_headers)
+    assert response.status_code == 201, response.json
+    budget_id = response.json['id']
+    assert response.json['lines'][0]['limit_amount'] == 2000.0
+
+    response = client.get('/api/v1/budgets', headers=auth_headers)
+    listed = {budget['id']: budget for budget in response.json}
+    assert listed[budget_id]['lines'][0]['category_name'] == 'Продукты'
+
+    # Слияние категорий переносит строку на целевую категорию
+    _, status = CategoryService.merge_categories(categories['Продукты'], categories['Транспорт'], user.id)
+    assert status == 200
+    line = BudgetLine.query.filter_by(budget_id=budget_id).one()
+    assert line.category_id == categories['Транспорт']
+
+    response = client.delete('/api/v1/budgets/bulk', json={'ids': [budget_id]}, headers=auth_headers)
+    assert response.status_code == 200 and response.json['succeeded'] == 1
+    assert BudgetLine.query.filter_by(budget_id=budget_id).count() == 0
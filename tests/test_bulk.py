@@ -0,0 +1,133 @@
+from datetime import date
+from decimal import Decimal
+
+from ..models import db, User, Category, Transaction, Budget, CategoryType
+from ..services.base_service import parse_amount
+from ..services.dedup_service import transaction_fingerprint
+from ..services.data_version_service import DataVersionService
+from ..services.summary_service import SummaryService
+from ..services.transaction_service import TransactionService
+
+
+def _stats(category):
+    db.session.refresh(category)
+    return category.transaction_count, category.total_amount
+
+
+def test_bulk_transactions_report_per_item_results(app):
+    """Корректные элементы записываются, ошибочные возвращаются с причиной."""
+    user = User.query.filter_by(username='testuser').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    transport = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+    may = (date(2024, 5, 1), date(2024, 5, 31))
+    assert SummaryService.get_summary(user.id, *may)['total_expense'] == 0
+    version, _ = DataVersionService.get_version(user.id)
+
+    result, status = TransactionService.bulk_create(user.id, [
+        {'description': 'Рынок', 'amount': '700', 'date': '2024-05-03', 'category_id': groceries.id},
+        {'description': 'Кино', 'amount': '500', 'date': '2024-05-04', 'category_id': 999999},
+        {'amount': '-1', 'date': '2024-05-05', 'category_id': groceries.id},
+        {'description': 'Метро', 'amount': '60.5', 'date': '2024-05-06', 'category_id': transport.id}
+    ])
+    assert status == 200
+    assert (result['succeeded'], result['failed']) == (2, 2)
+    assert [item['status'] for item in result['results']] == [201, 404, 400, 201]
+    market_id = result['results'][0]['id']
+    market = Transaction.query.get(market_id)
+    assert market.type == CategoryType.EXPENSE
+    assert market.fingerprint == transaction_fingerprint(user.id, market.date, market.amount,
+                                                 'RUB', 'Рынок')
+    assert _stats(groceries) == (2, Decimal('4200.50'))
+    assert SummaryService.get_summary(user.id, *may)['total_expense'] == Decimal('760.50')
+    assert DataVersionService.get_version(user.id)[0] > version
+
+    metro_id = result['results'][3]['id']
+    result, status = TransactionService.bulk_update(user.id, [
+        {'id': market_id, 'amount': '900.00', 'category_id': transport.id},
+        {'id': metro_id, 'date': '2024-06-01'},
+        {'id': metro_id, 'description': 'Повтор'},
+        {'id': 999999, 'amount': '1'}
+    ])
+    assert [item['status'] for item in result['results']] == [200, 200, 400, 404]
+    assert _stats(groceries) == (1, Decimal('3500.50'))
+    assert _stats(transport) == (3, Decimal('1410.50'))
+    assert SummaryService.get_summary(user.id, *may)['total_expense'] == Decimal('900.00')
+
+    # Атомарный режим: одна ошибка отменяет всю операцию
+    result, status = TransactionService.bulk_delete(user.id, [market_id, 999999], atomic=True)
+    assert status == 400 and result['failed'] == 1
+    assert Transaction.query.get(market_id) is not None
+
+    result, status = TransactionService.bulk_delete(user.id, [market_id, metro_id])
+    assert status == 200 and result['succeeded'] == 2
+    assert Transaction.query.filter(Transaction.id.in_([market_id, metro_id])).count() == 0
+    assert _stats(transport) == (1, Decimal('450.00'))
+
+
+def test_amount_rounding_to_zero_is_rejected(app):
+    """Сумма, округленная до нуля копеек, не проходит проверку."""
+    user = User.query.filter_by(username='testuser').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    assert parse_amount('0.004') == (None, "Сумма должна быть положительной")
+    assert parse_amount('0.005')[0] is None
+    assert parse_amount('0.006') == (Decimal('0.01'), None)
+
+    result, status = TransactionService.bulk_create(user.id, [
+        {'description': 'Копейка', 'amount': '0.004', 'date': '2024-05-03',
+         'category_id': groceries.id}])
+    assert status == 200 and result['failed'] == 1
+    assert result['results'][0]['status'] == 400
+    assert Transaction.query.filter_by(description='Копейка').count() == 0
+
+
+def test_bulk_categories_check_names_and_usage(client, auth_headers):
+    """Имена проверяются с учетом пакета, используемые категории не удаляются."""
+    response = client.post('/api/v1/categories/bulk', json={'items': [
+        {'name': 'Кафе', 'type': 'expense'},
+        {'name': 'Кафе', 'type': 'expense'},
+        {'name': 'Продукты', 'type': 'expense'},
+        {'name': 'Кафе', 'type': 'income'}
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [item['status'] for item in response.json['results']] == [201, 400, 400, 201]
+    cafe_id = response.json['results'][0]['id']
+
+    user = User.query.filter_by(username='testuser').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    response = client.put('/api/v1/categories/bulk', json={'items': [
+        {'id': cafe_id, 'name': 'Кафе и рестораны'},
+        {'id': groceries.id, 'type': 'income'}
+    ]}, headers=auth_headers)
+    assert [item['status'] for item in response.json['results']] == [200, 400]
+    assert Category.query.get(cafe_id).name == 'Кафе и рестораны'
+
+    response = client.delete('/api/v1/categories/bulk', json={'ids': [cafe_id, groceries.id]},
+                             headers=auth_headers)
+    assert [item['status'] for item in response.json['results']] == [200, 400]
+    assert Category.query.get(cafe_id) is None
+
+    response = client.post('/api/v1/categories/bulk', json={'items': []}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_bulk_budgets(client, auth_headers):
+    """Массовые операции с бюджетами через API."""
+    response = client.post('/api/v1/budgets/bulk', json={'items': [
+        {'name': 'Май', 'period': 'monthly', 'start_date': '2024-05-01', 'end_date': '2024-05-31',
+         'target_amount': '30000'},
+        {'name': 'Июнь', 'period': 'monthly', 'start_date': '2024-06-30', 'end_date': '2024-06-01'}
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [item['status'] for item in response.json['results']] == [201, 400]
+    budget_id = response.json['results'][0]['id']
+
+    response = client.put('/api/v1/budgets/bulk', json={'items': [
+        {'id': budget_id, 'target_amount': None, 'end_date': '2024-05-15'}
+    ]}, headers=auth_headers)
+    assert response.json['succeeded'] == 1
+    budget = Budget.query.get(budget_id)
+    assert budget.target_amount is None and budget.end_date == date(2024, 5, 15)
+
+    response = client.delete('/api/v1/budgets/bulk', json={'ids': [budget_id]}, headers=auth_headers)
+    assert response.json['succeeded'] == 1
+    assert Budget.query.get(budget_id) is None
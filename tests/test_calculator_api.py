@@ -125,3 +125,96 @@ def test_savings_goal_api_unauthorized(client):
 
     # Должен быть отказ в доступе
     assert response.status_code == 401
+
+
+def test_savings_goal_batch_api(client, auth_headers):
+    """Тестирование пакетного расчета сетки сценариев через API."""
+    request_data = {
+        'target_amounts': ['10000.00', '20000.00'],
+        'target_dates': [(date.today() + timedelta(days=365)).isoformat(),
+                         (date.today() + timedelta(days=730)).isoformat()],
+        'current_savings': ['0.00', '1000.00', '15000.00']
+    }
+
+    response = client.post(
+        '/api/v1/calculator/savings-goal/batch',
+        json=request_data,
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+
+    data = json.loads(response.data)
+    grid = data['required_monthly_savings']
+    assert len(grid) == 2 and len(grid[0]) == 2 and len(grid[0][0]) == 3
+    # Цель уже достигнута накоплениями
+    assert grid[0][0][2] == '0.00'
+    assert len(data['months_remaining']) == 2
+
+
+def test_amortization_api_streams_schedule(client, auth_headers):
+    """График кредита передается потоком и сходится с итогами."""
+    response = client.post(
+        '/api/v1/calculator/amortization',
+        json={'principal': '250000.00', 'annual_rate': '7.25', 'months': 360,
+              'start_date': '2025-01-01'},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    assert response.is_streamed
+
+    data = json.loads(response.data)
+    assert len(data['schedule']) == 360
+    assert data['schedule'][-1]['balance'] == '0.00'
+    assert data['schedule'][-1]['payment'] == data['summary']['last_payment']
+
+    summary_only = client.post(
+        '/api/v1/calculator/compound-growth',
+        json={'initial_amount': '1000.00', 'monthly_contribution': '100.00',
+              'annual_rate': '5', 'months': 120, 'include_schedule': False},
+        headers=auth_headers
+    )
+    assert summary_only.status_code == 200
+    assert 'schedule' not in summary_only.json
+    assert summary_only.json['summary']['final_balance'] == '17175.24'
+
+    invalid = client.post(
+        '/api/v1/calculator/amortization',
+        json={'principal': '1000.00', 'annual_rate': '5', 'months': 0},
+        headers=auth_headers
+    )
+    assert invalid.status_code == 400
+
+    # Нулевой платеж отклоняется до начала потоковой передачи
+    too_small = client.post(
+        '/api/v1/calculator/amortization',
+        json={'principal': '0.05', 'annual_rate': '5', 'months': 12},
+        headers=auth_headers
+    )
+    assert too_small.status_code == 400
+    assert 'rounds to zero' in json.loads(too_small.data)['message']
+
+
+def test_savings_goal_probability_api(client, auth_headers):
+    """Вероятностный режим проверяет входные данные и объем расчета."""
+    target_date = (date.today() + timedelta(days=365)).isoformat()
+
+    too_large = client.post(
+        '/api/v1/calculator/savings-goal/probability',
+        json={'target_amount': '10000.00', 'target_date': target_date,
+              'simulations': 1000000},
+        headers=auth_headers
+    )
+    assert too_large.status_code == 400
+    assert 'simulations' in too_large.json['message']
+
+    response = client.post(
+        '/api/v1/calculator/savings-goal/probability',
+        json={'target_amount': '10000.00', 'target_date': target_date,
+              'simulations': 1000, 'seed': 42},
+        headers=auth_headers
+    )
+    # У тестового пользователя транзакции только за последние две недели
+    assert response.status_code == 400
+    assert 'history' in response.json['error']
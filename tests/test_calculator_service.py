@@ -1,7 +1,9 @@
 import unittest
 from datetime import date, timedelta
 from decimal import Decimal
-from services.calculator_service import calculate_required_savings
+from services.calculator_service import (calculate_required_savings, calculate_savings_grid,
+                                         amortization_summary, iter_amortization_schedule,
+                                         compound_growth_summary, iter_compound_growth_schedule)
 
 
 class TestCalculatorService(unittest.TestCase):
@@ -146,5 +148,118 @@ class TestCalculatorService(unittest.TestCase):
             )
 
 
+    def test_savings_grid_matches_single_calculation(self):
+        """Пакетный расчет совпадает с расчетом отдельных сценариев."""
+        today = date.today()
+        amounts = [Decimal('1000.00'), Decimal('2500.50')]
+        dates = [today + timedelta(days=40), today + timedelta(days=400)]
+        savings = [Decimal('0.00'), Decimal('1200.00')]
+
+        result = calculate_savings_grid(amounts, dates, savings)
+
+        for i, amount in enumerate(amounts):
+            for j, target_date in enumerate(dates):
+                for k, current in enumerate(savings):
+                    single = calculate_required_savings(amount, target_date, current)
+                    self.assertEqual(
+                        result['required_monthly_savings'][i][j][k],
+                        single['required_monthly_savings'])
+
+        zipped = calculate_savings_grid(amounts, dates, [Decimal('100.00')], mode='zip')
+        self.assertEqual(len(zipped['required_monthly_savings']), 2)
+        self.assertEqual(
+            zipped['required_monthly_savings'][1],
+            calculate_required_savings(amounts[1], dates[1], Decimal('100.00'))['required_monthly_savings'])
+
+    def test_savings_grid_validation(self):
+        """Пакетный расчет проверяет данные и размер сетки."""
+        future_date = date.today() + timedelta(days=30)
+        with self.assertRaises(ValueError):
+            calculate_savings_grid([Decimal('100.00')], [date.today()])
+        with self.assertRaises(ValueError):
+            calculate_savings_grid([Decimal('-1.00')], [future_date])
+        with self.assertRaises(ValueError):
+            calculate_savings_grid([Decimal('1.00')] * 2, [future_date] * 3, mode='zip')
+        with self.assertRaises(ValueError):
+            calculate_savings_grid([Decimal('1.00')] * 101, [future_date] * 101)
+
+    def test_amortization_schedule(self):
+        """График кредита гасит долг полностью и сходится с итогами."""
+        summary = amortization_summary(Decimal('300000.00'), Decimal('6.5'), 360)
+        self.assertEqual(summary['monthly_payment'], '1896.20')
+
+        rows = list(iter_amortization_schedule(
+            Decimal('300000.00'), Decimal('6.5'), 360, date(2025, 1, 15)))
+        self.assertEqual(len(rows), 360)
+        self.assertEqual(rows[0]['interest'], '1625.00')
+        self.assertEqual(rows[0]['date'], '2025-02-15')
+        self.assertEqual(rows[-1]['balance'], '0.00')
+        self.assertEqual(rows[-1]['payment'], summary['last_payment'])
+        self.assertEqual(sum(Decimal(row['principal']) for row in rows), Decimal('300000.00'))
+        self.assertEqual(sum(Decimal(row['interest']) for row in rows),
+                         Decimal(summary['total_interest']))
+        # Баланс монотонно убывает и не уходит в минус
+        balances = [Decimal(row['balance']) for row in rows]
+        self.assertEqual(balances, sorted(balances, reverse=True))
+
+        # Нулевая ставка: остаток от округления уходит в последний платеж
+        rows = list(iter_amortization_schedule(Decimal('1000.00'), Decimal('0'), 7))
+        self.assertEqual(sum(Decimal(row['payment']) for row in rows), Decimal('1000.00'))
+        self.assertEqual(rows[-1]['payment'], '142.84')
+
+        # Платеж, округленный вверх, погасил бы долг раньше срока
+        summary = amortization_summary(Decimal('1000.00'), Decimal('0'), 600)
+        self.assertEqual(summary['monthly_payment'], '1.66')
+        self.assertEqual(summary['last_payment'], '5.66')
+        self.assertEqual(summary['total_paid'], '1000.00')
+        self.assertEqual(summary['total_interest'], '0.00')
+        rows = list(iter_amortization_schedule(Decimal('1000.00'), Decimal('0'), 600))
+        self.assertTrue(all(row['interest'] == '0.00' for row in rows))
+        self.assertEqual(rows[-2]['balance'], '5.66')
+
+        # Платеж, округленный до нуля, отклоняется до построения графика
+        with self.assertRaises(ValueError):
+            amortization_summary(Decimal('0.05'), Decimal('5'), 12)
+
+    def test_amortization_rounding_does_not_repay_early(self):
+        """С положительной ставкой долг тоже не гасится раньше последнего платежа."""
+        for principal, rate, months, payment, last_payment, total_interest in (
+                ('50.00', '1', 600, '0.10', '4.71', '14.61'),
+                ('10.00', '0.5', 360, '0.02', '3.87', '1.05')):
+            summary = amortization_summary(Decimal(principal), Decimal(rate), months)
+            self.assertEqual(summary['monthly_payment'], payment)
+            self.assertEqual(summary['last_payment'], last_payment)
+            self.assertEqual(summary['total_interest'], total_interest)
+
+            rows = list(iter_amortization_schedule(Decimal(principal), Decimal(rate), months))
+            self.assertTrue(all(Decimal(row['balance']) > 0 for row in rows[:-1]))
+            self.assertEqual(rows[-1]['balance'], '0.00')
+            self.assertEqual(sum(Decimal(row['interest']) for row in rows),
+                             Decimal(total_interest))
+            # Проценты строки - проценты на остаток с точностью до копейки
+            previous = Decimal(principal)
+            for row in rows:
+                expected = previous * Decimal(rate) / 1200
+                self.assertLess(abs(Decimal(row['interest']) - expected), Decimal('0.01'))
+                previous = Decimal(row['balance'])
+
+    def test_compound_growth_schedule(self):
+        """Рост вклада: последняя строка графика совпадает с итогом."""
+        summary = compound_growth_summary(Decimal('1000.00'), Decimal('100.00'), Decimal('5'), 120)
+        self.assertEqual(summary['total_contributions'], '13000.00')
+
+        rows = list(iter_compound_growth_schedule(
+            Decimal('1000.00'), Decimal('100.00'), Decimal('5'), 120))
+        self.assertEqual(len(rows), 120)
+        self.assertEqual(rows[0]['balance'], '1104.17')
+        self.assertEqual(rows[-1]['balance'], summary['final_balance'])
+        self.assertEqual(rows[-1]['interest'], summary['total_interest'])
+
+        with self.assertRaises(ValueError):
+            compound_growth_summary(Decimal('0'), Decimal('0'), Decimal('5'), 12)
+        with self.assertRaises(ValueError):
+            amortization_summary(Decimal('1000.00'), Decimal('5'), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,90 @@
+from datetime import date
+from decimal import Decimal
+
+from ..models import db, User, Category, Transaction, CategoryType
+from services.categorizer_service import CategorizerService, UserCategorizer
+
+
+def test_user_categorizer_ranks_and_forgets():
+    """Слова, префиксы и описание целиком дают ранжированные варианты."""
+    model = UserCategorizer()
+    model.add('Starbucks #1021', 1)
+    model.add('Starbucks #2210', 1)
+    model.add('Пятерочка', 2)
+    model.add('Starbucks зерна домой', 2)
+
+    suggestions = model.suggest('STARBUCKS #5550')
+    assert suggestions[0][0] == 1
+    assert suggestions[0][1] > suggestions[1][1]
+    assert abs(sum(score for _, score in suggestions) - 1.0) < 1e-3
+
+    assert model.suggest('пятерочка')[0] == (2, 1.0)
+    assert model.suggest('неизвестно') == []
+
+    model.add('Пятерочка', 2, delta=-1)
+    assert model.suggest('пятерочка') == []
+
+
+def test_model_updates_after_commit_only(app):
+    """Кэшированная модель обновляется после коммита и не меняется при откате."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+    CategorizerService.invalidate([user.id])
+    assert CategorizerService.suggest(user.id, 'такси')[0][0] == category.id
+    assert CategorizerService.suggest(user.id, 'метро') == []
+
+    db.session.add(Transaction(description='Метро', amount=Decimal('60.00'), date=date.today(),
+                               type=CategoryType.EXPENSE, category_id=category.id, user_id=user.id))
+    db.session.flush()
+    db.session.rollback()
+    assert CategorizerService.suggest(user.id, 'метро') == []
+
+    transaction = Transaction(description='Метро', amount=Decimal('60.00'), date=date.today(),
+                              type=CategoryType.EXPENSE, category_id=category.id, user_id=user.id)
+    db.session.add(transaction)
+    db.session.commit()
+    assert CategorizerService.suggest(user.id, 'метро')[0][0] == category.id
+
+    # Перенос в другую категорию переобучает модель
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    transaction.category_id = groceries.id
+    db.session.commit()
+    assert CategorizerService.suggest(user.id, 'метро') == [(groceries.id, 1.0)]
+
+    db.session.delete(transaction)
+    db.session.commit()
+    assert CategorizerService.suggest(user.id, 'метро') == []
+
+
+def test_import_with_auto_categorization(client, auth_headers):
+    """Импорт подбирает категории по описанию; ошибка в строке отменяет импорт."""
+    user = User.query.filter_by(username='testuser').first()
+    CategorizerService.invalidate([user.id])
+    transport = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+    side_job = Category.query.filter_by(user_id=user.id, name='Подработка').first()
+    today = date.today().isoformat()
+
+    suggestion = client.get('/api/v1/transactions/suggest-category?description=Такси%20домой',
+                            headers=auth_headers)
+    assert suggestion.status_code == 200
+    assert suggestion.json[0]['category_id'] == transport.id
+
+    count = Transaction.query.count()
+    invalid = client.post('/api/v1/transactions/import', json={'transactions': [
+        {'description': 'Такси', 'amount': '300.00', 'date': today},
+        {'description': 'Что-то новое', 'amount': '10.00', 'date': today}
+    ]}, headers=auth_headers)
+    assert invalid.status_code == 400
+    assert [error['index'] for error in invalid.json['errors']] == [1]
+    assert Transaction.query.count() == count
+
+    response = client.post('/api/v1/transactions/import', json={'transactions': [
+        {'description': 'Такси в аэропорт', 'amount': '1200.00', 'date': today},
+        {'description': 'Премия', 'amount': '5000.00', 'date': today, 'category_id': side_job.id}
+    ]}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json['created'] == 2
+    first, second = response.json['items']
+    assert first['category_id'] == transport.id and first['auto_categorized']
+    assert not second['auto_categorized']
+    assert Transaction.query.count() == count + 2
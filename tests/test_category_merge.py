@@ -0,0 +1,100 @@
+from datetime import date
+from decimal import Decimal
+
+from ..models import db, User, Category, Transaction, MonthlyCategorySummary, CategoryType
+from ..services.category_service import CategoryService
+from ..services.data_version_service import DataVersionService
+from ..services.summary_service import SummaryService
+
+
+def _setup():
+    user = User.query.filter_by(username='testuser').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    food = Category(name='Еда', type=CategoryType.EXPENSE, user_id=user.id)
+    db.session.add(food)
+    db.session.commit()
+    db.session.add_all([
+        Transaction(description='Рынок', amount=Decimal('700.00'), date=date(2024, 5, 3),
+                    type=CategoryType.EXPENSE, category_id=food.id, user_id=user.id),
+        Transaction(description='Пекарня', amount=Decimal('300.00'), date=date(2024, 5, 9),
+                    type=CategoryType.EXPENSE, category_id=food.id, user_id=user.id),
+        Transaction(description='Супермаркет', amount=Decimal('1000.00'), date=date(2024, 5, 20),
+                    type=CategoryType.EXPENSE, category_id=groceries.id, user_id=user.id)
+    ])
+    db.session.commit()
+    return user, groceries, food
+
+
+def test_merge_moves_everything_in_one_transaction(app):
+    """Слияние переносит транзакции, удаляет источник и обновляет итоги."""
+    user, groceries, food = _setup()
+    food_id = food.id
+    may = (date(2024, 5, 1), date(2024, 5, 31))
+    before = SummaryService.get_summary(user.id, *may)
+    assert len(before['expenses_by_category']) == 2
+    version, _ = DataVersionService.get_version(user.id)
+
+    result, status = CategoryService.merge_categories(food_id, groceries.id, user.id)
+    assert status == 200
+    assert result['moved_transactions'] == 2
+    assert Category.query.get(food_id) is None
+    assert Transaction.query.filter_by(category_id=food_id).count() == 0
+
+    db.session.refresh(groceries)
+    assert groceries.transaction_count == 4
+    assert groceries.total_amount == Decimal('5500.50')
+    # Итоги мая пересчитаны и содержат одну категорию
+    assert MonthlyCategorySummary.query.filter_by(category_id=food_id).count() == 0
+    after = SummaryService.get_summary(user.id, *may)
+    assert [(item['category_id'], item['total_amount']) for item in after['expenses_by_category']] == \
+        [(groceries.id, Decimal('2000.00'))]
+    assert DataVersionService.get_version(user.id)[0] > version
+
+    income = Category.query.filter_by(user_id=user.id, name='Зарплата').first()
+    _, status = CategoryService.merge_categories(income.id, groceries.id, user.id)
+    assert status == 400
+    _, status = CategoryService.merge_categories(groceries.id, groceries.id, user.id)
+    assert status == 400
+
+
+def test_recategorize_selected_transactions(app):
+    """Перенос выбранных транзакций; ошибка типа не меняет ничего."""
+    user, groceries, food = _setup()
+    moved = Transaction.query.filter_by(description='Рынок').first()
+    salary = Transaction.query.filter_by(description='Основная зарплата').first()
+
+    result, status = CategoryService.recategorize_transactions(
+        groceries.id, user.id, transaction_ids=[moved.id, salary.id])
+    assert status == 400
+    assert result['transaction_ids'] == [salary.id]
+    assert Transaction.query.get(moved.id).category_id == food.id
+
+    result, status = CategoryService.recategorize_transactions(
+        groceries.id, user.id, transaction_ids=[moved.id])
+    assert status == 200 and result['moved_transactions'] == 1
+    assert Transaction.query.get(moved.id).category_id == groceries.id
+    db.session.refresh(food)
+    assert (food.transaction_count, food.total_amount) == (1, Decimal('300.00'))
+
+    _, status = CategoryService.recategorize_transactions(groceries.id, user.id, transaction_ids=[999999])
+    assert status == 404
+
+
+def test_merge_and_recategorize_api(client, auth_headers):
+    """Эндпоинты слияния и переноса."""
+    user = User.query.filter_by(username='testuser').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    transport = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+
+    response = client.post(f'/api/v1/categories/{groceries.id}/recategorize',
+                           json={'source_category_id': transport.id}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['moved_transactions'] == 1
+
+    response = client.post(f'/api/v1/categories/{transport.id}/merge',
+                           json={'target_id': groceries.id}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['moved_transactions'] == 0
+    names = [category['name'] for category in
+             client.get('/api/v1/categories?type=expense', headers=auth_headers).json]
+    assert names == ['Продукты']
@@ -0,0 +1,75 @@
+import importlib
+from datetime import date, timedelta
+from decimal import Decimal
+
+from ..models import db, User, Category, Transaction, CategoryType
+from ..services.category_service import CategoryService
+from ..services.category_stats_service import CategoryStatsService
+from ..services import category_stats_service, summary_service
+
+
+def _stats(category):
+    db.session.refresh(category)
+    return category.transaction_count, category.total_amount, category.last_used_on
+
+
+def test_counters_follow_transaction_writes(app):
+    """Счетчики обновляются при создании, переносе, изменении и удалении."""
+    user = User.query.filter_by(username='testuser').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    transport = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+    today = date.today()
+    assert _stats(groceries) == (1, Decimal('3500.50'), today - timedelta(days=5))
+
+    transaction = Transaction(description='Рынок', amount=Decimal('499.50'), date=today,
+                              type=CategoryType.EXPENSE, category_id=groceries.id, user_id=user.id)
+    db.session.add(transaction)
+    db.session.commit()
+    assert _stats(groceries) == (2, Decimal('4000.00'), today)
+
+    transaction.category_id = transport.id
+    transaction.amount = Decimal('100.00')
+    db.session.commit()
+    assert _stats(groceries) == (1, Decimal('3500.50'), today - timedelta(days=5))
+    assert _stats(transport) == (2, Decimal('550.00'), today)
+
+    db.session.delete(transaction)
+    db.session.commit()
+    assert _stats(transport) == (1, Decimal('450.00'), today - timedelta(days=2))
+
+    # Полный пересчет дает те же значения
+    before = [_stats(category) for category in Category.query.order_by(Category.id)]
+    CategoryStatsService.recalculate()
+    db.session.commit()
+    assert [_stats(category) for category in Category.query.order_by(Category.id)] == before
+
+
+def test_category_list_with_usage(client, auth_headers):
+    """Список категорий со статистикой и сортировкой по использованию."""
+    response = client.get('/api/v1/categories?type=expense&sort=recent', headers=auth_headers)
+    assert response.status_code == 200
+    assert [category['name'] for category in response.json] == ['Транспорт', 'Продукты']
+    assert response.json[0]['transaction_count'] == 1
+    assert response.json[0]['total_amount'] == 450.0
+
+    created = client.post('/api/v1/categories', json={'name': 'Пустая', 'type': 'expense'},
+                          headers=auth_headers).json
+    listed = client.get('/api/v1/categories?type=expense&sort=frequent', headers=auth_headers).json
+    assert listed[-1]['name'] == 'Пустая' and listed[-1]['last_used_on'] is None
+
+    user = User.query.filter_by(username='testuser').first()
+    transport = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+    _, status = CategoryService.delete_category(transport.id, user.id)
+    assert status == 400
+    _, status = CategoryService.delete_category(created['id'], user.id)
+    assert status == 200
+
+
+def test_services_are_loaded_once():
+    """
+    Сервисы, импортированные из пакета приложения, - те же модули
+    services.*: обработчики событий зарегистрированы один раз.
+    """
+    for module in (category_stats_service, summary_service):
+        assert module.__name__.startswith('services.')
+        assert importlib.import_module(module.__name__) is module
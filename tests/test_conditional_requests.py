@@ -0,0 +1,68 @@
+import pytest
+
+from ..models import db, User, Category, CategoryType
+from ..services.data_version_service import DataVersionService
+
+
+def test_categories_etag_and_not_modified(client, auth_headers):
+    """Повторный запрос с If-None-Match получает 304 без тела."""
+    response = client.get('/api/v1/categories', headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers.get('ETag')
+    assert etag
+    assert response.headers.get('Last-Modified')
+
+    cached = client.get('/api/v1/categories',
+                        headers={**auth_headers, 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers.get('ETag') == etag
+
+
+def test_etag_depends_on_query_parameters(client, auth_headers):
+    """Разные параметры запроса дают разные ETag."""
+    all_categories = client.get('/api/v1/categories', headers=auth_headers)
+    expenses = client.get('/api/v1/categories?type=expense',
+                          headers=auth_headers)
+    assert all_categories.headers['ETag'] != expenses.headers['ETag']
+
+
+def test_write_changes_data_version(client, auth_headers):
+    """Любое изменение данных пользователя делает старый ETag недействительным."""
+    response = client.get('/api/v1/categories', headers=auth_headers)
+    etag = response.headers['ETag']
+
+    created = client.post('/api/v1/categories', json={'name': 'Кафе', 'type': 'expense'},
+                          headers=auth_headers)
+    assert created.status_code == 201
+
+    refreshed = client.get('/api/v1/categories',
+                           headers={**auth_headers, 'If-None-Match': etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers['ETag'] != etag
+    assert any(category['name'] == 'Кафе' for category in refreshed.json)
+
+
+@pytest.mark.parametrize('update_returning', [True, False])
+def test_bump_with_and_without_update_returning(app, monkeypatch, update_returning):
+    """Без UPDATE ... RETURNING (MySQL) новые версии читаются отдельным SELECT."""
+    monkeypatch.setattr(db.engine.dialect, 'update_returning', update_returning)
+    user = User.query.filter_by(username='testuser').first()
+    version = DataVersionService.get_version(user.id)[0]
+
+    assert DataVersionService.bump([user.id, user.id + 100]) == {user.id: version + 1}
+    db.session.add(Category(name='Кафе', type=CategoryType.EXPENSE, user_id=user.id))
+    db.session.commit()
+    assert DataVersionService.get_version(user.id)[0] == version + 2
+    assert Category.query.filter_by(name='Кафе').one().change_seq == version + 2
+
+
+def test_reports_summary_not_modified(client, auth_headers):
+    """Сводный отчет также поддерживает условные запросы."""
+    response = client.get('/api/v1/reports/summary', headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    cached = client.get('/api/v1/reports/summary',
+                        headers={**auth_headers, 'If-None-Match': etag})
+    assert cached.status_code == 304
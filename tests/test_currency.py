@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from ..models import db, User, Category, ExchangeRate
+from ..services.budget_service import BudgetService
+from ..services.currency_service import ExchangeRateService
+from ..services.rate_import_service import RateImportService
+from ..services.summary_service import SummaryService
+from ..services.transaction_service import TransactionService
+
+
+@pytest.fixture
+def rates(app):
+    """Курсы USD: 90 с даты месяц назад, 100 за последние три дня."""
+    today = date.today()
+    ExchangeRateService.invalidate()
+    result, status = RateImportService.load_rows([
+        {'date': (today - timedelta(days=30)).isoformat(), 'currency': 'usd', 'rate': '90'},
+        {'date': (today - timedelta(days=3)).isoformat(), 'currency': 'USD', 'rate': '100'}
+    ])
+    assert status == 200 and result == {'loaded': 2}
+    yield today
+    ExchangeRateService.invalidate()
+
+
+def _user_and_groceries():
+    user = User.query.filter_by(username='testuser').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    return user, groceries
+
+
+def test_rates_are_loaded_and_looked_up_by_date(rates):
+    """Курс на дату - последний известный не позже этой даты."""
+    today = rates
+    assert ExchangeRate.query.count() == 2
+    assert ExchangeRateService.get_rate('USD', today - timedelta(days=10)) == Decimal('90')
+    assert ExchangeRateService.get_rate('USD', today) == Decimal('100')
+    assert ExchangeRateService.get_rate('USD', today - timedelta(days=40)) is None
+    assert ExchangeRateService.get_rate('RUB', today) == Decimal('1')
+
+    # Повторная загрузка заменяет курс на ту же дату
+    RateImportService.load_rows([{'date': today - timedelta(days=3), 'currency': 'USD', 'rate': '95'}])
+    assert ExchangeRate.query.count() == 2
+    assert ExchangeRateService.get_rate('USD', today) == Decimal('95')
+
+    for row in ({'date': today, 'currency': 'RUB', 'rate': '1'},
+                {'date': today, 'currency': 'USD', 'rate': '-1'},
+                {'date': 'вчера', 'currency': 'USD', 'rate': '1'}):
+        _, status = RateImportService.load_rows([row])
+        assert status == 400
+
+
+def test_foreign_transaction_is_converted_in_aggregates(rates):
+    """Суммы в валюте пересчитываются в итогах по курсу на дату транзакции."""
+    today = rates
+    user, groceries = _user_and_groceries()
+    result, status = TransactionService.create_transaction(user.id, {
+        'description': 'Книга', 'amount': '10.00', 'currency': 'usd',
+        'date': (today - timedelta(days=1)).isoformat(), 'category_id': groceries.id})
+    assert status == 201 and result['currency'] == 'USD'
+
+    day = today - timedelta(days=1)
+    assert BudgetService._calculate_budget_stats(user.id, day, day)[1] == Decimal('1000.00')
+    assert BudgetService._calculate_budget_stats(user.id, day, day, 'USD')[1] == Decimal('10.00')
+
+    summary = SummaryService.get_summary(user.id, today - timedelta(days=6), today)
+    assert summary['total_expense'] == Decimal('4950.50')
+    db.session.refresh(groceries)
+    assert groceries.total_amount == Decimal('4500.50')
+
+    # Новый курс на дату транзакции пересчитывает итоги и сумму категории
+    RateImportService.load_rows([{'date': day, 'currency': 'USD', 'rate': '95'}])
+    summary = SummaryService.get_summary(user.id, today - timedelta(days=6), today)
+    assert summary['total_expense'] == Decimal('4900.50')
+    db.session.refresh(groceries)
+    assert groceries.total_amount == Decimal('4450.50')
+
+
+def test_currency_without_rate_is_rejected(rates):
+    """Транзакцию в валюте без курса на дату создать нельзя."""
+    today = rates
+    user, groceries = _user_and_groceries()
+    for currency, day in (('EUR', today), ('USD', today - timedelta(days=40)), ('US', today)):
+        result, status = TransactionService.create_transaction(user.id, {
+            'amount': '10.00', 'currency': currency, 'date': day.isoformat(),
+            'category_id': groceries.id})
+        assert status == 400, result
+
+
+def test_budget_in_foreign_currency(client, auth_headers, rates):
+    """Итоги бюджета считаются в его валюте."""
+    today = rates
+    response = client.post('/api/v1/budgets/bulk', json={'items': [{
+        'name': 'Поездка', 'period': 'monthly', 'currency': 'usd',
+        'start_date': (today - timedelta(days=7)).isoformat(),
+        'end_date': (today + timedelta(days=7)).isoformat(),
+        'target_amount': '100.00'}]}, headers=auth_headers)
+    assert response.status_code == 200, response.json
+    budget_id = response.json['results'][0]['id']
+
+    user, _ = _user_and_groceries()
+    result, status = BudgetService.get_budget_details(budget_id, user.id)
+    assert status == 200 and result['currency'] == 'USD'
+    # 3500.50 по 90 и 450 по 100
+    assert result['statistics']['expense'] == pytest.approx(3500.50 / 90 + 4.5, abs=0.01)
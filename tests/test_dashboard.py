@@ -0,0 +1,43 @@
+from datetime import date
+
+from ..models import User
+from ..services.budget_service import BudgetService
+from ..services.summary_service import SummaryService
+from ..services.dashboard_service import DashboardService
+
+
+def test_dashboard_matches_separate_services(app):
+    """Данные главной страницы совпадают с отдельными сервисами."""
+    user = User.query.filter_by(username='testuser').first()
+    dashboard, status = DashboardService.get_dashboard(user.id)
+    assert status == 200
+
+    start_date = dashboard['summary']['start_date']
+    end_date = dashboard['summary']['end_date']
+    summary = SummaryService.get_summary(
+        user.id, date.fromisoformat(start_date), date.fromisoformat(end_date))
+    assert dashboard['summary']['total_income'] == float(summary['total_income'])
+    assert dashboard['summary']['total_expense'] == float(summary['total_expense'])
+    assert [item['category_name'] for item in dashboard['summary']['expenses_by_category']] == \
+        [item['category_name'] for item in summary['expenses_by_category']]
+
+    budgets, _ = BudgetService.get_user_budgets(user.id, active_only=True)
+    assert [budget['statistics'] for budget in dashboard['budgets']] == \
+        [budget['statistics'] for budget in budgets['items']]
+    assert [budget.get('progress') for budget in dashboard['budgets']] == \
+        [budget.get('progress') for budget in budgets['items']]
+
+    assert len(dashboard['categories']) == 4
+
+
+def test_dashboard_endpoint(client, auth_headers):
+    """Эндпоинт возвращает последние транзакции с названиями категорий."""
+    response = client.get('/api/v1/dashboard?limit=2', headers=auth_headers)
+    assert response.status_code == 200
+    recent = response.json['recent_transactions']
+    assert [item['description'] for item in recent] == ['Такси', 'Покупка в супермаркете']
+    assert recent[0]['category_name'] == 'Транспорт'
+
+    cached = client.get('/api/v1/dashboard?limit=2',
+                        headers={**auth_headers, 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import update
+
+from ..models import db, User, Transaction
+from ..services.dedup_service import DedupService, transaction_fingerprint
+
+
+def test_fingerprint_normalizes_description():
+    """Регистр, пунктуация и формат суммы не влияют на отпечаток."""
+    day = date(2024, 5, 1)
+    assert transaction_fingerprint(1, day, '350', 'RUB', 'STARBUCKS, Moscow!') == \
+        transaction_fingerprint(1, day, Decimal('350.00'), 'rub', 'starbucks   moscow')
+    assert transaction_fingerprint(1, day, '350', 'RUB', 'starbucks') != \
+        transaction_fingerprint(2, day, '350', 'RUB', 'starbucks')
+    assert transaction_fingerprint(1, day, '350', 'RUB', None) == \
+        transaction_fingerprint(1, day, '350', 'RUB', '')
+
+
+def test_fingerprint_includes_currency():
+    """Одна сумма в разных валютах - разные транзакции; без валюты - базовая."""
+    day = date(2024, 5, 1)
+    assert transaction_fingerprint(1, day, '100', 'USD', 'Книги') != \
+        transaction_fingerprint(1, day, '100', 'RUB', 'Книги')
+    assert transaction_fingerprint(1, day, '100', None, 'Книги') == \
+        transaction_fingerprint(1, day, '100', 'RUB', 'Книги')
+
+
+def test_fingerprint_maintained_and_backfilled(app):
+    """Отпечаток ставится при записи через ORM и заполняется для массовых изменений."""
+    transaction = Transaction.query.filter_by(description='Такси').first()
+    assert transaction.fingerprint == transaction_fingerprint(
+        transaction.user_id, transaction.date, transaction.amount, 'RUB', 'Такси')
+
+    transaction.description = 'Такси до вокзала'
+    db.session.commit()
+    assert transaction.fingerprint == transaction_fingerprint(
+        transaction.user_id, transaction.date, transaction.amount, 'RUB', 'такси до вокзала')
+    expected = transaction.fingerprint
+
+    db.session.execute(update(Transaction).values(fingerprint=None))
+    assert DedupService.backfill_fingerprints(db.session.connection()) == Transaction.query.count()
+    db.session.commit()
+    assert Transaction.query.filter(Transaction.fingerprint.is_(None)).count() == 0
+    db.session.refresh(transaction)
+    assert transaction.fingerprint == expected
+
+
+def test_find_duplicates_counts_repeats(app):
+    """Одна сохраненная строка закрывает только один повтор в импорте."""
+    user = User.query.filter_by(username='testuser').first()
+    existing = Transaction.query.filter_by(description='Такси').first()
+    row = (existing.date, existing.amount, 'RUB', 'ТАКСИ')
+    other = (existing.date - timedelta(days=1), Decimal('99.00'), 'RUB', 'Кофе')
+    in_dollars = (existing.date, existing.amount, 'USD', 'Такси')
+    assert DedupService.find_duplicates(user.id, [row, row, other, in_dollars]) == {0}
+    assert DedupService.find_duplicates(user.id, []) == set()
+
+
+def test_reimport_skips_duplicates(client, auth_headers):
+    """Повторный импорт пересекающейся выписки не создает дубликатов."""
+    categories = client.get('/api/v1/categories?type=expense', headers=auth_headers).json
+    today = date.today()
+    rows = [
+        {'description': 'Аптека', 'amount': '540.00', 'date': (today - timedelta(days=3)).isoformat(),
+         'category_id': categories[0]['id']},
+        {'description': 'Кинотеатр', 'amount': '800.00', 'date': (today - timedelta(days=1)).isoformat(),
+         'category_id': categories[0]['id']}
+    ]
+    first = client.post('/api/v1/transactions/import', json={'transactions': rows},
+                        headers=auth_headers)
+    assert first.status_code == 201
+    assert first.json['created'] == 2 and first.json['duplicates'] == []
+
+    overlapping = rows[1:] + [{'description': 'Книги', 'amount': '1500.00',
+                               'date': today.isoformat(), 'category_id': categories[0]['id']}]
+    second = client.post('/api/v1/transactions/import', json={'transactions': overlapping},
+                         headers=auth_headers)
+    assert second.status_code == 201
+    assert second.json['created'] == 1
+    assert second.json['duplicates'] == [0]
+    assert [item['index'] for item in second.json['items']] == [1]
+
+    forced = client.post('/api/v1/transactions/import',
+                         json={'transactions': rows[:1], 'skip_duplicates': False},
+                         headers=auth_headers)
+    assert forced.json['created'] == 1
@@ -0,0 +1,121 @@
+import json
+from decimal import Decimal
+
+from ..models import db, User, Transaction, ChangeEvent
+from ..services import event_service
+from ..services.event_service import EventService, ChangeBroker, get_broker, process_origin
+from ..services.transaction_service import TransactionService
+
+
+def _drain(subscriber):
+    events = []
+    while not subscriber.empty():
+        events.append(subscriber.get_nowait())
+    return events
+
+
+def test_broker_replaces_overflow_with_resync(monkeypatch):
+    """Переполненная очередь медленного клиента заменяется событием resync."""
+    monkeypatch.setattr(event_service, 'SUBSCRIBER_QUEUE_SIZE', 2)
+    broker = ChangeBroker()
+    subscriber = broker.subscribe(1)
+    for version in range(1, 4):
+        broker.publish(1, {'type': 'change', 'version': version})
+    broker.publish(2, {'type': 'change', 'version': 9})
+    assert _drain(subscriber) == [{'type': 'resync', 'version': 3}]
+
+    broker.unsubscribe(1, subscriber)
+    assert not broker.has_subscribers()
+
+
+def test_commit_publishes_changes(app):
+    """После коммита подписчики получают таблицу, id строк и новую версию."""
+    app.config['EVENTS_POLL_INTERVAL'] = 0
+    user = User.query.filter_by(username='testuser').first()
+    subscriber = EventService.subscribe(user.id)
+
+    taxi = Transaction.query.filter_by(description='Такси').first()
+    taxi_id = taxi.id
+    taxi.amount = Decimal('600.00')
+    db.session.flush()
+    assert _drain(subscriber) == []
+    db.session.commit()
+
+    events = _drain(subscriber)
+    assert events == [{'type': 'change', 'user_id': user.id, 'table': 'transactions',
+                       'ids': [taxi.id], 'version': user.data_version}]
+    row = ChangeEvent.query.order_by(ChangeEvent.id.desc()).first()
+    assert json.loads(row.record_ids) == [taxi.id] and row.origin == process_origin()
+
+    taxi.amount = Decimal('700.00')
+    db.session.flush()
+    db.session.rollback()
+    assert _drain(subscriber) == []
+
+    result, _ = TransactionService.bulk_delete(user.id, [taxi_id])
+    assert result['succeeded'] == 1
+    assert [(event['table'], event['ids']) for event in _drain(subscriber)] == \
+        [('transactions', [taxi_id])]
+    EventService.unsubscribe(user.id, subscriber)
+
+
+def test_poll_delivers_events_of_other_processes(app):
+    """Из таблицы доставляются только события, записанные другими процессами."""
+    user = User.query.filter_by(username='testuser').first()
+    broker = get_broker(app)
+    subscriber = broker.subscribe(user.id)
+    last_id = EventService.last_event_id()
+
+    EventService.record(user.id, 'categories', [3, 1], 5)
+    db.session.add(ChangeEvent(user_id=user.id, table_name='budgets', record_ids=None,
+                               version=6, origin='other-host:1'))
+    db.session.commit()
+    _drain(subscriber)
+
+    assert EventService.poll(broker, last_id) == EventService.last_event_id()
+    assert _drain(subscriber) == [{'type': 'change', 'user_id': user.id, 'table': 'budgets',
+                                   'ids': None, 'version': 6}]
+    broker.unsubscribe(user.id, subscriber)
+
+
+def test_event_stream_api(app, client, auth_headers):
+    """SSE-поток начинается с hello и передает изменения с версией в id."""
+    app.config['EVENTS_POLL_INTERVAL'] = 0
+    headers = dict(auth_headers, **{'Last-Event-ID': '0'})
+    response = client.get('/api/v1/events/stream', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    chunks = iter(response.response)
+    hello = next(chunks).decode()
+    version = User.query.filter_by(username='testuser').first().data_version
+    assert f'id: {version}' in hello and 'event: hello' in hello
+    assert 'event: resync' in next(chunks).decode()
+
+    user_id = User.query.filter_by(username='testuser').first().id
+    get_broker(app).publish(user_id, {'type': 'change', 'user_id': user_id,
+                                      'table': 'categories', 'ids': [1], 'version': 42})
+    message = next(chunks).decode()
+    assert message.startswith('id: 42\nevent: change\n')
+    assert json.loads(message.split('data: ')[1]) == {'table': 'categories', 'ids': [1],
+                                                      'version': 42}
+    response.close()
+    assert not get_broker(app).has_subscribers(user_id)
+
+
+def test_event_streams_are_capped(app, client, auth_headers):
+    """Сверх EVENTS_MAX_STREAMS подключений поток отклоняется с 503."""
+    app.config.update({'EVENTS_POLL_INTERVAL': 0, 'EVENTS_MAX_STREAMS': 1})
+    first = client.get('/api/v1/events/stream', headers=auth_headers)
+    assert first.status_code == 200
+    second = client.get('/api/v1/events/stream', headers=auth_headers)
+    assert second.status_code == 503
+    assert second.headers['Retry-After'] == '30'
+
+    next(iter(first.response))
+    first.close()
+    assert not get_broker(app).has_subscribers()
+    third = client.get('/api/v1/events/stream', headers=auth_headers)
+    assert third.status_code == 200
+    next(iter(third.response))
+    third.close()
@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from ..models import db, User, Category, Transaction, Budget, BudgetPeriod, CategoryType
+from ..services.budget_service import BudgetService
+from ..services.forecast_service import ForecastService, HISTORY_DAYS
+
+
+def _weekly_spender():
+    """Пользователь, тратящий 100 каждый понедельник, и его бюджет на 4 недели."""
+    user = User(username='weekly', email='weekly@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    category = Category(name='Кафе', type=CategoryType.EXPENSE, user_id=user.id)
+    db.session.add(category)
+    db.session.commit()
+
+    today = date(2024, 6, 12)  # среда
+    days = [today - timedelta(days=offset) for offset in range(HISTORY_DAYS)]
+    db.session.add_all([
+        Transaction(amount=Decimal('100.00'), date=day, type=CategoryType.EXPENSE,
+                    category_id=category.id, user_id=user.id)
+        for day in days if day.weekday() == 0
+    ])
+    budget = Budget(name='Июнь', period=BudgetPeriod.MONTHLY, start_date=date(2024, 6, 1),
+                    end_date=date(2024, 6, 30), target_amount=Decimal('400.00'), user_id=user.id)
+    db.session.add(budget)
+    db.session.commit()
+    return user, budget, today
+
+
+def test_weekday_model_projects_remaining_mondays(app):
+    """Модель по дням недели предсказывает расходы только по понедельникам."""
+    user, budget, today = _weekly_spender()
+
+    projection = ForecastService.forecast_budgets(user.id, [budget], today)[budget.id]
+
+    # Понедельники 3 и 10 июня уже прошли, впереди 17 и 24 июня
+    assert projection['spent_to_date'] == 200.0
+    assert projection['projected_total'] == 400.0
+    assert projection['remaining_days'] == 18
+    assert projection['target_percentage'] == 100.0
+    # Ряд без разброса: интервал вырождается в точку
+    assert projection['lower_bound'] == projection['upper_bound'] == 400.0
+
+
+def test_forecast_skips_inactive_budgets(app):
+    """Для прошедших и будущих бюджетов прогноз не строится."""
+    user, budget, today = _weekly_spender()
+    assert ForecastService.forecast_budgets(user.id, [budget], date(2024, 7, 1)) == {}
+    assert ForecastService.forecast_budgets(user.id, [], today) == {}
+
+
+def test_budget_service_uses_forecast(app):
+    """Список и детали бюджета содержат прогноз с доверительным интервалом."""
+    user = User.query.filter_by(username='testuser').first()
+    budgets, status = BudgetService.get_user_budgets(user.id, active_only=True)
+    assert status == 200
+    listed = budgets['items'][0]['projection']
+    assert listed['lower_bound'] <= listed['projected_total'] <= listed['upper_bound']
+
+    details, status = BudgetService.get_budget_details(budgets['items'][0]['id'], user.id)
+    assert status == 200
+    assert details['projection'] == listed
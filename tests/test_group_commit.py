@@ -0,0 +1,107 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from ..models import db, User, Category, Transaction, CategoryType
+from ..services.group_commit_service import (
+    GroupCommitter, committer_for_session, get_committer)
+from ..services.transaction_service import TransactionService
+
+
+def _values(user, category, description, amount=Decimal('100.00')):
+    return {'description': description, 'amount': amount, 'date': date.today(),
+            'type': CategoryType.EXPENSE, 'category_id': category.id, 'user_id': user.id}
+
+
+def test_group_is_written_in_one_transaction(app):
+    """Вставки в окне записываются одним коммитом: версия данных растет на 1."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    version = user.data_version
+    committer = GroupCommitter(app, window_ms=200)
+    values = [_values(user, category, f'Покупка {number}') for number in range(5)]
+    db.session.commit()
+
+    futures = [committer.submit(item) for item in values]
+    ids = [future.result(timeout=10)['id'] for future in futures]
+
+    db.session.expire_all()
+    assert len(set(ids)) == 5
+    assert Transaction.query.filter(Transaction.id.in_(ids)).count() == 5
+    assert User.query.get(user.id).data_version == version + 1
+
+
+def test_failed_row_does_not_fail_the_group(app):
+    """Ошибка одной строки достается только ее вызывающему."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    committer = GroupCommitter(app, window_ms=200, durability='flush')
+    good = _values(user, category, 'Хорошая')
+    bad = _values(user, category, 'Плохая', amount=None)
+    db.session.commit()
+
+    good_future, bad_future = committer.submit(good), committer.submit(bad)
+    assert good_future.result(timeout=10)['id']
+    with pytest.raises(Exception):
+        bad_future.result(timeout=10)
+    db.session.expire_all()
+    assert Transaction.query.filter_by(description='Хорошая').count() == 1
+    assert Transaction.query.filter_by(description='Плохая').count() == 0
+
+
+def test_create_transaction_with_group_commit(app):
+    """create_transaction возвращает тот же ответ и в режиме группового коммита."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+    assert get_committer(app) is None
+    app.config.update({'GROUP_COMMIT_ENABLED': True, 'GROUP_COMMIT_WINDOW_MS': 1})
+
+    result, status = TransactionService.create_transaction(user.id, {
+        'description': 'Метро', 'amount': '60', 'date': date.today().isoformat(),
+        'category_id': category.id})
+    assert status == 201
+    assert result['category_name'] == 'Транспорт' and result['amount'] == 60.0
+    assert Transaction.query.get(result['id']).description == 'Метро'
+    assert get_committer(app) is app.extensions['group_committer']
+
+
+def test_api_create_uses_group_commit(client, auth_headers, app):
+    """POST /transactions идет через коммиттер, если групповой коммит включен."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+    app.config.update({'GROUP_COMMIT_ENABLED': True, 'GROUP_COMMIT_WINDOW_MS': 1})
+    committer = get_committer(app)
+    submitted = []
+    submit = committer.submit
+    committer.submit = lambda values: submitted.append(values) or submit(values)
+
+    response = client.post('/api/v1/transactions', json={
+        'description': 'Такси', 'amount': 450, 'date': date.today().isoformat(),
+        'category_id': category.id}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json['description'] == 'Такси'
+    assert response.json['category']['name'] == 'Транспорт'
+    assert [values['description'] for values in submitted] == ['Такси']
+    db.session.expire_all()
+    assert Transaction.query.get(response.json['id']).type == CategoryType.EXPENSE
+
+
+def test_pending_writes_bypass_group_commit(app):
+    """Сессия с незафиксированными изменениями пишет сама и их не теряет."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+    app.config.update({'GROUP_COMMIT_ENABLED': True, 'GROUP_COMMIT_WINDOW_MS': 1})
+    db.session.commit()
+    assert committer_for_session() is get_committer(app)
+
+    db.session.add(Category(name='Черновик', type=CategoryType.EXPENSE, user_id=user.id))
+    db.session.flush()
+    assert committer_for_session() is None
+    result, status = TransactionService.create_transaction(user.id, {
+        'description': 'Автобус', 'amount': '40', 'date': date.today().isoformat(),
+        'category_id': category.id})
+    assert status == 201
+    db.session.expire_all()
+    assert Category.query.filter_by(name='Черновик').count() == 1
+    assert Transaction.query.get(result['id']).description == 'Автобус'
@@ -0,0 +1,78 @@
+import os
+
+from .. import init_db
+from ..models import db, SchemaInfo, User, SCHEMA_VERSION
+
+
+def _database(path):
+    return init_db.create_app(f'sqlite:///{path}')
+
+
+def _state(app):
+    with app.app_context():
+        version = init_db.get_schema_version(db)
+        users = [user.username for user in User.query.order_by(User.username)]
+        db.session.remove()
+        db.engine.dispose()
+    return version, users
+
+
+def _forbid_upgrade(monkeypatch):
+    def upgrade_schema(db):
+        raise AssertionError('схема не должна обновляться')
+    monkeypatch.setattr(init_db, 'upgrade_schema', upgrade_schema)
+
+
+def test_init_stamps_schema_version_and_skips_current_database(tmp_path, monkeypatch):
+    """Новая база получает отметку версии; повторный запуск ограничивается ее проверкой."""
+    app = _database(tmp_path / 'budgetnik.db')
+    init_db.init_database(app, template_path='')
+    assert _state(app) == (SCHEMA_VERSION, ['demo', 'test'])
+
+    _forbid_upgrade(monkeypatch)
+    init_db.init_database(app, template_path='')
+    with app.app_context():
+        assert SchemaInfo.query.count() == 1
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_outdated_database_is_upgraded_without_reseeding(tmp_path):
+    """Устаревшая отметка версии обновляется, тестовые данные не дублируются."""
+    app = _database(tmp_path / 'budgetnik.db')
+    init_db.init_database(app, template_path='')
+    with app.app_context():
+        SchemaInfo.query.one().version = SCHEMA_VERSION - 1
+        db.session.commit()
+        db.session.remove()
+
+    init_db.init_database(app, template_path='')
+    assert _state(app) == (SCHEMA_VERSION, ['demo', 'test'])
+
+
+def test_first_start_copies_template(tmp_path, monkeypatch):
+    """При первом запуске база копируется из шаблона, схема не пересоздается."""
+    template = tmp_path / 'template' / 'budgetnik.db'
+    init_db.build_template(str(template))
+    assert template.exists()
+
+    _forbid_upgrade(monkeypatch)
+    database = tmp_path / 'data' / 'budgetnik.db'
+    app = _database(database)
+    init_db.init_database(app, template_path=str(template))
+    assert database.exists()
+    assert _state(app) == (SCHEMA_VERSION, ['demo', 'test'])
+
+
+def test_existing_database_is_not_replaced_by_template(tmp_path):
+    """Шаблон не копируется поверх существующей базы."""
+    template = tmp_path / 'template.db'
+    init_db.build_template(str(template))
+
+    database = tmp_path / 'budgetnik.db'
+    database.write_bytes(b'')
+    app = _database(database)
+    with app.app_context():
+        assert init_db.copy_template_if_missing(db, str(template)) is False
+        db.engine.dispose()
+    assert os.path.getsize(database) == 0
@@ -0,0 +1,132 @@
+import csv
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from ..models import db, User, Job, JobStatus
+from ..services.job_service import (JobService, JobContext, JobCancelled, JobRunner,
+                                    get_runner, _run_job)
+
+
+@pytest.fixture
+def jobs(app, tmp_path):
+    """
+    Задачи ждут в пуле до вызова jobs.run(): тестовая БД - одно
+    соединение, и задача не должна выполняться одновременно с тестом.
+    """
+    app.config['JOBS_RESULT_DIR'] = str(tmp_path)
+    release = threading.Event()
+    runner = JobRunner(thread_workers=1, process_workers=0)
+    runner.threads.submit(release.wait)
+    app.extensions['job_runner'] = runner
+
+    class Jobs:
+        @staticmethod
+        def run():
+            """Выполняет поставленные задачи и дожидается их окончания."""
+            release.set()
+            app.extensions.pop('job_runner').threads.shutdown(wait=True)
+            db.session.expire_all()
+
+    yield Jobs
+    release.set()
+    runner.threads.shutdown(wait=True)
+
+
+def _user():
+    return User.query.filter_by(username='testuser').first()
+
+
+def test_export_job_runs_in_background(app, jobs):
+    """Выгрузка выполняется в пуле и пишет CSV в файл, в задаче - только путь."""
+    user = _user()
+    job, status = JobService.submit(user.id, 'transactions_export', {'format': 'csv'})
+    assert status == 202 and job['status'] == 'queued'
+    jobs.run()
+
+    state, _ = JobService.get_job(job['id'], user.id)
+    assert state['status'] == 'succeeded' and state['progress'] == 1.0
+    result, status = JobService.get_result(job['id'], user.id)
+    assert status == 200 and result['result_type'] == 'text/csv'
+    assert db.session.get(Job, job['id']).result is None
+    with open(result['path'], encoding='utf-8', newline='') as exported:
+        rows = list(csv.reader(exported))
+    assert rows[0] == ['id', 'date', 'type', 'amount', 'currency', 'category', 'description']
+    assert {row[6] for row in rows[1:]} >= {'Такси', 'Фриланс проект'}
+
+
+def test_submit_validates_kind_and_params(app, jobs):
+    user = _user()
+    assert JobService.submit(user.id, 'unknown')[1] == 400
+    assert JobService.submit(user.id, 'transactions_export', {'format': 'xml'})[1] == 400
+    assert JobService.submit(user.id, 'transaction_statistics',
+                             {'start_date': '2024-02-01', 'end_date': '2024-01-01'})[1] == 400
+
+
+def test_failed_job_keeps_error(app, jobs):
+    """Ошибка сервиса сохраняется в задаче, результат недоступен."""
+    user = _user()
+    job, _ = JobService.submit(user.id, 'savings_goal_probability', {
+        'target_amount': '100000.00',
+        'target_date': (date.today() + timedelta(days=400)).isoformat(),
+        'simulations': 200})
+    jobs.run()
+
+    state, _ = JobService.get_job(job['id'], user.id)
+    assert state['status'] == 'failed' and 'history' in state['error']
+    assert JobService.get_result(job['id'], user.id)[1] == 409
+
+
+def test_cancel_and_stale_jobs(app):
+    """Отмена ожидающей и выполняющейся задачи, прерванные задачи."""
+    user = _user()
+    queued = Job(user_id=user.id, kind='transaction_statistics', params='{}')
+    running = Job(user_id=user.id, kind='transaction_statistics', params='{}',
+                  status=JobStatus.RUNNING, started_at=datetime.utcnow())
+    stale = Job(user_id=user.id, kind='transaction_statistics', params='{}',
+                status=JobStatus.RUNNING,
+                heartbeat_at=datetime.utcnow() - timedelta(hours=1))
+    db.session.add_all([queued, running, stale])
+    db.session.commit()
+
+    assert JobService.cancel_job(queued.id, user.id)[0]['status'] == 'cancelled'
+    _run_job(app, queued.id)
+    assert JobService.get_job(queued.id, user.id)[0]['status'] == 'cancelled'
+    assert JobService.cancel_job(queued.id, user.id)[1] == 409
+
+    assert JobService.cancel_job(running.id, user.id)[0]['status'] == 'running'
+    with pytest.raises(JobCancelled):
+        JobContext(running.id, get_runner(app)).progress(0.5, force=True)
+
+    assert JobService.get_job(stale.id, user.id)[0]['status'] == 'failed'
+    assert JobService.get_job(stale.id, user.id + 1)[1] == 403
+
+
+def test_jobs_api(app, client, auth_headers, jobs):
+    """Эндпоинты выгрузки и отчетов возвращают 202 со ссылкой на задачу."""
+    response = client.post('/api/v1/transactions/export', json={'format': 'json'},
+                           headers=auth_headers)
+    assert response.status_code == 202
+    location = response.headers['Location']
+    statistics = client.post('/api/v1/reports/statistics', json={}, headers=auth_headers)
+    assert statistics.status_code == 202
+    csv_export = client.post('/api/v1/transactions/export', json={}, headers=auth_headers)
+    jobs.run()
+
+    assert client.get(location, headers=auth_headers).json['status'] == 'succeeded'
+    exported = client.get(f'{location}/result', headers=auth_headers).json
+    assert 'Основная зарплата' in [row['description'] for row in exported]
+
+    report = client.get(f"/api/v1/jobs/{statistics.json['id']}/result", headers=auth_headers)
+    assert report.json['total_income'] == 65000.0
+
+    response = client.get(f"/api/v1/jobs/{csv_export.json['id']}/result", headers=auth_headers)
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    assert 'Такси' in response.get_data(as_text=True)
+    response.close()
+
+    jobs = client.get('/api/v1/jobs', headers=auth_headers).json
+    assert [job['kind'] for job in jobs] == ['transactions_export', 'transaction_statistics',
+                                            'transactions_export']
@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from ..models import db, User, Category, RecurringRule, Transaction, BudgetPeriod, CategoryType
+from ..services.recurring_service import (RecurringService, add_months, cron_occurrences,
+                                          parse_cron, period_occurrences,
+                                          count_period_occurrences)
+
+
+def _brute_force(anchor, period, start_date, end_date):
+    """Перебор всех вхождений от anchor для сравнения."""
+    result = []
+    index = 0
+    while True:
+        current = anchor + timedelta(days=7 * index) if period == BudgetPeriod.WEEKLY \
+            else add_months(anchor, index * {BudgetPeriod.MONTHLY: 1, BudgetPeriod.QUARTERLY: 3,
+                                             BudgetPeriod.SEMIANNUAL: 6, BudgetPeriod.ANNUAL: 12}[period])
+        if current > end_date:
+            return result
+        if current >= start_date:
+            result.append(current)
+        index += 1
+
+
+def test_period_occurrences_match_brute_force():
+    """Арифметика периодов совпадает с перебором, включая конец месяца."""
+    anchor = date(2024, 1, 31)
+    ranges = [(date(2024, 1, 1), date(2024, 12, 31)),
+              (date(2024, 2, 29), date(2024, 3, 30)),
+              (date(2023, 6, 1), date(2024, 1, 30)),
+              (date(2025, 7, 15), date(2027, 2, 1))]
+    for period in BudgetPeriod:
+        for start_date, end_date in ranges:
+            expected = _brute_force(anchor, period, start_date, end_date)
+            assert period_occurrences(anchor, period, start_date, end_date) == expected
+            assert count_period_occurrences(anchor, period, start_date, end_date) == len(expected)
+
+    # День прижимается к концу короткого месяца, но не "сползает"
+    assert period_occurrences(anchor, BudgetPeriod.MONTHLY,
+                              date(2024, 2, 1), date(2024, 3, 31)) == \
+        [date(2024, 2, 29), date(2024, 3, 31)]
+
+
+def test_cron_occurrences():
+    """Cron: дни месяца, дни недели и их объединение."""
+    start_date, end_date = date(2024, 1, 1), date(2024, 3, 31)
+
+    assert cron_occurrences(parse_cron('25 * *'), start_date, end_date) == \
+        [date(2024, 1, 25), date(2024, 2, 25), date(2024, 3, 25)]
+
+    # Каждый понедельник: совпадает с перебором дней
+    mondays = cron_occurrences(parse_cron('* * 1'), start_date, end_date)
+    assert mondays == [start_date + timedelta(days=offset)
+                       for offset in range((end_date - start_date).days + 1)
+                       if (start_date + timedelta(days=offset)).weekday() == 0]
+
+    # Пятиполевая форма, 31 число только в длинных месяцах, список месяцев
+    assert cron_occurrences(parse_cron('0 9 31 1,2,3 *'), start_date, end_date) == \
+        [date(2024, 1, 31), date(2024, 3, 31)]
+
+    # Заданы и день месяца, и день недели: подходит любой из них
+    both = cron_occurrences(parse_cron('1 2 0'), start_date, end_date)
+    assert date(2024, 2, 1) in both and date(2024, 2, 4) in both
+    assert all(day.month == 2 for day in both)
+
+
+def test_confirm_and_forecast(app):
+    """Подтвержденное вхождение становится транзакцией и уходит из прогноза."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Транспорт').first()
+    today = date.today()
+    start_date = today - timedelta(days=70)
+
+    result, status = RecurringService.create_rule(user.id, {
+        'description': 'Проездной', 'amount': Decimal('1000.00'),
+        'category_id': category.id, 'period': 'weekly', 'start_date': start_date})
+    assert status == 201
+    rule = RecurringRule.query.get(result['id'])
+    assert rule.type == CategoryType.EXPENSE
+
+    window_end = today + timedelta(days=30)
+    occurrences, _ = RecurringService.get_occurrences(user.id, start_date, window_end)
+    assert len(occurrences) == count_period_occurrences(
+        start_date, BudgetPeriod.WEEKLY, start_date, window_end)
+    assert not any(item['confirmed'] for item in occurrences)
+
+    totals = RecurringService.forecast(user.id, start_date, window_end).totals(start_date, window_end)
+    assert totals['expense'] == Decimal('1000.00') * len(occurrences)
+
+    transactions_before = Transaction.query.count()
+    confirmed, status = RecurringService.confirm_occurrence(
+        rule.id, user.id, start_date, Decimal('1100.00'))
+    assert status == 201
+    assert Transaction.query.count() == transactions_before + 1
+    assert Transaction.query.get(confirmed['transaction_id']).amount == Decimal('1100.00')
+
+    _, status = RecurringService.confirm_occurrence(rule.id, user.id, start_date)
+    assert status == 400
+    _, status = RecurringService.confirm_occurrence(
+        rule.id, user.id, start_date + timedelta(days=1))
+    assert status == 400
+
+    totals = RecurringService.forecast(user.id, start_date, window_end).totals(start_date, window_end)
+    assert totals['expense'] == Decimal('1000.00') * (len(occurrences) - 1)
+
+
+def test_recurring_api(client, auth_headers):
+    """Создание правила через API и ожидаемые суммы в сводном отчете."""
+    categories = client.get('/api/v1/categories?type=expense', headers=auth_headers).json
+    today = date.today()
+    response = client.post('/api/v1/recurring', json={
+        'description': 'Аренда', 'amount': '30000.00', 'category_id': categories[0]['id'],
+        'cron': '28 * *', 'start_date': today.replace(day=1).isoformat()}, headers=auth_headers)
+    assert response.status_code == 201
+
+    invalid = client.post('/api/v1/recurring', json={
+        'amount': '10.00', 'category_id': categories[0]['id'], 'period': 'monthly',
+        'cron': '1 * *', 'start_date': today.isoformat()}, headers=auth_headers)
+    assert invalid.status_code == 400
+
+    report = client.get('/api/v1/reports/summary?include_expected=true', headers=auth_headers)
+    assert report.status_code == 200
+    expected = Decimal('30000.00') if today.day <= 28 else Decimal('0.00')
+    assert Decimal(report.json['expected']['total_expense']) == expected
@@ -0,0 +1,164 @@
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import text, update
+
+from ..models import db, User, Category, Transaction, CategoryType
+from ..services import search_service
+from ..services.search_service import (
+    SearchService, FTS_TABLE, fts_match_expression, fts_user_match_expression)
+
+
+def _add_coffee(user, category):
+    db.session.add_all([
+        Transaction(description='Starbucks кофе', amount=Decimal('350.00'), date=date(2024, 5, 1),
+                    type=CategoryType.EXPENSE, category_id=category.id, user_id=user.id),
+        Transaction(description='STARBUCKS Reserve, капучино', amount=Decimal('420.00'),
+                    date=date(2024, 5, 20), type=CategoryType.EXPENSE,
+                    category_id=category.id, user_id=user.id),
+        Transaction(description='Кофейня у дома', amount=Decimal('200.00'), date=date(2024, 6, 2),
+                    type=CategoryType.EXPENSE, category_id=category.id, user_id=user.id)
+    ])
+    db.session.commit()
+
+
+def test_match_expression_quotes_tokens():
+    """Спецсимволы FTS5 в запросе не интерпретируются."""
+    assert fts_match_expression(['star', 'or']) == '"star"* "or"*'
+    assert fts_user_match_expression(7, ['star']) == 'owner : "u7" AND description : ("star"*)'
+
+
+def test_search_uses_index_and_stays_in_sync(app):
+    """Поиск по префиксу, фильтры и синхронизация индекса при изменениях."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    _add_coffee(user, category)
+    assert SearchService.fts_available(db.session.connection())
+
+    result, status = SearchService.search_transactions(user.id, 'starb')
+    assert status == 200
+    assert result['total'] == 2
+    assert all(item['rank'] > 0 for item in result['items'])
+
+    result, _ = SearchService.search_transactions(user.id, 'кофе star')
+    assert [item['description'] for item in result['items']] == ['Starbucks кофе']
+
+    result, _ = SearchService.search_transactions(user.id, 'кофе', sort_by='date')
+    assert [item['description'] for item in result['items']] == ['Кофейня у дома', 'Starbucks кофе']
+
+    result, _ = SearchService.search_transactions(
+        user.id, 'starbucks', start_date=date(2024, 5, 10))
+    assert result['total'] == 1
+
+    # Изменение через ORM и массовый UPDATE в обход ORM
+    transaction = Transaction.query.filter_by(description='Кофейня у дома').first()
+    transaction.description = 'Starbucks на вокзале'
+    db.session.commit()
+    assert SearchService.search_transactions(user.id, 'starbucks')[0]['total'] == 3
+    assert SearchService.search_transactions(user.id, 'кофейня')[0]['total'] == 0
+
+    db.session.execute(update(Transaction).where(Transaction.id == transaction.id)
+                       .values(description='Аптека'))
+    db.session.delete(Transaction.query.filter_by(description='Starbucks кофе').first())
+    db.session.commit()
+    assert SearchService.search_transactions(user.id, 'starbucks')[0]['total'] == 1
+    assert SearchService.search_transactions(user.id, 'аптека')[0]['total'] == 1
+
+    # Другой пользователь не видит чужих транзакций
+    other = User(username='other', email='other@example.com')
+    other.set_password('password123')
+    db.session.add(other)
+    db.session.commit()
+    assert SearchService.search_transactions(other.id, 'starbucks')[0]['total'] == 0
+
+
+def test_index_is_per_user(app):
+    """MATCH отбирает только транзакции пользователя, без фильтра по таблице."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    _add_coffee(user, category)
+    other = User(username='other', email='other@example.com')
+    other.set_password('password123')
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(Transaction(description='Starbucks', amount=Decimal('100.00'),
+                               date=date(2024, 5, 3), type=CategoryType.EXPENSE,
+                               category_id=category.id, user_id=other.id))
+    db.session.commit()
+
+    def matched(user_id, words):
+        return db.session.execute(text(
+            f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expression"
+        ), {'expression': fts_user_match_expression(user_id, words)}).scalar()
+
+    assert matched(user.id, ['starbucks']) == 2
+    assert matched(other.id, ['starbucks']) == 1
+    # Слова запроса не совпадают с токеном владельца
+    assert matched(other.id, [f'u{user.id}']) == 0
+    assert SearchService.search_transactions(other.id, 'starbucks')[0]['total'] == 1
+
+
+def test_old_index_is_rebuilt_with_owner(app):
+    """Индекс без колонки владельца пересоздается и заполняется заново."""
+    user = User.query.filter_by(username='testuser').first()
+    for suffix in ('ai', 'ad', 'au'):
+        db.session.execute(text(f'DROP TRIGGER {FTS_TABLE}_{suffix}'))
+    db.session.execute(text(f'DROP TABLE {FTS_TABLE}'))
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        "description, content='transactions', content_rowid='id')"))
+    db.session.commit()
+
+    assert SearchService.ensure_index(db.session.connection())
+    db.session.commit()
+    assert SearchService.search_transactions(user.id, 'такси')[0]['total'] == 1
+
+
+def test_search_total_is_capped(app, monkeypatch):
+    """Совпадения считаются не дальше MAX_TOTAL."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    _add_coffee(user, category)
+    monkeypatch.setattr(search_service, 'MAX_TOTAL', 1)
+
+    result, status = SearchService.search_transactions(user.id, 'starbucks', limit=1)
+    assert status == 200
+    assert result['total'] == 1
+    assert result['total_capped'] is True
+    assert len(result['items']) == 1
+
+    result, _ = SearchService.search_transactions(user.id, 'кофейня')
+    assert result['total'] == 1
+    assert result['total_capped'] is False
+
+
+def test_search_falls_back_to_like(app):
+    """Без полнотекстового индекса поиск работает через LIKE."""
+    user = User.query.filter_by(username='testuser').first()
+    for suffix in ('ai', 'ad', 'au'):
+        db.session.execute(text(f'DROP TRIGGER {FTS_TABLE}_{suffix}'))
+    db.session.execute(text(f'DROP TABLE {FTS_TABLE}'))
+    db.session.commit()
+
+    result, status = SearchService.search_transactions(user.id, 'супермаркет')
+    assert status == 200
+    assert [item['description'] for item in result['items']] == ['Покупка в супермаркете']
+    assert result['items'][0]['rank'] is None
+
+    assert SearchService.ensure_index(db.session.connection())
+    db.session.commit()
+    assert SearchService.search_transactions(user.id, 'такси')[0]['total'] == 1
+
+
+def test_search_api(client, auth_headers):
+    """Эндпоинт поиска с фильтрами и проверкой пустого запроса."""
+    response = client.get('/api/v1/transactions/search?q=фриланс', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['total'] == 1
+    assert response.json['items'][0]['category_name'] == 'Подработка'
+
+    response = client.get('/api/v1/transactions/search?q=фриланс&type=expense',
+                          headers=auth_headers)
+    assert response.json['total'] == 0
+
+    response = client.get('/api/v1/transactions/search?q=%20-', headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,59 @@
+from datetime import date
+from decimal import Decimal
+import numpy as np
+
+from ..models import db, User, Category, Transaction, CategoryType
+from ..services.simulation_service import SimulationService, run_simulations
+
+
+def test_run_simulations_is_reproducible():
+    """Результат зависит только от seed, в том числе при расчете в пуле процессов."""
+    history = np.array([100.0, 300.0])
+
+    probability, trajectories = run_simulations(history, 12, 0.0, 2400.0, 5000, seed=7)
+    parallel = run_simulations(history, 12, 0.0, 2400.0, 5000, seed=7, workers=2)
+    assert probability == parallel[0]
+    assert np.array_equal(trajectories, parallel[1])
+    assert 0.0 < probability < 1.0
+    # Перцентили упорядочены в каждом месяце
+    assert np.all(np.diff(trajectories, axis=0) >= 0)
+
+    # Минимум 100 в месяц: 1200 за год достигается всегда, 3601 - никогда
+    assert run_simulations(history, 12, 0.0, 1200.0, 500, seed=1)[0] == 1.0
+    assert run_simulations(history, 12, 0.0, 3601.0, 500, seed=1)[0] == 0.0
+
+
+def test_savings_goal_probability_from_history(app):
+    """История пользователя: чистые накопления 500 в месяц в течение полугода."""
+    user = User(username='saver', email='saver@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    income = Category(name='Зарплата', type=CategoryType.INCOME, user_id=user.id)
+    expense = Category(name='Продукты', type=CategoryType.EXPENSE, user_id=user.id)
+    db.session.add_all([income, expense])
+    db.session.commit()
+    for month in range(1, 7):
+        db.session.add_all([
+            Transaction(amount=Decimal('2000.00'), date=date(2024, month, 5),
+                        type=CategoryType.INCOME, category_id=income.id, user_id=user.id),
+            Transaction(amount=Decimal('1500.00'), date=date(2024, month, 20),
+                        type=CategoryType.EXPENSE, category_id=expense.id, user_id=user.id)
+        ])
+    db.session.commit()
+    today = date(2024, 7, 10)
+
+    assert SimulationService.monthly_net_history(user.id, today) == [Decimal('500.00')] * 6
+
+    result, status = SimulationService.savings_goal_probability(
+        user.id, Decimal('3000.00'), date(2024, 12, 31), Decimal('100.00'),
+        simulations=1000, today=today)
+    assert status == 200
+    assert result['months_remaining'] == 6
+    assert result['probability'] == 1.0
+    assert result['months'][0] == '2024-08'
+    assert result['trajectories']['p50'][-1] == 3100.0
+
+    _, status = SimulationService.savings_goal_probability(
+        user.id, Decimal('3000.00'), date(2024, 12, 31), today=date(2024, 3, 10))
+    assert status == 400
@@ -0,0 +1,188 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from ..models import db, User, Category, Transaction, MonthlySummary, CategoryType
+from ..services.data_version_service import DataVersionService
+from ..services.summary_service import (SummaryService, split_range, next_month,
+                                        comparison_periods, shift_months)
+
+
+def _raw_totals(user_id, start_date, end_date):
+    """Итоги напрямую по транзакциям для сравнения."""
+    income = Decimal('0.00')
+    expense = Decimal('0.00')
+    for transaction in Transaction.query.filter(
+            Transaction.user_id == user_id,
+            Transaction.date >= start_date,
+            Transaction.date <= end_date):
+        if transaction.type == CategoryType.INCOME:
+            income += transaction.amount
+        else:
+            expense += transaction.amount
+    return income, expense
+
+
+def test_split_range_whole_and_partial_months():
+    """Диапазон делится на целые месяцы и неполные края."""
+    months, edges = split_range(date(2024, 1, 15), date(2024, 4, 10))
+    assert months == [date(2024, 2, 1), date(2024, 3, 1)]
+    assert edges == [(date(2024, 1, 15), date(2024, 1, 31)),
+                     (date(2024, 4, 1), date(2024, 4, 10))]
+
+    months, edges = split_range(date(2024, 1, 1), date(2024, 12, 31))
+    assert len(months) == 12
+    assert edges == []
+
+    months, edges = split_range(date(2024, 2, 3), date(2024, 2, 20))
+    assert months == []
+    assert edges == [(date(2024, 2, 3), date(2024, 2, 20))]
+
+
+def test_summary_matches_raw_transactions(app):
+    """Сводка по материализованным месяцам совпадает с сырыми суммами."""
+    user = User.query.filter_by(username='testuser').first()
+    end_date = date.today()
+    start_date = end_date - timedelta(days=400)
+
+    summary = SummaryService.get_summary(user.id, start_date, end_date)
+    income, expense = _raw_totals(user.id, start_date, end_date)
+
+    assert summary['total_income'] == income
+    assert summary['total_expense'] == expense
+    assert summary['net_total'] == income - expense
+    assert sum(item['total_amount']
+               for item in summary['expenses_by_category']) == expense
+
+
+def test_summary_refreshed_after_transaction_change(app):
+    """Изменение транзакции сбрасывает итоги ее месяца."""
+    user = User.query.filter_by(username='testuser').first()
+    category = Category.query.filter_by(
+        user_id=user.id, type=CategoryType.EXPENSE).first()
+
+    month = (date.today().replace(day=1) - timedelta(days=70)).replace(day=1)
+    month_end = next_month(month) - timedelta(days=1)
+
+    before = SummaryService.get_summary(user.id, month, month_end)
+    assert MonthlySummary.query.filter_by(
+        user_id=user.id, month=month).count() == 1
+
+    transaction = Transaction(description='Старый расход', amount=Decimal('123.45'),
+                              date=month + timedelta(days=3), type=CategoryType.EXPENSE,
+                              category_id=category.id, user_id=user.id)
+    db.session.add(transaction)
+    db.session.commit()
+    assert MonthlySummary.query.filter_by(
+        user_id=user.id, month=month).count() == 0
+
+    after = SummaryService.get_summary(user.id, month, month_end)
+    assert after['total_expense'] - \
+        before['total_expense'] == Decimal('123.45')
+
+    # Перенос транзакции в другой месяц сбрасывает оба месяца
+    SummaryService.get_summary(user.id, month, month_end)
+    transaction.date = date.today()
+    db.session.commit()
+    moved = SummaryService.get_summary(user.id, month, month_end)
+    assert moved['total_expense'] == before['total_expense']
+
+
+def test_comparison_periods():
+    """Целые месяцы сравниваются с месяцами, иначе - с тем же числом дней."""
+    periods = comparison_periods(date(2024, 3, 1), date(2024, 4, 30))
+    assert periods['previous'] == (date(2024, 1, 1), date(2024, 2, 29))
+    assert periods['year_ago'] == (date(2023, 3, 1), date(2023, 4, 30))
+    periods = comparison_periods(date(2024, 2, 1), date(2024, 2, 29))
+    assert periods['year_ago'] == (date(2023, 2, 1), date(2023, 2, 28))
+    periods = comparison_periods(date(2024, 3, 10), date(2024, 3, 16))
+    assert periods['previous'] == (date(2024, 3, 3), date(2024, 3, 9))
+    assert shift_months(date(2024, 3, 31), -1) == date(2024, 2, 29)
+
+
+def test_comparison_report(client, auth_headers):
+    """Три периода и разницы по категориям считаются одним запросом."""
+    user = User.query.filter_by(username='testuser').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    today = date.today()
+    db.session.add(Transaction(
+        description='Продукты год назад', amount=Decimal('1000.00'),
+        date=shift_months(today - timedelta(days=5), -12), type=CategoryType.EXPENSE,
+        category_id=groceries.id, user_id=user.id))
+    db.session.commit()
+
+    start_date = today - timedelta(days=7)
+    comparison = SummaryService.get_comparison(user.id, start_date, today)
+    periods = comparison['periods']
+    assert periods['current']['total_expense'] == Decimal('3950.50')
+    assert periods['previous']['total_income'] == Decimal('65000.00')
+    assert periods['year_ago']['total_expense'] == Decimal('1000.00')
+    assert comparison['change_previous']['total_income'] == {
+        'amount': Decimal('-65000.00'), 'percent': Decimal('-100.00')}
+
+    by_name = {item['category_name']: item for item in comparison['categories']}
+    assert by_name['Продукты']['change_year_ago'] == {
+        'amount': Decimal('2500.50'), 'percent': Decimal('250.05')}
+    assert by_name['Продукты']['change_previous']['percent'] is None
+    assert by_name['Зарплата']['previous'] == Decimal('50000.00')
+
+    response = client.get('/api/v1/reports/comparison', query_string={
+        'start_date': start_date.isoformat(), 'end_date': today.isoformat()}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['periods']['current']['total_expense'] == '3950.50'
+    assert response.json['change_year_ago']['total_expense']['percent'] == '295.05'
+
+
+def test_materialization_does_not_commit_caller_session(app):
+    """Чтение итогов не фиксирует и не откатывает чужие изменения сессии."""
+    user = User.query.filter_by(username='testuser').first()
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    month = (date.today() - timedelta(days=400)).replace(day=1)
+    month_end = next_month(month) - timedelta(days=1)
+
+    # Без незафиксированных изменений итоги пишутся на отдельном соединении
+    SummaryService.get_summary(user.id, month, month_end)
+    db.session.rollback()
+    assert MonthlySummary.query.filter_by(user_id=user.id, month=month).count() == 1
+
+    # С незафиксированной записью - в SAVEPOINT, которая откатывается вместе с ней
+    pending = Transaction(description='Незафиксированная', amount=Decimal('10.00'),
+                          date=month, type=CategoryType.EXPENSE,
+                          category_id=groceries.id, user_id=user.id)
+    db.session.add(pending)
+    db.session.flush()
+    previous = (month - timedelta(days=1)).replace(day=1)
+    SummaryService.get_summary(user.id, previous, month - timedelta(days=1))
+    # Конфликт уникальности при записи итогов не откатывает запись вызывающего кода
+    SummaryService._store_months(
+        user.id, User.query.get(user.id).data_version,
+        [{'user_id': user.id, 'month': previous, 'total_income': 0, 'total_expense': 0}], [])
+    assert Transaction.query.filter_by(description='Незафиксированная').count() == 1
+    db.session.rollback()
+    assert Transaction.query.filter_by(description='Незафиксированная').count() == 0
+    assert MonthlySummary.query.filter_by(user_id=user.id, month=previous).count() == 0
+
+
+def test_materialization_skips_snapshot_older_than_concurrent_write(app, monkeypatch):
+    """Итоги, посчитанные до параллельной записи, не сохраняются."""
+    user = User.query.filter_by(username='testuser').first()
+    month = (date.today() - timedelta(days=400)).replace(day=1)
+    month_end = next_month(month) - timedelta(days=1)
+    db.session.commit()
+    store = SummaryService._store_months
+
+    def store_after_concurrent_write(*args):
+        # Другой запрос фиксирует изменение между чтением итогов и их записью
+        with db.engine.connect() as connection:
+            DataVersionService.bump([user.id], connection=connection)
+            connection.commit()
+        store(*args)
+
+    monkeypatch.setattr(SummaryService, '_store_months', staticmethod(store_after_concurrent_write))
+    SummaryService.get_summary(user.id, month, month_end)
+    db.session.rollback()
+    assert MonthlySummary.query.filter_by(user_id=user.id, month=month).count() == 0
+
+    monkeypatch.setattr(SummaryService, '_store_months', staticmethod(store))
+    SummaryService.get_summary(user.id, month, month_end)
+    db.session.rollback()
+    assert MonthlySummary.query.filter_by(user_id=user.id, month=month).count() == 1
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from ..models import db, User, Category, Transaction
+from ..services.category_service import CategoryService
+from ..services.sync_service import SyncService
+from ..services.transaction_service import TransactionService
+
+
+def _changed_ids(result, name):
+    return sorted(row['id'] for row in result[name])
+
+
+def test_sync_returns_only_changes_since_token(app):
+    """После токена возвращаются только измененные и удаленные строки."""
+    user = User.query.filter_by(username='testuser').first()
+    full, status = SyncService.get_changes(user.id)
+    assert status == 200 and not full['has_more']
+    assert len(full['transactions']) == Transaction.query.filter_by(user_id=user.id).count()
+    assert len(full['categories']) == 4
+
+    empty, _ = SyncService.get_changes(user.id, full['token'])
+    assert empty['transactions'] == [] and empty['deleted'] == []
+    assert empty['token'] == full['token']
+
+    taxi = Transaction.query.filter_by(description='Такси').first()
+    taxi.amount = Decimal('500.00')
+    salary = Transaction.query.filter_by(description='Основная зарплата').first()
+    salary_id = salary.id
+    db.session.delete(salary)
+    created = Category(name='Кафе', type=taxi.type, user_id=user.id)
+    db.session.add(created)
+    db.session.commit()
+
+    delta, _ = SyncService.get_changes(user.id, full['token'])
+    assert _changed_ids(delta, 'transactions') == [taxi.id]
+    assert delta['transactions'][0]['amount'] == 500.0
+    assert _changed_ids(delta, 'categories') == [created.id]
+    assert delta['deleted'] == [{'table': 'transactions', 'id': salary_id}]
+    assert SyncService.get_changes(user.id, 'garbage')[1] == 400
+
+
+def test_sync_pages_and_bulk_writes(app):
+    """Постраничная выдача не теряет строк; массовые операции тоже видны."""
+    user = User.query.filter_by(username='testuser').first()
+    token = SyncService.get_changes(user.id)[0]['token']
+    groceries = Category.query.filter_by(user_id=user.id, name='Продукты').first()
+    transport_id = Category.query.filter_by(user_id=user.id, name='Транспорт').first().id
+
+    created, _ = TransactionService.bulk_create(user.id, [
+        {'description': f'Покупка {number}', 'amount': '10', 'date': '2024-05-03',
+         'category_id': groceries.id} for number in range(5)
+    ])
+    new_ids = [item['id'] for item in created['results']]
+    TransactionService.bulk_delete(user.id, new_ids[:2])
+    CategoryService.merge_categories(transport_id, groceries.id, user.id)
+
+    pages = []
+    while True:
+        page, status = SyncService.get_changes(user.id, token, limit=2)
+        assert status == 200
+        pages.append(page)
+        token = page['token']
+        if not page['has_more']:
+            break
+    assert len(pages) > 2
+    transactions = sorted(row['id'] for page in pages for row in page['transactions'])
+    deleted = sorted((row['table'], row['id']) for page in pages for row in page['deleted'])
+    taxi = Transaction.query.filter_by(description='Такси').first()
+    assert transactions == sorted(new_ids[2:] + [taxi.id])
+    assert deleted == sorted([('transactions', new_ids[0]), ('transactions', new_ids[1]),
+                              ('categories', transport_id)])
+    assert SyncService.get_changes(user.id, token)[0]['transactions'] == []
+
+
+def test_sync_api(client, auth_headers):
+    """Эндпоинт синхронизации отдает токен и поддерживает ETag."""
+    response = client.get('/api/v1/sync', headers=auth_headers)
+    assert response.status_code == 200
+    token = response.json['token']
+
+    client.post('/api/v1/categories', json={'name': 'Подписки', 'type': 'expense'},
+                headers=auth_headers)
+    response = client.get(f'/api/v1/sync?since={token}', headers=auth_headers)
+    assert [row['name'] for row in response.json['categories']] == ['Подписки']
+
+    etag = response.headers['ETag']
+    response = client.get(f'/api/v1/sync?since={token}',
+                          headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert response.status_code == 304
@@ -0,0 +1,68 @@
+"""
+Условные ответы (ETag / Last-Modified) для данных пользователя.
+"""
+import hashlib
+from datetime import date, timezone
+from functools import wraps
+from typing import Callable
+
+from flask import request, Response
+from flask_jwt_extended import verify_jwt_in_request, current_user
+from flask_restx.utils import unpack
+from werkzeug.http import http_date
+
+
+def make_etag(user_id: int, data_version: int) -> str:
+    """
+    Строит ETag из версии данных пользователя и параметров запроса.
+    Текущая дата входит в ключ, т.к. периоды по умолчанию зависят от нее.
+    """
+    args = '&'.join(f'{key}={value}' for key, value in sorted(
+        request.args.items(multi=True)))
+    key = f'{user_id}:{data_version}:{date.today().isoformat()}:{request.method}:{request.path}?{args}'
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional_response(f: Callable) -> Callable:
+    """
+    Декоратор для GET-ресурсов с данными пользователя.
+
+    До выполнения запросов к БД и сериализации сравнивает If-None-Match
+    (или If-Modified-Since) с версией данных пользователя и при
+    совпадении сразу отвечает 304. Иначе добавляет к ответу ETag и
+    Last-Modified. Располагается над marshal_with.
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        verify_jwt_in_request()
+        user = current_user
+        etag = make_etag(user.id, user.data_version or 0)
+        modified_at = user.data_updated_at or user.created_at
+        if modified_at is not None:
+            modified_at = modified_at.replace(
+                tzinfo=timezone.utc, microsecond=0)
+
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+        if modified_at is not None:
+            headers['Last-Modified'] = http_date(modified_at)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = (request.if_modified_since is not None and modified_at is not None
+                            and modified_at <= request.if_modified_since)
+        if not_modified:
+            return Response(status=304, headers=headers)
+
+        data, code, response_headers = unpack(f(*args, **kwargs))
+        if isinstance(data, Response):
+            if data.status_code == 200:
+                data.headers.update(headers)
+            return data
+        if code != 200:
+            return data, code, response_headers
+        response_headers = dict(response_headers or {})
+        response_headers.update(headers)
+        return data, code, response_headers
+
+    return wrapper
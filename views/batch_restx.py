@@ -0,0 +1,67 @@
+from flask import request
+from flask_restx import Namespace, Resource, fields
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from ..services.batch_service import BatchService
+from ..utils.error_handlers import log_operation
+
+# Создаем Namespace
+ns = Namespace('batch', description='Пакетное выполнение запросов')
+
+# --- Модели данных для Swagger ---
+batch_item_model = ns.model('BatchItem', {
+    'method': fields.String(description='HTTP метод', enum=['GET', 'POST', 'PUT', 'DELETE'], default='GET', example='GET'),
+    'path': fields.String(required=True, description='Путь API с параметрами запроса', example='/api/v1/categories?type=expense'),
+    'body': fields.Raw(description='Тело запроса (для POST и PUT)')
+})
+
+batch_input_model = ns.model('BatchInput', {
+    'requests': fields.List(fields.Nested(batch_item_model), required=True, description='Запросы в порядке выполнения'),
+    'atomic': fields.Boolean(description='Выполнить все запросы в одной транзакции', default=False)
+})
+
+batch_result_model = ns.model('BatchResult', {
+    'status': fields.Integer(description='HTTP статус вложенного запроса'),
+    'duration_ms': fields.Float(description='Время выполнения, мс'),
+    'body': fields.Raw(description='Тело ответа'),
+    'etag': fields.String(description='ETag ответа, если есть'),
+    'skipped': fields.Boolean(description='Запрос не выполнялся из-за ошибки в атомарном пакете')
+})
+
+batch_output_model = ns.model('BatchOutput', {
+    'atomic': fields.Boolean(),
+    'committed': fields.Boolean(description='Изменения зафиксированы'),
+    'duration_ms': fields.Float(description='Общее время выполнения, мс'),
+    'results': fields.List(fields.Nested(batch_result_model))
+})
+
+# --- Ресурсы ---
+
+
+@ns.route('')
+class Batch(Resource):
+    """Выполнение нескольких запросов к API за один HTTP-запрос."""
+
+    @ns.doc('run_batch', security='Bearer Auth')
+    @ns.expect(batch_input_model, validate=True)
+    @ns.response(200, 'Пакет выполнен', model=batch_output_model)
+    @ns.response(400, 'Некорректный пакет запросов')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Выполнить пакет запросов"""
+        user_id = get_jwt_identity()
+        data = ns.payload
+        requests = data.get('requests')
+
+        log_operation(
+            operation_type="batch",
+            resource_type="api",
+            user_id=user_id,
+            details={"count": len(requests or []),
+                     "atomic": bool(data.get('atomic'))}
+        )
+
+        # Вложенные запросы аутентифицируются тем же токеном
+        headers = {'Authorization': request.headers.get('Authorization', '')}
+        return BatchService.run(requests, headers, atomic=bool(data.get('atomic')))
@@ -10,6 +10,10 @@ from marshmallow import ValidationError
 from ..models import Budget, BudgetPeriod
 # Используем схему Marshmallow для валидации дат и других правил
 from ..schemas import BudgetSchema
+from ..services.budget_service import BudgetService
+from ..services.forecast_service import ForecastService
+from ..services.budget_line_service import BudgetLineService
+from ..utils.http_cache import conditional_response
 from .. import db
 
 # Создаем Namespace
@@ -23,16 +27,67 @@ budget_model = ns.model('Budget', {
     'start_date': fields.Date(required=True, description='Дата начала (YYYY-MM-DD)'),
     'end_date': fields.Date(required=True, description='Дата окончания (YYYY-MM-DD)'),
     'target_amount': fields.Price(description='Планируемая сумма (опционально)', decimals=2, example=50000.00),
-    'created_at': fields.DateTime(readonly=True, dt_format='iso8601')
+    'currency': fields.String(description='Валюта бюджета (ISO 4217)', example='RUB'),
+    'created_at': fields.DateTime(readonly=True, dt_format='iso8601'),
+    'projection': fields.Raw(readonly=True, description='Прогноз расходов с доверительным интервалом (для активных бюджетов)'),
+    'lines': fields.Raw(readonly=True, attribute='line_statistics',
+                        description='Строки бюджета: лимит, потрачено, остаток и прогноз по категориям')
 })
 
 # Модель для создания/обновления
+budget_line_input_model = ns.model('BudgetLineInput', {
+    'category_id': fields.Integer(required=True, description='ID категории расходов'),
+    'limit_amount': fields.String(required=True, description='Лимит расходов по категории', example='15000.00')
+})
+
 budget_input_model = ns.model('BudgetInput', {
     'name': fields.String(required=True, description='Название бюджета', example='Бюджет на Май'),
     'period': fields.String(required=True, description='Период бюджета', enum=[p.value for p in BudgetPeriod], example='monthly'),
     'start_date': fields.Date(required=True, description='Дата начала (YYYY-MM-DD)', example='2024-05-01'),
     'end_date': fields.Date(required=True, description='Дата окончания (YYYY-MM-DD)', example='2024-05-31'),
-    'target_amount': fields.Price(description='Планируемая сумма (опционально)', decimals=2, min=0, example=50000.00)
+    'target_amount': fields.Price(description='Планируемая сумма (опционально)', decimals=2, min=0, example=50000.00),
+    'currency': fields.String(description='Валюта бюджета (ISO 4217), по умолчанию базовая', example='RUB'),
+    'lines': fields.List(fields.Nested(budget_line_input_model),
+                         description='Лимиты по категориям (заменяют текущие строки)')
+})
+
+# Модели массовых операций
+budget_bulk_update_item_model = ns.model('BudgetBulkUpdateItem', {
+    'id': fields.Integer(required=True, description='ID бюджета'),
+    'name': fields.String(description='Название бюджета'),
+    'period': fields.String(description='Период бюджета', enum=[p.value for p in BudgetPeriod]),
+    'start_date': fields.Date(description='Дата начала (YYYY-MM-DD)'),
+    'end_date': fields.Date(description='Дата окончания (YYYY-MM-DD)'),
+    'target_amount': fields.String(description='Планируемая сумма', example='50000.00'),
+    'currency': fields.String(description='Валюта бюджета (ISO 4217)', example='RUB')
+})
+
+budget_bulk_create_model = ns.model('BudgetBulkCreate', {
+    'items': fields.List(fields.Nested(budget_input_model), required=True, description='Создаваемые бюджеты'),
+    'atomic': fields.Boolean(default=False, description='Не сохранять ничего, если в элементах есть ошибки')
+})
+
+budget_bulk_update_model = ns.model('BudgetBulkUpdate', {
+    'items': fields.List(fields.Nested(budget_bulk_update_item_model), required=True, description='Изменения бюджетов'),
+    'atomic': fields.Boolean(default=False, description='Не сохранять ничего, если в элементах есть ошибки')
+})
+
+budget_bulk_delete_model = ns.model('BudgetBulkDelete', {
+    'ids': fields.List(fields.Integer, required=True, description='ID удаляемых бюджетов'),
+    'atomic': fields.Boolean(default=False, description='Не удалять ничего, если в элементах есть ошибки')
+})
+
+bulk_item_result_model = ns.model('BudgetBulkItemResult', {
+    'index': fields.Integer(description='Позиция элемента в запросе'),
+    'id': fields.Integer(description='ID бюджета'),
+    'status': fields.Integer(description='HTTP статус элемента'),
+    'error': fields.String(description='Ошибка элемента')
+})
+
+bulk_result_model = ns.model('BudgetBulkResult', {
+    'succeeded': fields.Integer(description='Выполнено'),
+    'failed': fields.Integer(description='С ошибками'),
+    'results': fields.List(fields.Nested(bulk_item_result_model))
 })
 
 # --- Парсеры аргументов запроса ---
@@ -50,6 +105,17 @@ budget_list_parser.add_argument('sort_order', type=str, choices=[
 # --- Marshmallow схема для валидации ---
 budget_validator = BudgetSchema()
 
+
+def _prepare_lines(items):
+    """Проверенные строки бюджета из запроса (None, если не переданы)."""
+    if items is None:
+        return None
+    lines, status = BudgetLineService.prepare_lines(current_user.id, items)
+    if status != 200:
+        ns.abort(status, message=lines['error'])
+    return lines
+
+
 # --- Ресурсы ---
 
 
@@ -58,6 +124,7 @@ class BudgetList(Resource):
     """Работа со списком бюджетов и создание новых."""
 
     @ns.doc('list_budgets', security='Bearer Auth')
+    @conditional_response
     @ns.expect(budget_list_parser)
     @ns.marshal_list_with(budget_model)
     @ns.response(400, 'Ошибка в параметрах фильтрации/сортировки')
@@ -84,6 +151,13 @@ class BudgetList(Resource):
             query = query.order_by(sort_column.asc())
 
         budgets = query.all()
+        # Прогнозы для всех активных бюджетов одним проходом
+        projections = ForecastService.forecast_budgets(current_user.id, budgets)
+        # Строки всех бюджетов - одним сгруппированным запросом
+        lines = BudgetLineService.evaluate(current_user.id, budgets)
+        for budget in budgets:
+            budget.projection = projections.get(budget.id)
+            budget.line_statistics = lines[budget.id]
         return budgets
 
     @ns.doc('create_budget', security='Bearer Auth')
@@ -95,7 +169,8 @@ class BudgetList(Resource):
     @jwt_required()
     def post(self):
         """Создать бюджет"""
-        data = ns.payload
+        data = dict(ns.payload)
+        lines = _prepare_lines(data.pop('lines', None))
         # Дополнительная валидация через Marshmallow (особенно для дат)
         try:
             validated_data = budget_validator.load(data)
@@ -106,6 +181,8 @@ class BudgetList(Resource):
         validated_data['period'] = BudgetPeriod(validated_data['period'])
 
         new_budget = Budget(**validated_data, owner=current_user)
+        if lines is not None:
+            BudgetLineService.replace_lines(new_budget, lines)
 
         try:
             db.session.add(new_budget)
@@ -122,9 +199,49 @@ class BudgetList(Resource):
                 f"Error creating budget for user {current_user.id}: {e}", exc_info=True)
             ns.abort(500, message="Could not create budget.")
 
+        new_budget.line_statistics = BudgetLineService.evaluate(
+            current_user.id, [new_budget])[new_budget.id]
         return new_budget, 201
 
 
+@ns.route('/bulk')
+class BudgetBulk(Resource):
+    """Массовое создание, изменение и удаление бюджетов за один запрос."""
+
+    @ns.doc('bulk_create_budgets', security='Bearer Auth')
+    @ns.expect(budget_bulk_create_model)
+    @ns.response(200, 'Результаты по элементам', bulk_result_model)
+    @ns.response(400, 'Некорректный запрос')
+    @jwt_required()
+    def post(self):
+        """Создать несколько бюджетов"""
+        data = ns.payload or {}
+        return BudgetService.bulk_create(
+            current_user.id, data.get('items'), atomic=bool(data.get('atomic')))
+
+    @ns.doc('bulk_update_budgets', security='Bearer Auth')
+    @ns.expect(budget_bulk_update_model)
+    @ns.response(200, 'Результаты по элементам', bulk_result_model)
+    @ns.response(400, 'Некорректный запрос')
+    @jwt_required()
+    def put(self):
+        """Изменить несколько бюджетов"""
+        data = ns.payload or {}
+        return BudgetService.bulk_update(
+            current_user.id, data.get('items'), atomic=bool(data.get('atomic')))
+
+    @ns.doc('bulk_delete_budgets', security='Bearer Auth')
+    @ns.expect(budget_bulk_delete_model)
+    @ns.response(200, 'Результаты по элементам', bulk_result_model)
+    @ns.response(400, 'Некорректный запрос')
+    @jwt_required()
+    def delete(self):
+        """Удалить несколько бюджетов"""
+        data = ns.payload or {}
+        return BudgetService.bulk_delete(
+            current_user.id, data.get('ids'), atomic=bool(data.get('atomic')))
+
+
 @ns.route('/<int:budget_id>')
 @ns.response(404, 'Бюджет не найден или доступ запрещен')
 @ns.response(401, 'Требуется авторизация')
@@ -133,12 +250,16 @@ class BudgetResource(Resource):
     """Чтение, обновление и удаление конкретного бюджета."""
 
     @ns.doc('get_budget', security='Bearer Auth')
+    @conditional_response
     @ns.marshal_with(budget_model)
     @jwt_required()
     def get(self, budget_id):
         """Получить бюджет по ID"""
         budget = Budget.query.filter_by(id=budget_id, owner=current_user).first_or_404(
             description="Budget not found or access denied.")
+        budget.projection = ForecastService.forecast_budgets(
+            current_user.id, [budget]).get(budget.id)
+        budget.line_statistics = BudgetLineService.evaluate(current_user.id, [budget])[budget.id]
         return budget
 
     @ns.doc('update_budget', security='Bearer Auth')
@@ -151,7 +272,8 @@ class BudgetResource(Resource):
         """Обновить бюджет"""
         budget = Budget.query.filter_by(id=budget_id, owner=current_user).first_or_404(
             description="Budget not found or access denied.")
-        data = ns.payload
+        data = dict(ns.payload)
+        lines = _prepare_lines(data.pop('lines', None))
 
         # Валидация через Marshmallow (partial=True для частичного обновления)
         try:
@@ -175,6 +297,8 @@ class BudgetResource(Resource):
                 value = BudgetPeriod(value)  # Преобразуем в Enum
             # Модель должна сама преобразовать даты из строк/объектов date
             setattr(budget, key, value)
+        if lines is not None:
+            BudgetLineService.replace_lines(budget, lines)
 
         try:
             db.session.commit()
@@ -189,6 +313,7 @@ class BudgetResource(Resource):
                 f"Error updating budget {budget_id}: {e}", exc_info=True)
             ns.abort(500, message="Could not update budget.")
 
+        budget.line_statistics = BudgetLineService.evaluate(current_user.id, [budget])[budget.id]
         return budget
 
     @ns.doc('delete_budget', security='Bearer Auth')
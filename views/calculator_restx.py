@@ -1,14 +1,19 @@
+import json
 import logging
-from flask import request, current_app
+from flask import request, current_app, Response, stream_with_context
 from flask_restx import Namespace, Resource, fields, inputs
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from decimal import Decimal, InvalidOperation
 from datetime import date
 from marshmallow import ValidationError
 
 from ..services import calculator_service  # Импортируем сервис
-from ..schemas import SavingsCalculatorSchema  # Импортируем схему для валидации
+from ..services.job_service import JobService
+from ..services.simulation_service import SimulationService
+from ..schemas import (SavingsCalculatorSchema, SavingsGridSchema,  # Импортируем схемы для валидации
+                       SavingsProbabilitySchema, AmortizationSchema, CompoundGrowthSchema)
 from ..utils.error_handlers import handle_validation_error, handle_value_error, handle_exception, log_operation
+from .jobs_restx import job_accepted
 
 # Создаем Namespace
 ns = Namespace('calculator', description='Финансовые калькуляторы')
@@ -30,6 +35,83 @@ savings_goal_output_model = ns.model('SavingsGoalOutput', {
     'message': fields.String(description='Дополнительное сообщение (например, цель достигнута)')
 })
 
+savings_grid_input_model = ns.model('SavingsGridInput', {
+    'target_amounts': fields.List(fields.String, required=True, description='Целевые суммы', example=['100000.00', '250000.00']),
+    'target_dates': fields.List(fields.Date, required=True, description='Даты достижения цели (YYYY-MM-DD)', example=['2026-12-31', '2027-12-31']),
+    'current_savings': fields.List(fields.String, description='Текущие накопления (по умолчанию [0])', example=['0.00', '50000.00']),
+    'mode': fields.String(description="'grid' - все сочетания, 'zip' - сценарии по индексам", enum=['grid', 'zip'], default='grid')
+})
+
+savings_grid_output_model = ns.model('SavingsGridOutput', {
+    'mode': fields.String(),
+    'target_amounts': fields.List(fields.String),
+    'target_dates': fields.List(fields.String),
+    'current_savings': fields.List(fields.String),
+    'months_remaining': fields.List(fields.Integer, description='Месяцев до каждой даты'),
+    'required_monthly_savings': fields.Raw(description='Суммы в виде [сумма][дата][накопления] (grid) или списка (zip)')
+})
+
+savings_probability_input_model = ns.model('SavingsProbabilityInput', {
+    'target_amount': fields.String(required=True, description='Целевая сумма', example='10000.00'),
+    'target_date': fields.Date(required=True, description='Дата достижения цели (YYYY-MM-DD)', example='2026-12-31'),
+    'current_savings': fields.String(description='Текущие накопления (по умолчанию 0)', example='500.00'),
+    'simulations': fields.Integer(description='Число симуляций (100-100000)', default=5000),
+    'seed': fields.Integer(description='Seed генератора для воспроизводимости')
+})
+
+savings_probability_output_model = ns.model('SavingsProbabilityOutput', {
+    'probability': fields.Float(description='Доля симуляций, в которых цель достигнута к дате'),
+    'months_remaining': fields.Integer(),
+    'simulations': fields.Integer(),
+    'seed': fields.Integer(),
+    'history_months': fields.Integer(description='Месяцев истории в выборке'),
+    'average_monthly_net': fields.Float(description='Средние чистые накопления за месяц'),
+    'months': fields.List(fields.String, description='Месяцы траекторий (YYYY-MM)'),
+    'trajectories': fields.Raw(description='Перцентили накоплений по месяцам: p5, p25, p50, p75, p95')
+})
+
+amortization_input_model = ns.model('AmortizationInput', {
+    'principal': fields.String(required=True, description='Сумма кредита', example='300000.00'),
+    'annual_rate': fields.String(required=True, description='Годовая ставка, %', example='6.5'),
+    'months': fields.Integer(required=True, description='Срок в месяцах (до 600)', example=360),
+    'start_date': fields.Date(description='Дата выдачи (для дат платежей)', example='2025-01-01'),
+    'include_schedule': fields.Boolean(description='Вернуть помесячный график', default=True)
+})
+
+amortization_output_model = ns.model('AmortizationOutput', {
+    'summary': fields.Raw(description='Платеж, последний платеж, переплата и итоговая сумма'),
+    'schedule': fields.List(fields.Raw, description='Строки: number, date, payment, principal, interest, balance')
+})
+
+compound_growth_input_model = ns.model('CompoundGrowthInput', {
+    'initial_amount': fields.String(description='Начальная сумма', example='10000.00'),
+    'monthly_contribution': fields.String(description='Ежемесячный взнос', example='500.00'),
+    'annual_rate': fields.String(required=True, description='Годовая ставка, %', example='5'),
+    'months': fields.Integer(required=True, description='Срок в месяцах (до 1200)', example=120),
+    'start_date': fields.Date(description='Дата начала (для дат строк)'),
+    'include_schedule': fields.Boolean(description='Вернуть помесячный график', default=True)
+})
+
+compound_growth_output_model = ns.model('CompoundGrowthOutput', {
+    'summary': fields.Raw(description='Итоговый баланс, сумма взносов и начисленные проценты'),
+    'schedule': fields.List(fields.Raw, description='Строки: month, date, contributions, interest, balance')
+})
+
+
+def stream_schedule(summary, rows):
+    """
+    Потоковый JSON-ответ {"summary": ..., "schedule": [...]}.
+    Строки графика сериализуются по мере генерации, поэтому длинный
+    график не собирается в памяти целиком.
+    """
+    def generate():
+        yield '{"summary": ' + json.dumps(summary) + ', "schedule": ['
+        for index, row in enumerate(rows):
+            yield (', ' if index else '') + json.dumps(row)
+        yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
 # --- Ресурсы ---
 
 
@@ -79,3 +161,173 @@ class SavingsGoalCalculator(Resource):
             handle_exception(e, "savings calculator", user_id)
             # Эта строка никогда не выполнится, так как handle_exception вызывает abort
             return None
+
+
+@ns.route('/savings-goal/batch')
+class SavingsGoalBatchCalculator(Resource):
+    """Пакетный расчет сбережений для сетки сценариев "что если"."""
+
+    @ns.doc('calculate_savings_goal_batch', security='Bearer Auth')
+    @ns.expect(savings_grid_input_model)
+    @ns.response(200, 'Расчет выполнен успешно', model=savings_grid_output_model)
+    @ns.response(400, 'Ошибка валидации входных данных или слишком много сценариев')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Рассчитать необходимые сбережения для набора сценариев"""
+        user_id = get_jwt_identity()
+
+        try:
+            data = SavingsGridSchema().load(ns.payload or {})
+
+            log_operation(
+                operation_type="calculate",
+                resource_type="savings_goal_batch",
+                user_id=user_id,
+                details={"amounts": len(data['target_amounts']),
+                         "dates": len(data['target_dates']),
+                         "savings": len(data['current_savings']),
+                         "mode": data['mode']}
+            )
+
+            result = calculator_service.calculate_savings_grid(
+                target_amounts=data['target_amounts'],
+                target_dates=data['target_dates'],
+                current_savings=data['current_savings'],
+                mode=data['mode']
+            )
+            return result, 200
+        except ValidationError as e:
+            return handle_validation_error(e)
+        except ValueError as e:
+            return handle_value_error(e, log_error=True, user_id=user_id)
+        except Exception as e:
+            handle_exception(e, "savings batch calculator", user_id)
+            return None
+
+
+@ns.route('/savings-goal/probability')
+class SavingsGoalProbability(Resource):
+    """Вероятность достижения цели по истории накоплений пользователя."""
+
+    @ns.doc('calculate_savings_goal_probability', security='Bearer Auth',
+            params={'async': 'true - выполнить фоновой задачей и вернуть 202 со ссылкой на нее'})
+    @ns.expect(savings_probability_input_model)
+    @ns.response(200, 'Расчет выполнен успешно', model=savings_probability_output_model)
+    @ns.response(202, 'Задача принята (при async=true)')
+    @ns.response(400, 'Ошибка валидации, недостаточно истории или слишком большой расчет')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Оценить вероятность накопить сумму к дате (Монте-Карло)"""
+        user_id = get_jwt_identity()
+
+        try:
+            data = SavingsProbabilitySchema().load(ns.payload or {})
+
+            log_operation(
+                operation_type="calculate",
+                resource_type="savings_goal_probability",
+                user_id=user_id,
+                details={"target_amount": str(data['target_amount']),
+                         "target_date": data['target_date'].isoformat(),
+                         "simulations": data['simulations']}
+            )
+
+            # Большие расчеты можно вынести из запроса в фоновую задачу
+            if inputs.boolean(request.args.get('async', 'false')):
+                return job_accepted(JobService.submit(
+                    current_user.id, 'savings_goal_probability', ns.payload))
+
+            return SimulationService.savings_goal_probability(
+                current_user.id,
+                target_amount=data['target_amount'],
+                target_date=data['target_date'],
+                current_savings=data.get('current_savings', Decimal('0.00')),
+                simulations=data['simulations'],
+                seed=data['seed']
+            )
+        except ValidationError as e:
+            return handle_validation_error(e)
+        except Exception as e:
+            handle_exception(e, "savings probability calculator", user_id)
+            return None
+
+
+@ns.route('/amortization')
+class AmortizationCalculator(Resource):
+    """График погашения аннуитетного кредита."""
+
+    @ns.doc('calculate_amortization', security='Bearer Auth')
+    @ns.expect(amortization_input_model)
+    @ns.response(200, 'Расчет выполнен успешно (график передается потоком)', model=amortization_output_model)
+    @ns.response(400, 'Ошибка валидации входных данных')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Рассчитать платеж и график погашения кредита"""
+        user_id = get_jwt_identity()
+
+        try:
+            data = AmortizationSchema().load(ns.payload or {})
+
+            log_operation(
+                operation_type="calculate",
+                resource_type="amortization",
+                user_id=user_id,
+                details={"principal": str(data['principal']), "months": data['months']}
+            )
+
+            summary = calculator_service.amortization_summary(
+                data['principal'], data['annual_rate'], data['months'])
+            if not data['include_schedule']:
+                return {"summary": summary}, 200
+            return stream_schedule(summary, calculator_service.iter_amortization_schedule(
+                data['principal'], data['annual_rate'], data['months'], data['start_date']))
+        except ValidationError as e:
+            return handle_validation_error(e)
+        except ValueError as e:
+            return handle_value_error(e, log_error=True, user_id=user_id)
+        except Exception as e:
+            handle_exception(e, "amortization calculator", user_id)
+            return None
+
+
+@ns.route('/compound-growth')
+class CompoundGrowthCalculator(Resource):
+    """Рост накоплений со сложным процентом и регулярными взносами."""
+
+    @ns.doc('calculate_compound_growth', security='Bearer Auth')
+    @ns.expect(compound_growth_input_model)
+    @ns.response(200, 'Расчет выполнен успешно (график передается потоком)', model=compound_growth_output_model)
+    @ns.response(400, 'Ошибка валидации входных данных')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Рассчитать рост накоплений по месяцам"""
+        user_id = get_jwt_identity()
+
+        try:
+            data = CompoundGrowthSchema().load(ns.payload or {})
+
+            log_operation(
+                operation_type="calculate",
+                resource_type="compound_growth",
+                user_id=user_id,
+                details={"initial_amount": str(data['initial_amount']), "months": data['months']}
+            )
+
+            args = (data['initial_amount'], data['monthly_contribution'],
+                    data['annual_rate'], data['months'])
+            summary = calculator_service.compound_growth_summary(*args)
+            if not data['include_schedule']:
+                return {"summary": summary}, 200
+            return stream_schedule(summary, calculator_service.iter_compound_growth_schedule(
+                *args, start_date=data['start_date']))
+        except ValidationError as e:
+            return handle_validation_error(e)
+        except ValueError as e:
+            return handle_value_error(e, log_error=True, user_id=user_id)
+        except Exception as e:
+            handle_exception(e, "compound growth calculator", user_id)
+            return None
@@ -6,6 +6,7 @@ from flask_jwt_extended import jwt_required, current_user, get_jwt_identity
 
 from models import CategoryType
 from services.category_service import CategoryService
+from utils.http_cache import conditional_response
 
 # Создаем Namespace - аналог Blueprint для RESTx
 ns = Namespace(
@@ -16,7 +17,10 @@ category_model = ns.model('Category', {
     'id': fields.Integer(readonly=True, description='Уникальный идентификатор категории'),
     'name': fields.String(required=True, description='Название категории', example='Продукты'),
     'type': fields.String(required=True, description='Тип категории (доход/расход)', enum=[e.value for e in CategoryType], example='expense'),
-    'user_id': fields.Integer(readonly=True, description='ID владельца категории')
+    'user_id': fields.Integer(readonly=True, description='ID владельца категории'),
+    'transaction_count': fields.Integer(readonly=True, description='Число транзакций'),
+    'total_amount': fields.Float(readonly=True, description='Сумма транзакций за все время'),
+    'last_used_on': fields.Date(readonly=True, description='Дата последней транзакции')
 })
 
 # Модель для создания категории (без id)
@@ -25,6 +29,51 @@ category_input_model = ns.model('CategoryInput', {
     'type': fields.String(required=True, description='Тип категории (доход/расход)', enum=[e.value for e in CategoryType], example='expense')
 })
 
+# Модели для слияния категорий и переноса транзакций
+category_merge_model = ns.model('CategoryMerge', {
+    'target_id': fields.Integer(required=True, description='ID категории, в которую переносятся транзакции')
+})
+
+category_recategorize_model = ns.model('CategoryRecategorize', {
+    'transaction_ids': fields.List(fields.Integer, description='ID переносимых транзакций'),
+    'source_category_id': fields.Integer(description='Перенести все транзакции этой категории')
+})
+
+# Модели массовых операций
+category_bulk_update_item_model = ns.model('CategoryBulkUpdateItem', {
+    'id': fields.Integer(required=True, description='ID категории'),
+    'name': fields.String(description='Название категории'),
+    'type': fields.String(description='Тип категории', enum=[e.value for e in CategoryType])
+})
+
+category_bulk_create_model = ns.model('CategoryBulkCreate', {
+    'items': fields.List(fields.Nested(category_input_model), required=True, description='Создаваемые категории'),
+    'atomic': fields.Boolean(default=False, description='Не сохранять ничего, если в элементах есть ошибки')
+})
+
+category_bulk_update_model = ns.model('CategoryBulkUpdate', {
+    'items': fields.List(fields.Nested(category_bulk_update_item_model), required=True, description='Изменения категорий'),
+    'atomic': fields.Boolean(default=False, description='Не сохранять ничего, если в элементах есть ошибки')
+})
+
+category_bulk_delete_model = ns.model('CategoryBulkDelete', {
+    'ids': fields.List(fields.Integer, required=True, description='ID удаляемых категорий'),
+    'atomic': fields.Boolean(default=False, description='Не удалять ничего, если в элементах есть ошибки')
+})
+
+bulk_item_result_model = ns.model('CategoryBulkItemResult', {
+    'index': fields.Integer(description='Позиция элемента в запросе'),
+    'id': fields.Integer(description='ID категории'),
+    'status': fields.Integer(description='HTTP статус элемента'),
+    'error': fields.String(description='Ошибка элемента')
+})
+
+bulk_result_model = ns.model('CategoryBulkResult', {
+    'succeeded': fields.Integer(description='Выполнено'),
+    'failed': fields.Integer(description='С ошибками'),
+    'results': fields.List(fields.Nested(bulk_item_result_model))
+})
+
 # Модель ответа с ошибкой
 error_model = ns.model('Error', {
     'error': fields.String(required=True, description='Сообщение об ошибке')
@@ -34,6 +83,8 @@ error_model = ns.model('Error', {
 category_list_parser = reqparse.RequestParser()
 category_list_parser.add_argument('type', type=str, choices=[
                                   e.value for e in CategoryType], help='Фильтр по типу категории (income/expense)', location='args')
+category_list_parser.add_argument('sort', type=str, choices=['name', 'recent', 'frequent'],
+                                  help='Сортировка: по имени, по последнему или по частоте использования', location='args')
 
 # --- Ресурсы (обработчики эндпоинтов) ---
 
@@ -43,6 +94,7 @@ class CategoryList(Resource):
     """Работа со списком категорий и создание новых."""
 
     @ns.doc('list_categories', description='Получение списка категорий текущего пользователя с фильтрацией по типу.')
+    @conditional_response
     @ns.expect(category_list_parser)  # Описываем ожидаемые GET параметры
     @ns.response(200, 'Успешно', [category_model])
     @ns.response(401, 'Требуется авторизация')
@@ -63,7 +115,7 @@ class CategoryList(Resource):
 
             # Используем сервис для получения категорий
             result, status_code = CategoryService.get_user_categories(
-                user_id, type_filter)
+                user_id, type_filter, args.get('sort'))
             return result, status_code
 
         except Exception as e:
@@ -110,6 +162,7 @@ class CategoryResource(Resource):
     """Чтение, обновление и удаление конкретной категории."""
 
     @ns.doc('get_category', description='Получение данных одной категории по ID.')
+    @conditional_response
     @ns.response(200, 'Успешно', category_model)
     @ns.response(403, 'Доступ запрещен', error_model)
     @jwt_required()
@@ -191,3 +244,103 @@ class CategoryResource(Resource):
             current_app.logger.error(
                 f"Ошибка при удалении категории {category_id}: {str(e)}")
             return {"error": "Внутренняя ошибка сервера"}, 500
+
+
+@ns.route('/<int:category_id>/merge')
+@ns.param('category_id', 'Категория, которая будет объединена и удалена')
+class CategoryMerge(Resource):
+    """Слияние двух категорий."""
+
+    @ns.doc('merge_category', description='Перенос всех транзакций и правил категории в другую категорию того же типа и удаление исходной.')
+    @ns.expect(category_merge_model, validate=True)
+    @ns.response(200, 'Категории объединены')
+    @ns.response(400, 'Категории разных типов', error_model)
+    @ns.response(403, 'Доступ запрещен', error_model)
+    @ns.response(404, 'Категория не найдена', error_model)
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self, category_id):
+        """Объединить категорию с другой"""
+        try:
+            user_id = get_jwt_identity()
+            return CategoryService.merge_categories(
+                source_id=category_id,
+                target_id=request.json['target_id'],
+                user_id=user_id
+            )
+
+        except Exception as e:
+            current_app.logger.error(
+                f"Ошибка при объединении категории {category_id}: {str(e)}")
+            return {"error": "Внутренняя ошибка сервера"}, 500
+
+
+@ns.route('/<int:category_id>/recategorize')
+@ns.param('category_id', 'Категория, в которую переносятся транзакции')
+class CategoryRecategorize(Resource):
+    """Массовый перенос транзакций в категорию."""
+
+    @ns.doc('recategorize_transactions', description='Перенос выбранных транзакций или всех транзакций другой категории одним запросом.')
+    @ns.expect(category_recategorize_model)
+    @ns.response(200, 'Транзакции перенесены')
+    @ns.response(400, 'Тип транзакций не совпадает с типом категории', error_model)
+    @ns.response(404, 'Категория или транзакции не найдены', error_model)
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self, category_id):
+        """Перенести транзакции в категорию"""
+        try:
+            user_id = get_jwt_identity()
+            data = request.json or {}
+            return CategoryService.recategorize_transactions(
+                target_id=category_id,
+                user_id=user_id,
+                transaction_ids=data.get('transaction_ids'),
+                source_id=data.get('source_category_id')
+            )
+
+        except Exception as e:
+            current_app.logger.error(
+                f"Ошибка при переносе транзакций в категорию {category_id}: {str(e)}")
+            return {"error": "Внутренняя ошибка сервера"}, 500
+
+
+@ns.route('/bulk')
+class CategoryBulk(Resource):
+    """Массовое создание, изменение и удаление категорий за один запрос."""
+
+    @ns.doc('bulk_create_categories', description='Создание нескольких категорий; результат возвращается по каждому элементу.')
+    @ns.expect(category_bulk_create_model)
+    @ns.response(200, 'Результаты по элементам', bulk_result_model)
+    @ns.response(400, 'Некорректный запрос', error_model)
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Создать несколько категорий"""
+        data = request.json or {}
+        return CategoryService.bulk_create(
+            get_jwt_identity(), data.get('items'), atomic=bool(data.get('atomic')))
+
+    @ns.doc('bulk_update_categories', description='Изменение нескольких категорий; результат возвращается по каждому элементу.')
+    @ns.expect(category_bulk_update_model)
+    @ns.response(200, 'Результаты по элементам', bulk_result_model)
+    @ns.response(400, 'Некорректный запрос', error_model)
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def put(self):
+        """Изменить несколько категорий"""
+        data = request.json or {}
+        return CategoryService.bulk_update(
+            get_jwt_identity(), data.get('items'), atomic=bool(data.get('atomic')))
+
+    @ns.doc('bulk_delete_categories', description='Удаление нескольких категорий без транзакций и повторяющихся правил.')
+    @ns.expect(category_bulk_delete_model)
+    @ns.response(200, 'Результаты по элементам', bulk_result_model)
+    @ns.response(400, 'Некорректный запрос', error_model)
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def delete(self):
+        """Удалить несколько категорий"""
+        data = request.json or {}
+        return CategoryService.bulk_delete(
+            get_jwt_identity(), data.get('ids'), atomic=bool(data.get('atomic')))
@@ -0,0 +1,39 @@
+from flask_restx import Namespace, Resource, fields, reqparse, inputs
+from flask_jwt_extended import jwt_required, current_user
+
+from ..services.dashboard_service import DashboardService
+from ..utils.http_cache import conditional_response
+
+# Создаем Namespace
+ns = Namespace('dashboard', description='Данные главной страницы')
+
+# --- Модели данных для Swagger ---
+dashboard_model = ns.model('Dashboard', {
+    'summary': fields.Raw(description='Сводка за текущий месяц (как в /reports/summary)'),
+    'budgets': fields.List(fields.Raw, description='Активные бюджеты со статистикой и прогрессом'),
+    'recent_transactions': fields.List(fields.Raw, description='Последние транзакции с названиями категорий'),
+    'categories': fields.List(fields.Raw, description='Категории пользователя')
+})
+
+# --- Парсеры аргументов запроса ---
+dashboard_parser = reqparse.RequestParser()
+dashboard_parser.add_argument('limit', type=inputs.int_range(1, 100), default=10,
+                              help='Количество последних транзакций (1-100)', location='args')
+
+# --- Ресурсы ---
+
+
+@ns.route('')
+class Dashboard(Resource):
+    """Сводные данные для главной страницы."""
+
+    @ns.doc('get_dashboard', security='Bearer Auth')
+    @conditional_response
+    @ns.expect(dashboard_parser)
+    @ns.response(200, 'Успешно', model=dashboard_model)
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Получить данные главной страницы"""
+        args = dashboard_parser.parse_args()
+        return DashboardService.get_dashboard(current_user.id, args['limit'])
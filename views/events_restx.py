@@ -0,0 +1,83 @@
+import json
+import queue
+
+from flask import Response, current_app, request
+from flask_restx import Namespace, Resource
+from flask_jwt_extended import jwt_required, current_user
+
+from ..models import db
+from ..services.data_version_service import DataVersionService
+from ..services.event_service import EventService, DEFAULT_HEARTBEAT
+
+# Создаем Namespace
+ns = Namespace('events', description='Поток уведомлений об изменениях данных (SSE)')
+
+
+def _sse(event_type: str, data, event_id=None) -> str:
+    """Одно сообщение в формате text/event-stream."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+# --- Ресурсы ---
+
+
+@ns.route('/stream')
+class EventStream(Resource):
+    """Server-Sent Events: уведомления об изменениях данных пользователя."""
+
+    @ns.doc('get_event_stream', security='Bearer Auth', params={
+        'jwt': 'Токен доступа (для EventSource, который не передает заголовки)',
+        'Last-Event-ID': {'in': 'header', 'description': 'Последняя полученная версия данных'}
+    })
+    @ns.response(200, 'Поток text/event-stream')
+    @ns.response(401, 'Требуется авторизация')
+    @ns.response(503, 'Достигнут предел SSE-подключений процесса')
+    @jwt_required(locations=['headers', 'query_string'])
+    def get(self):
+        """
+        Подписаться на изменения: событие change содержит таблицу, id строк
+        (null - слишком много строк) и новую версию данных; id события -
+        версия данных, по которой клиент догружает изменения через /sync.
+        """
+        app = current_app._get_current_object()
+        user_id = current_user.id
+        version = DataVersionService.get_version(user_id)[0]
+        try:
+            last_seen = int(request.headers.get('Last-Event-ID', ''))
+        except ValueError:
+            last_seen = None
+        heartbeat = app.config.get('EVENTS_HEARTBEAT', DEFAULT_HEARTBEAT)
+        subscriber = EventService.subscribe(user_id)
+        if subscriber is None:
+            # Потоки воркера нужны и обычным запросам
+            return {'message': 'Too many event streams, retry later.'}, 503, {'Retry-After': '30'}
+        # Соединение с БД не держится все время жизни потока
+        db.session.remove()
+
+        def generate():
+            try:
+                yield _sse('hello', {'version': version}, version)
+                # После переподключения клиент мог пропустить изменения
+                if last_seen is not None and last_seen < version:
+                    yield _sse('resync', {'version': version}, version)
+                while True:
+                    try:
+                        payload = subscriber.get(timeout=heartbeat)
+                    except queue.Empty:
+                        yield ': keepalive\n\n'
+                        continue
+                    data = {key: value for key, value in payload.items()
+                            if key not in ('type', 'user_id')}
+                    yield _sse(payload['type'], data, payload.get('version'))
+            finally:
+                EventService.unsubscribe(user_id, subscriber, app)
+
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
@@ -0,0 +1,132 @@
+from flask import Response, send_file
+from flask_restx import Namespace, Resource, fields, reqparse, inputs
+from flask_jwt_extended import jwt_required, current_user
+
+from ..models import JobStatus
+from ..services.job_service import JobService, JOB_KINDS
+
+# Создаем Namespace
+ns = Namespace('jobs', description='Фоновые задачи: выгрузки и тяжелые отчеты')
+
+# --- Модели данных для Swagger ---
+job_input_model = ns.model('JobInput', {
+    'kind': fields.String(required=True, description='Вид задачи', enum=sorted(JOB_KINDS)),
+    'params': fields.Raw(description='Параметры задачи', example={'start_date': '2024-01-01', 'format': 'csv'})
+})
+
+job_model = ns.model('Job', {
+    'id': fields.Integer(readonly=True),
+    'kind': fields.String(),
+    'status': fields.String(enum=[status.value for status in JobStatus]),
+    'progress': fields.Float(description='Доля выполненной работы (0-1)'),
+    'message': fields.String(description='Текущий шаг'),
+    'params': fields.Raw(),
+    'error': fields.String(),
+    'result_type': fields.String(description='MIME-тип результата'),
+    'created_at': fields.DateTime(),
+    'started_at': fields.DateTime(),
+    'finished_at': fields.DateTime()
+})
+
+# --- Парсеры аргументов запроса ---
+list_parser = reqparse.RequestParser()
+list_parser.add_argument('limit', type=inputs.int_range(1, 200), default=50,
+                         help='Сколько последних задач вернуть', location='args')
+
+
+def job_accepted(result):
+    """Ответ 202 со ссылкой на созданную задачу (для эндпоинтов других разделов)."""
+    payload, status = result
+    if status != 202:
+        return payload, status
+    return payload, 202, {'Location': f"/api/v1/jobs/{payload['id']}"}
+
+# --- Ресурсы ---
+
+
+@ns.route('')
+class JobList(Resource):
+    """Задачи пользователя."""
+
+    @ns.doc('list_jobs', security='Bearer Auth')
+    @ns.expect(list_parser)
+    @ns.response(200, 'Успешно', model=[job_model])
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Получить последние задачи"""
+        args = list_parser.parse_args()
+        return JobService.list_jobs(current_user.id, args['limit'])
+
+    @ns.doc('submit_job', security='Bearer Auth')
+    @ns.expect(job_input_model)
+    @ns.response(202, 'Задача принята', model=job_model)
+    @ns.response(400, 'Неизвестный вид задачи или неверные параметры')
+    @ns.response(401, 'Требуется авторизация')
+    @ns.response(429, 'Слишком много незавершенных задач')
+    @jwt_required()
+    def post(self):
+        """Поставить задачу в очередь"""
+        data = ns.payload or {}
+        if not isinstance(data.get('params', {}), dict):
+            return {"error": "params должен быть объектом"}, 400
+        return job_accepted(JobService.submit(current_user.id, data.get('kind'), data.get('params')))
+
+
+@ns.route('/<int:job_id>')
+@ns.param('job_id', 'ID задачи')
+class JobItem(Resource):
+    """Состояние задачи."""
+
+    @ns.doc('get_job', security='Bearer Auth')
+    @ns.response(200, 'Успешно', model=job_model)
+    @ns.response(403, 'Нет доступа к задаче')
+    @ns.response(404, 'Задача не найдена')
+    @jwt_required()
+    def get(self, job_id):
+        """Получить состояние и прогресс задачи"""
+        return JobService.get_job(job_id, current_user.id)
+
+
+@ns.route('/<int:job_id>/cancel')
+@ns.param('job_id', 'ID задачи')
+class JobCancel(Resource):
+    """Отмена задачи."""
+
+    @ns.doc('cancel_job', security='Bearer Auth')
+    @ns.response(200, 'Отмена принята', model=job_model)
+    @ns.response(404, 'Задача не найдена')
+    @ns.response(409, 'Задача уже завершена')
+    @jwt_required()
+    def post(self, job_id):
+        """Отменить задачу (выполняющаяся остановится на следующем шаге)"""
+        return JobService.cancel_job(job_id, current_user.id)
+
+
+@ns.route('/<int:job_id>/result')
+@ns.param('job_id', 'ID задачи')
+class JobResult(Resource):
+    """Результат задачи."""
+
+    @ns.doc('get_job_result', security='Bearer Auth')
+    @ns.response(200, 'Результат (JSON или файл выгрузки)')
+    @ns.response(404, 'Задача не найдена')
+    @ns.response(409, 'Задача еще не завершилась успешно')
+    @jwt_required()
+    def get(self, job_id):
+        """Получить результат завершенной задачи"""
+        result, status = JobService.get_result(job_id, current_user.id)
+        if status != 200:
+            return result, status
+        extension = 'csv' if result['result_type'] == 'text/csv' else 'txt'
+        if 'path' in result:
+            # Файл выгрузки отдается потоком, без чтения в память
+            as_json = result['result_type'] == 'application/json'
+            return send_file(result['path'], mimetype=result['result_type'],
+                             as_attachment=not as_json,
+                             download_name=f'job-{job_id}.{"json" if as_json else extension}')
+        if result['result_type'] == 'application/json':
+            return result['content'], 200
+        return Response(result['content'], mimetype=result['result_type'], headers={
+            'Content-Disposition': f'attachment; filename=job-{job_id}.{extension}'
+        })
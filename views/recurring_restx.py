@@ -0,0 +1,186 @@
+from flask_restx import Namespace, Resource, fields, reqparse, inputs
+from flask_jwt_extended import jwt_required, current_user
+from marshmallow import ValidationError
+
+from ..models import BudgetPeriod
+from ..schemas import RecurringRuleSchema, RecurringConfirmSchema
+from ..services.recurring_service import RecurringService
+from ..utils.error_handlers import handle_validation_error, log_operation
+from ..utils.http_cache import conditional_response
+from .reports_restx import get_default_date_range
+
+# Создаем Namespace
+ns = Namespace('recurring', description='Повторяющиеся транзакции')
+
+# --- Модели данных для Swagger ---
+recurring_rule_model = ns.model('RecurringRule', {
+    'id': fields.Integer(readonly=True, description='ID правила'),
+    'description': fields.String(description='Описание', example='Аренда квартиры'),
+    'amount': fields.Float(required=True, description='Сумма', example=35000.00),
+    'type': fields.String(readonly=True, description='Тип (по категории)'),
+    'category_id': fields.Integer(required=True, description='ID категории'),
+    'period': fields.String(description='Периодичность (или cron)', enum=[p.value for p in BudgetPeriod], example='monthly'),
+    'cron': fields.String(description="Cron-подобное расписание 'день_месяца месяц день_недели' (или period)", example='25 * *'),
+    'start_date': fields.Date(required=True, description='Дата начала (YYYY-MM-DD)'),
+    'end_date': fields.Date(description='Дата окончания (необязательно)'),
+    'user_id': fields.Integer(readonly=True)
+})
+
+occurrence_model = ns.model('RecurringOccurrence', {
+    'rule_id': fields.Integer(),
+    'date': fields.Date(),
+    'amount': fields.Float(),
+    'type': fields.String(),
+    'category_id': fields.Integer(),
+    'description': fields.String(),
+    'confirmed': fields.Boolean(description='Вхождение подтверждено и сохранено как транзакция'),
+    'transaction_id': fields.Integer(description='ID созданной транзакции')
+})
+
+confirm_input_model = ns.model('RecurringConfirmInput', {
+    'date': fields.Date(required=True, description='Дата вхождения (YYYY-MM-DD)'),
+    'amount': fields.Float(description='Фактическая сумма (по умолчанию - сумма правила)')
+})
+
+# --- Парсеры аргументов запроса ---
+range_parser = reqparse.RequestParser()
+range_parser.add_argument('start_date', type=inputs.date_from_iso8601,
+                          help='Начало периода (YYYY-MM-DD)', location='args')
+range_parser.add_argument('end_date', type=inputs.date_from_iso8601,
+                          help='Конец периода (YYYY-MM-DD)', location='args')
+
+# Максимальная длина периода для развертывания вхождений
+MAX_RANGE_DAYS = 5 * 366
+
+rule_validator = RecurringRuleSchema()
+confirm_validator = RecurringConfirmSchema()
+
+
+def _parse_range():
+    """Период из параметров запроса (по умолчанию - текущий месяц)."""
+    args = range_parser.parse_args()
+    start_date, end_date = args.get('start_date'), args.get('end_date')
+    if not start_date or not end_date:
+        return get_default_date_range()
+    if end_date < start_date:
+        ns.abort(400, message="End date cannot be earlier than start date.")
+    if (end_date - start_date).days > MAX_RANGE_DAYS:
+        ns.abort(400, message="Date range is too long.")
+    return start_date, end_date
+
+# --- Ресурсы ---
+
+
+@ns.route('')
+class RecurringRuleList(Resource):
+    """Список правил и создание новых."""
+
+    @ns.doc('list_recurring_rules', security='Bearer Auth')
+    @conditional_response
+    @ns.response(200, 'Успешно', model=[recurring_rule_model])
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Список повторяющихся правил"""
+        return RecurringService.get_user_rules(current_user.id)
+
+    @ns.doc('create_recurring_rule', security='Bearer Auth')
+    @ns.expect(recurring_rule_model)
+    @ns.response(201, 'Правило создано', model=recurring_rule_model)
+    @ns.response(400, 'Ошибка валидации данных')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Создать повторяющееся правило"""
+        try:
+            data = rule_validator.load(ns.payload or {})
+        except ValidationError as e:
+            return handle_validation_error(e)
+
+        log_operation(operation_type="create", resource_type="recurring_rule",
+                      user_id=current_user.id)
+        return RecurringService.create_rule(current_user.id, data)
+
+
+@ns.route('/<int:rule_id>')
+@ns.response(404, 'Правило не найдено')
+@ns.response(401, 'Требуется авторизация')
+@ns.param('rule_id', 'Идентификатор правила')
+class RecurringRuleResource(Resource):
+    """Чтение, обновление и удаление правила."""
+
+    @ns.doc('get_recurring_rule', security='Bearer Auth')
+    @conditional_response
+    @ns.response(200, 'Успешно', model=recurring_rule_model)
+    @jwt_required()
+    def get(self, rule_id):
+        """Получить правило по ID"""
+        return RecurringService.get_rule(rule_id, current_user.id)
+
+    @ns.doc('update_recurring_rule', security='Bearer Auth')
+    @ns.expect(recurring_rule_model)
+    @ns.response(200, 'Правило обновлено', model=recurring_rule_model)
+    @ns.response(400, 'Ошибка валидации данных')
+    @jwt_required()
+    def put(self, rule_id):
+        """Обновить правило"""
+        try:
+            data = rule_validator.load(ns.payload or {}, partial=True)
+        except ValidationError as e:
+            return handle_validation_error(e)
+
+        log_operation(operation_type="update", resource_type="recurring_rule",
+                      resource_id=rule_id, user_id=current_user.id)
+        return RecurringService.update_rule(rule_id, current_user.id, data)
+
+    @ns.doc('delete_recurring_rule', security='Bearer Auth')
+    @ns.response(200, 'Правило удалено')
+    @jwt_required()
+    def delete(self, rule_id):
+        """Удалить правило (созданные транзакции сохраняются)"""
+        log_operation(operation_type="delete", resource_type="recurring_rule",
+                      resource_id=rule_id, user_id=current_user.id)
+        return RecurringService.delete_rule(rule_id, current_user.id)
+
+
+@ns.route('/<int:rule_id>/confirm')
+@ns.param('rule_id', 'Идентификатор правила')
+class RecurringConfirm(Resource):
+    """Подтверждение вхождения правила."""
+
+    @ns.doc('confirm_recurring_occurrence', security='Bearer Auth')
+    @ns.expect(confirm_input_model)
+    @ns.response(201, 'Вхождение подтверждено, транзакция создана')
+    @ns.response(400, 'Нет вхождения на эту дату или оно уже подтверждено')
+    @ns.response(404, 'Правило не найдено')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self, rule_id):
+        """Подтвердить вхождение и сохранить его как транзакцию"""
+        try:
+            data = confirm_validator.load(ns.payload or {})
+        except ValidationError as e:
+            return handle_validation_error(e)
+
+        log_operation(operation_type="confirm", resource_type="recurring_rule",
+                      resource_id=rule_id, user_id=current_user.id,
+                      details={"date": data['date'].isoformat()})
+        return RecurringService.confirm_occurrence(
+            rule_id, current_user.id, data['date'], data.get('amount'))
+
+
+@ns.route('/occurrences')
+class RecurringOccurrences(Resource):
+    """Вхождения всех правил за период."""
+
+    @ns.doc('list_recurring_occurrences', security='Bearer Auth')
+    @conditional_response
+    @ns.expect(range_parser)
+    @ns.response(200, 'Успешно', model=[occurrence_model])
+    @ns.response(400, 'Неверный период')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Вхождения правил за период (вычисляются на лету)"""
+        start_date, end_date = _parse_range()
+        return RecurringService.get_occurrences(current_user.id, start_date, end_date)
@@ -8,6 +8,12 @@ from datetime import date, timedelta
 from decimal import Decimal
 
 from ..models import Transaction, Category, CategoryType
+from ..services.analytics_service import AnalyticsService, GRANULARITIES
+from ..services.job_service import JobService
+from ..services.summary_service import SummaryService
+from ..services.recurring_service import RecurringService
+from ..utils.http_cache import conditional_response
+from .jobs_restx import job_accepted
 from .. import db
 
 # Создаем Namespace
@@ -28,7 +34,8 @@ report_summary_model = ns.model('ReportSummary', {
     'total_income': fields.Price(decimals=2, description='Общий доход за период'),
     'total_expense': fields.Price(decimals=2, description='Общий расход за период'),
     'net_total': fields.Price(decimals=2, description='Чистый итог (доход - расход)'),
-    'expenses_by_category': fields.List(fields.Nested(expense_breakdown_model), description='Разбивка расходов по категориям')
+    'expenses_by_category': fields.List(fields.Nested(expense_breakdown_model), description='Разбивка расходов по категориям'),
+    'expected': fields.Raw(description='Ожидаемые повторяющиеся транзакции с сегодняшнего дня (при include_expected=true)')
 })
 
 # --- Парсеры аргументов запроса ---
@@ -37,6 +44,31 @@ summary_parser.add_argument('start_date', type=inputs.date_from_iso8601,
                             help='Начало периода (YYYY-MM-DD)', location='args')
 summary_parser.add_argument('end_date', type=inputs.date_from_iso8601,
                             help='Конец периода (YYYY-MM-DD)', location='args')
+summary_parser.add_argument('include_expected', type=inputs.boolean, default=False,
+                            help='Добавить ожидаемые повторяющиеся транзакции', location='args')
+
+trend_parser = reqparse.RequestParser()
+trend_parser.add_argument('start_date', type=inputs.date_from_iso8601,
+                          help='Начало периода (YYYY-MM-DD)', location='args')
+trend_parser.add_argument('end_date', type=inputs.date_from_iso8601,
+                          help='Конец периода (YYYY-MM-DD)', location='args')
+trend_parser.add_argument('granularity', type=str, choices=GRANULARITIES, default='month',
+                          help='Интервал: day, week или month', location='args')
+
+category_totals_parser = reqparse.RequestParser()
+category_totals_parser.add_argument('start_date', type=inputs.date_from_iso8601,
+                                    help='Начало периода (по умолчанию - вся история)', location='args')
+category_totals_parser.add_argument('end_date', type=inputs.date_from_iso8601,
+                                    help='Конец периода', location='args')
+category_totals_parser.add_argument('type', type=str, choices=[e.value for e in CategoryType],
+                                    default=CategoryType.EXPENSE.value,
+                                    help='Тип транзакций (income/expense)', location='args')
+
+comparison_parser = reqparse.RequestParser()
+comparison_parser.add_argument('start_date', type=inputs.date_from_iso8601,
+                               help='Начало периода (YYYY-MM-DD)', location='args')
+comparison_parser.add_argument('end_date', type=inputs.date_from_iso8601,
+                               help='Конец периода (YYYY-MM-DD)', location='args')
 
 # Вспомогательная функция для дат по умолчанию
 
@@ -56,6 +88,7 @@ class SummaryReport(Resource):
     """Сводный отчет по доходам и расходам."""
 
     @ns.doc('get_summary_report', security='Bearer Auth')
+    @conditional_response
     @ns.expect(summary_parser)
     # Не используем marshal_with здесь, т.к. структура ответа сложная и формируется вручную
     # Но описываем возможный ответ для документации
@@ -75,55 +108,160 @@ class SummaryReport(Resource):
         elif end_date < start_date:
             ns.abort(400, message="End date cannot be earlier than start date.")
 
-        # Конечная дата для запросов (< end_date + 1)
-        end_date_exclusive = end_date + timedelta(days=1)
-
-        # Запрос для общих сумм
-        summary_results = db.session.query(
-            Transaction.type,
-            func.sum(Transaction.amount).label('total_amount')
-        ).filter(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= start_date,
-            Transaction.date < end_date_exclusive
-        ).group_by(Transaction.type).all()
-
-        total_income = Decimal('0.00')
-        total_expense = Decimal('0.00')
-        for result_type, total_amount in summary_results:
-            amount = total_amount or Decimal('0.00')
-            if result_type == CategoryType.INCOME:
-                total_income = amount
-            elif result_type == CategoryType.EXPENSE:
-                total_expense = amount
-
-        # Запрос для разбивки расходов
-        expenses_by_category_results = db.session.query(
-            Category.id.label('category_id'),
-            Category.name.label('category_name'),
-            func.sum(Transaction.amount).label('total_amount')
-        ).join(Category, Transaction.category_id == Category.id
-               ).filter(
-            Transaction.user_id == current_user.id,
-            Transaction.type == CategoryType.EXPENSE,
-            Transaction.date >= start_date,
-            Transaction.date < end_date_exclusive
-        ).group_by(Category.id, Category.name
-                   ).order_by(func.sum(Transaction.amount).desc()).all()
+        # Целые месяцы берутся из помесячных итогов, края периода - из транзакций
+        summary = SummaryService.get_summary(
+            current_user.id, start_date, end_date)
 
         expenses_breakdown = [
-            {"category_id": cat_id, "category_name": cat_name,
-                "total_amount": str(amount or Decimal('0.00'))}
-            for cat_id, cat_name, amount in expenses_by_category_results
+            {"category_id": item["category_id"], "category_name": item["category_name"],
+                "total_amount": str(item["total_amount"])}
+            for item in summary["expenses_by_category"]
         ]
 
         response_data = {
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat(),
-            "total_income": str(total_income),
-            "total_expense": str(total_expense),
-            "net_total": str(total_income - total_expense),
+            "total_income": str(summary["total_income"]),
+            "total_expense": str(summary["total_expense"]),
+            "net_total": str(summary["net_total"]),
             "expenses_by_category": expenses_breakdown
         }
+
+        # Ожидаемые вхождения повторяющихся правил с сегодняшнего дня
+        expected_start = max(start_date, date.today())
+        if args.get('include_expected') and expected_start <= end_date:
+            expected = RecurringService.forecast(
+                current_user.id, expected_start, end_date).totals(expected_start, end_date)
+            response_data["expected"] = {
+                "start_date": expected_start.isoformat(),
+                "end_date": end_date.isoformat(),
+                "total_income": str(expected['income']),
+                "total_expense": str(expected['expense']),
+                "projected_net_total": str(summary["net_total"] + expected['income'] - expected['expense'])
+            }
         # Используем jsonify, т.к. структура сложная и уже подготовлена
         return jsonify(response_data)
+
+
+def _change_to_json(value):
+    return {"amount": str(value["amount"]),
+            "percent": str(value["percent"]) if value["percent"] is not None else None}
+
+
+@ns.route('/comparison')
+class ComparisonReport(Resource):
+    """Сравнение периода с предыдущим и с тем же периодом год назад."""
+
+    @ns.doc('get_comparison_report', security='Bearer Auth')
+    @conditional_response
+    @ns.expect(comparison_parser)
+    @ns.response(200, 'Итоги трех периодов, разницы и проценты по категориям')
+    @ns.response(400, 'Неверный формат даты или end_date < start_date')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Сравнить период (по умолчанию - текущий месяц) с предыдущим и прошлогодним"""
+        args = comparison_parser.parse_args()
+        start_date = args.get('start_date')
+        end_date = args.get('end_date')
+        if not start_date or not end_date:
+            start_date, end_date = get_default_date_range()
+        elif end_date < start_date:
+            ns.abort(400, message="End date cannot be earlier than start date.")
+
+        comparison = SummaryService.get_comparison(current_user.id, start_date, end_date)
+        periods = ('current', 'previous', 'year_ago')
+        response_data = {
+            "periods": {
+                name: {
+                    "start_date": period["start_date"].isoformat(),
+                    "end_date": period["end_date"].isoformat(),
+                    "total_income": str(period["total_income"]),
+                    "total_expense": str(period["total_expense"]),
+                    "net_total": str(period["net_total"])
+                }
+                for name, period in comparison["periods"].items()
+            },
+            "categories": [
+                {"category_id": item["category_id"], "category_name": item["category_name"],
+                 "type": item["type"],
+                 **{name: str(item[name]) for name in periods},
+                 "change_previous": _change_to_json(item["change_previous"]),
+                 "change_year_ago": _change_to_json(item["change_year_ago"])}
+                for item in comparison["categories"]
+            ]
+        }
+        for name in ('change_previous', 'change_year_ago'):
+            response_data[name] = {key: _change_to_json(value)
+                                   for key, value in comparison[name].items()}
+        return jsonify(response_data)
+
+
+@ns.route('/trend')
+class TrendReport(Resource):
+    """Динамика доходов и расходов по интервалам (столбцы в памяти)."""
+
+    @ns.doc('get_trend_report', security='Bearer Auth')
+    @conditional_response
+    @ns.expect(trend_parser)
+    @ns.response(200, 'Доходы, расходы и итог по интервалам периода')
+    @ns.response(400, 'Неверный период или интервал')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Получить динамику за период (по умолчанию - последние 12 месяцев)"""
+        args = trend_parser.parse_args()
+        end_date = args.get('end_date') or date.today()
+        start_date = args.get('start_date') or \
+            (end_date.replace(day=1) - timedelta(days=334)).replace(day=1)
+        result, status = AnalyticsService.get_trend(
+            current_user.id, start_date, end_date, args['granularity'])
+        if status != 200:
+            ns.abort(status, message=result['error'])
+        return result
+
+
+@ns.route('/categories')
+class CategoryTotalsReport(Resource):
+    """Суммы по категориям за любой период (столбцы в памяти)."""
+
+    @ns.doc('get_category_totals_report', security='Bearer Auth')
+    @conditional_response
+    @ns.expect(category_totals_parser)
+    @ns.response(200, 'Суммы и число транзакций по категориям')
+    @ns.response(400, 'Неверный период или тип')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Получить суммы по категориям за период"""
+        args = category_totals_parser.parse_args()
+        start_date, end_date = args.get('start_date'), args.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            ns.abort(400, message="End date cannot be earlier than start date.")
+        result, status = AnalyticsService.get_category_totals(
+            current_user.id, start_date, end_date, args['type'])
+        if status != 200:
+            ns.abort(status, message=result['error'])
+        return result
+
+
+statistics_input_model = ns.model('StatisticsInput', {
+    'start_date': fields.Date(description='Начало периода (по умолчанию - вся история)'),
+    'end_date': fields.Date(description='Конец периода')
+})
+
+
+@ns.route('/statistics')
+class StatisticsReport(Resource):
+    """Статистика доходов и расходов по категориям за любой период."""
+
+    @ns.doc('submit_statistics_report', security='Bearer Auth')
+    @ns.expect(statistics_input_model)
+    @ns.response(202, 'Задача принята (результат - /api/v1/jobs/<id>/result)')
+    @ns.response(400, 'Неверный формат даты')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Поставить расчет статистики в очередь фоновых задач"""
+        return job_accepted(JobService.submit(
+            current_user.id, 'transaction_statistics', ns.payload or {}))
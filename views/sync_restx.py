@@ -0,0 +1,50 @@
+from flask_restx import Namespace, Resource, fields, reqparse, inputs
+from flask_jwt_extended import jwt_required, current_user
+
+from ..services.sync_service import SyncService, DEFAULT_SYNC_LIMIT
+from ..utils.http_cache import conditional_response
+
+# Создаем Namespace
+ns = Namespace('sync', description='Дельта-синхронизация данных клиента')
+
+# --- Модели данных для Swagger ---
+deleted_record_model = ns.model('DeletedRecord', {
+    'table': fields.String(description='Таблица удаленной строки', example='transactions'),
+    'id': fields.Integer(description='ID удаленной строки')
+})
+
+sync_model = ns.model('SyncChanges', {
+    'transactions': fields.List(fields.Raw, description='Созданные и измененные транзакции'),
+    'categories': fields.List(fields.Raw, description='Созданные и измененные категории'),
+    'budgets': fields.List(fields.Raw, description='Созданные и измененные бюджеты'),
+    'deleted': fields.List(fields.Nested(deleted_record_model), description='Удаленные строки'),
+    'token': fields.String(description='Токен для следующего запроса'),
+    'has_more': fields.Boolean(description='Есть еще изменения: повторите запрос с новым токеном'),
+    'version': fields.Integer(description='Текущая версия данных пользователя')
+})
+
+# --- Парсеры аргументов запроса ---
+sync_parser = reqparse.RequestParser()
+sync_parser.add_argument('since', type=str, default=None,
+                         help='Токен предыдущей синхронизации (пусто - все данные)', location='args')
+sync_parser.add_argument('limit', type=inputs.int_range(1, 1000), default=DEFAULT_SYNC_LIMIT,
+                         help='Максимум строк в ответе (1-1000)', location='args')
+
+# --- Ресурсы ---
+
+
+@ns.route('')
+class Sync(Resource):
+    """Изменения данных пользователя после предыдущей синхронизации."""
+
+    @ns.doc('get_sync_changes', security='Bearer Auth')
+    @conditional_response
+    @ns.expect(sync_parser)
+    @ns.response(200, 'Успешно', model=sync_model)
+    @ns.response(400, 'Неверный токен синхронизации')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Получить изменения после токена (удаления применяются первыми)"""
+        args = sync_parser.parse_args()
+        return SyncService.get_changes(current_user.id, args['since'], args['limit'])
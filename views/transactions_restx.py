@@ -1,6 +1,7 @@
 import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from flask import request, current_app
-from flask_restx import Namespace, Resource, fields, reqparse
+from flask_restx import Namespace, Resource, fields, reqparse, inputs
 from flask_jwt_extended import jwt_required, current_user
 from sqlalchemy import func  # Для сортировки в GET запросе
 from datetime import date
@@ -8,9 +9,18 @@ from decimal import Decimal
 # Для отлова, если используется доп. валидация
 from marshmallow import ValidationError
 
-from ..models import Transaction, Category, CategoryType
+from ..models import Transaction, Category, CategoryType, BASE_CURRENCY
 # Импортируем схемы Marshmallow, они все еще полезны для валидации и иногда для сериализации
-from ..schemas import TransactionSchema, CategorySchema
+from ..schemas import TransactionSchema, CategorySchema, TransactionImportSchema
+from ..services.archive_service import transaction_source
+from ..services.currency_service import ExchangeRateService
+from ..services.group_commit_service import committer_for_session
+from ..services.job_service import JobService
+from ..services.search_service import SearchService
+from ..services.transaction_service import TransactionService
+from ..utils.error_handlers import handle_validation_error, log_operation
+from ..utils.http_cache import conditional_response
+from .jobs_restx import job_accepted
 from .. import db
 
 # Создаем Namespace
@@ -31,6 +41,7 @@ transaction_model = ns.model('Transaction', {
     'description': fields.String(description='Описание'),
     # Используем Price для денег
     'amount': fields.Price(required=True, description='Сумма', decimals=2),
+    'currency': fields.String(description='Валюта (ISO 4217)'),
     'date': fields.Date(required=True, description='Дата транзакции (YYYY-MM-DD)'),
     'type': fields.String(enum=[e.value for e in CategoryType], readonly=True, description='Тип (доход/расход)'),
     'created_at': fields.DateTime(readonly=True, dt_format='iso8601'),
@@ -42,6 +53,7 @@ transaction_model = ns.model('Transaction', {
 transaction_input_model = ns.model('TransactionInput', {
     'description': fields.String(description='Описание', example='Обед'),
     'amount': fields.Price(required=True, description='Сумма (> 0)', decimals=2, min=0.01, example=350.00),
+    'currency': fields.String(description='Валюта (ISO 4217), по умолчанию базовая', example='USD'),
     'date': fields.Date(required=True, description='Дата (YYYY-MM-DD)', example='2024-05-15'),
     'category_id': fields.Integer(required=True, description='ID категории', example=1)
 })
@@ -62,6 +74,95 @@ transaction_list_parser.add_argument('sort_by', type=str, choices=[
 transaction_list_parser.add_argument('sort_order', type=str, choices=[
                                      'asc', 'desc'], default='desc', help='Порядок сортировки', location='args')
 
+# --- Парсер аргументов поиска ---
+transaction_search_parser = reqparse.RequestParser(bundle_errors=True)
+transaction_search_parser.add_argument(
+    'q', type=str, required=True, help='Слова для поиска в описании', location='args')
+transaction_search_parser.add_argument('type', type=str, choices=[
+                                       e.value for e in CategoryType], help='Фильтр по типу (income/expense)', location='args')
+transaction_search_parser.add_argument(
+    'category_id', type=int, help='Фильтр по ID категории', location='args')
+transaction_search_parser.add_argument(
+    'start_date', type=inputs.date_from_iso8601, help='Начальная дата периода (YYYY-MM-DD)', location='args')
+transaction_search_parser.add_argument(
+    'end_date', type=inputs.date_from_iso8601, help='Конечная дата периода (YYYY-MM-DD)', location='args')
+transaction_search_parser.add_argument('sort_by', type=str, choices=[
+                                       'rank', 'date'], default='rank', help='Сортировка: по релевантности или по дате', location='args')
+transaction_search_parser.add_argument(
+    'limit', type=inputs.int_range(1, 200), default=50, help='Размер страницы', location='args')
+transaction_search_parser.add_argument(
+    'offset', type=inputs.natural, default=0, help='Смещение', location='args')
+
+# --- Парсер подбора категории ---
+category_suggest_parser = reqparse.RequestParser(bundle_errors=True)
+category_suggest_parser.add_argument(
+    'description', type=str, required=True, help='Описание транзакции', location='args')
+category_suggest_parser.add_argument('type', type=str, choices=[
+                                     e.value for e in CategoryType], help='Только категории этого типа', location='args')
+category_suggest_parser.add_argument(
+    'limit', type=inputs.int_range(1, 20), default=3, help='Число вариантов', location='args')
+
+category_suggestion_model = ns.model('CategorySuggestion', {
+    'category_id': fields.Integer(),
+    'category_name': fields.String(),
+    'type': fields.String(enum=[e.value for e in CategoryType]),
+    'confidence': fields.Float(description='Уверенность 0..1')
+})
+
+transaction_import_row_model = ns.model('TransactionImportRow', {
+    'description': fields.String(description='Описание', example='Starbucks'),
+    'amount': fields.String(required=True, description='Сумма (> 0)', example='350.00'),
+    'currency': fields.String(description='Валюта (ISO 4217), по умолчанию базовая', example='USD'),
+    'date': fields.Date(required=True, description='Дата (YYYY-MM-DD)'),
+    'type': fields.String(enum=[e.value for e in CategoryType], description='Тип (ограничивает подбор категории)'),
+    'category_id': fields.Integer(description='ID категории (если не указан - подбирается по описанию)')
+})
+
+transaction_import_model = ns.model('TransactionImport', {
+    'transactions': fields.List(fields.Nested(transaction_import_row_model), required=True, description='До 1000 строк'),
+    'auto_categorize': fields.Boolean(default=True, description='Подбирать категорию для строк без category_id'),
+    'min_confidence': fields.Float(default=0.0, description='Минимальная уверенность подбора (0..1)'),
+    'skip_duplicates': fields.Boolean(default=True, description='Пропускать строки, которые уже есть в базе')
+})
+
+# Модели массовых операций
+transaction_bulk_update_item_model = ns.model('TransactionBulkUpdateItem', {
+    'id': fields.Integer(required=True, description='ID транзакции'),
+    'description': fields.String(description='Описание'),
+    'amount': fields.String(description='Сумма (> 0)', example='350.00'),
+    'currency': fields.String(description='Валюта (ISO 4217)', example='USD'),
+    'date': fields.Date(description='Дата (YYYY-MM-DD)'),
+    'category_id': fields.Integer(description='ID категории')
+})
+
+transaction_bulk_create_model = ns.model('TransactionBulkCreate', {
+    'items': fields.List(fields.Nested(transaction_import_row_model), required=True, description='Создаваемые транзакции'),
+    'atomic': fields.Boolean(default=False, description='Не сохранять ничего, если в элементах есть ошибки')
+})
+
+transaction_bulk_update_model = ns.model('TransactionBulkUpdate', {
+    'items': fields.List(fields.Nested(transaction_bulk_update_item_model), required=True, description='Изменения транзакций'),
+    'atomic': fields.Boolean(default=False, description='Не сохранять ничего, если в элементах есть ошибки')
+})
+
+transaction_bulk_delete_model = ns.model('TransactionBulkDelete', {
+    'ids': fields.List(fields.Integer, required=True, description='ID удаляемых транзакций'),
+    'atomic': fields.Boolean(default=False, description='Не удалять ничего, если в элементах есть ошибки')
+})
+
+bulk_item_result_model = ns.model('TransactionBulkItemResult', {
+    'index': fields.Integer(description='Позиция элемента в запросе'),
+    'id': fields.Integer(description='ID транзакции'),
+    'status': fields.Integer(description='HTTP статус элемента'),
+    'error': fields.String(description='Ошибка элемента')
+})
+
+bulk_result_model = ns.model('TransactionBulkResult', {
+    'succeeded': fields.Integer(description='Выполнено'),
+    'failed': fields.Integer(description='С ошибками'),
+    'results': fields.List(fields.Nested(bulk_item_result_model))
+})
+
 # --- Marshmallow Схемы (для сложной валидации/сериализации) ---
 transaction_load_validator = TransactionSchema(
     exclude=("id", "created_at", "type", "category", "user_id"))
@@ -75,6 +176,7 @@ class TransactionList(Resource):
     """Работа со списком транзакций и создание новых."""
 
     @ns.doc('list_transactions', security='Bearer Auth')
+    @conditional_response
     @ns.expect(transaction_list_parser)
     # Используем marshal_list_with и модель RESTx для ответа
     @ns.marshal_list_with(transaction_model)
@@ -84,11 +186,19 @@ class TransactionList(Resource):
     def get(self):
         """Список транзакций пользователя (с фильтрацией и сортировкой)"""
         args = transaction_list_parser.parse_args()
-        query = Transaction.query.filter_by(owner=current_user)
+        try:
+            start_date = date.fromisoformat(args['start_date']) if args['start_date'] else None
+            end_date = date.fromisoformat(args['end_date']) if args['end_date'] else None
+        except ValueError:
+            ns.abort(400, message="Invalid date format. Use YYYY-MM-DD.")
+
+        # Транзакции архивных лет периода читаются из их архивов
+        source = transaction_source(start_date, end_date)
+        query = db.session.query(source).filter(source.user_id == current_user.id)
 
         # Применение фильтров
         if args['type']:
-            query = query.filter(Transaction.type ==
+            query = query.filter(source.type ==
                                  CategoryType(args['type']))
         if args['category_id']:
             # Проверяем доступность категории для пользователя
@@ -96,21 +206,16 @@ class TransactionList(Resource):
                 id=args['category_id'], owner=current_user).first()
             if category:
                 query = query.filter(
-                    Transaction.category_id == args['category_id'])
+                    source.category_id == args['category_id'])
             else:
                 return [], 200  # Возвращаем пустой список, если категория недоступна
-        try:
-            if args['start_date']:
-                start_date = date.fromisoformat(args['start_date'])
-                query = query.filter(Transaction.date >= start_date)
-            if args['end_date']:
-                end_date = date.fromisoformat(args['end_date'])
-                query = query.filter(Transaction.date <= end_date)
-        except ValueError:
-            ns.abort(400, message="Invalid date format. Use YYYY-MM-DD.")
+        if start_date:
+            query = query.filter(source.date >= start_date)
+        if end_date:
+            query = query.filter(source.date <= end_date)
 
         # Применение сортировки
-        sort_column = getattr(Transaction, args['sort_by'], Transaction.date)
+        sort_column = getattr(source, args['sort_by'], source.date)
         if args['sort_order'] == 'desc':
             query = query.order_by(sort_column.desc())
         else:
@@ -126,6 +231,7 @@ class TransactionList(Resource):
     @ns.response(404, 'Категория не найдена или недоступна')
     @ns.response(400, 'Ошибка валидации данных')
     @ns.response(401, 'Требуется авторизация')
+    @ns.response(503, 'Истекло ожидание группового коммита')
     @jwt_required()
     def post(self):
         """Создать транзакцию"""
@@ -145,19 +251,45 @@ class TransactionList(Resource):
         # except ValidationError as err:
         #     ns.abort(400, message=err.messages)
 
-        # Создаем транзакцию (тип установится в модели)
-        new_transaction = Transaction(
-            # Используем get для необязательных полей
-            description=data.get('description'),
-            amount=data['amount'],
-            date=data['date'],
-            category_id=category_id,
-            owner=current_user
-        )
-
+        # Валюта: курс к базовой валюте должен быть известен на дату
+        currency = BASE_CURRENCY
+        if data.get('currency') is not None:
+            try:
+                transaction_date = date.fromisoformat(str(data['date']))
+            except ValueError:
+                ns.abort(400, message="Invalid date format for date. Use YYYY-MM-DD.")
+            currency, error = ExchangeRateService.check_currency(data['currency'], transaction_date)
+            if error:
+                ns.abort(400, message=error)
+
+        committer = committer_for_session()
         try:
-            db.session.add(new_transaction)
-            db.session.commit()
+            if committer is not None:
+                # Групповой коммит: строка записывается вместе со вставками
+                # параллельных запросов, ответ - записанный объект
+                written = committer.insert({
+                    'description': data.get('description'),
+                    'amount': data['amount'],
+                    'currency': currency,
+                    'date': date.fromisoformat(str(data['date'])),
+                    'type': category.type,
+                    'category_id': category_id,
+                    'user_id': current_user.id
+                })
+                new_transaction = db.session.get(Transaction, written['id'])
+            else:
+                # Создаем транзакцию (тип установится в модели)
+                new_transaction = Transaction(
+                    # Используем get для необязательных полей
+                    description=data.get('description'),
+                    amount=data['amount'],
+                    currency=currency,
+                    date=data['date'],
+                    category_id=category_id,
+                    owner=current_user
+                )
+                db.session.add(new_transaction)
+                db.session.commit()
             current_app.logger.info(
                 f"Transaction {new_transaction.id} created for user {current_user.id}")
         # Ловим ошибки валидации модели (например, тип категории)
@@ -165,6 +297,9 @@ class TransactionList(Resource):
             db.session.rollback()
             # Возвращаем сообщение валидатора модели
             ns.abort(400, message=str(e))
+        except FutureTimeoutError:
+            current_app.logger.error("Group commit wait timed out")
+            ns.abort(503, message="Server is busy, retry later.")
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(
@@ -175,6 +310,157 @@ class TransactionList(Resource):
         return new_transaction, 201
 
 
+@ns.route('/search')
+class TransactionSearch(Resource):
+    """Полнотекстовый поиск транзакций по описанию."""
+
+    @ns.doc('search_transactions', security='Bearer Auth')
+    @conditional_response
+    @ns.expect(transaction_search_parser)
+    @ns.response(200, 'Успешно')
+    @ns.response(400, 'Пустой запрос или ошибка в параметрах')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Найти транзакции по словам в описании (с фильтрами и ранжированием)"""
+        args = transaction_search_parser.parse_args()
+        return SearchService.search_transactions(
+            current_user.id,
+            args['q'],
+            start_date=args['start_date'],
+            end_date=args['end_date'],
+            category_id=args['category_id'],
+            transaction_type=args['type'],
+            sort_by=args['sort_by'],
+            limit=args['limit'],
+            offset=args['offset']
+        )
+
+
+@ns.route('/suggest-category')
+class TransactionCategorySuggestion(Resource):
+    """Подбор категории по описанию на основе истории пользователя."""
+
+    @ns.doc('suggest_transaction_category', security='Bearer Auth')
+    @ns.expect(category_suggest_parser)
+    @ns.response(200, 'Успешно', model=[category_suggestion_model])
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def get(self):
+        """Предложить категории для описания (по убыванию уверенности)"""
+        args = category_suggest_parser.parse_args()
+        return TransactionService.suggest_categories(
+            current_user.id, args['description'], args['type'], args['limit'])
+
+
+@ns.route('/import')
+class TransactionImport(Resource):
+    """Пакетный импорт транзакций с автоматическим подбором категорий."""
+
+    @ns.doc('import_transactions', security='Bearer Auth')
+    @ns.expect(transaction_import_model)
+    @ns.response(201, 'Транзакции импортированы')
+    @ns.response(400, 'Ошибка валидации (ничего не сохранено)')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Импортировать транзакции (строки без category_id категоризируются, дубликаты пропускаются)"""
+        try:
+            data = TransactionImportSchema().load(ns.payload or {})
+        except ValidationError as e:
+            return handle_validation_error(e)
+
+        log_operation(operation_type="import", resource_type="transaction",
+                      user_id=current_user.id, details={"rows": len(data['transactions'])})
+        return TransactionService.import_transactions(
+            current_user.id, data['transactions'],
+            auto_categorize=data['auto_categorize'],
+            min_confidence=data['min_confidence'],
+            skip_duplicates=data['skip_duplicates'])
+
+
+transaction_export_model = ns.model('TransactionExportInput', {
+    'start_date': fields.Date(description='Начало периода (по умолчанию - вся история)'),
+    'end_date': fields.Date(description='Конец периода'),
+    'format': fields.String(description='Формат выгрузки', enum=['csv', 'json'], default='csv')
+})
+
+
+@ns.route('/export')
+class TransactionExport(Resource):
+    """Выгрузка транзакций фоновой задачей."""
+
+    @ns.doc('export_transactions', security='Bearer Auth')
+    @ns.expect(transaction_export_model)
+    @ns.response(202, 'Задача выгрузки принята (результат - /api/v1/jobs/<id>/result)')
+    @ns.response(400, 'Неверные параметры')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Поставить выгрузку транзакций в очередь фоновых задач"""
+        return job_accepted(JobService.submit(
+            current_user.id, 'transactions_export', ns.payload or {}))
+
+
+@ns.route('/bulk')
+class TransactionBulk(Resource):
+    """Массовое создание, изменение и удаление транзакций за один запрос."""
+
+    @ns.doc('bulk_create_transactions', security='Bearer Auth')
+    @ns.expect(transaction_bulk_create_model)
+    @ns.response(200, 'Результаты по элементам', bulk_result_model)
+    @ns.response(400, 'Некорректный запрос')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def post(self):
+        """Создать несколько транзакций"""
+        data = ns.payload or {}
+        log_operation(operation_type="bulk_create", resource_type="transaction",
+                      user_id=current_user.id, details={"count": len(data.get('items') or [])})
+        return TransactionService.bulk_create(
+            current_user.id, data.get('items'), atomic=bool(data.get('atomic')))
+
+    @ns.doc('bulk_update_transactions', security='Bearer Auth')
+    @ns.expect(transaction_bulk_update_model)
+    @ns.response(200, 'Результаты по элементам', bulk_result_model)
+    @ns.response(400, 'Некорректный запрос')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def put(self):
+        """Изменить несколько транзакций"""
+        data = ns.payload or {}
+        log_operation(operation_type="bulk_update", resource_type="transaction",
+                      user_id=current_user.id, details={"count": len(data.get('items') or [])})
+        return TransactionService.bulk_update(
+            current_user.id, data.get('items'), atomic=bool(data.get('atomic')))
+
+    @ns.doc('bulk_delete_transactions', security='Bearer Auth')
+    @ns.expect(transaction_bulk_delete_model)
+    @ns.response(200, 'Результаты по элементам', bulk_result_model)
+    @ns.response(400, 'Некорректный запрос')
+    @ns.response(401, 'Требуется авторизация')
+    @jwt_required()
+    def delete(self):
+        """Удалить несколько транзакций"""
+        data = ns.payload or {}
+        log_operation(operation_type="bulk_delete", resource_type="transaction",
+                      user_id=current_user.id, details={"count": len(data.get('ids') or [])})
+        return TransactionService.bulk_delete(
+            current_user.id, data.get('ids'), atomic=bool(data.get('atomic')))
+
+
+def _writable_transaction(transaction_id: int) -> Transaction:
+    """Транзакция пользователя для изменения; архивные доступны только для чтения."""
+    transaction = Transaction.query.filter_by(id=transaction_id, owner=current_user).first()
+    if transaction is None:
+        source = transaction_source()
+        if source is not Transaction and db.session.query(source.id).filter(
+                source.id == transaction_id, source.user_id == current_user.id).first():
+            ns.abort(409, message="Archived transactions are read-only.")
+        ns.abort(404, message="Transaction not found or access denied.")
+    return transaction
+
+
 @ns.route('/<int:transaction_id>')
 @ns.response(404, 'Транзакция не найдена или доступ запрещен')
 @ns.response(401, 'Требуется авторизация')
@@ -183,25 +469,27 @@ class TransactionResource(Resource):
     """Чтение, обновление и удаление конкретной транзакции."""
 
     @ns.doc('get_transaction', security='Bearer Auth')
+    @conditional_response
     @ns.marshal_with(transaction_model)
     @jwt_required()
     def get(self, transaction_id):
-        """Получить транзакцию по ID"""
-        transaction = Transaction.query.filter_by(id=transaction_id, owner=current_user).first_or_404(
-            description="Transaction not found or access denied.")
-        return transaction
+        """Получить транзакцию по ID (в том числе из архива)"""
+        source = transaction_source()
+        return db.session.query(source).filter(
+            source.id == transaction_id, source.user_id == current_user.id
+        ).first_or_404(description="Transaction not found or access denied.")
 
     @ns.doc('update_transaction', security='Bearer Auth')
     # Используем ту же модель для обновления
     @ns.expect(transaction_input_model)
     @ns.marshal_with(transaction_model)
     @ns.response(404, 'Транзакция или новая категория не найдена/недоступна')
+    @ns.response(409, 'Транзакция в архиве и доступна только для чтения')
     @ns.response(400, 'Ошибка валидации данных')
     @jwt_required()
     def put(self, transaction_id):
         """Обновить транзакцию"""
-        transaction = Transaction.query.filter_by(id=transaction_id, owner=current_user).first_or_404(
-            description="Transaction not found or access denied.")
+        transaction = _writable_transaction(transaction_id)
         data = ns.payload
 
         # Опциональная валидация через Marshmallow
@@ -220,6 +508,18 @@ class TransactionResource(Resource):
                     404, message=f"New category with id {new_category_id} not found or access denied.")
             # Валидатор модели проверит тип при присваивании
 
+        # Проверка валюты: курс должен быть известен на (новую) дату
+        if 'currency' in data:
+            try:
+                transaction_date = date.fromisoformat(str(data['date'])) \
+                    if 'date' in data else transaction.date
+            except ValueError:
+                ns.abort(400, message="Invalid date format for date. Use YYYY-MM-DD.")
+            data['currency'], error = ExchangeRateService.check_currency(
+                data['currency'], transaction_date)
+            if error:
+                ns.abort(400, message=error)
+
         # Обновляем поля объекта транзакции
         for key, value in data.items():
             # Преобразуем дату из строки, если она передана
@@ -259,11 +559,11 @@ class TransactionResource(Resource):
 
     @ns.doc('delete_transaction', security='Bearer Auth')
     @ns.response(204, 'Транзакция успешно удалена')
+    @ns.response(409, 'Транзакция в архиве и доступна только для чтения')
     @jwt_required()
     def delete(self, transaction_id):
         """Удалить транзакцию"""
-        transaction = Transaction.query.filter_by(id=transaction_id, owner=current_user).first_or_404(
-            description="Transaction not found or access denied.")
+        transaction = _writable_transaction(transaction_id)
 
         try:
             db.session.delete(transaction)